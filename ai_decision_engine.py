@@ -5,10 +5,18 @@ Autonomous decision engine for AI Weed Company
 
 from enum import Enum
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+import copy
 import json
+import os
 from ai_memory_system import AIMemory, MemoryAwareDecisionEngine
 from autonomy_tracker import GradualAutonomySystem
+from risk_cache import RiskAssessmentCache, insight_cache_key, risk_cache_key
+from risk_rules import RiskRules, RiskTable, risk_rules
+from metric_series import MetricSeries
+
+# Samples of metric history kept by PerformanceTracker (oldest dropped first)
+PERFORMANCE_HISTORY_SAMPLES = int(os.getenv("PERFORMANCE_HISTORY_SAMPLES", "10000"))
 
 class RiskLevel(Enum):
     LOW = "LOW"
@@ -24,28 +32,118 @@ class DecisionCategory(Enum):
     RND = "RND"
     COMPLIANCE = "COMPLIANCE"
 
+_LEVELS = list(RiskLevel)  # in RISK_LEVELS order
+
 class AIDecisionEngine:
     """Core AI decision-making system"""
     
-    def __init__(self):
-        self.decision_log = []
-        self.memory = AIMemory()  # Integrate memory system
-        self.autonomy = GradualAutonomySystem()  # Integrate autonomy tracker
-        self.risk_thresholds = {
-            RiskLevel.LOW: {"max_amount": 1000, "auto_execute": True},
-            RiskLevel.MEDIUM: {"max_amount": 10000, "auto_execute": True, "log_required": True},
-            RiskLevel.HIGH: {"max_amount": 50000, "auto_execute": False, "human_approval": True},
-            RiskLevel.CRITICAL: {"max_amount": None, "auto_execute": False, "human_review": True}
-        }
+    def __init__(self, memory_file: str = "ai_memory.json", autonomy_file: str = "autonomy_tracker.json",
+                 decision_log_file: Optional[str] = None, tenant_id: Optional[str] = None,
+                 rules: Optional[RiskRules] = None):
+        self.decision_log_file = decision_log_file
+        self.decision_log = self._load_log()
+        self.memory = AIMemory(memory_file)  # Integrate memory system
+        self.autonomy = GradualAutonomySystem(autonomy_file)  # Integrate autonomy tracker
+        self.tenant_id = tenant_id
+        self.rules = rules or risk_rules  # amount boundaries and actions per category/tenant
+        
+        # Bumped whenever memory aggregates or autonomy change; the rules
+        # version is added on top
+        self._state_version = 0
+        self.risk_cache = RiskAssessmentCache()
+        # Bumped when insights change: outcomes and learnings (new decisions
+        # and events only show up in them after the next one)
+        self._insights_version = 0
+        self.insight_cache = RiskAssessmentCache()
+        self.memory.add_listener(self._on_memory_change)
+        self.autonomy.tracker.add_listener(self._on_autonomy_change)
+    
+    @property
+    def model_version(self) -> int:
+        """Monotonic version of everything a risk assessment depends on"""
+        return self._state_version + self.rules.version
+    
+    def bump_model_version(self):
+        """Invalidate cached risk assessments"""
+        self._state_version += 1
+    
+    @property
+    def risk_thresholds(self) -> Dict[RiskLevel, Dict[str, Any]]:
+        """Threshold flags per risk level (tenant default scope)"""
+        return self.thresholds_for()
+    
+    def thresholds_for(self, category: Optional[str] = None) -> Dict[RiskLevel, Dict[str, Any]]:
+        """Threshold flags per risk level for a category"""
+        table = self._rules_table(category)
+        return {level: table.thresholds[level.value] for level in RiskLevel}
+    
+    def _rules_table(self, category: Optional[str] = None) -> RiskTable:
+        category = getattr(category, "value", category)
+        return self.rules.current().table(category.upper() if category else None, self.tenant_id)
     
-    def evaluate_decision(self, decision_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Evaluate a decision and determine risk level"""
+    def _on_memory_change(self, kind: str, record: Dict[str, Any]):
+        # Outcomes and learnings move the aggregates; new decisions do not
+        if kind in ("outcome", "learning"):
+            self.bump_model_version()
+            self._insights_version += 1
+    
+    def _on_autonomy_change(self, data: Dict[str, Any]):
+        self.bump_model_version()
+    
+    def assess_decision(self, decision_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Risk level and memory insights for a decision, memoized per model version
+        
+        The risk level and aggregate insights are cached per category,
+        amount band, base risk and requested risk level. The full insights
+        (related memories included) are cached per description as well,
+        until the next outcome or learning; decisions and events recorded
+        in between, such as the one each evaluation logs, do not refresh
+        them. Callers get their own copy of the insights.
+        
+        Returns:
+            risk_level, memory_insights, cache and insights_cache ("HIT"/"MISS")
+            and model_version
+        """
+        base_risk = self._base_risk(decision_data.get("amount", 0), decision_data.get("category"))
+        version = self.model_version
+        key = risk_cache_key(decision_data, base_risk)
+        cached = self.risk_cache.get(key, version)
+        if cached is None:
+            aggregates = self.memory.get_decision_aggregates(decision_data)
+            cached = (aggregates, self._assess_risk(decision_data, aggregates))
+            self.risk_cache.put(key, version, cached)
+            cache_status = "MISS"
+        else:
+            cache_status = "HIT"
+        aggregates, risk_level = cached
         
-        # Get memory insights before evaluation
-        memory_insights = self.memory.inform_decision(decision_data)
+        insight_key = insight_cache_key(decision_data, base_risk)
+        insight_version = self._insights_version
+        insights = self.insight_cache.get(insight_key, insight_version)
+        if insights is None:
+            insights = self.memory.inform_decision(decision_data, aggregates=aggregates)
+            self.insight_cache.put(insight_key, insight_version, insights)
+            insights_status = "MISS"
+        else:
+            insights_status = "HIT"
+        return {
+            "risk_level": risk_level,
+            "memory_insights": copy.deepcopy(insights),
+            "cache": cache_status,
+            "insights_cache": insights_status,
+            "model_version": version
+        }
+    
+    def evaluate_decision(self, decision_data: Dict[str, Any],
+                          assessment: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Evaluate a decision and determine risk level (``assessment`` from assess_decision)"""
         
-        # Use memory to inform risk assessment
-        risk_level = self._assess_risk(decision_data, memory_insights)
+        # Memory insights and memory-informed risk assessment
+        if assessment is None:
+            assessment = self.assess_decision(decision_data)
+        memory_insights = assessment["memory_insights"]
+        risk_level = assessment["risk_level"]
         
         # Check if AI should make this decision based on autonomy level
         # Use autonomy system to check if AI can decide
@@ -62,7 +160,7 @@ class AIDecisionEngine:
             "amount": decision_data.get("amount", 0),
             "data": {k: (v.value if isinstance(v, (RiskLevel, DecisionCategory)) else v) for k, v in decision_data.items()},  # Convert enums to strings
             "status": "PENDING",
-            "action_required": self._determine_action(risk_level, should_ai_decide),
+            "action_required": self._determine_action(risk_level, should_ai_decide, decision_data.get("category")),
             "memory_insights": memory_insights,  # Include memory insights
             "ai_can_decide": should_ai_decide,
             "autonomy_level": current_autonomy
@@ -75,48 +173,26 @@ class AIDecisionEngine:
     
     def _assess_risk(self, decision_data: Dict[str, Any], memory_insights: Dict[str, Any] = None) -> RiskLevel:
         """AI risk assessment (uses memory if available)"""
-        amount = decision_data.get("amount", 0)
-        
-        # Base risk assessment
-        if amount <= 1000:
-            base_risk = RiskLevel.LOW
-        elif amount <= 10000:
-            base_risk = RiskLevel.MEDIUM
-        elif amount <= 50000:
-            base_risk = RiskLevel.HIGH
-        else:
-            base_risk = RiskLevel.CRITICAL
+        base_risk = self._base_risk(decision_data.get("amount", 0), decision_data.get("category"))
         
-        # Adjust based on memory if available
-        if memory_insights:
-            # If similar decisions were successful, might reduce risk slightly
-            successful_similar = memory_insights.get("success_patterns", {}).get("successful_decisions", [])
-            if successful_similar:
-                # If we have successful similar decisions, confidence increases
-                pass  # Keep base risk for now, can add adjustment logic
+        # Adjust by one level when outcomes for this category and amount band
+        # are confidently good or bad; critical amounts always keep human review
+        if memory_insights and base_risk != RiskLevel.CRITICAL:
+            adjustment = memory_insights.get("learned", {}).get("risk_adjustment", 0)
+            if adjustment:
+                index = min(max(_LEVELS.index(base_risk) + adjustment, 0), len(_LEVELS) - 1)
+                return _LEVELS[index]
         
         return base_risk
     
-    def _determine_action(self, risk_level: RiskLevel, should_ai_decide: bool = False) -> str:
+    def _base_risk(self, amount: float, category: Optional[str] = None) -> RiskLevel:
+        """Risk level from the amount alone, using the category's boundaries"""
+        return _LEVELS[self._rules_table(category).level_index(amount or 0)]
+    
+    def _determine_action(self, risk_level: RiskLevel, should_ai_decide: bool = False,
+                          category: Optional[str] = None) -> str:
         """Determine required action based on risk level and autonomy"""
-        thresholds = self.risk_thresholds[risk_level]
-        
-        # If AI can decide at current autonomy level
-        if should_ai_decide:
-            if thresholds.get("auto_execute"):
-                return "AI_EXECUTE_IMMEDIATELY"
-            else:
-                return "AI_PROPOSE_HUMAN_REVIEW"
-        
-        # Standard flow based on risk
-        if thresholds.get("auto_execute"):
-            return "EXECUTE_IMMEDIATELY"
-        elif thresholds.get("human_approval"):
-            return "WAIT_HUMAN_APPROVAL"
-        elif thresholds.get("human_review"):
-            return "WAIT_HUMAN_REVIEW"
-        else:
-            return "LOG_ONLY"
+        return self._rules_table(category).action(_LEVELS.index(risk_level), should_ai_decide)
     
     def execute_decision(self, decision: Dict[str, Any]) -> Dict[str, Any]:
         """Execute a decision"""
@@ -158,11 +234,23 @@ class AIDecisionEngine:
         """Get recent decisions"""
         return self.decision_log[-limit:]
     
-    def export_log(self, filename: str = "decision_log.json"):
+    def _load_log(self) -> List[Dict[str, Any]]:
+        """Reload a previously exported decision log (when a log file is configured)"""
+        if not self.decision_log_file or not os.path.exists(self.decision_log_file):
+            return []
+        with open(self.decision_log_file, 'r') as f:
+            return json.load(f)
+    
+    def export_log(self, filename: Optional[str] = None):
         """Export decision log"""
+        filename = filename or self.decision_log_file or "decision_log.json"
         with open(filename, 'w') as f:
             json.dump(self.decision_log, f, indent=2)
     
+    def close(self):
+        """Release background resources (the memory's snapshot writer)"""
+        self.memory.close()
+    
     def record_outcome(self, decision_id: str, outcome: str, success: bool, metrics: Dict[str, Any] = None):
         """Record outcome of a decision and learn from it"""
         self.memory.record_outcome(decision_id, outcome, success, metrics)
@@ -259,12 +347,39 @@ class IncomeStrategyEvaluator:
             "high": RiskLevel.HIGH
         }
         return mapping.get(risk_str, RiskLevel.MEDIUM)
+    
+    def score_allocation(self) -> Dict[str, float]:
+        """Score-based allocation as fractions of capital, scaled down to 100% if the buckets add up to more"""
+        shares = {name: self._calculate_allocation(self._calculate_score(attributes, 1.0), 1.0)
+                  for name, attributes in self.STRATEGIES.items()}
+        total = sum(shares.values())
+        return {name: share / total for name, share in shares.items()} if total > 1 else shares
+    
+    def simulate_portfolio(self, initial_capital: float, paths: int = 100_000, horizon: int = 12,
+                           confidence: float = 0.95, max_cvar: Optional[float] = None,
+                           seed: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Monte Carlo comparison of the score-based allocation and an optimized one
+        
+        Both are simulated over ``horizon`` months on ``paths`` paths;
+        ``max_cvar`` caps the optimized allocation's CVaR as a fraction
+        of the capital. See portfolio_simulator.PortfolioSimulator.
+        """
+        from portfolio_simulator import PortfolioSimulator
+        
+        simulator = PortfolioSimulator(self.STRATEGIES, horizon=horizon)
+        current = self.score_allocation()
+        return {
+            "score_based": simulator.simulate(current, initial_capital, paths=paths, confidence=confidence, seed=seed),
+            "optimized": simulator.optimize(initial_capital, paths=paths, confidence=confidence, max_cvar=max_cvar,
+                                            baseline=current, seed=seed)
+        }
 
 # Performance Tracker
 class PerformanceTracker:
     """Track performance metrics"""
     
-    def __init__(self):
+    def __init__(self, history_samples: int = PERFORMANCE_HISTORY_SAMPLES):
         self.metrics = {
             "revenue": 0.0,
             "capital_base": 0.0,
@@ -275,7 +390,13 @@ class PerformanceTracker:
             "decisions_made": 0,
             "success_rate": 0.0
         }
-        self.history = []
+        # One sample of every metric per update, as float64 columns
+        self.series = MetricSeries(self.metrics, history_samples)
+    
+    @property
+    def history(self) -> List[Dict[str, Any]]:
+        """Recorded samples as {"timestamp", "metrics"} dicts, oldest first"""
+        return self.series.to_records()
     
     def update_metric(self, metric_name: str, value: float):
         """Update a metric"""
@@ -287,12 +408,25 @@ class PerformanceTracker:
         """Get current metrics"""
         return self.metrics.copy()
     
+    def get_history(self, since: Any = None, until: Any = None, interval: Optional[float] = None,
+                    how: str = "last") -> Dict[str, Any]:
+        """
+        Metric history as NumPy arrays keyed by metric (plus "timestamp")
+        
+        ``since``/``until`` take ISO strings, datetimes or epoch seconds;
+        with ``interval`` (seconds) samples are resampled per bucket.
+        """
+        if interval is None:
+            return self.series.window(since, until)
+        return self.series.resample(interval, how, since, until)
+    
+    def summarize(self, since: Any = None, until: Any = None) -> Dict[str, Dict[str, Any]]:
+        """Min, max, mean and change of every metric over a time range"""
+        return {name: self.series.aggregate(name, since, until) for name in self.metrics}
+    
     def _record_history(self):
         """Record metrics history"""
-        self.history.append({
-            "timestamp": datetime.now().isoformat(),
-            "metrics": self.metrics.copy()
-        })
+        self.series.append(self.metrics)
 
 # Main System
 class AIWeedCompanySystem:
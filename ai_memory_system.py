@@ -3,16 +3,323 @@ Memory System for AI Weed Company
 Saves all events, decisions, and outcomes for AI learning and decision-making
 """
 
+import copy
+import heapq
 import json
+import logging
+import os
+from bisect import bisect_left, bisect_right
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Callable, Iterator, Tuple
+
+from decision_similarity import DecisionSimilarityIndex
+from memory_journal import MemoryJournal, journal_path
+from memory_retention import MemoryRetention, record_epoch as _epoch
+from memory_snapshot import MemorySnapshot, MemorySnapshots
+from learning_stats import LearningStats
+from outcome_losses import OutcomeLosses
+from success_patterns import SuccessPatterns
+
+logger = logging.getLogger(__name__)
+
+# Record collections that carry a "timestamp" and get a time index
+TIME_INDEXED = ("events", "decisions", "outcomes", "learnings")
+
+# Opt-in: moves aged records out of ai_memory.json into memory_archive/ next to it
+MEMORY_RETENTION_ENABLED = os.getenv("MEMORY_RETENTION_ENABLED", "false").lower() == "true"
+# With several workers, one writes memory-mapped snapshots that all of them read
+MEMORY_SNAPSHOT_ENABLED = os.getenv("MEMORY_SNAPSHOT_ENABLED", "false").lower() == "true"
+
+def empty_memories() -> Dict[str, Any]:
+    """Contents of a new memory file"""
+    return {
+        "events": [],
+        "decisions": [],
+        "outcomes": [],
+        "learnings": [],
+        "preferences": {},
+        "patterns": {}
+    }
 
 class AIMemory:
-    """AI memory system - stores all events and learns from them"""
+    """
+    AI memory system - stores all events and learns from them
     
-    def __init__(self, memory_file="ai_memory.json"):
+    On its own, a memory holds the whole hot file and rewrites it on
+    every record. With snapshots (several workers on one file) it is
+    shared: every record is appended to ``<name>.journal.ndjson``, the
+    snapshot writer folds the journal into the memory file and the next
+    generation, and each worker serves reads from the mapped generation
+    plus the journal entries it does not cover yet, without loading the
+    file.
+    """
+    
+    def __init__(self, memory_file="ai_memory.json", retention: Optional[MemoryRetention] = None,
+                 snapshots: Optional[MemorySnapshots] = None, memories: Optional[Dict[str, Any]] = None):
         self.memory_file = memory_file
-        self.memories = self.load_memories()
+        self._listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        if retention is None and MEMORY_RETENTION_ENABLED:
+            # Archive lives next to the hot file
+            retention = MemoryRetention(os.path.join(os.path.dirname(os.path.abspath(memory_file)), "memory_archive"))
+        self.retention = retention
+        self._archived_successful: Optional[int] = None
+        self._similarity: Optional[DecisionSimilarityIndex] = None
+        self._losses: Optional[OutcomeLosses] = None
+        # An already loaded memory file (``memories``) is used as is, without snapshots
+        self._owns_snapshots = snapshots is None and memories is None and MEMORY_SNAPSHOT_ENABLED
+        if self._owns_snapshots:
+            snapshots = MemorySnapshots(os.path.join(os.path.dirname(os.path.abspath(memory_file)), "memory_snapshot"))
+        self.snapshots = snapshots if memories is None else None
+        self.journal: Optional[MemoryJournal] = None
+        self._delta: Optional[DecisionSimilarityIndex] = None  # decisions newer than the snapshot
+        
+        if self.snapshots is None:
+            self.memories = self.load_memories() if memories is None else memories
+            self.rebuild_index()
+            self._load_aggregates(self.memories.get("patterns"), self.memories.get("statistics"))
+            self.compact()
+            return
+        
+        self.journal = MemoryJournal(journal_path(memory_file))
+        if self._owns_snapshots:
+            self.snapshots.start_writer(memory_file, retention, journal=self.journal, fold=fold_journal)
+        self._snapshot: Optional[MemorySnapshot] = None
+        self._entries: List[Dict[str, Any]] = []  # journal entries the snapshot does not cover
+        self._applied_seq = 0
+        snapshot = self.snapshots.current()
+        if snapshot is None:  # first start: fold whatever there is into a generation now
+            self.snapshots.refresh_from_disk(memory_file, retention, self.journal, fold_journal)
+            snapshot = self.snapshots.current(recheck=True)
+        self._rebase(snapshot)
+        self._sync()
+    
+    def _load_aggregates(self, stored_patterns: Any, stored_statistics: Any):
+        """
+        Success tables and outcome statistics from their stored states
+        
+        Either one missing is built once from every hot and archived record.
+        """
+        decisions, outcomes = None, None
+        if not (SuccessPatterns.is_state(stored_patterns) and LearningStats.is_state(stored_statistics)):
+            decisions, outcomes = self._all_records("decisions"), self._all_records("outcomes")
+        
+        if SuccessPatterns.is_state(stored_patterns):
+            self.patterns = SuccessPatterns(stored_patterns)
+        else:
+            self.patterns = SuccessPatterns.from_records(decisions, outcomes)
+        if LearningStats.is_state(stored_statistics):
+            self.statistics = LearningStats(stored_statistics)
+        else:
+            self.statistics = LearningStats.from_records(decisions, outcomes)
+    
+    # Shared mode: snapshot plus journal
+    
+    def _rebase(self, snapshot: MemorySnapshot):
+        """Derive local state from a generation and the journal entries newer than it"""
+        if snapshot.journal_seq > self._applied_seq:
+            self._losses = None  # it missed entries folded before this worker read them
+        if self.retention:
+            self.retention.reload()
+        self._snapshot = snapshot
+        entries = [entry for entry in self._entries if entry["seq"] > snapshot.journal_seq]
+        self._entries = []
+        self.memories = {kind: [] for kind in TIME_INDEXED}
+        self.rebuild_index()
+        self._decision_updates: Dict[str, Dict[str, Any]] = {}  # outcomes of decisions, by id
+        self._successful_delta = 0
+        self._delta = DecisionSimilarityIndex()
+        self._load_aggregates(copy.deepcopy(snapshot.states.get("patterns")),
+                              copy.deepcopy(snapshot.states.get("statistics")))
+        for entry in entries:
+            self._entries.append(entry)
+            self._add(entry["kind"], entry["record"], replay=True)
+    
+    def _apply_entries(self, entries: List[Dict[str, Any]], notify: bool = True):
+        """Apply journal entries (this worker's and others') not in the current generation"""
+        for entry in entries:
+            if entry["seq"] <= self._snapshot.journal_seq:
+                continue
+            self._entries.append(entry)
+            self._add(entry["kind"], entry["record"])
+            self._applied_seq = entry["seq"]
+            if notify:
+                self._notify(entry["kind"][:-1], entry["record"])
+    
+    def _sync(self, entries: Optional[List[Dict[str, Any]]] = None):
+        """Switch to a newer generation and apply what other workers journaled since the last read"""
+        if self.journal is None:
+            return
+        if entries is None:
+            entries = self.journal.read()
+        # A fold past this generation means its successor is already published
+        snapshot = self.snapshots.current(recheck=self.journal.folded > self._snapshot.journal_seq)
+        if snapshot is not None and snapshot.generation != self._snapshot.generation:
+            self._rebase(snapshot)
+        self._apply_entries(entries)
+    
+    def write_snapshot(self) -> Optional[int]:
+        """Fold the journal into the memory file and write a generation now (None if nothing changed)"""
+        if self.journal is None:
+            return None
+        generation = self.snapshots.refresh_from_disk(self.memory_file, self.retention, self.journal, fold_journal)
+        self._sync()
+        return generation
+    
+    def _updated(self, kind: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        """A decision with the outcomes journaled since the generation (shared mode)"""
+        if kind == "decisions" and record.get("id") in self._decision_updates:
+            return dict(record, **self._decision_updates[record["id"]])
+        return record
+    
+    def _hot(self, kind: str) -> List[Dict[str, Any]]:
+        if self.journal is None:
+            return self.memories[kind]
+        return [self._updated(kind, record) for _, _, record in self._snapshot.records(kind)] + [
+            self._updated(kind, record) for record in self.memories[kind]]
+    
+    def _all_records(self, kind: str) -> List[Dict[str, Any]]:
+        """Archived then hot records of a kind"""
+        archived = [record for _, record in self.retention.iter_records(kind)] if self.retention else []
+        return archived + self._hot(kind)
+    
+    def records(self, kind: str) -> List[Dict[str, Any]]:
+        """Hot records of one kind (with snapshots, decoded from the generation plus newer ones)"""
+        self._sync()
+        return list(self._hot(kind))
+    
+    @property
+    def similarity(self) -> DecisionSimilarityIndex:
+        """Similarity index over every stored decision, built on first use"""
+        if self._similarity is None:
+            index = DecisionSimilarityIndex()
+            for decision in self._all_records("decisions"):
+                index.add(decision)
+            self._similarity = index
+        return self._similarity
+    
+    @property
+    def losses(self) -> OutcomeLosses:
+        """Per-category outcome loss distributions over every stored outcome, built on first use"""
+        self._sync()
+        if self._losses is None:
+            self._losses = OutcomeLosses.from_records(self._all_records("decisions"), self._all_records("outcomes"))
+        return self._losses
+    
+    def find_similar_decisions(self, decision_context: Dict[str, Any], k: int = 5,
+                               min_score: float = 0.1) -> List[Dict[str, Any]]:
+        """
+        Top-k past decisions most similar to ``decision_context``, with cosine scores
+        
+        With snapshots, the shared mapped generation is searched together
+        with a small local index of decisions journaled after it was written.
+        """
+        if self.journal is None:
+            return self.similarity.search(decision_context, k=k, min_score=min_score)
+        
+        self._sync()
+        matches = self._snapshot.search(decision_context, k=k, min_score=min_score)
+        for match in matches:
+            if match["id"] in self._decision_updates:
+                match["success"] = bool(self._decision_updates[match["id"]]["success"])
+        matches.extend(self._delta.search(decision_context, k=k, min_score=min_score))
+        matches.sort(key=lambda match: -match["score"])
+        return matches[:k]
+    
+    def compact(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Move records past their hot window into the archive
+        
+        Runs at startup and whenever a save finds the oldest hot record
+        expired, so the hot file only ever holds the recent window. With
+        snapshots the writer does this as it folds the journal.
+        
+        Returns:
+            Records archived per kind
+        """
+        if not self.retention or self.journal is not None:
+            return {}
+        hot_successful = sum(1 for d in self.memories.get("decisions", []) if d.get("success"))
+        moved = self.retention.archive(self.memories, now)
+        if moved:
+            self._write_memories()
+            self.rebuild_index()
+            if self._archived_successful is not None:
+                self._archived_successful += hot_successful - self._successful_decisions
+            logger.info(f"Archived memory records: {moved}")
+        return moved
+    
+    def _needs_compaction(self) -> bool:
+        """Whether any collection's oldest hot record is a day past its window"""
+        if not self.retention or self.journal is not None:
+            return False
+        now = datetime.now().timestamp()
+        for kind, policy in self.retention.policies.items():
+            times = self._times.get(kind)
+            hot_days = policy.get("hot_days")
+            if times and hot_days is not None and times[0] < now - (hot_days + 1) * 86400:
+                return True
+        return False
+    
+    def rebuild_index(self):
+        """
+        Rebuild the per-collection time index and counters
+        
+        For each collection the index is two parallel lists sorted by time:
+        epoch seconds, and the record's position in ``memories[kind]``
+        (with snapshots, the records newer than the generation).
+        Call this after replacing or pruning ``memories`` directly.
+        """
+        self._times: Dict[str, List[float]] = {}
+        self._positions: Dict[str, List[int]] = {}
+        for kind in TIME_INDEXED:
+            records = self.memories.setdefault(kind, [])
+            pairs = sorted((_epoch(r.get("timestamp")), i) for i, r in enumerate(records))
+            self._times[kind] = [t for t, _ in pairs]
+            self._positions[kind] = [i for _, i in pairs]
+        self._successful_decisions = sum(1 for d in self.memories["decisions"] if d.get("success"))
+        self._decisions_by_id: Dict[str, Dict[str, Any]] = {}
+        for decision in self.memories["decisions"]:
+            self._decisions_by_id.setdefault(decision.get("id"), decision)
+    
+    def _index_record(self, kind: str, record: Dict[str, Any]):
+        """Add the record just appended to ``memories[kind]`` to the time index"""
+        times, positions = self._times[kind], self._positions[kind]
+        timestamp = _epoch(record.get("timestamp"))
+        position = len(self.memories[kind]) - 1
+        if not times or timestamp >= times[-1]:
+            times.append(timestamp)
+            positions.append(position)
+        else:
+            at = bisect_right(times, timestamp)
+            times.insert(at, timestamp)
+            positions.insert(at, position)
+    
+    def add_listener(self, listener: Callable[[str, Dict[str, Any]], None]):
+        """
+        Subscribe to memory changes
+        
+        The listener is called as ``listener(kind, record)`` after each save,
+        where kind is "event", "decision", "outcome" or "learning".
+        """
+        self._listeners.append(listener)
+    
+    def remove_listener(self, listener: Callable[[str, Dict[str, Any]], None]):
+        """Unsubscribe a listener"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+    
+    def close(self):
+        """Stop the snapshot writer this memory started (everything else is saved on each write)"""
+        if self._owns_snapshots and self.snapshots is not None:
+            self.snapshots.close()
+    
+    def _notify(self, kind: str, record: Dict[str, Any]):
+        """Tell listeners about a new record; a failing listener never breaks recording"""
+        for listener in list(self._listeners):
+            try:
+                listener(kind, record)
+            except Exception as e:
+                logger.error(f"Memory listener failed on {kind}: {e}")
     
     def load_memories(self) -> Dict[str, Any]:
         """Load existing memories"""
@@ -20,17 +327,19 @@ class AIMemory:
             with open(self.memory_file, "r", encoding="utf-8") as f:
                 return json.load(f)
         except FileNotFoundError:
-            return {
-                "events": [],
-                "decisions": [],
-                "outcomes": [],
-                "learnings": [],
-                "preferences": {},
-                "patterns": {}
-            }
+            return empty_memories()
     
     def save_memories(self):
-        """Save memories to file"""
+        """Save memories to file (with snapshots every record is journaled as it is made instead)"""
+        if self.journal is not None:
+            return
+        if self._needs_compaction():
+            self.compact()
+            return
+        self._write_memories()
+    
+    def _write_memories(self):
+        """Write the hot tier to the memory file"""
         def serialize_enum(obj):
             """Helper to convert enums and other non-serializable objects"""
             if hasattr(obj, 'value'):
@@ -41,10 +350,15 @@ class AIMemory:
                 return [serialize_enum(item) for item in obj]
             return obj
         
+        self.memories["patterns"] = self.patterns.to_dict()
+        self.memories["statistics"] = self.statistics.to_dict()
+        
         # Serialize enums before saving
         serialized_memories = serialize_enum(self.memories)
-        with open(self.memory_file, "w", encoding="utf-8") as f:
+        tmp_path = self.memory_file + ".tmp"  # snapshot writers may read concurrently
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(serialized_memories, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.memory_file)
     
     def record_event(self, event_type: str, description: str, data: Dict[str, Any] = None):
         """Record an event"""
@@ -55,8 +369,7 @@ class AIMemory:
             "description": description,
             "data": data or {}
         }
-        self.memories["events"].append(event)
-        self.save_memories()
+        self._record("events", event)
         return event
     
     def record_decision(self, decision: Dict[str, Any], outcome: str = None):
@@ -68,8 +381,7 @@ class AIMemory:
             "outcome": outcome,
             "learned": False
         }
-        self.memories["decisions"].append(decision_record)
-        self.save_memories()
+        self._record("decisions", decision_record)
         return decision_record
     
     def record_outcome(self, decision_id: str, outcome: str, success: bool, metrics: Dict[str, Any] = None):
@@ -81,18 +393,80 @@ class AIMemory:
             "success": success,
             "metrics": metrics or {}
         }
-        self.memories["outcomes"].append(outcome_record)
-        
-        # Link to decision
-        for decision in self.memories["decisions"]:
-            if decision["id"] == decision_id:
-                decision["outcome"] = outcome
-                decision["success"] = success
-                break
-        
-        self.save_memories()
+        self._record("outcomes", outcome_record)
         return outcome_record
     
+    def _record(self, kind: str, record: Dict[str, Any]):
+        """Keep a new record: saved with the memory file, or journaled with snapshots"""
+        if self.journal is None:
+            self._add(kind, record)
+            self.save_memories()
+            self._notify(kind[:-1], record)
+            return
+        entry, earlier = self.journal.append(kind, record)
+        self._sync(earlier + [entry])
+    
+    def _add(self, kind: str, record: Dict[str, Any], replay: bool = False):
+        """Apply one new record to the in-memory state and indexes"""
+        self.memories[kind].append(record)
+        self._index_record(kind, record)
+        if kind == "decisions":
+            self._decisions_by_id.setdefault(record.get("id"), record)
+            if self._similarity is not None:
+                self._similarity.add(record)
+            if self._delta is not None:
+                self._delta.add(record)
+        elif kind == "outcomes":
+            self._link_outcome(record, replay)
+    
+    def _link_outcome(self, outcome_record: Dict[str, Any], replay: bool = False):
+        """Mark the outcome on its decision and update the aggregates (``replay``: losses already have it)"""
+        decision_id, outcome, success = (outcome_record["decision_id"], outcome_record["outcome"],
+                                          outcome_record["success"])
+        # Looked up in the archive once it has left the hot file
+        decision = self._find_decision(decision_id)
+        previous = None
+        if decision is not None:
+            previous = decision.get("success")
+            update = {"outcome": outcome, "success": success}
+            if self.journal is not None:
+                # Generation and journal stay as written; the writer applies it when folding
+                self._decision_updates[decision_id] = update
+                self._successful_delta += bool(success) - bool(previous)
+                decision = dict(decision, **update)
+            elif decision_id in self._decisions_by_id:
+                decision.update(update)
+                self._successful_decisions += bool(success) - bool(previous)
+            else:
+                decision.update(update)
+                self.retention.update("decisions", decision_id, update)
+                if self._archived_successful is not None:
+                    self._archived_successful += bool(success) - bool(previous)
+        self.patterns.record_outcome(outcome_record, decision, previous)
+        if decision is not None:
+            self.statistics.record_outcome(decision, outcome_record, previous)
+        if self._similarity is not None:
+            self._similarity.set_outcome(decision_id, success)
+        if self._losses is not None and decision is not None and not replay:
+            self._losses.record_outcome(decision, outcome_record)
+        if self._delta is not None:
+            self._delta.set_outcome(decision_id, success)
+    
+    def _find_decision(self, decision_id: str) -> Optional[Dict[str, Any]]:
+        decision = self._decisions_by_id.get(decision_id)
+        if decision is None and self.journal is not None:
+            decision = self._snapshot.find_decision(decision_id)
+        if decision is None and self.retention:
+            decision = self.retention.find("decisions", decision_id)
+        if decision is not None and self.journal is not None:
+            decision = self._updated("decisions", decision)
+        return decision
+    
+    def get_decision(self, decision_id: str) -> Optional[Dict[str, Any]]:
+        """A decision record by ID, hot or archived (an archived one, or any with snapshots, is a copy)"""
+        self._sync()
+        return self._find_decision(decision_id)
+    
     def record_learning(self, insight: str, source: str, application: str = None):
         """Record a learning/insight"""
         learning = {
@@ -103,76 +477,84 @@ class AIMemory:
             "application": application,
             "applied": False
         }
-        self.memories["learnings"].append(learning)
-        self.save_memories()
+        self._record("learnings", learning)
         return learning
     
-    def get_related_memories(self, context: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get memories related to a context"""
+    def get_related_memories(self, context: str, limit: int = 10,
+                             similar_to: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Get memories related to a context
+        
+        Decisions are ranked by similarity to ``similar_to`` (decision data)
+        when given, otherwise to the context text.
+        """
+        self._sync()
         related = []
         context_lower = context.lower()
         
         # Search events
-        for event in self.memories["events"][-100:]:  # Last 100 events
+        for event in self._recent("events", 100):
             if context_lower in event.get("description", "").lower() or \
                context_lower in event.get("type", "").lower():
                 related.append({"type": "event", "data": event})
         
         # Search decisions
-        for decision in self.memories["decisions"][-50:]:  # Last 50 decisions
-            if context_lower in str(decision).lower():
-                related.append({"type": "decision", "data": decision})
+        for match in self.find_similar_decisions(similar_to or {"description": context}, k=limit):
+            related.append({"type": "decision", "data": match})
         
         # Search learnings
-        for learning in self.memories["learnings"][-30:]:  # Last 30 learnings
+        for learning in self._recent("learnings", 30):
             if context_lower in learning.get("insight", "").lower():
                 related.append({"type": "learning", "data": learning})
         
         return related[:limit]
     
-    def get_successful_patterns(self) -> Dict[str, Any]:
-        """Analyze successful patterns"""
-        patterns = {
-            "successful_decisions": [],
-            "successful_strategies": [],
-            "optimal_timing": [],
-            "preferred_approaches": []
+    def _recent(self, kind: str, count: int) -> List[Dict[str, Any]]:
+        """The last ``count`` hot records of a kind"""
+        local = self.memories[kind][-count:]
+        if self.journal is None:
+            return local
+        hot = self._snapshot.hot_count(kind)
+        older = [self._snapshot.record(kind, row) for row in range(max(0, hot - (count - len(local))), hot)]
+        return older + local
+    
+    def get_successful_patterns(self, category: Any = None, risk_level: Any = None) -> Dict[str, Any]:
+        """Success/failure tables and recent successful decisions (bounded size)"""
+        self._sync()
+        return self.patterns.get_patterns(category, risk_level)
+    
+    def get_decision_aggregates(self, decision_context: Dict[str, Any]) -> Dict[str, Any]:
+        """Aggregate-table part of the insights (changes only with outcomes and learnings)"""
+        return {
+            "success_patterns": self.get_successful_patterns(decision_context.get("category"),
+                                                             decision_context.get("risk_level")),
+            "learned": self.statistics.get(decision_context.get("category"), decision_context.get("amount"))
         }
-        
-        # Analyze successful decisions
-        for decision in self.memories["decisions"]:
-            if decision.get("success"):
-                patterns["successful_decisions"].append({
-                    "type": decision["decision"].get("category"),
-                    "risk_level": decision["decision"].get("risk_level"),
-                    "outcome": decision.get("outcome")
-                })
-        
-        # Analyze successful strategies
-        for outcome in self.memories["outcomes"]:
-            if outcome.get("success"):
-                metrics = outcome.get("metrics", {})
-                if "strategy" in metrics:
-                    patterns["successful_strategies"].append(metrics["strategy"])
-        
-        return patterns
-    
-    def inform_decision(self, decision_context: Dict[str, Any]) -> Dict[str, Any]:
-        """Use memories to inform a decision"""
+    
+    def inform_decision(self, decision_context: Dict[str, Any],
+                        aggregates: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Use memories to inform a decision (``aggregates`` from get_decision_aggregates, if cached)"""
         context_str = f"{decision_context.get('category', '')} {decision_context.get('description', '')}"
         
         # Get related memories
-        related = self.get_related_memories(context_str, limit=5)
+        related = self.get_related_memories(context_str, limit=5, similar_to=decision_context)
+        similar = [m["data"] for m in related if m["type"] == "decision"]
         
-        # Get successful patterns
-        patterns = self.get_successful_patterns()
+        # Get successful patterns and learned statistics
+        if aggregates is None:
+            aggregates = self.get_decision_aggregates(decision_context)
+        patterns = aggregates["success_patterns"]
         
         # Generate recommendations based on memory
         recommendations = {
             "related_events": len([m for m in related if m["type"] == "event"]),
-            "similar_decisions": len([m for m in related if m["type"] == "decision"]),
+            "similar_decisions": len(similar),
+            "similar": [
+                {"id": m["id"], "score": m["score"], "success": m["success"]} for m in similar
+            ],
             "relevant_learnings": len([m for m in related if m["type"] == "learning"]),
             "success_patterns": patterns,
+            "learned": aggregates["learned"],
             "recommendation": self._generate_recommendation(related, patterns, decision_context)
         }
         
@@ -196,28 +578,180 @@ class AIMemory:
         
         return "Consider past events but evaluate independently."
     
-    def get_recent_activity(self, hours: int = 24) -> List[Dict[str, Any]]:
-        """Get recent activity"""
+    def count_since(self, kind: str, since: float) -> int:
+        """Number of hot ``kind`` records at or after epoch ``since``"""
+        self._sync()
+        times = self._times[kind]
+        count = len(times) - bisect_left(times, since)
+        if self.journal is not None:
+            count += self._snapshot.count_since(kind, since)
+        return count
+    
+    def get_recent_activity(self, hours: int = 24, include_archive: bool = False) -> List[Dict[str, Any]]:
+        """Get recent activity, newest first (``include_archive`` also searches archived events)"""
+        self._sync()
         cutoff = datetime.now().timestamp() - (hours * 3600)
-        recent = []
+        return [record for _, record in reversed(list(self._iter_kind("events", cutoff, None, include_archive)))]
+    
+    def _iter_kind(self, kind: str, start: float, end: Optional[float],
+                   include_archive: bool = False) -> Iterator[Tuple[float, Dict[str, Any]]]:
+        """
+        (epoch, record) for one collection within [start, end), oldest first
         
-        for event in self.memories["events"]:
-            event_time = datetime.fromisoformat(event["timestamp"]).timestamp()
-            if event_time >= cutoff:
-                recent.append(event)
+        Archived records come first (they are older than anything hot).
+        Records with equal timestamps keep the order they were recorded in.
+        """
+        if include_archive and self.retention:
+            yield from self.retention.iter_records(kind, start=None if start == float("-inf") else start, end=end)
         
-        return sorted(recent, key=lambda x: x["timestamp"], reverse=True)
+        times, positions = self._times[kind], self._positions[kind]
+        records = self.memories[kind]
+        stop = len(times) if end is None else bisect_left(times, end)
+        if self.journal is None:
+            for i in range(bisect_left(times, start), stop):
+                yield times[i], records[positions[i]]
+            return
+        
+        mapped = ((timestamp, self._updated(kind, record)) for timestamp, _, record in
+                  self._snapshot.records(kind, None if start == float("-inf") else start, end))
+        local = ((times[i], self._updated(kind, records[positions[i]]))
+                 for i in range(bisect_left(times, start), stop))
+        yield from heapq.merge(mapped, local, key=lambda item: item[0])
     
-    def get_memory_summary(self) -> Dict[str, Any]:
-        """Get summary of all memories"""
+    def _iter_keyed(self, kind: str, start: float, end: Optional[float],
+                    include_archive: bool) -> Iterator[Tuple[Tuple[float, str, int], Dict[str, Any]]]:
+        """
+        ((epoch, kind, rank), record), rank counting earlier records of the kind at the same epoch
+        
+        The key depends only on timestamps, never on where a record is
+        stored, so it stays valid across archiving and snapshot folds.
+        """
+        previous, rank = None, 0
+        for timestamp, record in self._iter_kind(kind, start, end, include_archive):
+            rank = rank + 1 if timestamp == previous else 0
+            previous = timestamp
+            yield (timestamp, kind, rank), record
+    
+    def get_activity(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        kinds: Optional[List[str]] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        include_archive: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Records of several kinds merged in time order, one page at a time
+        
+        Args:
+            since: Inclusive start time
+            until: Exclusive end time
+            kinds: Subset of events/decisions/outcomes/learnings (default all)
+            cursor: ``next_cursor`` from the previous page (``epoch:kind:rank``
+                of the last record returned)
+            limit: Page size
+            include_archive: Also walk warm/cold archived records
+        
+        Returns:
+            {"items": [{"kind", "timestamp", "record"}], "next_cursor": str or None}
+        
+        Raises:
+            ValueError: On an unknown kind or malformed cursor
+        """
+        self._sync()
+        kinds = kinds or list(TIME_INDEXED)
+        for kind in kinds:
+            if kind not in TIME_INDEXED:
+                raise ValueError(f"Unknown kind '{kind}'. Use one of: {', '.join(TIME_INDEXED)}")
+        
+        start = since.timestamp() if since else float("-inf")
+        end = until.timestamp() if until else None
+        after = None
+        if cursor:
+            try:
+                cursor_time, cursor_kind, cursor_position = cursor.split(":")
+                after = (float(cursor_time), cursor_kind, int(cursor_position))
+            except ValueError:
+                raise ValueError(f"Invalid cursor '{cursor}'")
+            start = max(start, after[0])
+        
+        merged = heapq.merge(
+            *(self._iter_keyed(kind, start, end, include_archive) for kind in kinds),
+            key=lambda item: item[0]
+        )
+        items = []
+        last = None
+        for key, record in merged:
+            if after and key <= after:
+                continue
+            if len(items) >= limit:
+                break
+            items.append({
+                "kind": key[1],
+                "timestamp": record.get("timestamp"),
+                "record": record
+            })
+            last = key
+        else:
+            last = None
+        
         return {
-            "total_events": len(self.memories["events"]),
-            "total_decisions": len(self.memories["decisions"]),
-            "total_outcomes": len(self.memories["outcomes"]),
-            "total_learnings": len(self.memories["learnings"]),
-            "successful_decisions": len([d for d in self.memories["decisions"] if d.get("success")]),
-            "recent_activity": len(self.get_recent_activity(24))
+            "items": items,
+            "next_cursor": f"{last[0]!r}:{last[1]}:{last[2]}" if last else None
+        }
+    
+    def _count_archived_successful(self) -> int:
+        """Successful archived decisions (counted once, then kept current)"""
+        if not self.retention:
+            return 0
+        if self._archived_successful is None:
+            self._archived_successful = sum(
+                1 for _, decision in self.retention.iter_records("decisions") if decision.get("success")
+            )
+        return self._archived_successful
+    
+    def get_memory_summary(self) -> Dict[str, Any]:
+        """Get summary of all memories (totals include archived records; ``archived`` breaks them out)"""
+        self._sync()
+        hot = {kind: len(self.memories[kind]) for kind in TIME_INDEXED}
+        if self.journal is not None:
+            aggregates = self._snapshot.aggregates
+            archived = aggregates["archived"]
+            hot = {kind: count + aggregates["hot"][kind] for kind, count in hot.items()}
+            successful = aggregates["successful_decisions"] + self._successful_delta
+        else:
+            archived = {kind: self.retention.count(kind) for kind in TIME_INDEXED} if self.retention else {}
+            successful = self._successful_decisions + self._count_archived_successful()
+        summary = {
+            "total_events": hot["events"] + archived.get("events", 0),
+            "total_decisions": hot["decisions"] + archived.get("decisions", 0),
+            "total_outcomes": hot["outcomes"] + archived.get("outcomes", 0),
+            "total_learnings": hot["learnings"] + archived.get("learnings", 0),
+            "successful_decisions": successful,
+            "recent_activity": self.count_since("events", datetime.now().timestamp() - 24 * 3600),
+            "archived": archived
         }
+        if self.snapshots:
+            summary["snapshot"] = self.snapshots.get_stats()
+        return summary
+
+
+def fold_journal(memory_file: str, memories: Dict[str, Any], entries: List[Dict[str, Any]],
+                 retention: Optional[MemoryRetention] = None):
+    """
+    Apply memory journal entries to a loaded memory file and save it (the snapshot writer's fold)
+    
+    The entries go through a plain memory over ``memories``, so outcomes
+    reach their decisions (archived ones in the archive) and the success
+    tables and statistics exactly as they would in a single process.
+    """
+    if not memories:
+        memories.update(empty_memories())
+    memory = AIMemory(memory_file, retention, memories=memories)
+    for entry in entries:
+        memory._add(entry["kind"], entry["record"])
+    memory.save_memories()
 
 
 # Integration with decision engine
@@ -0,0 +1,4 @@
+"""
+Analytics
+Dashboard data generation and static dashboards
+"""
@@ -3,16 +3,133 @@ Dashboard Data Generator
 Creates data for analytics dashboard
 """
 
+from collections import deque
 from datetime import datetime, timedelta
 import json
-from typing import Dict, Any, List
+import os
+import sys
+import threading
+from typing import Dict, Any, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_memory_system import AIMemory
+from autonomy_tracker import AutonomyTracker
+
+RECENT_ACTIVITY_SIZE = 10
+
+class DashboardView:
+    """
+    Materialized dashboard metrics
+    
+    Built from memory once, then kept current by memory and autonomy change
+    notifications, so a snapshot never rereads ai_memory.json.
+    """
+    
+    def __init__(self, memory: AIMemory, tracker: Optional[AutonomyTracker] = None,
+                 recent_size: int = RECENT_ACTIVITY_SIZE):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=recent_size)
+        self._decision_success: Dict[str, Optional[bool]] = {}
+        self.total_events = 0
+        self.total_decisions = 0
+        self.successful_decisions = 0
+        self.ai_autonomy = tracker.data.get("current_autonomy") if tracker else None
+        
+        for event in memory.records("events"):
+            self._add_event(event)
+        for decision in memory.records("decisions"):
+            self._add_decision(decision)
+        retention = getattr(memory, "retention", None)
+        if retention:
+            # Archived records count towards totals; their outcomes are final
+            self.total_events += retention.count("events")
+            self.total_decisions += retention.count("decisions")
+            self.successful_decisions += sum(
+                1 for _, decision in retention.iter_records("decisions") if decision.get("success")
+            )
+        
+        memory.add_listener(self._on_memory_change)
+        if tracker:
+            tracker.add_listener(self._on_autonomy_change)
+    
+    def _add_event(self, event: Dict[str, Any]):
+        self.total_events += 1
+        self._recent.append(event)
+    
+    def _add_decision(self, decision: Dict[str, Any]):
+        self.total_decisions += 1
+        decision_id = decision.get("id")
+        # record_outcome links to the first decision with an id, so only that one counts
+        if decision_id in self._decision_success:
+            return
+        success = decision.get("success")
+        self._decision_success[decision_id] = success
+        if success is True:
+            self.successful_decisions += 1
+    
+    def _set_outcome(self, decision_id: str, success: bool):
+        if decision_id not in self._decision_success:
+            return
+        previous = self._decision_success[decision_id]
+        self._decision_success[decision_id] = success
+        self.successful_decisions += (success is True) - (previous is True)
+    
+    def _on_memory_change(self, kind: str, record: Dict[str, Any]):
+        with self._lock:
+            if kind == "event":
+                self._add_event(record)
+            elif kind == "decision":
+                self._add_decision(record)
+            elif kind == "outcome":
+                self._set_outcome(record.get("decision_id"), record.get("success"))
+    
+    def _on_autonomy_change(self, data: Dict[str, Any]):
+        with self._lock:
+            self.ai_autonomy = data.get("current_autonomy")
+    
+    def get_system_metrics(self) -> Dict[str, Any]:
+        """Current counters"""
+        with self._lock:
+            success_rate = (
+                self.successful_decisions / self.total_decisions * 100
+            ) if self.total_decisions > 0 else 0
+            return {
+                "total_events": self.total_events,
+                "total_decisions": self.total_decisions,
+                "success_rate": round(success_rate, 1),
+                "ai_autonomy": self.ai_autonomy,
+                "system_health": "operational"
+            }
+    
+    def get_recent_activity(self, days: int = 7) -> List[Dict[str, Any]]:
+        """Most recent events (at most ``recent_size``) newer than ``days``"""
+        cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
+        with self._lock:
+            return [event for event in self._recent if event.get("timestamp", "") >= cutoff_date]
+
 
 class DashboardData:
     """Generate dashboard analytics data"""
     
-    def __init__(self):
+    def __init__(self, memory: Optional[AIMemory] = None, tracker: Optional[AutonomyTracker] = None):
         self.memory_file = "ai_memory.json"
         self.progress_file = "PROGRESS_STATUS.json"
+        self._memory = memory
+        self._tracker = tracker
+        self._view: Optional[DashboardView] = None
+    
+    @property
+    def view(self) -> DashboardView:
+        """Materialized view, built on first use"""
+        return self.build_view()
+    
+    def build_view(self) -> DashboardView:
+        """Build the materialized view now if it is not built yet (it reads every record once)"""
+        if self._view is None:
+            memory = self._memory or AIMemory(self.memory_file)
+            tracker = self._tracker or AutonomyTracker()
+            self._view = DashboardView(memory, tracker)
+        return self._view
     
     def get_revenue_data(self) -> Dict[str, Any]:
         """Get revenue projections and actuals"""
@@ -51,49 +168,21 @@ class DashboardData:
     def get_system_metrics(self) -> Dict[str, Any]:
         """Get system performance metrics"""
         try:
-            with open(self.memory_file, "r") as f:
-                memory = json.load(f)
-            
-            events_count = len(memory.get("events", []))
-            decisions_count = len(memory.get("decisions", []))
-            
-            # Calculate decision success rate (placeholder)
-            decisions = memory.get("decisions", [])
-            successful = sum(1 for d in decisions if d.get("decision", {}).get("success") == True)
-            success_rate = (successful / decisions_count * 100) if decisions_count > 0 else 0
-            
-            return {
-                "total_events": events_count,
-                "total_decisions": decisions_count,
-                "success_rate": round(success_rate, 1),
-                "ai_autonomy": 77.4,
-                "system_health": "operational"
-            }
-        except:
+            return self.view.get_system_metrics()
+        except Exception:
             return {
                 "total_events": 0,
                 "total_decisions": 0,
                 "success_rate": 0,
-                "ai_autonomy": 77.4,
+                "ai_autonomy": None,
                 "system_health": "unknown"
             }
     
     def get_recent_activity(self, days: int = 7) -> List[Dict[str, Any]]:
         """Get recent activity"""
         try:
-            with open(self.memory_file, "r") as f:
-                memory = json.load(f)
-            
-            events = memory.get("events", [])
-            cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
-            
-            recent = [
-                event for event in events 
-                if event.get("timestamp", "") >= cutoff_date
-            ]
-            
-            return recent[-10:]  # Last 10 events
-        except:
+            return self.view.get_recent_activity(days)
+        except Exception:
             return []
     
     def generate_dashboard_json(self) -> Dict[str, Any]:
@@ -4,95 +4,71 @@ Enhanced analytics with visualizations
 """
 
 import json
+import os
+import sys
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Any
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.analytics import ANALYTICS_FILE
+from api.analytics_store import ColumnarAnalyticsStore, analytics_store
+
 class AdvancedAnalytics:
     """Advanced analytics with insights"""
     
-    def __init__(self):
-        self.analytics_file = "api/api_analytics.json"
-        self.analytics = self._load_analytics()
+    def __init__(self, store: ColumnarAnalyticsStore = None):
+        self.analytics_file = ANALYTICS_FILE
+        self.store = store or analytics_store
+        self._import_legacy_requests()
     
-    def _load_analytics(self) -> Dict[str, Any]:
-        """Load analytics data"""
+    def _import_legacy_requests(self):
+        """Seed an empty store from the request list in api_analytics.json"""
+        if len(self.store) > 0:
+            return
         try:
             if Path(self.analytics_file).exists():
                 with open(self.analytics_file, "r") as f:
-                    return json.load(f)
-        except:
+                    requests = json.load(f).get("requests", [])
+                self.store.extend(requests)
+        except (json.JSONDecodeError, KeyError, ValueError):
             pass
-        return {"requests": []}
     
     def get_trends(self, days: int = 7) -> Dict[str, Any]:
         """Get usage trends"""
         cutoff = datetime.now() - timedelta(days=days)
-        requests = [
-            r for r in self.analytics.get("requests", [])
-            if datetime.fromisoformat(r["timestamp"]) > cutoff
-        ]
-        
-        # Group by day
-        daily_counts = {}
-        for req in requests:
-            date = datetime.fromisoformat(req["timestamp"]).date()
-            daily_counts[date] = daily_counts.get(date, 0) + 1
+        recent = self.store.query().where(start=cutoff)
+        total = recent.count()
         
         return {
-            "total_requests": len(requests),
-            "daily_breakdown": {str(k): v for k, v in daily_counts.items()},
-            "average_per_day": len(requests) / days if days > 0 else 0
+            "total_requests": total,
+            "daily_breakdown": {
+                day: bucket["requests"] for day, bucket in recent.time_buckets("day").items()
+            },
+            "average_per_day": total / days if days > 0 else 0
         }
     
     def get_endpoint_performance(self) -> Dict[str, Any]:
         """Get endpoint performance metrics"""
-        requests = self.analytics.get("requests", [])
-        
-        endpoint_stats = {}
-        for req in requests:
-            endpoint = req.get("endpoint", "unknown")
-            if endpoint not in endpoint_stats:
-                endpoint_stats[endpoint] = {
-                    "count": 0,
-                    "total_time": 0,
-                    "errors": 0
-                }
-            
-            endpoint_stats[endpoint]["count"] += 1
-            endpoint_stats[endpoint]["total_time"] += req.get("response_time", 0)
-            
-            if req.get("status_code", 200) >= 400:
-                endpoint_stats[endpoint]["errors"] += 1
+        query = self.store.query()
+        endpoint_stats = query.group_by("endpoint")
+        latency = query.percentiles((50, 95, 99), by="endpoint")
         
-        # Calculate averages
         for endpoint, stats in endpoint_stats.items():
-            if stats["count"] > 0:
-                stats["avg_response_time"] = stats["total_time"] / stats["count"]
-                stats["error_rate"] = (stats["errors"] / stats["count"]) * 100
+            stats["avg_response_time"] = stats["avg_response_time_ms"]
+            stats.update(latency.get(endpoint, {}))
         
         return endpoint_stats
     
     def get_user_insights(self) -> Dict[str, Any]:
         """Get user usage insights"""
-        requests = self.analytics.get("requests", [])
-        
         user_stats = {}
-        for req in requests:
-            api_key = req.get("api_key", "unknown")[:10] + "..."
-            if api_key not in user_stats:
-                user_stats[api_key] = {
-                    "requests": 0,
-                    "endpoints": set()
-                }
-            
-            user_stats[api_key]["requests"] += 1
-            user_stats[api_key]["endpoints"].add(req.get("endpoint", "unknown"))
         
-        # Convert sets to counts
-        for api_key, stats in user_stats.items():
-            stats["unique_endpoints"] = len(stats["endpoints"])
-            del stats["endpoints"]
+        for api_key, stats in self.store.query().group_by("api_key", distinct="endpoint").items():
+            user_stats[api_key] = {
+                "requests": stats["count"],
+                "unique_endpoints": stats["distinct_endpoint"]
+            }
         
         return user_stats
     
@@ -121,6 +97,7 @@ ENDPOINT PERFORMANCE
 {endpoint}:
   Requests: {stats['count']}
   Avg Response Time: {stats.get('avg_response_time', 0):.2f}ms
+  p95 Response Time: {stats.get('p95', 0):.2f}ms
   Error Rate: {stats.get('error_rate', 0):.2f}%
 """
         
@@ -147,4 +124,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
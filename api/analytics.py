@@ -3,20 +3,48 @@ API Usage Analytics
 Track and analyze API usage patterns
 """
 
+import atexit
 import json
+import logging
 import os
+import threading
+import time
+import weakref
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
-from collections import defaultdict
+from typing import Dict, Any, List, Optional
+from api.analytics_store import analytics_store, fcntl
+
+logger = logging.getLogger(__name__)
 
 ANALYTICS_FILE = "api_analytics.json"
 
+# Seconds between merges of the per-endpoint/key/day counters into ANALYTICS_FILE
+ANALYTICS_SAVE_INTERVAL = float(os.getenv("ANALYTICS_SAVE_INTERVAL", "5"))
+
+_open_analytics = weakref.WeakSet()
+
 class APIAnalytics:
-    """Track and analyze API usage"""
+    """
+    Track and analyze API usage
+    
+    Request events go to the columnar store. The endpoint, key and daily
+    counters kept in ``api_analytics.json`` are accumulated in memory and
+    merged into the file (under a lock, so several worker processes can
+    share it) at most every ``save_interval`` seconds, on reads, and at exit.
+    """
     
-    def __init__(self):
-        self.analytics_file = ANALYTICS_FILE
+    def __init__(self, analytics_file: str = None, save_interval: float = ANALYTICS_SAVE_INTERVAL):
+        self.analytics_file = analytics_file or ANALYTICS_FILE
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._pending = self._empty_pending()
+        self._last_save = time.monotonic()
         self._ensure_file_exists()
+        _open_analytics.add(self)
+    
+    @staticmethod
+    def _empty_pending() -> Dict[str, Dict[str, Dict[str, Any]]]:
+        return {"endpoints": {}, "keys": {}, "daily_stats": {}}
     
     def _ensure_file_exists(self):
         """Ensure analytics file exists"""
@@ -56,114 +84,110 @@ class APIAnalytics:
         response_time_ms: float = None
     ):
         """Record an API request"""
-        data = self._load_analytics()
-        
-        request_record = {
-            "timestamp": datetime.now().isoformat(),
-            "endpoint": endpoint,
-            "method": method,
-            "api_key_prefix": api_key[:10] + "..." if api_key else "anonymous",
-            "status_code": status_code,
-            "response_time_ms": response_time_ms
-        }
-        
-        # Add to requests list (keep last 1000)
-        data["requests"].append(request_record)
-        if len(data["requests"]) > 1000:
-            data["requests"] = data["requests"][-1000:]
-        
-        # Update endpoint stats
-        endpoint_key = f"{method} {endpoint}"
-        if endpoint_key not in data["endpoints"]:
-            data["endpoints"][endpoint_key] = {
-                "count": 0,
-                "success_count": 0,
-                "error_count": 0,
-                "avg_response_time": 0
-            }
-        
-        endpoint_stats = data["endpoints"][endpoint_key]
-        endpoint_stats["count"] += 1
-        if status_code == 200:
-            endpoint_stats["success_count"] += 1
-        else:
-            endpoint_stats["error_count"] += 1
-        
-        if response_time_ms:
-            current_avg = endpoint_stats["avg_response_time"]
-            count = endpoint_stats["count"]
-            endpoint_stats["avg_response_time"] = (
-                (current_avg * (count - 1) + response_time_ms) / count
-            )
-        
-        # Update key stats
         key_prefix = api_key[:10] + "..." if api_key else "anonymous"
-        if key_prefix not in data["keys"]:
-            data["keys"][key_prefix] = {
-                "count": 0,
-                "last_used": None
-            }
+        now = datetime.now()
+        analytics_store.append(now, endpoint, method, key_prefix, status_code, response_time_ms)
         
-        data["keys"][key_prefix]["count"] += 1
-        data["keys"][key_prefix]["last_used"] = datetime.now().isoformat()
+        with self._lock:
+            # Update endpoint stats
+            endpoint_stats = self._pending["endpoints"].setdefault(f"{method} {endpoint}", {
+                "count": 0, "success_count": 0, "error_count": 0, "response_time_total": 0.0
+            })
+            endpoint_stats["count"] += 1
+            endpoint_stats["success_count" if status_code == 200 else "error_count"] += 1
+            if response_time_ms:
+                endpoint_stats["response_time_total"] += response_time_ms
+            
+            # Update key stats
+            key = self._pending["keys"].setdefault(key_prefix, {"count": 0, "last_used": None})
+            key["count"] += 1
+            key["last_used"] = now.isoformat()
+            
+            # Update daily stats
+            daily = self._pending["daily_stats"].setdefault(now.strftime("%Y-%m-%d"), {
+                "total_requests": 0, "successful_requests": 0, "failed_requests": 0
+            })
+            daily["total_requests"] += 1
+            daily["successful_requests" if status_code == 200 else "failed_requests"] += 1
+            
+            due = time.monotonic() - self._last_save >= self.save_interval
         
-        # Update daily stats
-        today = datetime.now().strftime("%Y-%m-%d")
-        if today not in data["daily_stats"]:
-            data["daily_stats"][today] = {
-                "total_requests": 0,
-                "successful_requests": 0,
-                "failed_requests": 0
-            }
+        if due:
+            self.flush()
+    
+    def flush(self):
+        """Merge the counters gathered since the last flush into the analytics file"""
+        # Swap the counters out under the lock; requests keep recording
+        # into the new ones while this thread merges and writes the file
+        with self._lock:
+            pending, self._pending = self._pending, self._empty_pending()
+            self._last_save = time.monotonic()
+        if not any(pending.values()):
+            return
+        with open(self.analytics_file + ".lock", "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                data = self._load_analytics()
+                self._merge(data, pending)
+                tmp_path = f"{self.analytics_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(data, f, indent=2)
+                os.replace(tmp_path, self.analytics_file)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    @staticmethod
+    def _merge(data: Dict[str, Any], pending: Dict[str, Dict[str, Dict[str, Any]]]):
+        for endpoint_key, delta in pending["endpoints"].items():
+            stats = data["endpoints"].setdefault(endpoint_key, {
+                "count": 0, "success_count": 0, "error_count": 0, "avg_response_time": 0
+            })
+            count = stats["count"] + delta["count"]
+            stats["avg_response_time"] = (
+                (stats["avg_response_time"] * stats["count"] + delta["response_time_total"]) / count
+            )
+            stats["count"] = count
+            stats["success_count"] += delta["success_count"]
+            stats["error_count"] += delta["error_count"]
         
-        daily = data["daily_stats"][today]
-        daily["total_requests"] += 1
-        if status_code == 200:
-            daily["successful_requests"] += 1
-        else:
-            daily["failed_requests"] += 1
+        for key_prefix, delta in pending["keys"].items():
+            stats = data["keys"].setdefault(key_prefix, {"count": 0, "last_used": None})
+            stats["count"] += delta["count"]
+            stats["last_used"] = delta["last_used"]
         
-        self._save_analytics(data)
+        for day, delta in pending["daily_stats"].items():
+            stats = data["daily_stats"].setdefault(day, {
+                "total_requests": 0, "successful_requests": 0, "failed_requests": 0
+            })
+            for field, value in delta.items():
+                stats[field] += value
     
     def get_stats(self, days: int = 30) -> Dict[str, Any]:
         """Get analytics statistics"""
+        self.flush()
         data = self._load_analytics()
         
-        # Calculate date range
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-        
-        # Filter requests by date
-        recent_requests = [
-            r for r in data["requests"]
-            if datetime.fromisoformat(r["timestamp"]) >= start_date
-        ]
+        # Request-level stats come from the columnar store
+        start_date = datetime.now() - timedelta(days=days)
+        recent = analytics_store.query().where(start=start_date)
         
-        # Calculate stats
-        total_requests = len(recent_requests)
-        successful = sum(1 for r in recent_requests if r["status_code"] == 200)
+        total_requests = recent.count()
+        successful = recent.where(status_min=200, status_max=200).count()
         failed = total_requests - successful
         
         # Top endpoints
-        endpoint_counts = defaultdict(int)
-        for r in recent_requests:
-            endpoint_counts[r["endpoint"]] += 1
+        endpoint_counts = recent.group_by("endpoint")
         top_endpoints = sorted(
-            endpoint_counts.items(),
+            ((ep, stats["count"]) for ep, stats in endpoint_counts.items()),
             key=lambda x: x[1],
             reverse=True
         )[:10]
         
         # Response times
-        response_times = [
-            r["response_time_ms"]
-            for r in recent_requests
-            if r.get("response_time_ms")
-        ]
-        avg_response_time = (
-            sum(response_times) / len(response_times)
-            if response_times else 0
-        )
+        avg_response_time = recent.mean_response_time()
+        latency = recent.percentiles((50, 95, 99))
         
         return {
             "period_days": days,
@@ -172,6 +196,7 @@ class APIAnalytics:
             "failed_requests": failed,
             "success_rate": (successful / total_requests * 100) if total_requests > 0 else 0,
             "avg_response_time_ms": round(avg_response_time, 2),
+            "response_time_percentiles_ms": {k: round(v, 2) for k, v in latency.items()},
             "top_endpoints": [
                 {"endpoint": ep, "count": count}
                 for ep, count in top_endpoints
@@ -183,6 +208,7 @@ class APIAnalytics:
     
     def get_endpoint_stats(self, endpoint: str) -> Dict[str, Any]:
         """Get statistics for a specific endpoint"""
+        self.flush()
         data = self._load_analytics()
         
         # Find all matching endpoints
@@ -193,8 +219,8 @@ class APIAnalytics:
         
         return stats
     
-    def export_report(self, output_file: str = "api_analytics_report.json"):
-        """Export analytics report"""
+    def export_report(self, output_file: Optional[str] = "api_analytics_report.json"):
+        """Export analytics report (pass output_file=None to skip writing it)"""
         stats = self.get_stats()
         
         report = {
@@ -209,11 +235,23 @@ class APIAnalytics:
             "daily_breakdown": stats["daily_stats"]
         }
         
-        with open(output_file, "w") as f:
-            json.dump(report, f, indent=2)
+        if output_file:
+            with open(output_file, "w") as f:
+                json.dump(report, f, indent=2)
         
         return report
 
+
+@atexit.register
+def _flush_all():
+    """Save counters still waiting for their next merge"""
+    for analytics in list(_open_analytics):
+        try:
+            analytics.flush()
+        except Exception as e:
+            logger.error(f"Error saving {analytics.analytics_file}: {e}")
+
+
 # Global instance
 api_analytics = APIAnalytics()
 
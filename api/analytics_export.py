@@ -0,0 +1,332 @@
+"""
+Analytics Export
+Streams analytics and usage data as CSV or NDJSON
+
+Request events and daily rollups are read from the columnar store chunk by
+chunk, in constant memory. Key usage and marketing visits come from JSON
+files that have to be loaded whole before the first record is sent.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterator, Callable
+
+import numpy as np
+
+from api.analytics_store import analytics_store, decode_rows, to_epoch, from_epoch
+from api.api_key_manager import api_key_manager
+from api.marketing_analytics import marketing_analytics
+
+EXPORT_CHUNK_ROWS = 5000
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson"
+}
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO date or datetime query parameter"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value)
+
+
+def iter_request_events(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: int = 0,
+    limit: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Raw request events from the columnar store
+    
+    Each record carries its ``row`` number; resume an interrupted export
+    with ``cursor=<last row + 1>``.
+    """
+    query = analytics_store.query()
+    columns, dictionaries = query.columns, query.dictionaries
+    total = len(columns["timestamp"])
+    start_ts = to_epoch(start) if start else None
+    end_ts = to_epoch(end) if end else None
+    emitted = 0
+    
+    for chunk_start in range(max(cursor, 0), total, EXPORT_CHUNK_ROWS):
+        chunk_end = min(chunk_start + EXPORT_CHUNK_ROWS, total)
+        timestamps = columns["timestamp"][chunk_start:chunk_end]
+        mask = np.ones(len(timestamps), dtype=bool)
+        if start_ts is not None:
+            mask &= timestamps >= start_ts
+        if end_ts is not None:
+            mask &= timestamps < end_ts
+        
+        index = np.flatnonzero(mask) + chunk_start
+        if limit is not None:
+            index = index[:limit - emitted]
+        
+        for row, record in zip(index, decode_rows(columns, dictionaries, index)):
+            record["row"] = int(row)
+            yield record
+        
+        emitted += len(index)
+        if limit is not None and emitted >= limit:
+            return
+
+
+def iter_daily_rollups(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Per-day request totals aggregated chunk by chunk
+    
+    ``cursor`` is the last ``date`` already received.
+    """
+    columns = analytics_store.query().columns
+    total = len(columns["timestamp"])
+    start_ts = to_epoch(start) if start else None
+    end_ts = to_epoch(end) if end else None
+    days: Dict[int, List[float]] = {}
+    
+    for chunk_start in range(0, total, EXPORT_CHUNK_ROWS):
+        chunk = slice(chunk_start, min(chunk_start + EXPORT_CHUNK_ROWS, total))
+        timestamps = columns["timestamp"][chunk]
+        mask = np.ones(len(timestamps), dtype=bool)
+        if start_ts is not None:
+            mask &= timestamps >= start_ts
+        if end_ts is not None:
+            mask &= timestamps < end_ts
+        if not mask.any():
+            continue
+        
+        day = np.floor(timestamps[mask] / 86400).astype(np.int64)
+        status_codes = columns["status_code"][chunk][mask]
+        latency = columns["response_time_ms"][chunk][mask].astype(np.float64)
+        timed = ~np.isnan(latency)
+        
+        labels, inverse = np.unique(day, return_inverse=True)
+        sums = (
+            np.bincount(inverse),
+            np.bincount(inverse, weights=status_codes == 200),
+            np.bincount(inverse, weights=status_codes >= 400),
+            np.bincount(inverse, weights=np.where(timed, latency, 0.0)),
+            np.bincount(inverse, weights=timed)
+        )
+        for i, label in enumerate(labels):
+            totals = days.setdefault(int(label), [0.0] * len(sums))
+            for j, values in enumerate(sums):
+                totals[j] += values[i]
+    
+    emitted = 0
+    for label in sorted(days):
+        date = from_epoch(label * 86400).strftime("%Y-%m-%d")
+        if cursor and date <= cursor:
+            continue
+        requests, successful, errors, latency_sum, timed = days[label]
+        yield {
+            "date": date,
+            "total_requests": int(requests),
+            "successful_requests": int(successful),
+            "failed_requests": int(requests - successful),
+            "error_responses": int(errors),
+            "avg_response_time_ms": round(latency_sum / timed, 3) if timed else None
+        }
+        emitted += 1
+        if limit is not None and emitted >= limit:
+            return
+
+
+def iter_key_usage(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: int = 0,
+    limit: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Monthly request counts per API key (key prefixes only)
+    
+    Records are ordered by (month, key); ``cursor`` is the number of
+    records already received. The rate-limit and key files are JSON
+    documents, so both are loaded into memory in full (one entry per key
+    and month) before anything is yielded.
+    """
+    try:
+        with open(api_key_manager.rate_limit_file, "r") as f:
+            rate_limits = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        rate_limits = {}
+    keys = api_key_manager._load_keys()
+    start_month = start.strftime("%Y-%m") if start else None
+    end_month = end.strftime("%Y-%m") if end else None
+    
+    entries = []
+    for month_key in rate_limits:
+        api_key, _, month = month_key.rpartition("_")
+        if start_month and month < start_month:
+            continue
+        if end_month and month > end_month:
+            continue
+        entries.append((month, api_key, month_key))
+    entries.sort()
+    
+    stop = None if limit is None else cursor + limit
+    for month, api_key, month_key in entries[cursor:stop]:
+        usage = rate_limits[month_key]
+        key_info = keys.get(api_key, {})
+        yield {
+            "month": month,
+            "api_key_prefix": api_key[:10] + "...",
+            "tier": key_info.get("tier", "unknown"),
+            "requests_per_month": key_info.get("requests_per_month"),
+            "total_requests": usage.get("count", 0),
+            "overage_requests": usage.get("overage_requests", 0),
+            "first_request": usage.get("first_request"),
+            "last_request": usage.get("last_request")
+        }
+
+
+def iter_marketing_visits(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: int = 0,
+    limit: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Marketing visits with their UTM attribution (no IP or user agent)
+    
+    ``cursor`` is the number of matching visits already received. The
+    visit log is a single JSON document and is loaded whole; only the
+    output is streamed.
+    """
+    visits = marketing_analytics._load_analytics().get("visits", [])
+    start_iso = start.isoformat() if start else None
+    end_iso = end.isoformat() if end else None
+    skipped = 0
+    emitted = 0
+    
+    for visit in visits:
+        timestamp = visit.get("timestamp", "")
+        if start_iso and timestamp < start_iso:
+            continue
+        if end_iso and timestamp >= end_iso:
+            continue
+        if skipped < cursor:
+            skipped += 1
+            continue
+        yield {
+            "timestamp": timestamp,
+            "url": visit.get("url"),
+            "utm_source": visit.get("utm_source"),
+            "utm_medium": visit.get("utm_medium"),
+            "utm_campaign": visit.get("utm_campaign"),
+            "utm_term": visit.get("utm_term"),
+            "utm_content": visit.get("utm_content"),
+            "referer": visit.get("referer")
+        }
+        emitted += 1
+        if limit is not None and emitted >= limit:
+            return
+
+
+# Dataset name -> generator, CSV columns, cursor parser and default
+EXPORT_DATASETS: Dict[str, Dict[str, Any]] = {
+    "requests": {
+        "generator": iter_request_events,
+        "fields": ["row", "timestamp", "endpoint", "method", "api_key_prefix", "status_code", "response_time_ms"],
+        "cursor": int,
+        "default_cursor": 0
+    },
+    "daily": {
+        "generator": iter_daily_rollups,
+        "fields": ["date", "total_requests", "successful_requests", "failed_requests",
+                   "error_responses", "avg_response_time_ms"],
+        "cursor": str,
+        "default_cursor": None
+    },
+    "keys": {
+        "generator": iter_key_usage,
+        "fields": ["month", "api_key_prefix", "tier", "requests_per_month", "total_requests",
+                   "overage_requests", "first_request", "last_request"],
+        "cursor": int,
+        "default_cursor": 0
+    },
+    "visits": {
+        "generator": iter_marketing_visits,
+        "fields": ["timestamp", "url", "utm_source", "utm_medium", "utm_campaign",
+                   "utm_term", "utm_content", "referer"],
+        "cursor": int,
+        "default_cursor": 0
+    }
+}
+
+
+def _batched(records: Iterator[Dict[str, Any]], size: int = 500) -> Iterator[List[Dict[str, Any]]]:
+    """Group records so each network write carries many rows"""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def format_csv(records: Iterator[Dict[str, Any]], fields: List[str]) -> Iterator[str]:
+    """Render records as CSV text chunks, header first"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue()
+    
+    for batch in _batched(records):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+
+def format_ndjson(records: Iterator[Dict[str, Any]], fields: List[str] = None) -> Iterator[str]:
+    """Render records as newline-delimited JSON chunks"""
+    for batch in _batched(records):
+        yield "".join(json.dumps(record) + "\n" for record in batch)
+
+
+def stream_export(
+    dataset: str,
+    export_format: str = "ndjson",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+) -> Iterator[str]:
+    """
+    Lazily render an export
+    
+    Args:
+        dataset: One of ``EXPORT_DATASETS``
+        export_format: "csv" or "ndjson"
+        start: Inclusive ISO start time
+        end: Exclusive ISO end time
+        cursor: Resume position (see each dataset's generator)
+        limit: Maximum records to emit
+    
+    Raises:
+        ValueError: On an unknown dataset/format or malformed parameters
+    """
+    if dataset not in EXPORT_DATASETS:
+        raise ValueError(f"Dataset must be one of: {', '.join(EXPORT_DATASETS)}")
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Format must be one of: {', '.join(EXPORT_FORMATS)}")
+    
+    spec = EXPORT_DATASETS[dataset]
+    generator: Callable[..., Iterator[Dict[str, Any]]] = spec["generator"]
+    parsed_cursor = spec["cursor"](cursor) if cursor else spec["default_cursor"]
+    records = generator(_parse_time(start), _parse_time(end), parsed_cursor, limit)
+    
+    formatter = format_csv if export_format == "csv" else format_ndjson
+    return formatter(records, spec["fields"])
@@ -8,6 +8,7 @@ from starlette.middleware.base import BaseHTTPMiddleware
 import time
 from api.analytics import api_analytics
 from api.marketing_analytics import marketing_analytics
+from api.live_metrics import live_metrics
 import logging
 
 logger = logging.getLogger(__name__)
@@ -48,6 +49,9 @@ class AnalyticsMiddleware(BaseHTTPMiddleware):
         # Calculate response time
         response_time_ms = (time.time() - start_time) * 1000
         
+        # Feed the live dashboard stream
+        live_metrics.record_request(response.status_code, response_time_ms)
+        
         # Record analytics
         try:
             api_analytics.record_request(
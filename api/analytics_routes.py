@@ -3,9 +3,14 @@ API Analytics Endpoint
 Provides analytics data via API
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from api.analytics import api_analytics
+from api.analytics_export import stream_export, EXPORT_FORMATS
+from api.live_metrics import live_metrics
 from api.api_key_manager import api_key_manager
+from api.tenant_registry import tenant_registry, tenant_id_for, TENANT_ISOLATION
 from typing import Dict, Any, Optional
 from datetime import datetime
 
@@ -87,12 +92,13 @@ async def export_analytics_report(
     Export analytics report as JSON
     
     - Requires Pro or Enterprise tier API key
+    - For raw data use GET /analytics/export/{dataset}
     """
     try:
-        report = api_analytics.export_report()
+        report = api_analytics.export_report(output_file=None)
         return {
             "success": True,
-            "message": "Report exported to api_analytics_report.json",
+            "message": "Report generated",
             "data": report,
             "timestamp": datetime.now().isoformat()
         }
@@ -102,3 +108,78 @@ async def export_analytics_report(
             detail=f"Error exporting report: {str(e)}"
         )
 
+
+@router.get("/export/{dataset}")
+async def stream_analytics_export(
+    dataset: str,
+    format: str = "ndjson",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    api_info: Dict[str, Any] = Depends(verify_admin_key)
+):
+    """
+    Stream raw analytics data as CSV or NDJSON
+    
+    - **dataset**: requests, daily, keys or visits
+    - **format**: csv or ndjson (default: ndjson)
+    - **start** / **end**: ISO time range (start inclusive, end exclusive)
+    - **cursor**: Resume position (request ``row`` + 1, last ``date``, or records already received)
+    - **limit**: Maximum records to return
+    - Requires Pro or Enterprise tier API key
+    """
+    try:
+        body = stream_export(dataset, format, start=start, end=end, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_FORMATS[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{dataset}.{format}"'
+        }
+    )
+
+@router.get("/stream")
+async def stream_live_metrics(
+    request: Request,
+    x_api_key: Optional[str] = None,
+    api_info: Dict[str, Any] = Depends(verify_admin_key)
+):
+    """
+    Live metrics feed (Server-Sent Events)
+    
+    Pushes one ``metrics`` event per second with request counts, error rate,
+    latency percentiles and decisions evaluated, plus an ``autonomy`` event
+    whenever the autonomy level changes. ``totals`` in each event are
+    absolute counts since the server started, to be shown as they are
+    rather than summed. Requests and latency cover the whole server;
+    decisions and autonomy are the caller's tenant's. Pass the key as
+    ``?x_api_key=`` since EventSource cannot set headers.
+    
+    - Requires Pro or Enterprise tier API key
+    """
+    tenant = None
+    autonomy_source = None
+    if TENANT_ISOLATION:
+        tenant = tenant_id_for(x_api_key, api_info)
+        # Load the tenant off the event loop; each tick then finds it hot
+        await run_in_threadpool(tenant_registry.get, tenant)
+        
+        def autonomy_source() -> float:
+            engine = tenant_registry.acquire(tenant)
+            try:
+                return engine.autonomy.get_autonomy_level()
+            finally:
+                tenant_registry.release(tenant)
+    
+    return StreamingResponse(
+        live_metrics.stream(request.is_disconnected, tenant, autonomy_source),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
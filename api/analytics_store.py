@@ -0,0 +1,473 @@
+"""
+Columnar Analytics Store
+Memory-mapped NumPy columns for API request events
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Iterable, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines
+    fcntl = None
+
+ANALYTICS_STORE_DIR = os.getenv("ANALYTICS_STORE_DIR", "analytics_store")
+
+# Column name -> on-disk dtype. Every column is a flat little-endian file.
+COLUMNS = {
+    "timestamp": np.dtype("<f8"),         # wall-clock seconds (see to_epoch)
+    "endpoint": np.dtype("<i4"),          # dictionary-encoded
+    "method": np.dtype("<i4"),            # dictionary-encoded
+    "api_key": np.dtype("<i4"),           # dictionary-encoded key prefix
+    "status_code": np.dtype("<i2"),
+    "response_time_ms": np.dtype("<f4"),  # NaN when not measured
+}
+
+DICTIONARY_COLUMNS = ("endpoint", "method", "api_key")
+
+FLUSH_THRESHOLD = 256
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch(value: Any) -> float:
+    """
+    Convert a datetime or ISO string to wall-clock seconds
+    
+    Timestamps elsewhere in the API are naive local ISO strings, so they are
+    stored as seconds since 1970-01-01 on the same wall clock. Day buckets
+    then line up with the ``%Y-%m-%d`` keys used by ``daily_stats``.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None)
+    return (value - _EPOCH).total_seconds()
+
+
+def from_epoch(seconds: float) -> datetime:
+    """Convert wall-clock seconds back to a naive datetime"""
+    return _EPOCH + timedelta(seconds=float(seconds))
+
+
+class AnalyticsQuery:
+    """Vectorized, chainable query over a snapshot of the store"""
+    
+    def __init__(self, columns: Dict[str, np.ndarray], dictionaries: Dict[str, List[str]],
+                 mask: Optional[np.ndarray] = None):
+        self.columns = columns
+        self.dictionaries = dictionaries
+        self.mask = mask
+    
+    def _selected(self, name: str) -> np.ndarray:
+        """Column values for the selected rows"""
+        values = self.columns[name]
+        if self.mask is None:
+            return values
+        return values[self.mask]
+    
+    def _code(self, column: str, value: str) -> int:
+        """Dictionary code for a value, -1 if never seen"""
+        try:
+            return self.dictionaries[column].index(value)
+        except ValueError:
+            return -1
+    
+    def where(
+        self,
+        start: Any = None,
+        end: Any = None,
+        endpoint: Optional[str] = None,
+        method: Optional[str] = None,
+        api_key: Optional[str] = None,
+        status_min: Optional[int] = None,
+        status_max: Optional[int] = None
+    ) -> "AnalyticsQuery":
+        """
+        Narrow the selection
+        
+        Args:
+            start: Inclusive lower time bound (datetime, ISO string or seconds)
+            end: Exclusive upper time bound
+            endpoint/method/api_key: Exact match on a dictionary column
+            status_min/status_max: Inclusive status code range
+        
+        Returns:
+            New query with the combined filter
+        """
+        n = len(self.columns["timestamp"])
+        mask = np.ones(n, dtype=bool) if self.mask is None else self.mask.copy()
+        
+        timestamps = self.columns["timestamp"]
+        if start is not None:
+            mask &= timestamps >= to_epoch(start)
+        if end is not None:
+            mask &= timestamps < to_epoch(end)
+        
+        for column, value in (("endpoint", endpoint), ("method", method), ("api_key", api_key)):
+            if value is not None:
+                mask &= self.columns[column] == self._code(column, value)
+        
+        status_codes = self.columns["status_code"]
+        if status_min is not None:
+            mask &= status_codes >= status_min
+        if status_max is not None:
+            mask &= status_codes <= status_max
+        
+        return AnalyticsQuery(self.columns, self.dictionaries, mask)
+    
+    def count(self) -> int:
+        """Number of selected rows"""
+        if self.mask is None:
+            return len(self.columns["timestamp"])
+        return int(np.count_nonzero(self.mask))
+    
+    def indices(self) -> np.ndarray:
+        """Row numbers of the selected rows"""
+        if self.mask is None:
+            return np.arange(len(self.columns["timestamp"]))
+        return np.flatnonzero(self.mask)
+    
+    def group_by(self, column: str, distinct: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Aggregate selected rows by a dictionary-encoded column
+        
+        Args:
+            column: Dictionary column to group on
+            distinct: Optional second dictionary column to count distinct values of
+        
+        Returns:
+            Mapping of decoded value -> count, errors, error_rate,
+            avg_response_time_ms (and ``distinct_<column>`` if requested)
+        """
+        if column not in DICTIONARY_COLUMNS:
+            raise ValueError(f"Can only group by one of: {', '.join(DICTIONARY_COLUMNS)}")
+        
+        codes = self._selected(column)
+        size = len(self.dictionaries[column])
+        if size == 0 or len(codes) == 0:
+            return {}
+        
+        latency = self._selected("response_time_ms").astype(np.float64)
+        measured = ~np.isnan(latency)
+        errors = self._selected("status_code") >= 400
+        
+        counts = np.bincount(codes, minlength=size)
+        error_counts = np.bincount(codes, weights=errors, minlength=size)
+        latency_sums = np.bincount(codes[measured], weights=latency[measured], minlength=size)
+        latency_counts = np.bincount(codes[measured], minlength=size)
+        
+        distinct_counts = None
+        if distinct is not None:
+            other = self._selected(distinct).astype(np.int64)
+            width = max(len(self.dictionaries[distinct]), 1)
+            pairs = np.unique(codes.astype(np.int64) * width + other)
+            distinct_counts = np.bincount(pairs // width, minlength=size)
+        
+        groups = {}
+        for code in np.flatnonzero(counts):
+            count = int(counts[code])
+            timed = int(latency_counts[code])
+            groups[self.dictionaries[column][code]] = {
+                "count": count,
+                "errors": int(error_counts[code]),
+                "error_rate": float(error_counts[code]) / count * 100,
+                "avg_response_time_ms": float(latency_sums[code]) / timed if timed else 0.0
+            }
+            if distinct_counts is not None:
+                groups[self.dictionaries[column][code]][f"distinct_{distinct}"] = int(distinct_counts[code])
+        return groups
+    
+    def mean_response_time(self) -> float:
+        """Mean response time over selected rows that were timed"""
+        latency = self._selected("response_time_ms").astype(np.float64)
+        latency = latency[~np.isnan(latency)]
+        return float(latency.mean()) if len(latency) else 0.0
+    
+    def percentiles(self, q: Sequence[float] = (50, 95, 99),
+                    by: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Response-time percentiles for the selected rows
+        
+        Args:
+            q: Percentiles to compute (0-100)
+            by: Optional dictionary column to compute percentiles per group
+        
+        Returns:
+            {"p50": ..., ...} or {group: {"p50": ...}} when ``by`` is given
+        """
+        latency = self._selected("response_time_ms").astype(np.float64)
+        measured = ~np.isnan(latency)
+        
+        if by is None:
+            values = latency[measured]
+            if len(values) == 0:
+                return {f"p{p:g}": 0.0 for p in q}
+            return dict(zip((f"p{p:g}" for p in q), np.percentile(values, q).tolist()))
+        
+        codes = self._selected(by)[measured]
+        values = latency[measured]
+        if len(values) == 0:
+            return {}
+        
+        order = np.argsort(codes, kind="stable")
+        codes = codes[order]
+        values = values[order]
+        boundaries = np.flatnonzero(np.diff(codes)) + 1
+        result = {}
+        for segment_codes, segment in zip(np.split(codes, boundaries), np.split(values, boundaries)):
+            name = self.dictionaries[by][segment_codes[0]]
+            result[name] = dict(zip((f"p{p:g}" for p in q), np.percentile(segment, q).tolist()))
+        return result
+    
+    def time_buckets(self, interval: str = "day") -> Dict[str, Dict[str, int]]:
+        """
+        Count selected rows per time bucket
+        
+        Args:
+            interval: "minute", "hour" or "day"
+        
+        Returns:
+            Mapping of bucket label -> {"requests", "errors"}
+        """
+        widths = {"minute": 60, "hour": 3600, "day": 86400}
+        formats = {"minute": "%Y-%m-%dT%H:%M", "hour": "%Y-%m-%dT%H:00", "day": "%Y-%m-%d"}
+        if interval not in widths:
+            raise ValueError(f"Interval must be one of: {', '.join(widths)}")
+        
+        timestamps = self._selected("timestamp")
+        if len(timestamps) == 0:
+            return {}
+        
+        width = widths[interval]
+        buckets = np.floor(timestamps / width).astype(np.int64)
+        errors = self._selected("status_code") >= 400
+        labels, inverse = np.unique(buckets, return_inverse=True)
+        counts = np.bincount(inverse)
+        error_counts = np.bincount(inverse, weights=errors)
+        
+        return {
+            from_epoch(label * width).strftime(formats[interval]): {
+                "requests": int(count),
+                "errors": int(error_count)
+            }
+            for label, count, error_count in zip(labels, counts, error_counts)
+        }
+    
+    def rows(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Decode selected rows into dicts (for small result sets)"""
+        index = self.indices()
+        if limit is not None:
+            index = index[:limit]
+        return decode_rows(self.columns, self.dictionaries, index)
+
+
+def decode_rows(columns: Dict[str, np.ndarray], dictionaries: Dict[str, List[str]],
+                index: np.ndarray) -> List[Dict[str, Any]]:
+    """Decode a set of row numbers into request records"""
+    decoded = {name: columns[name][index] for name in COLUMNS}
+    rows = []
+    for i in range(len(index)):
+        latency = float(decoded["response_time_ms"][i])
+        rows.append({
+            "timestamp": from_epoch(decoded["timestamp"][i]).isoformat(),
+            "endpoint": dictionaries["endpoint"][decoded["endpoint"][i]],
+            "method": dictionaries["method"][decoded["method"][i]],
+            "api_key_prefix": dictionaries["api_key"][decoded["api_key"][i]],
+            "status_code": int(decoded["status_code"][i]),
+            "response_time_ms": None if np.isnan(latency) else round(latency, 3)
+        })
+    return rows
+
+
+class ColumnarAnalyticsStore:
+    """Append-only columnar store for request events"""
+    
+    def __init__(self, directory: str = ANALYTICS_STORE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._buffer: List[tuple] = []
+        self._dictionaries: Dict[str, List[str]] = {name: [] for name in DICTIONARY_COLUMNS}
+        self._dictionaries_mtime = None
+        self._mapped: Dict[str, np.ndarray] = {}
+        self._mapped_rows = -1
+        self._load_dictionaries()
+    
+    # ---- file layout ----
+    
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.bin")
+    
+    @property
+    def _dictionaries_path(self) -> str:
+        return os.path.join(self.directory, "dictionaries.json")
+    
+    def _load_dictionaries(self):
+        """Reload dictionaries if another process extended them"""
+        try:
+            mtime = os.path.getmtime(self._dictionaries_path)
+        except OSError:
+            return
+        if mtime == self._dictionaries_mtime:
+            return
+        try:
+            with open(self._dictionaries_path, "r") as f:
+                loaded = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        for name in DICTIONARY_COLUMNS:
+            self._dictionaries[name] = loaded.get(name, [])
+        self._dictionaries_mtime = mtime
+    
+    def _save_dictionaries(self):
+        """Atomically persist dictionaries"""
+        tmp_path = f"{self._dictionaries_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._dictionaries, f)
+        os.replace(tmp_path, self._dictionaries_path)
+        self._dictionaries_mtime = os.path.getmtime(self._dictionaries_path)
+    
+    def _row_count(self) -> int:
+        """Rows fully written to every column"""
+        counts = []
+        for name, dtype in COLUMNS.items():
+            try:
+                counts.append(os.path.getsize(self._column_path(name)) // dtype.itemsize)
+            except OSError:
+                counts.append(0)
+        return min(counts)
+    
+    # ---- writes ----
+    
+    def append(
+        self,
+        timestamp: Any,
+        endpoint: str,
+        method: str,
+        api_key: str,
+        status_code: int,
+        response_time_ms: Optional[float] = None
+    ):
+        """Buffer one request event; flushed in batches"""
+        row = (
+            to_epoch(timestamp),
+            endpoint or "unknown",
+            method or "GET",
+            api_key or "anonymous",
+            int(status_code),
+            float("nan") if response_time_ms is None else float(response_time_ms)
+        )
+        with self._lock:
+            self._buffer.append(row)
+            if len(self._buffer) >= FLUSH_THRESHOLD:
+                self._flush_locked()
+    
+    def extend(self, records: Iterable[Dict[str, Any]]):
+        """Bulk-load request records in the ``api_analytics.json`` shape"""
+        for record in records:
+            self.append(
+                record["timestamp"],
+                record.get("endpoint"),
+                record.get("method"),
+                record.get("api_key_prefix") or record.get("api_key"),
+                record.get("status_code", 200),
+                record.get("response_time_ms")
+            )
+        self.flush()
+    
+    def flush(self):
+        """Write buffered rows to disk"""
+        with self._lock:
+            self._flush_locked()
+    
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        
+        # Created on first write, so importing the module leaves no directory behind
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._load_dictionaries()
+                lookups = {
+                    name: {value: code for code, value in enumerate(self._dictionaries[name])}
+                    for name in DICTIONARY_COLUMNS
+                }
+                dictionaries_changed = False
+                
+                def encode(name: str, value: str) -> int:
+                    nonlocal dictionaries_changed
+                    code = lookups[name].get(value)
+                    if code is None:
+                        code = len(self._dictionaries[name])
+                        self._dictionaries[name].append(value)
+                        lookups[name][value] = code
+                        dictionaries_changed = True
+                    return code
+                
+                columns = {
+                    "timestamp": [r[0] for r in rows],
+                    "endpoint": [encode("endpoint", r[1]) for r in rows],
+                    "method": [encode("method", r[2]) for r in rows],
+                    "api_key": [encode("api_key", r[3]) for r in rows],
+                    "status_code": [r[4] for r in rows],
+                    "response_time_ms": [r[5] for r in rows],
+                }
+                
+                # Dictionaries first so readers never see an unknown code
+                if dictionaries_changed:
+                    self._save_dictionaries()
+                
+                # Trim any partially written tail left by a crashed writer
+                committed = self._row_count()
+                for name, dtype in COLUMNS.items():
+                    path = self._column_path(name)
+                    with open(path, "ab") as f:
+                        f.truncate(committed * dtype.itemsize)
+                        f.write(np.asarray(columns[name], dtype=dtype).tobytes())
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    # ---- reads ----
+    
+    def _columns(self) -> Dict[str, np.ndarray]:
+        """Read-only memory maps of every column, remapped as the store grows"""
+        rows = self._row_count()
+        if rows != self._mapped_rows:
+            mapped = {}
+            for name, dtype in COLUMNS.items():
+                if rows == 0:
+                    mapped[name] = np.empty(0, dtype=dtype)
+                else:
+                    mapped[name] = np.memmap(self._column_path(name), dtype=dtype, mode="r", shape=(rows,))
+            self._mapped = mapped
+            self._mapped_rows = rows
+        return self._mapped
+    
+    def query(self) -> AnalyticsQuery:
+        """Start a query over everything written so far"""
+        self.flush()
+        with self._lock:
+            self._load_dictionaries()
+            dictionaries = {name: list(values) for name, values in self._dictionaries.items()}
+            columns = self._columns()
+        return AnalyticsQuery(columns, dictionaries)
+    
+    def __len__(self) -> int:
+        self.flush()
+        return self._row_count()
+
+
+# Global instance
+analytics_store = ColumnarAnalyticsStore()
@@ -110,6 +110,39 @@ class AIDecisionAPIClient:
             logger.error(f"Risk assessment failed: {e}")
             raise
     
+    def get_value_at_risk(
+        self,
+        category: str = "FINANCIAL",
+        confidence: float = 0.95,
+        amount: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Get Value-at-Risk and expected shortfall from recorded outcomes
+        
+        Args:
+            category: Decision category
+            confidence: VaR confidence level (0.5-0.999)
+            amount: Also report the share of outcomes that lost more than this
+        
+        Returns:
+            Historical and parametric VaR and expected shortfall
+        """
+        params = {"category": category.upper(), "confidence": confidence}
+        if amount is not None:
+            params["amount"] = amount
+        
+        try:
+            response = self.session.get(
+                f"{self.base_url}/risk/var",
+                params=params,
+                timeout=10
+            )
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Value-at-Risk request failed: {e}")
+            raise
+    
     def get_autonomy_level(self) -> Dict[str, Any]:
         """Get current AI autonomy level"""
         try:
@@ -155,6 +188,41 @@ class AIDecisionAPIClient:
             logger.error(f"Auto-execute check failed: {e}")
             raise
     
+    def should_auto_execute_bulk(self, checks: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Check many (task_type, risk_level) pairs in one call
+        
+        Args:
+            checks: List of {"task_type": ..., "risk_level": ...}
+        
+        Returns:
+            Per-check answers and the matrix version they came from
+        """
+        try:
+            response = self.session.post(
+                f"{self.base_url}/autonomy/should-execute/bulk",
+                json={"checks": checks},
+                timeout=10
+            )
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Bulk auto-execute check failed: {e}")
+            raise
+    
+    def get_execution_matrix(self) -> Dict[str, Any]:
+        """Get the full auto-execute matrix (task type x risk level)"""
+        try:
+            response = self.session.get(
+                f"{self.base_url}/autonomy/matrix",
+                timeout=10
+            )
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to get execution matrix: {e}")
+            raise
+    
     def get_memory_insights(self, decision_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Get memory insights
@@ -0,0 +1,135 @@
+"""
+Fake Stripe
+Generates signed Stripe-style webhook events for tests and load runs
+"""
+
+import hashlib
+import hmac
+import json
+import random
+import time
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+
+
+class FakeStripe:
+    """
+    Source of Stripe webhook deliveries without a Stripe account
+    
+    Events have the shape Stripe sends (``id``, ``type``, ``created``,
+    ``data.object``) and each subscription's events come in lifecycle
+    order, interleaved with other subscriptions'. Like Stripe, some
+    events are delivered more than once. ``sign`` produces the
+    ``Stripe-Signature`` header for a payload (``t=<ts>,v1=<hmac>``).
+    """
+    
+    def __init__(self, secret: str = "whsec_fake", seed: int = 0):
+        self.secret = secret
+        self.rng = random.Random(seed)
+        self._counter = 0
+    
+    def _id(self, prefix: str) -> str:
+        self._counter += 1
+        return f"{prefix}_{self._counter:08d}{self.rng.getrandbits(32):08x}"
+    
+    def event(self, event_type: str, obj: Dict[str, Any], created: Optional[int] = None) -> Dict[str, Any]:
+        return {
+            "id": self._id("evt"),
+            "object": "event",
+            "type": event_type,
+            "created": created or int(time.time()),
+            "livemode": False,
+            "data": {"object": obj}
+        }
+    
+    def subscription_events(self, subscription_id: str, updates: int = 3, cancel: bool = False) -> List[Dict[str, Any]]:
+        """One subscription's lifecycle: checkout, status updates, maybe a cancellation"""
+        customer = self._id("cus")
+        created = int(time.time())
+        events = [self.event("checkout.session.completed", {
+            "id": self._id("cs"), "object": "checkout.session",
+            "subscription": subscription_id, "customer": customer
+        }, created)]
+        for n in range(updates):
+            status = self.rng.choice(["active", "past_due", "active", "trialing"])
+            events.append(self.event("customer.subscription.updated", {
+                "id": subscription_id, "object": "subscription", "customer": customer, "status": status
+            }, created + n + 1))
+        if cancel:
+            events.append(self.event("customer.subscription.deleted", {
+                "id": subscription_id, "object": "subscription", "customer": customer, "status": "canceled"
+            }, created + updates + 1))
+        return events
+    
+    def stream(self, subscriptions: List[str], updates: int = 3, cancel_rate: float = 0.2,
+               duplicate_rate: float = 0.1) -> List[Dict[str, Any]]:
+        """Events for many subscriptions, interleaved, with some delivered twice"""
+        pending = [self.subscription_events(s, updates, self.rng.random() < cancel_rate) for s in subscriptions]
+        stream = []
+        while pending:
+            events = self.rng.choice(pending)
+            stream.append(events.pop(0))
+            if not events:
+                pending.remove(events)
+        for event in list(stream):
+            if self.rng.random() < duplicate_rate:
+                stream.insert(self.rng.randint(stream.index(event) + 1, len(stream)), event)
+        return stream
+    
+    def sign(self, payload: bytes, timestamp: Optional[int] = None) -> str:
+        """Stripe-Signature header value for a payload"""
+        timestamp = timestamp or int(time.time())
+        signed = f"{timestamp}.".encode() + payload
+        return f"t={timestamp},v1={hmac.new(self.secret.encode(), signed, hashlib.sha256).hexdigest()}"
+    
+    def deliveries(self, events: List[Dict[str, Any]]) -> Iterator[Tuple[bytes, str]]:
+        """(payload, signature header) per event, as Stripe would POST them"""
+        for event in events:
+            payload = json.dumps(event).encode()
+            yield payload, self.sign(payload)
+
+
+if __name__ == "__main__":
+    # Load run: acknowledge time through the inbox vs handling inline
+    import os
+    import statistics
+    import sys
+    import tempfile
+    
+    os.chdir(tempfile.mkdtemp(prefix="fake_stripe_"))
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from api.api_key_manager import api_key_manager
+    from api.stripe_inbox import StripeEventInbox, apply_stripe_event
+    from api.stripe_service import stripe_service
+    
+    fake = FakeStripe()
+    subscriptions = [f"sub_{n:05d}" for n in range(200)]
+    for subscription_id in subscriptions:
+        api_key = api_key_manager.generate_api_key(tier="pro", prefix="pro_sub")
+        stripe_service.link_subscription_to_api_key(api_key, subscription_id, "load@example.com", "pro")
+    events = fake.stream(subscriptions)
+    print(f"{len(events)} deliveries for {len(subscriptions)} subscriptions")
+    
+    inline = []
+    for event in events[:300]:
+        start = time.perf_counter()
+        apply_stripe_event(event)
+        inline.append(time.perf_counter() - start)
+    
+    inbox = StripeEventInbox(apply_stripe_event, path="stripe_inbox.db")
+    acks = []
+    started = time.perf_counter()
+    inbox.start()
+    for payload, _ in fake.deliveries(events):
+        start = time.perf_counter()
+        inbox.enqueue(json.loads(payload))
+        acks.append(time.perf_counter() - start)
+    inbox.join()
+    drained = time.perf_counter() - started
+    inbox.close()
+    
+    def ms(values, q):
+        return statistics.quantiles(values, n=100)[q - 1] * 1000
+    
+    print(f"inline handling: p50 {ms(inline, 50):.2f} ms, p99 {ms(inline, 99):.2f} ms")
+    print(f"inbox acknowledge: p50 {ms(acks, 50):.3f} ms, p99 {ms(acks, 99):.3f} ms")
+    print(f"drained in {drained:.2f}s: {inbox.get_stats()}")
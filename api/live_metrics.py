@@ -0,0 +1,266 @@
+"""
+Live Metrics Feed
+One in-process aggregator fanning out per-second deltas and running totals to SSE subscribers
+"""
+
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable, AsyncIterator, Iterable
+
+logger = logging.getLogger(__name__)
+
+TICK_SECONDS = 1.0
+SUBSCRIBER_QUEUE_SIZE = 30  # ~30s of deltas before a slow client starts losing the oldest
+HEARTBEAT_SECONDS = 15.0
+MAX_LATENCY_SAMPLES = 5000  # per tick; reservoir-sampled beyond this
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class LiveMetricsAggregator:
+    """
+    Collect request/decision counters and publish one delta per tick
+    
+    Counting goes on whether or not anyone is subscribed: ``totals`` are
+    absolute counts since the process started, and a delta covers
+    everything since the previous one (``interval_seconds`` is the time
+    it actually spans, which is longer than a tick for the first delta
+    after an idle spell). Clients should display totals as sent rather
+    than add deltas up.
+    
+    Request counts, errors and latency describe the whole server.
+    Decisions and the autonomy level can be scoped to a tenant: decisions
+    recorded with a ``tenant`` are also counted for it, and a subscriber
+    that passes one sees only that tenant's decisions and the autonomy
+    level from its own ``autonomy_source``.
+    """
+    
+    def __init__(self, tick_seconds: float = TICK_SECONDS, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.tick_seconds = tick_seconds
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers: Dict[asyncio.Queue, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._autonomy_source: Optional[Callable[[], float]] = None
+        self._totals = {"requests": 0, "errors": 0, "decisions": 0}
+        self._tenant_decisions: Dict[str, int] = {}
+        self._started = datetime.now().isoformat()
+        self._reset_window()
+    
+    def _reset_window(self):
+        self._window = {"requests": 0, "errors": 0, "decisions": 0, "by_risk": {}}
+        self._tenant_windows: Dict[str, Dict[str, Any]] = {}
+        self._window_start = time.monotonic()
+        self._latencies: List[float] = []
+        self._latency_seen = 0
+    
+    # ---- producers (cheap, called on the request path) ----
+    
+    def record_request(self, status_code: int, response_time_ms: Optional[float] = None):
+        """Count one API request"""
+        with self._lock:
+            self._window["requests"] += 1
+            self._totals["requests"] += 1
+            if status_code >= 400:
+                self._window["errors"] += 1
+                self._totals["errors"] += 1
+            if response_time_ms is not None:
+                self._latency_seen += 1
+                if len(self._latencies) < MAX_LATENCY_SAMPLES:
+                    self._latencies.append(response_time_ms)
+                else:
+                    slot = random.randrange(self._latency_seen)
+                    if slot < MAX_LATENCY_SAMPLES:
+                        self._latencies[slot] = response_time_ms
+    
+    def record_decision(self, risk_level: Optional[str] = None, tenant: Optional[str] = None):
+        """Count one evaluated decision (for the server, and for ``tenant`` if given)"""
+        with self._lock:
+            windows = [self._window]
+            self._totals["decisions"] += 1
+            if tenant is not None:
+                windows.append(self._tenant_windows.setdefault(tenant, {"decisions": 0, "by_risk": {}}))
+                self._tenant_decisions[tenant] = self._tenant_decisions.get(tenant, 0) + 1
+            for window in windows:
+                window["decisions"] += 1
+                if risk_level:
+                    window["by_risk"][risk_level] = window["by_risk"].get(risk_level, 0) + 1
+    
+    def set_autonomy_source(self, source: Callable[[], float]):
+        """Callable returning the current autonomy level, for subscribers without their own"""
+        self._autonomy_source = source
+    
+    def totals(self, tenant: Optional[str] = None) -> Dict[str, Any]:
+        """Absolute counts since the process started (decisions for ``tenant`` only, if given)"""
+        with self._lock:
+            totals = dict(self._totals, since=self._started)
+            if tenant is not None:
+                totals["decisions"] = self._tenant_decisions.get(tenant, 0)
+            return totals
+    
+    # ---- aggregation ----
+    
+    def _collect(self, tenants: Iterable[Optional[str]] = (None,)) -> Dict[Optional[str], Dict[str, Any]]:
+        """Swap out the current window and turn it into a delta per tenant (None: the whole server)"""
+        with self._lock:
+            window, latencies, tenant_windows = self._window, self._latencies, self._tenant_windows
+            elapsed = time.monotonic() - self._window_start
+            totals = dict(self._totals, since=self._started)
+            tenant_totals = {tenant: self._tenant_decisions.get(tenant, 0) for tenant in tenants if tenant is not None}
+            self._reset_window()
+        
+        latencies.sort()
+        delta = {
+            "timestamp": datetime.now().isoformat(),
+            "interval_seconds": round(elapsed, 3),
+            "requests": window["requests"],
+            "errors": window["errors"],
+            "error_rate": round(window["errors"] / window["requests"] * 100, 2) if window["requests"] else 0.0,
+            "latency_ms": {
+                "p50": round(_percentile(latencies, 50), 2),
+                "p95": round(_percentile(latencies, 95), 2),
+                "p99": round(_percentile(latencies, 99), 2)
+            },
+            "decisions": window["decisions"],
+            "decisions_by_risk": window["by_risk"],
+            "totals": totals
+        }
+        
+        deltas = {}
+        for tenant in tenants:
+            if tenant is None:
+                deltas[None] = delta
+                continue
+            scoped = tenant_windows.get(tenant, {"decisions": 0, "by_risk": {}})
+            deltas[tenant] = dict(delta, decisions=scoped["decisions"], decisions_by_risk=scoped["by_risk"],
+                                  totals=dict(totals, decisions=tenant_totals[tenant]))
+        return deltas
+    
+    def _sample_autonomy(self, source: Optional[Callable[[], float]], previous: Optional[float]) -> Optional[float]:
+        """Current autonomy level from a source (the previous value if it fails)"""
+        if source is None:
+            return previous
+        try:
+            return source()
+        except Exception as e:
+            logger.error(f"Error sampling autonomy level: {e}")
+            return previous
+    
+    def _publish(self, queue: asyncio.Queue, event: str, data: Dict[str, Any]):
+        """Hand an event to a subscriber, dropping its oldest if it is behind"""
+        stats = self._subscribers.get(queue)
+        if stats is None:
+            return
+        if queue.full():
+            try:
+                queue.get_nowait()
+                stats["dropped"] += 1
+            except asyncio.QueueEmpty:
+                pass
+        queue.put_nowait((event, data))
+    
+    async def _run(self):
+        """Tick loop; exits when the last subscriber leaves"""
+        while self._subscribers:
+            await asyncio.sleep(self.tick_seconds)
+            subscribers = list(self._subscribers.items())
+            deltas = self._collect({stats["tenant"] for _, stats in subscribers})
+            
+            # One reading per source per tick, off the event loop (a tenant source may load state)
+            sources = {stats["autonomy_source"] or self._autonomy_source for _, stats in subscribers}
+            levels = {}
+            for source in sources - {None}:
+                levels[source] = await asyncio.to_thread(self._sample_autonomy, source, None)
+            
+            for queue, stats in subscribers:
+                delta = deltas[stats["tenant"]]
+                source = stats["autonomy_source"] or self._autonomy_source
+                autonomy = levels.get(source)
+                if autonomy is None:
+                    autonomy = stats["autonomy"]
+                if autonomy != stats["autonomy"]:
+                    change = {"previous": stats["autonomy"], "current": autonomy}
+                    stats["autonomy"] = autonomy
+                    self._publish(queue, "metrics", dict(delta, autonomy=change))
+                    self._publish(queue, "autonomy", change)
+                else:
+                    self._publish(queue, "metrics", delta)
+        self._task = None
+    
+    # ---- subscribers ----
+    
+    def subscribe(self, tenant: Optional[str] = None,
+                  autonomy_source: Optional[Callable[[], float]] = None) -> asyncio.Queue:
+        """Register a subscriber queue and make sure the ticker is running"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[queue] = {
+            "dropped": 0,
+            "tenant": tenant,
+            "autonomy_source": autonomy_source,
+            "autonomy": self._sample_autonomy(autonomy_source or self._autonomy_source, None)
+        }
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue):
+        """Remove a subscriber"""
+        self._subscribers.pop(queue, None)
+    
+    def subscriber_count(self) -> int:
+        """Number of connected clients"""
+        return len(self._subscribers)
+    
+    async def stream(self, is_disconnected: Callable[[], Any], tenant: Optional[str] = None,
+                     autonomy_source: Optional[Callable[[], float]] = None) -> AsyncIterator[str]:
+        """
+        Server-Sent Events body for one client
+        
+        Args:
+            is_disconnected: Awaitable callable (``request.is_disconnected``)
+            tenant: Only count this tenant's decisions
+            autonomy_source: The client's autonomy level (default: ``set_autonomy_source``)
+        """
+        queue = self.subscribe(tenant, autonomy_source)
+        try:
+            snapshot = {
+                "timestamp": datetime.now().isoformat(),
+                "totals": self.totals(tenant),
+                "autonomy": self._subscribers[queue]["autonomy"],
+                "subscribers": self.subscriber_count()
+            }
+            yield f"event: snapshot\ndata: {json.dumps(snapshot)}\n\n"
+            
+            last_sent = time.monotonic()
+            while not await is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=self.tick_seconds * 2)
+                except asyncio.TimeoutError:
+                    if time.monotonic() - last_sent >= HEARTBEAT_SECONDS:
+                        last_sent = time.monotonic()
+                        yield ": keep-alive\n\n"
+                    continue
+                
+                dropped = self._subscribers.get(queue, {}).get("dropped", 0)
+                if dropped:
+                    data = dict(data, dropped_events=dropped)
+                    self._subscribers[queue]["dropped"] = 0
+                last_sent = time.monotonic()
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            self.unsubscribe(queue)
+
+
+# Global instance
+live_metrics = LiveMetricsAggregator()
@@ -3,16 +3,19 @@ AI Decision Engine API - FastAPI Implementation
 Main API server with enhanced error handling and validation
 """
 
-from fastapi import FastAPI, Header, HTTPException, Depends, Request, status
+from fastapi import FastAPI, Header, HTTPException, Depends, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, HTMLResponse
 from fastapi.exceptions import RequestValidationError
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field, validator
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Iterator
 from datetime import datetime
 import os
+import json
 import logging
 import traceback
+import weakref
 
 # Set up logging
 logging.basicConfig(
@@ -59,8 +62,19 @@ except Exception as e:
 # Import API key manager and analytics
 from api.api_key_manager import api_key_manager
 from api.analytics import api_analytics
+from api.live_metrics import live_metrics
+from api.tenant_registry import tenant_registry, tenant_id_for, TENANT_ISOLATION
+from api.stripe_inbox import get_stripe_inbox, close_stripe_inbox, STRIPE_INBOX_FILE
 import time
 
+# Live metrics subscribers without a tenant (TENANT_ISOLATION=false) follow the shared engine
+live_metrics.set_autonomy_source(decision_engine.autonomy.get_autonomy_level)
+
+# Dashboard views, one per engine, kept current by its memory/autonomy change notifications
+from analytics.dashboard_data import DashboardData
+from outcome_losses import OutcomeLosses
+_dashboards: "weakref.WeakKeyDictionary[AIDecisionEngine, DashboardData]" = weakref.WeakKeyDictionary()
+
 # API Key authentication
 def verify_api_key(x_api_key: Optional[str] = Header(None, alias="X-API-Key")) -> Dict[str, Any]:
     """
@@ -98,10 +112,63 @@ def verify_api_key(x_api_key: Optional[str] = Header(None, alias="X-API-Key")) -
         "tier": key_info.get("tier", "free"),
         "requests_per_month": key_info.get("requests_per_month", 100),
         "api_key": x_api_key[:10] + "...",  # Partial key for logging
-        "_full_key": x_api_key  # Full key for internal use (not exposed in logs)
+        "_full_key": x_api_key,  # Full key for internal use (not exposed in logs)
+        "_tenant_id": tenant_id_for(x_api_key, key_info)
     }
 
 
+def get_tenant_engine(api_info: Dict[str, Any] = Depends(verify_api_key)) -> Iterator[AIDecisionEngine]:
+    """
+    Decision engine holding the caller's own state, held until the response is sent
+    
+    Without TENANT_ISOLATION every caller shares the global engine.
+    """
+    if not TENANT_ISOLATION:
+        yield decision_engine
+        return
+    tenant_id = api_info["_tenant_id"]
+    engine = tenant_registry.acquire(tenant_id)
+    try:
+        yield engine
+    finally:
+        tenant_registry.release(tenant_id)
+
+
+def get_tenant_dashboard(engine: AIDecisionEngine = Depends(get_tenant_engine)) -> DashboardData:
+    """Dashboard view over the caller's engine (built here, in the threadpool, on first use)"""
+    dashboard = _dashboards.get(engine)
+    if dashboard is None:
+        dashboard = _dashboards.setdefault(
+            engine, DashboardData(memory=engine.memory, tracker=engine.autonomy.tracker)
+        )
+    dashboard.build_view()
+    return dashboard
+
+
+def get_tenant_losses(engine: AIDecisionEngine = Depends(get_tenant_engine)) -> OutcomeLosses:
+    """Outcome loss distributions for the caller's engine (built here, in the threadpool, on first use)"""
+    return engine.memory.losses
+
+
+@app.on_event("shutdown")
+def flush_tenants():
+    """Persist in-memory tenant state"""
+    tenant_registry.flush_all()
+
+
+@app.on_event("startup")
+def start_stripe_inbox():
+    """Resume Stripe events queued before a restart (the inbox is otherwise created by the first event)"""
+    if os.path.exists(STRIPE_INBOX_FILE):
+        get_stripe_inbox().start()
+
+
+@app.on_event("shutdown")
+def stop_stripe_inbox():
+    """Let the Stripe event in progress finish; the rest stays queued"""
+    close_stripe_inbox()
+
+
 # Pydantic models for request validation
 class DecisionEvaluationRequest(BaseModel):
     category: str = Field(..., description="Decision category")
@@ -141,6 +208,10 @@ class AutoExecuteRequest(BaseModel):
         return v.upper()
 
 
+class AutoExecuteBulkRequest(BaseModel):
+    checks: List[AutoExecuteRequest] = Field(..., max_length=1000, description="Task and risk level pairs to check")
+
+
 class MemoryInsightsRequest(BaseModel):
     decision_data: Dict[str, Any] = Field(default_factory=dict, description="Decision data for insights")
 
@@ -332,6 +403,7 @@ async def root(request: Request):
             "redoc": "/redoc",
             "evaluate_decision": "/decisions/evaluate",
             "assess_risk": "/risk/assess",
+            "value_at_risk": "/risk/var",
             "autonomy_level": "/autonomy/level",
             "pricing": "/pricing"
         }
@@ -367,7 +439,9 @@ async def health_check():
 @app.post("/decisions/evaluate", response_model=Dict[str, Any])
 async def evaluate_decision(
     decision_request: DecisionEvaluationRequest,
-    api_info: Dict[str, Any] = Depends(verify_api_key)
+    http_response: Response,
+    api_info: Dict[str, Any] = Depends(verify_api_key),
+    engine: AIDecisionEngine = Depends(get_tenant_engine)
 ):
     """
     Evaluate a decision using AI decision-making framework
@@ -391,7 +465,10 @@ async def evaluate_decision(
         decision_data["category"] = DecisionCategory[category_str].value if category_str in DecisionCategory.__members__ else category_str
         
         # Evaluate decision
-        result = decision_engine.evaluate_decision(decision_data)
+        assessment = engine.assess_decision(decision_data)
+        _set_risk_cache_headers(http_response, engine, assessment)
+        result = engine.evaluate_decision(decision_data, assessment)
+        live_metrics.record_decision(result.get("risk_level"), tenant=engine.tenant_id)
         
         # Convert to JSON-serializable format
         response = {
@@ -428,7 +505,9 @@ async def evaluate_decision(
 @app.post("/risk/assess", response_model=Dict[str, Any])
 async def assess_risk(
     risk_request: RiskAssessmentRequest,
-    api_info: Dict[str, Any] = Depends(verify_api_key)
+    http_response: Response,
+    api_info: Dict[str, Any] = Depends(verify_api_key),
+    engine: AIDecisionEngine = Depends(get_tenant_engine)
 ):
     """
     Assess risk level for a decision or action
@@ -447,14 +526,14 @@ async def assess_risk(
             "description": risk_request.description
         }
         
-        # Get memory insights for context
-        memory_insights = decision_engine.memory.inform_decision(decision_data)
-        
-        # Assess risk
-        risk_level = decision_engine._assess_risk(decision_data, memory_insights)
+        # Assess risk with memory insights for context
+        assessment = engine.assess_decision(decision_data)
+        _set_risk_cache_headers(http_response, engine, assessment)
+        memory_insights = assessment["memory_insights"]
+        risk_level = assessment["risk_level"]
         
         # Get risk thresholds
-        thresholds = decision_engine.risk_thresholds.get(risk_level, {})
+        thresholds = engine.thresholds_for(risk_request.category).get(risk_level, {})
         
         response = {
             "risk_level": risk_level.value,
@@ -464,6 +543,7 @@ async def assess_risk(
                 "max_amount": thresholds.get("max_amount"),
                 "auto_execute": thresholds.get("auto_execute", False)
             },
+            "learned": memory_insights.get("learned", {}),
             "timestamp": datetime.now().isoformat()
         }
         
@@ -480,7 +560,8 @@ async def assess_risk(
 
 @app.get("/autonomy/level", response_model=Dict[str, Any])
 async def get_autonomy_level(
-    api_info: Dict[str, Any] = Depends(verify_api_key)
+    api_info: Dict[str, Any] = Depends(verify_api_key),
+    engine: AIDecisionEngine = Depends(get_tenant_engine)
 ):
     """
     Get current AI autonomy level and system status
@@ -493,7 +574,7 @@ async def get_autonomy_level(
     - proven_capabilities: List of proven AI capabilities
     """
     try:
-        autonomy_system = decision_engine.autonomy
+        autonomy_system = engine.autonomy
         tracker = autonomy_system.tracker
         
         status_data = tracker.get_autonomy_status()
@@ -520,7 +601,8 @@ async def get_autonomy_level(
 @app.post("/autonomy/should-execute", response_model=Dict[str, Any])
 async def should_auto_execute(
     execute_request: AutoExecuteRequest,
-    api_info: Dict[str, Any] = Depends(verify_api_key)
+    api_info: Dict[str, Any] = Depends(verify_api_key),
+    engine: AIDecisionEngine = Depends(get_tenant_engine)
 ):
     """
     Determine if AI should autonomously execute a task
@@ -531,7 +613,7 @@ async def should_auto_execute(
     try:
         logger.info(f"Checking auto-execute: {execute_request.task_type} - {execute_request.risk_level}")
         
-        should_execute = decision_engine.autonomy.should_auto_execute(
+        should_execute = engine.autonomy.should_auto_execute(
             execute_request.task_type, 
             execute_request.risk_level
         )
@@ -554,10 +636,114 @@ async def should_auto_execute(
         )
 
 
+@app.post("/autonomy/should-execute/bulk", response_model=Dict[str, Any])
+async def should_auto_execute_bulk(
+    bulk_request: AutoExecuteBulkRequest,
+    api_info: Dict[str, Any] = Depends(verify_api_key),
+    engine: AIDecisionEngine = Depends(get_tenant_engine)
+):
+    """
+    Answer many auto-execute checks in one call
+    
+    - **checks**: List of {task_type, risk_level} pairs (up to 1000)
+    
+    All answers come from the same version of the execution matrix.
+    """
+    try:
+        autonomy_system = engine.autonomy
+        version = autonomy_system.matrix_version
+        answers = autonomy_system.should_auto_execute_many(
+            (check.task_type, check.risk_level) for check in bulk_request.checks
+        )
+        
+        return {
+            "results": [
+                {"task_type": check.task_type, "risk_level": check.risk_level, "should_execute": answer}
+                for check, answer in zip(bulk_request.checks, answers)
+            ],
+            "matrix_version": version,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error checking bulk execution: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error checking bulk execution: {str(e)}"
+        )
+
+
+@app.get("/autonomy/matrix", response_model=Dict[str, Any])
+async def get_execution_matrix(
+    api_info: Dict[str, Any] = Depends(verify_api_key),
+    engine: AIDecisionEngine = Depends(get_tenant_engine)
+):
+    """
+    Get the full auto-execute matrix (task type x risk level)
+    
+    Clients can cache it and re-fetch when `version` changes.
+    """
+    try:
+        return dict(engine.autonomy.get_execution_matrix(), timestamp=datetime.now().isoformat())
+        
+    except Exception as e:
+        logger.error(f"Error getting execution matrix: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error getting execution matrix: {str(e)}"
+        )
+
+
+@app.get("/autonomy/history", response_model=Dict[str, Any])
+async def get_autonomy_history(
+    as_of: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    event_type: Optional[str] = None,
+    after_seq: int = 0,
+    limit: int = 100,
+    api_info: Dict[str, Any] = Depends(verify_api_key),
+    engine: AIDecisionEngine = Depends(get_tenant_engine)
+):
+    """
+    Autonomy change log, and the autonomy state at a point in time
+    
+    - **as_of**: ISO timestamp; include the autonomy status as it was then
+    - **since** / **until**: ISO time range of events (since inclusive, until exclusive)
+    - **event_type**: handoff, capability, milestone or state
+    - **after_seq**: ``next_after_seq`` from the previous page
+    - **limit**: Page size (1-1000, default: 100)
+    """
+    if not 1 <= limit <= 1000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 1000")
+    
+    tracker = engine.autonomy.tracker
+    try:
+        events = tracker.get_history(since=since, until=until, event_type=event_type,
+                                     after_seq=after_seq, limit=limit)
+        response = {
+            "events": events,
+            "count": len(events),
+            "next_after_seq": events[-1]["seq"] if len(events) == limit else None,
+            "timestamp": datetime.now().isoformat()
+        }
+        if as_of:
+            state = tracker.get_status_as_of(as_of)
+            if state is None:
+                raise HTTPException(status_code=404, detail=f"No autonomy history before {as_of}")
+            response["as_of"] = as_of
+            response["state"] = state
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return response
+
+
 @app.post("/memory/insights", response_model=Dict[str, Any])
 async def get_memory_insights(
     insights_request: MemoryInsightsRequest,
-    api_info: Dict[str, Any] = Depends(verify_api_key)
+    api_info: Dict[str, Any] = Depends(verify_api_key),
+    engine: AIDecisionEngine = Depends(get_tenant_engine)
 ):
     """
     Get insights from AI memory system
@@ -569,10 +755,11 @@ async def get_memory_insights(
         
         decision_data = insights_request.decision_data
         
-        insights = decision_engine.memory.inform_decision(decision_data)
+        insights = engine.memory.inform_decision(decision_data)
         
         response = {
-            "similar_decisions": len(insights.get("similar_decisions", [])) if isinstance(insights.get("similar_decisions"), list) else 0,
+            "similar_decisions": insights.get("similar_decisions", 0),
+            "similar": insights.get("similar", []),
             "success_patterns": insights.get("success_patterns", {}),
             "recommendations": insights.get("recommendations", []) if isinstance(insights.get("recommendations"), list) else [],
             "timestamp": datetime.now().isoformat()
@@ -588,7 +775,115 @@ async def get_memory_insights(
         )
 
 
+@app.get("/memory/activity", response_model=Dict[str, Any])
+async def get_memory_activity(
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    kind: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    include_archive: bool = False,
+    api_info: Dict[str, Any] = Depends(verify_api_key),
+    engine: AIDecisionEngine = Depends(get_tenant_engine)
+):
+    """
+    Page through memory records in time order
+    
+    - **since** / **until**: ISO time range (since inclusive, until exclusive)
+    - **kind**: Comma-separated subset of events, decisions, outcomes, learnings
+    - **cursor**: ``next_cursor`` from the previous page
+    - **limit**: Page size (1-1000, default: 100)
+    - **include_archive**: Also include records moved to the warm/cold archive
+    """
+    if not 1 <= limit <= 1000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 1000")
+    
+    try:
+        page = engine.memory.get_activity(
+            since=datetime.fromisoformat(since) if since else None,
+            until=datetime.fromisoformat(until) if until else None,
+            kinds=kind.split(",") if kind else None,
+            cursor=cursor,
+            limit=limit,
+            include_archive=include_archive
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "items": page["items"],
+        "count": len(page["items"]),
+        "next_cursor": page["next_cursor"],
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@app.get("/dashboard/data", response_model=Dict[str, Any])
+async def get_dashboard_data(
+    dashboard: DashboardData = Depends(get_tenant_dashboard)
+):
+    """
+    Dashboard snapshot (same shape as analytics/dashboard_data.json) for the caller's tenant
+    
+    Served from the in-memory dashboard view; no files are read per request.
+    """
+    try:
+        return dashboard.generate_dashboard_json()
+        
+    except Exception as e:
+        logger.error(f"Error building dashboard data: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error building dashboard data: {str(e)}"
+        )
+
+
+@app.get("/risk/var", response_model=Dict[str, Any])
+async def get_value_at_risk(
+    http_response: Response,
+    category: str = "FINANCIAL",
+    confidence: float = 0.95,
+    amount: Optional[float] = None,
+    api_info: Dict[str, Any] = Depends(verify_api_key),
+    losses: OutcomeLosses = Depends(get_tenant_losses)
+):
+    """
+    Value-at-Risk and expected shortfall from recorded decision outcomes
+    
+    Losses are read from outcome metrics (``loss``, else ``pnl``/``profit``
+    negated, else ``return``/``roi`` times the decision amount).
+    
+    - **category**: Decision category (default: FINANCIAL)
+    - **confidence**: VaR confidence level (0.5-0.999, default: 0.95)
+    - **amount**: Also report the share of outcomes that lost more than this
+    """
+    if not 0.5 <= confidence <= 0.999:
+        raise HTTPException(status_code=400, detail="confidence must be between 0.5 and 0.999")
+    category = category.upper()
+    if category not in DecisionCategory.__members__:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid category. Must be one of: {', '.join([cat.name for cat in DecisionCategory])}"
+        )
+    
+    # A miss merges newly recorded losses into the sorted array
+    summary = await run_in_threadpool(losses.value_at_risk, category, confidence, amount)
+    if summary is None:
+        raise HTTPException(status_code=404, detail=f"No outcome losses recorded for {category} decisions")
+    http_response.headers["X-VaR-Cache"] = summary["cache"]
+    summary["timestamp"] = datetime.now().isoformat()
+    return summary
+
+
 # Helper methods
+def _set_risk_cache_headers(response: Response, engine: AIDecisionEngine, assessment: Dict[str, Any]):
+    """Expose whether a risk assessment came from the cache"""
+    response.headers["X-Risk-Cache"] = assessment["cache"]
+    response.headers["X-Insights-Cache"] = assessment["insights_cache"]
+    response.headers["X-Model-Version"] = str(assessment["model_version"])
+    response.headers["X-Risk-Cache-Hit-Rate"] = str(engine.risk_cache.get_stats()["hit_rate"])
+
+
 def _calculate_risk_score(risk_level, amount):
     """Calculate risk score 0-100"""
     base_scores = {
@@ -991,11 +1286,11 @@ async def stripe_webhook(request: Request):
     """
     Handle Stripe webhook events
     
-    Processes subscription updates, cancellations, etc.
+    Verifies the signature and queues subscription updates, cancellations,
+    etc. for background processing (see api/stripe_inbox.py).
     """
     try:
         from api.stripe_service import stripe_service
-        from api.api_key_manager import api_key_manager
         
         payload = await request.body()
         signature = request.headers.get("stripe-signature")
@@ -1015,44 +1310,17 @@ async def stripe_webhook(request: Request):
                 detail="Invalid webhook signature"
             )
         
-        # Handle different event types
+        # Acknowledge once stored (a committed SQLite insert, off the event
+        # loop); the inbox applies it in the background and drops
+        # redeliveries of an event it has already seen
         event_type = event["type"]
-        event_data = event["data"]["object"]
+        stripe_inbox = get_stripe_inbox()
+        accepted = await run_in_threadpool(stripe_inbox.enqueue, event)
+        stripe_inbox.start()
         
-        if event_type == "checkout.session.completed":
-            # Subscription created
-            subscription_id = event_data.get("subscription")
-            if subscription_id:
-                subscription = stripe_service.get_subscription(subscription_id)
-                if subscription:
-                    tier = subscription.get("tier", "pro")
-                    # Update subscription status
-                    stripe_service.update_subscription_status(subscription_id, "active")
-                    logger.info(f"Subscription activated: {subscription_id}")
-        
-        elif event_type == "customer.subscription.updated":
-            # Subscription updated
-            subscription_id = event_data.get("id")
-            subscription_status = event_data.get("status")
-            stripe_service.update_subscription_status(subscription_id, subscription_status)
-            logger.info(f"Subscription updated: {subscription_id}, status: {subscription_status}")
-        
-        elif event_type == "customer.subscription.deleted":
-            # Subscription cancelled
-            subscription_id = event_data.get("id")
-            stripe_service.update_subscription_status(subscription_id, "cancelled")
-            
-            # Optionally downgrade API key to free tier
-            api_key = stripe_service.get_api_key_from_subscription(subscription_id)
-            if api_key:
-                keys = api_key_manager._load_keys()
-                if api_key in keys:
-                    keys[api_key]["tier"] = "free"
-                    keys[api_key]["requests_per_month"] = 100
-                    api_key_manager._save_keys(keys)
-                    logger.info(f"Downgraded API key {api_key[:10]}... to free tier")
-        
-        return {"status": "success", "event": event_type}
+        if not accepted:
+            return {"status": "duplicate", "event": event_type, "id": event["id"]}
+        return {"status": "queued", "event": event_type, "id": event["id"]}
     
     except HTTPException:
         raise
@@ -0,0 +1,325 @@
+"""
+Stripe Event Inbox
+Durable, deduplicated queue of Stripe webhook events
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable
+
+from api.webhook_outbox import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+STRIPE_INBOX_FILE = os.getenv("STRIPE_INBOX_FILE", "stripe_inbox.db")
+STRIPE_INBOX_FSYNC = os.getenv("STRIPE_INBOX_FSYNC", "true").lower() == "true"
+STRIPE_INBOX_WORKERS = int(os.getenv("STRIPE_INBOX_WORKERS", "1"))
+STRIPE_INBOX_MAX_ATTEMPTS = 5
+STRIPE_INBOX_RETENTION_DAYS = 30  # Stripe stops retrying an event after 3 days
+STRIPE_INBOX_LEASE_SECONDS = 300  # a claim older than this was left by a process that died
+
+POLL_SECONDS = 0.5    # idle workers look for events stored by other processes this often
+PRUNE_EVERY = 1000    # settled events between deletions of ones past retention
+
+# handler(event) applies one event; raising makes it retry
+EventHandler = Callable[[Dict[str, Any]], Any]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    subscription TEXT NOT NULL,
+    event TEXT,                               -- dropped once processed
+    status TEXT NOT NULL DEFAULT 'queued',    -- queued, processed or failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    received_at REAL NOT NULL,
+    settled_at REAL,
+    retry_at REAL NOT NULL DEFAULT 0,
+    claimed_until REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS events_queued ON events (subscription, seq) WHERE status = 'queued';
+"""
+
+# Oldest queued event of a subscription, if it is due and nobody holds it
+CLAIMABLE = """
+SELECT seq, event, attempts FROM events AS e
+WHERE status = 'queued' AND retry_at <= :now AND claimed_until <= :now
+  AND seq = (SELECT MIN(seq) FROM events WHERE status = 'queued' AND subscription = e.subscription)
+ORDER BY seq LIMIT 1
+"""
+
+
+def subscription_key(event: Dict[str, Any]) -> str:
+    """Events for the same subscription (else customer) are applied one at a time, in order"""
+    obj = (event.get("data") or {}).get("object") or {}
+    if event.get("type", "").startswith("customer.subscription."):
+        return obj.get("id") or ""
+    return obj.get("subscription") or obj.get("customer") or ""
+
+
+class StripeEventInbox:
+    """
+    Stripe events, acknowledged once stored and applied in the background
+    
+    ``enqueue`` inserts the event into a SQLite table keyed by its Stripe
+    ID and commits (fsynced by default), so the webhook can be
+    acknowledged straight away; an ID already in the table is a
+    redelivery and is dropped, whichever worker process stored it.
+    Worker threads claim the oldest queued event of a subscription that
+    nobody holds and hand it to the handler, so a subscription's events
+    are applied one at a time in the order received; a handler error
+    holds back that subscription's later events while the failed one is
+    retried with backoff, up to ``max_attempts``. A claim lapses after
+    ``lease_seconds``, so an event held by a process that died is picked
+    up by another, or after a restart.
+    
+    Settled event IDs are kept for ``retention_days``. The database is
+    created by the first ``enqueue`` or ``start``.
+    """
+    
+    def __init__(self, handler: EventHandler, path: str = STRIPE_INBOX_FILE,
+                 workers: int = STRIPE_INBOX_WORKERS, max_attempts: int = STRIPE_INBOX_MAX_ATTEMPTS,
+                 fsync: bool = STRIPE_INBOX_FSYNC, retention_days: int = STRIPE_INBOX_RETENTION_DAYS,
+                 backoff_base: float = 1.0, lease_seconds: float = STRIPE_INBOX_LEASE_SECONDS):
+        self.handler = handler
+        self.path = path
+        self.workers = max(1, workers)
+        self.max_attempts = max_attempts
+        self.fsync = fsync
+        self.retention_days = retention_days
+        self.backoff_base = backoff_base
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()          # guards the connection
+        self._changed = threading.Condition()  # wakes idle workers and join()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._settled_since_prune = 0
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+        self._stats = {"received": 0, "duplicates": 0, "processed": 0, "failed": 0, "retried": 0}
+    
+    # Storage
+    
+    def _db(self) -> sqlite3.Connection:
+        """Open connection, creating the database on first use (caller holds ``_lock``)"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={'FULL' if self.fsync else 'NORMAL'}")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+    
+    def _query(self, sql: str, params=()) -> List[tuple]:
+        with self._lock:
+            return self._db().execute(sql, params).fetchall()
+    
+    # Producer side
+    
+    def enqueue(self, event: Dict[str, Any]) -> bool:
+        """Store an event for processing; False if its ID was seen before, by any process"""
+        with self._lock:
+            cursor = self._db().execute(
+                "INSERT OR IGNORE INTO events (id, subscription, event, received_at) VALUES (?, ?, ?, ?)",
+                (event["id"], subscription_key(event), json.dumps(event, separators=(",", ":")), time.time())
+            )
+            accepted = cursor.rowcount == 1
+            self._stats["received" if accepted else "duplicates"] += 1
+        if accepted:
+            with self._changed:
+                self._changed.notify()
+        return accepted
+    
+    def status(self, event_id: str) -> Optional[str]:
+        """Event status: queued, processed or failed (None if the ID is unknown)"""
+        rows = self._query("SELECT status FROM events WHERE id = ?", (event_id,))
+        return rows[0][0] if rows else None
+    
+    def failed(self) -> List[Dict[str, Any]]:
+        """IDs and errors of events that used up their attempts"""
+        rows = self._query("SELECT id, settled_at, error FROM events WHERE status = 'failed' ORDER BY seq")
+        return [{"id": event_id, "status": "failed", "at": datetime.fromtimestamp(settled_at).isoformat(), "error": error}
+                for event_id, settled_at, error in rows]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        queued, subscriptions, known = self._query(
+            "SELECT SUM(status = 'queued'), COUNT(DISTINCT CASE WHEN status = 'queued' THEN subscription END), "
+            "COUNT(*) FROM events"
+        )[0]
+        with self._lock:
+            return dict(self._stats, queued=queued or 0, subscriptions=subscriptions, known_ids=known)
+    
+    # Processing
+    
+    def start(self):
+        """Start the worker threads (idempotent)"""
+        with self._changed:
+            if self._threads or self._closed:
+                return
+            for n in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"stripe-inbox-{n}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+    
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait until no event is queued; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._query("SELECT 1 FROM events WHERE status = 'queued' LIMIT 1"):
+            remaining = POLL_SECONDS if deadline is None else min(POLL_SECONDS, deadline - time.monotonic())
+            if remaining <= 0:
+                return False
+            with self._changed:
+                self._changed.wait(remaining)
+        return True
+    
+    def close(self, timeout: float = 5.0):
+        """Stop the workers after their current event; the rest stays queued"""
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        with self._lock:
+            self._threads = []
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
+    def _claim(self) -> Optional[tuple]:
+        """Take the next due event no one holds: (seq, event, attempts so far), or None"""
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")  # no other process claims between the read and the update
+            with db:
+                row = db.execute(CLAIMABLE, {"now": now}).fetchone()
+                if row is not None:
+                    db.execute("UPDATE events SET claimed_until = ? WHERE seq = ?", (now + self.lease_seconds, row[0]))
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), row[2]
+    
+    def _idle_wait(self) -> float:
+        """Seconds until the next retry is due, at most ``POLL_SECONDS``"""
+        rows = self._query("SELECT MIN(retry_at) FROM events WHERE status = 'queued' AND retry_at > ?", (time.time(),))
+        if rows[0][0] is None:
+            return POLL_SECONDS
+        return max(0.0, min(POLL_SECONDS, rows[0][0] - time.time()))
+    
+    def _work(self):
+        while not self._closed:
+            claimed = self._claim()
+            if claimed is None:
+                wait = self._idle_wait()
+                with self._changed:
+                    if not self._closed:
+                        self._changed.wait(wait)
+                continue
+            
+            seq, event, attempts = claimed
+            try:
+                self.handler(event)
+                error = None
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            self._settle(seq, event, attempts + 1, error)
+            with self._changed:
+                self._changed.notify_all()
+    
+    def _settle(self, seq: int, event: Dict[str, Any], attempts: int, error: Optional[str]):
+        """Record an attempt: processed, retried later, or failed for good"""
+        now = time.time()
+        if error is None:
+            sql = ("UPDATE events SET status = 'processed', event = NULL, attempts = ?, error = NULL, "
+                   "settled_at = ?, claimed_until = 0 WHERE seq = ?")
+            params = (attempts, now, seq)
+            outcome = "processed"
+        elif attempts < self.max_attempts:
+            logger.warning(f"Stripe event {event['id']} failed (attempt {attempts}): {error}")
+            sql = "UPDATE events SET attempts = ?, error = ?, retry_at = ?, claimed_until = 0 WHERE seq = ?"
+            params = (attempts, error, now + backoff_delay(attempts, self.backoff_base), seq)
+            outcome = "retried"
+        else:
+            logger.error(f"Stripe event {event['id']} ({event.get('type')}) failed for good: {error}")
+            sql = ("UPDATE events SET status = 'failed', attempts = ?, error = ?, settled_at = ?, "
+                   "claimed_until = 0 WHERE seq = ?")
+            params = (attempts, error, now, seq)
+            outcome = "failed"
+        
+        with self._lock:
+            db = self._db()
+            db.execute(sql, params)
+            self._stats[outcome] += 1
+            if outcome == "retried":
+                return
+            self._settled_since_prune += 1
+            if self._settled_since_prune >= PRUNE_EVERY:
+                self._settled_since_prune = 0
+                cutoff = now - self.retention_days * 86400
+                db.execute("DELETE FROM events WHERE status != 'queued' AND settled_at < ?", (cutoff,))
+
+
+def apply_stripe_event(event: Dict[str, Any]):
+    """Apply one verified Stripe event to subscriptions and API keys"""
+    from api.stripe_service import stripe_service
+    from api.api_key_manager import api_key_manager
+    
+    event_type = event["type"]
+    event_data = event["data"]["object"]
+    
+    if event_type == "checkout.session.completed":
+        # Subscription created
+        subscription_id = event_data.get("subscription")
+        if subscription_id:
+            subscription = stripe_service.get_subscription(subscription_id)
+            if subscription:
+                # Update subscription status
+                stripe_service.update_subscription_status(subscription_id, "active")
+                logger.info(f"Subscription activated: {subscription_id}")
+    
+    elif event_type == "customer.subscription.updated":
+        # Subscription updated
+        subscription_id = event_data.get("id")
+        subscription_status = event_data.get("status")
+        stripe_service.update_subscription_status(subscription_id, subscription_status)
+        logger.info(f"Subscription updated: {subscription_id}, status: {subscription_status}")
+    
+    elif event_type == "customer.subscription.deleted":
+        # Subscription cancelled
+        subscription_id = event_data.get("id")
+        stripe_service.update_subscription_status(subscription_id, "cancelled")
+        
+        # Downgrade API key to free tier
+        api_key = stripe_service.get_api_key_from_subscription(subscription_id)
+        if api_key:
+            keys = api_key_manager._load_keys()
+            if api_key in keys:
+                keys[api_key]["tier"] = "free"
+                keys[api_key]["requests_per_month"] = 100
+                api_key_manager._save_keys(keys)
+                logger.info(f"Downgraded API key {api_key[:10]}... to free tier")
+
+
+_stripe_inbox: Optional[StripeEventInbox] = None
+_stripe_inbox_lock = threading.Lock()
+
+
+def get_stripe_inbox() -> StripeEventInbox:
+    """Inbox for /webhooks/stripe, created on first use"""
+    global _stripe_inbox
+    with _stripe_inbox_lock:
+        if _stripe_inbox is None:
+            _stripe_inbox = StripeEventInbox(apply_stripe_event)
+        return _stripe_inbox
+
+
+def close_stripe_inbox():
+    """Stop the /webhooks/stripe inbox, if it was ever created"""
+    with _stripe_inbox_lock:
+        if _stripe_inbox is not None:
+            _stripe_inbox.close()
@@ -286,8 +286,10 @@ class StripeService:
             return None
         
         try:
-            event = stripe.Webhook.construct_event(
-                payload, signature, STRIPE_WEBHOOK_SECRET
+            # What construct_event checks, returning the payload as a plain dict
+            event = json.loads(payload)
+            stripe.WebhookSignature.verify_header(
+                payload.decode("utf-8"), signature, STRIPE_WEBHOOK_SECRET
             )
             return event
         except ValueError as e:
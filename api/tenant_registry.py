@@ -0,0 +1,251 @@
+"""
+Tenant Registry
+Per-tenant decision engines with their own memory, autonomy and decision log
+"""
+
+import hashlib
+import logging
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_decision_engine import AIDecisionEngine
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: each API key (or account) gets its own memory, autonomy and decision
+# log, starting empty; by default every caller shares the global engine and
+# the existing ai_memory.json / autonomy_tracker.json
+TENANT_ISOLATION = os.getenv("TENANT_ISOLATION", "false").lower() == "true"
+
+TENANTS_DIR = os.getenv("TENANTS_DIR", "tenants")
+MAX_HOT_TENANTS = int(os.getenv("MAX_HOT_TENANTS", "128"))
+
+# Optional sharding: with TENANT_SHARDS=N each worker sets TENANT_SHARD to its
+# index and the load balancer routes by shard_for(tenant_id, N), e.g. by
+# hashing the X-API-Key header. A tenant is then only ever hot in one worker.
+TENANT_SHARDS = int(os.getenv("TENANT_SHARDS", "1"))
+TENANT_SHARD = int(os.getenv("TENANT_SHARD", "0"))
+
+
+def tenant_id_for(api_key: str, key_info: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Stable tenant id for an API key
+    
+    Keys that belong to an account (``account_id`` in the key record) share
+    that account's tenant; otherwise each key is its own tenant. The id is a
+    hash, so raw keys never appear in paths.
+    """
+    owner = (key_info or {}).get("account_id") or api_key
+    return hashlib.sha256(owner.encode("utf-8")).hexdigest()[:16]
+
+
+def shard_for(tenant_id: str, shards: int = TENANT_SHARDS) -> int:
+    """Worker shard that owns a tenant"""
+    return int(tenant_id[:8], 16) % max(shards, 1)
+
+
+class TenantRegistry:
+    """
+    LRU of hot tenant engines; idle tenants live only on disk
+    
+    ``_lock`` only guards the LRU itself. Loading and evicting a tenant
+    happen under that tenant's own lock, so a slow load never holds up
+    other tenants, concurrent requests for one cold tenant load it once,
+    and a tenant being flushed on eviction is not reloaded until the
+    flush is done.
+    
+    Requests hold their engine with ``acquire``/``release``. An engine
+    evicted while in use is set aside rather than closed: a request for
+    its tenant gets it back, and it is flushed and closed when its last
+    user releases it. A tenant's files therefore only ever have one
+    engine writing them.
+    """
+    
+    def __init__(self, directory: str = TENANTS_DIR, capacity: int = MAX_HOT_TENANTS):
+        self.directory = directory
+        self.capacity = capacity
+        self._engines: "OrderedDict[str, AIDecisionEngine]" = OrderedDict()
+        self._retiring: Dict[str, AIDecisionEngine] = {}  # evicted, still in use
+        self._users: Dict[str, int] = {}                  # tenant id -> requests holding its engine
+        self._lock = threading.Lock()
+        self._tenant_locks: Dict[str, list] = {}  # tenant id -> [lock, users]; only while in use
+        self.stats = {"loads": 0, "evictions": 0, "hits": 0, "foreign_shard": 0}
+    
+    def tenant_dir(self, tenant_id: str) -> str:
+        """Directory holding one tenant's state files"""
+        return os.path.join(self.directory, tenant_id)
+    
+    def _load(self, tenant_id: str) -> AIDecisionEngine:
+        path = self.tenant_dir(tenant_id)
+        os.makedirs(path, exist_ok=True)
+        if TENANT_SHARDS > 1 and shard_for(tenant_id) != TENANT_SHARD:
+            self.stats["foreign_shard"] += 1
+            logger.warning(f"Tenant {tenant_id} belongs to shard {shard_for(tenant_id)}, served by {TENANT_SHARD}")
+        return AIDecisionEngine(
+            memory_file=os.path.join(path, "ai_memory.json"),
+            autonomy_file=os.path.join(path, "autonomy_tracker.json"),
+            decision_log_file=os.path.join(path, "decision_log.json"),
+            tenant_id=tenant_id
+        )
+    
+    def _flush(self, tenant_id: str, engine: AIDecisionEngine):
+        """Persist what is only held in memory (memory and autonomy save on every write)"""
+        try:
+            engine.export_log()
+        except Exception as e:
+            logger.error(f"Error saving decision log for tenant {tenant_id}: {e}")
+    
+    def _claim(self, tenant_id: str) -> threading.Lock:
+        """A tenant's load lock, kept until every claim is released (caller holds ``_lock``)"""
+        entry = self._tenant_locks.get(tenant_id)
+        if entry is None:
+            entry = self._tenant_locks[tenant_id] = [threading.Lock(), 0]
+        entry[1] += 1
+        return entry[0]
+    
+    def _release(self, tenant_id: str):
+        """Drop a claim taken with ``_claim`` (caller holds ``_lock``)"""
+        entry = self._tenant_locks[tenant_id]
+        entry[1] -= 1
+        if not entry[1]:
+            del self._tenant_locks[tenant_id]
+    
+    def _hot(self, tenant_id: str) -> Optional[AIDecisionEngine]:
+        """Hot engine for a tenant, marked most recently used (caller holds ``_lock``)"""
+        engine = self._engines.get(tenant_id)
+        if engine is None:
+            engine = self._retiring.pop(tenant_id, None)
+            if engine is None:
+                return None
+            self._engines[tenant_id] = engine  # evicted but never closed: take it back
+        self._engines.move_to_end(tenant_id)
+        self.stats["hits"] += 1
+        return engine
+    
+    def _lock_for_close(self, tenant_id: str, engine: AIDecisionEngine) -> Optional[tuple]:
+        """
+        Claim and take an unused engine's load lock so it can be flushed
+        and closed before the tenant is reloaded (caller holds ``_lock``);
+        None if the lock is busy
+        """
+        lock = self._claim(tenant_id)
+        if not lock.acquire(blocking=False):
+            self._release(tenant_id)
+            return None
+        return tenant_id, engine, lock
+    
+    def _take_coldest(self, keep: str) -> List[Tuple[str, AIDecisionEngine, threading.Lock]]:
+        """
+        Remove tenants beyond capacity, coldest first (caller holds ``_lock``)
+        
+        Unused ones come back with their load lock held, so they cannot be
+        reloaded before they are flushed; ones in use are set aside until
+        released, and a tenant whose lock is busy is skipped.
+        """
+        evicted = []
+        for cold_id in list(self._engines):
+            if len(self._engines) <= self.capacity:
+                break
+            if cold_id == keep:
+                continue
+            if self._users.get(cold_id):
+                self._retiring[cold_id] = self._engines.pop(cold_id)
+                self.stats["evictions"] += 1
+                continue
+            closing = self._lock_for_close(cold_id, self._engines[cold_id])
+            if closing is not None:
+                del self._engines[cold_id]
+                evicted.append(closing)
+                self.stats["evictions"] += 1
+        return evicted
+    
+    def _close(self, evicted: List[Tuple[str, AIDecisionEngine, threading.Lock]]):
+        """Flush and close engines taken off the registry, then let their tenants load again"""
+        for evicted_id, evicted_engine, evicted_lock in evicted:
+            try:
+                self._flush(evicted_id, evicted_engine)
+                evicted_engine.close()
+            except Exception as e:
+                logger.error(f"Error closing tenant {evicted_id}: {e}")
+            finally:
+                with self._lock:
+                    evicted_lock.release()
+                    self._release(evicted_id)
+    
+    def get(self, tenant_id: str) -> AIDecisionEngine:
+        """Engine for a tenant without holding it (a quick look, or loading ahead of use)"""
+        engine = self.acquire(tenant_id)
+        self.release(tenant_id)
+        return engine
+    
+    def acquire(self, tenant_id: str) -> AIDecisionEngine:
+        """
+        Engine for a tenant, loading it from disk and evicting the coldest
+        if needed; it stays open until a matching ``release``
+        """
+        with self._lock:
+            engine = self._hot(tenant_id)
+            if engine is not None:
+                self._users[tenant_id] = self._users.get(tenant_id, 0) + 1
+                return engine
+            load_lock = self._claim(tenant_id)
+        
+        evicted = []
+        try:
+            with load_lock:
+                with self._lock:
+                    engine = self._hot(tenant_id)  # loaded while we waited
+                    if engine is not None:
+                        self._users[tenant_id] = self._users.get(tenant_id, 0) + 1
+                if engine is None:
+                    engine = self._load(tenant_id)
+                    with self._lock:
+                        self._engines[tenant_id] = engine
+                        self._users[tenant_id] = self._users.get(tenant_id, 0) + 1
+                        self.stats["loads"] += 1
+                        evicted = self._take_coldest(keep=tenant_id)
+        finally:
+            with self._lock:
+                self._release(tenant_id)
+        
+        self._close(evicted)
+        return engine
+    
+    def release(self, tenant_id: str):
+        """Done with an engine from ``acquire``; closes it if it was evicted meanwhile"""
+        with self._lock:
+            self._users[tenant_id] -= 1
+            if self._users[tenant_id]:
+                return
+            del self._users[tenant_id]
+            engine = self._retiring.pop(tenant_id, None)
+            if engine is None:
+                return
+            closing = self._lock_for_close(tenant_id, engine)
+            if closing is None:
+                # A request waiting to load the tenant takes this engine back instead
+                self._retiring[tenant_id] = engine
+                return
+        self._close([closing])
+    
+    def flush_all(self):
+        """Persist every open tenant (e.g. on shutdown)"""
+        with self._lock:
+            engines = list(self._engines.items()) + list(self._retiring.items())
+        for tenant_id, engine in engines:
+            self._flush(tenant_id, engine)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Registry counters"""
+        with self._lock:
+            return dict(self.stats, hot_tenants=len(self._engines), retiring=len(self._retiring),
+                        in_use=sum(self._users.values()), capacity=self.capacity,
+                        shard=TENANT_SHARD, shards=TENANT_SHARDS)
+
+
+# Global instance
+tenant_registry = TenantRegistry()
@@ -0,0 +1,176 @@
+"""
+Webhook Batcher
+Per-subscription buffering and coalescing of webhook events
+"""
+
+import atexit
+import logging
+import threading
+import time
+import weakref
+from typing import Dict, Any, List, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_MAX_ITEMS = 100
+DEFAULT_BATCH_MAX_WAIT_MS = 1000
+
+# State events a newer one of supersedes, with the data fields that tell
+# apart independent states (autonomy changes per decision category)
+COALESCING_EVENTS = {
+    "autonomy.changed": ("category",),
+}
+
+# send(subscription, payloads) delivers one batch
+SendBatch = Callable[[Dict[str, Any], List[Dict[str, Any]]], Any]
+
+_open_batchers: "weakref.WeakSet[WebhookBatcher]" = weakref.WeakSet()
+
+
+def batch_settings(batch: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Validated batching options for a subscription, or None when it is not batched"""
+    if not batch:
+        return None
+    settings = {
+        "max_items": int(batch.get("max_items", DEFAULT_BATCH_MAX_ITEMS)),
+        "max_wait_ms": int(batch.get("max_wait_ms", DEFAULT_BATCH_MAX_WAIT_MS)),
+        "coalesce": bool(batch.get("coalesce", False))
+    }
+    if settings["max_items"] < 1 or settings["max_wait_ms"] < 0:
+        raise ValueError("batch max_items must be at least 1 and max_wait_ms not negative")
+    return settings
+
+
+class _Buffer:
+    """Events waiting for one subscription's next batch"""
+    
+    __slots__ = ("subscription", "items", "deadline", "sequence")
+    
+    def __init__(self, subscription: Dict[str, Any], deadline: float):
+        self.subscription = subscription
+        self.items: Dict[Any, Dict[str, Any]] = {}  # coalescing key (or sequence number) -> payload
+        self.deadline = deadline
+        self.sequence = 0
+
+
+class WebhookBatcher:
+    """
+    Buffers events per batched subscription and sends them as one array
+    
+    A subscription with ``batch`` settings gets its events collected until
+    ``max_items`` are waiting or ``max_wait_ms`` has passed since the
+    first, then handed to ``send`` in arrival order. With ``coalesce``, a
+    state event in COALESCING_EVENTS replaces a buffered one with the same
+    key fields, so the batch carries only the latest state (at the
+    position of the newest). Buffered events are held in memory only
+    until their batch goes to the outbox; ``flush()`` sends everything,
+    and so does interpreter exit.
+    """
+    
+    def __init__(self, send: SendBatch):
+        self.send = send
+        self._buffers: Dict[str, _Buffer] = {}
+        self._changed = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._stats = {"events": 0, "coalesced": 0, "batches": 0}
+        _open_batchers.add(self)
+    
+    def add(self, subscription: Dict[str, Any], event: str, payload: Dict[str, Any]) -> Any:
+        """Buffer one event; returns ``send``'s result if this filled the batch, else None"""
+        settings = subscription["batch"]
+        full = None
+        with self._changed:
+            buffer = self._buffers.get(subscription["id"])
+            if buffer is None:
+                buffer = _Buffer(subscription, time.monotonic() + settings["max_wait_ms"] / 1000)
+                self._buffers[subscription["id"]] = buffer
+                self._changed.notify()
+            key_fields = COALESCING_EVENTS.get(event) if settings["coalesce"] else None
+            if key_fields is not None:
+                data = payload.get("data") or {}
+                key = (event,) + tuple(str(data.get(field)) for field in key_fields)
+                if buffer.items.pop(key, None) is not None:
+                    self._stats["coalesced"] += 1
+            else:
+                key = buffer.sequence
+                buffer.sequence += 1
+            buffer.items[key] = payload
+            self._stats["events"] += 1
+            if len(buffer.items) >= settings["max_items"]:
+                full = self._buffers.pop(subscription["id"])
+        self._start()
+        if full is not None:
+            return self._send(full)
+        return None
+    
+    def flush(self, subscription_id: Optional[str] = None) -> int:
+        """Send buffered events now (for one subscription, or all); returns batches sent"""
+        with self._changed:
+            if subscription_id is None:
+                buffers = list(self._buffers.values())
+                self._buffers.clear()
+            else:
+                buffer = self._buffers.pop(subscription_id, None)
+                buffers = [buffer] if buffer is not None else []
+        for buffer in buffers:
+            self._send(buffer)
+        return len(buffers)
+    
+    def close(self):
+        """Send everything buffered and stop the timer thread"""
+        with self._changed:
+            self._closed = True
+            self._changed.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._changed:
+            return dict(self._stats,
+                        buffered=sum(len(buffer.items) for buffer in self._buffers.values()),
+                        subscriptions=len(self._buffers))
+    
+    def _send(self, buffer: _Buffer) -> Any:
+        with self._changed:
+            self._stats["batches"] += 1
+        try:
+            return self.send(buffer.subscription, list(buffer.items.values()))
+        except Exception as e:
+            logger.error(f"Webhook batch for {buffer.subscription['id']} failed to queue: {e}")
+            return None
+    
+    def _start(self):
+        if self._thread is None:
+            with self._changed:
+                if self._thread is None and not self._closed:
+                    self._thread = threading.Thread(target=self._run, name="webhook-batcher", daemon=True)
+                    self._thread.start()
+    
+    def _run(self):
+        """Send each buffer once its oldest event has waited ``max_wait_ms``"""
+        while True:
+            with self._changed:
+                while not self._closed:
+                    now = time.monotonic()
+                    due = [key for key, buffer in self._buffers.items() if buffer.deadline <= now]
+                    if due:
+                        break
+                    deadline = min((buffer.deadline for buffer in self._buffers.values()), default=None)
+                    self._changed.wait(None if deadline is None else deadline - now)
+                if self._closed:
+                    return
+                expired = [self._buffers.pop(key) for key in due]
+            for buffer in expired:
+                self._send(buffer)
+
+
+@atexit.register
+def _flush_all():
+    """Queue whatever is still buffered"""
+    for batcher in list(_open_batchers):
+        try:
+            batcher.flush()
+        except Exception as e:
+            logger.error(f"Error flushing webhook batches: {e}")
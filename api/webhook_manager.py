@@ -4,73 +4,54 @@ Complete webhook system for real-time notifications
 """
 
 import json
-import requests
 import hmac
 import hashlib
 from typing import Dict, List, Any, Optional
 from datetime import datetime
-from pathlib import Path
+
+from api.webhook_batcher import WebhookBatcher
+from api.webhook_outbox import WebhookOutbox
+from api.webhook_registry import WebhookRegistry, webhook_registry
+
+WEBHOOK_USER_AGENT = "AI-Decision-Engine-Webhook/1.0"
 
 class WebhookManager:
     """Manage webhook subscriptions and delivery"""
     
-    def __init__(self):
-        self.webhooks_file = "webhooks.json"
-        self.webhooks = self._load_webhooks()
-    
-    def _load_webhooks(self) -> List[Dict[str, Any]]:
-        """Load webhooks from file"""
-        try:
-            if Path(self.webhooks_file).exists():
-                with open(self.webhooks_file, "r") as f:
-                    return json.load(f)
-        except:
-            pass
-        return []
-    
-    def _save_webhooks(self):
-        """Save webhooks to file"""
-        with open(self.webhooks_file, "w") as f:
-            json.dump(self.webhooks, f, indent=2)
-    
-    def subscribe(self, url: str, events: List[str], secret: Optional[str] = None) -> str:
+    def __init__(self, outbox: Optional[WebhookOutbox] = None, registry: Optional[WebhookRegistry] = None):
+        self.registry = registry or webhook_registry
+        self.outbox = outbox or WebhookOutbox()
+        self.outbox.on_result = self._record_delivery
+        self.batcher = WebhookBatcher(self._send_batch)
+    
+    @property
+    def webhooks_file(self) -> str:
+        return self.registry.path
+    
+    @property
+    def webhooks(self) -> List[Dict[str, Any]]:
+        return self.registry.list()
+    
+    def subscribe(self, url: str, events: List[str], secret: Optional[str] = None,
+                  batch: Optional[Dict[str, Any]] = None) -> str:
         """
         Subscribe to webhook events
         
         Args:
             url: Webhook URL
-            events: List of events to subscribe to
+            events: List of events (or wildcard patterns such as "decision.*") to subscribe to
             secret: Optional secret for signature verification
+            batch: Optional batching ({"max_items", "max_wait_ms", "coalesce"}):
+                events are sent as one JSON array per batch
         
         Returns:
             Webhook ID
         """
-        webhook_id = f"wh_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        
-        webhook = {
-            "id": webhook_id,
-            "url": url,
-            "events": events,
-            "secret": secret,
-            "active": True,
-            "created_at": datetime.now().isoformat(),
-            "last_triggered": None,
-            "failure_count": 0
-        }
-        
-        self.webhooks.append(webhook)
-        self._save_webhooks()
-        
-        return webhook_id
+        return self.registry.subscribe(url, events, secret, batch)
     
     def unsubscribe(self, webhook_id: str) -> bool:
         """Unsubscribe from webhook"""
-        for webhook in self.webhooks:
-            if webhook["id"] == webhook_id:
-                webhook["active"] = False
-                self._save_webhooks()
-                return True
-        return False
+        return self.registry.unsubscribe(webhook_id)
     
     def _generate_signature(self, payload: str, secret: str) -> str:
         """Generate HMAC signature"""
@@ -80,13 +61,20 @@ class WebhookManager:
             hashlib.sha256
         ).hexdigest()
     
-    def trigger(self, event: str, data: Dict[str, Any]):
+    def trigger(self, event: str, data: Dict[str, Any]) -> List[str]:
         """
         Trigger webhook for an event
         
+        Deliveries are queued in the outbox and sent in the background
+        (see WebhookOutbox), so this returns without waiting on subscribers.
+        Batched webhooks get the event added to their next batch instead.
+        
         Args:
             event: Event name
             data: Event data
+        
+        Returns:
+            Delivery IDs queued by this call
         """
         payload = {
             "event": event,
@@ -94,60 +82,67 @@ class WebhookManager:
             "timestamp": datetime.now().isoformat()
         }
         
-        payload_str = json.dumps(payload)
+        payload_str = None
+        delivery_ids = []
         
-        for webhook in self.webhooks:
-            if not webhook["active"]:
-                continue
-            
-            if event not in webhook["events"]:
-                continue
-            
-            try:
-                headers = {
-                    "Content-Type": "application/json",
-                    "X-Webhook-Event": event
-                }
-                
-                # Add signature if secret exists
-                if webhook.get("secret"):
-                    signature = self._generate_signature(payload_str, webhook["secret"])
-                    headers["X-Webhook-Signature"] = f"sha256={signature}"
-                
-                response = requests.post(
-                    webhook["url"],
-                    json=payload,
-                    headers=headers,
-                    timeout=5
-                )
-                
-                response.raise_for_status()
-                
-                # Update webhook status
-                webhook["last_triggered"] = datetime.now().isoformat()
-                webhook["failure_count"] = 0
-                
-            except Exception as e:
-                webhook["failure_count"] = webhook.get("failure_count", 0) + 1
-                
-                # Deactivate after 5 failures
-                if webhook["failure_count"] >= 5:
-                    webhook["active"] = False
-                
-                print(f"Webhook {webhook['id']} failed: {e}")
+        for webhook in self.registry.matching(event):
+            if webhook.get("batch"):
+                delivery_id = self.batcher.add(webhook, event, payload)
+            else:
+                if payload_str is None:
+                    payload_str = json.dumps(payload)
+                delivery_id = self._enqueue(webhook, event, payload_str)
+            if delivery_id is not None:
+                delivery_ids.append(delivery_id)
         
-        self._save_webhooks()
+        if delivery_ids:
+            self.outbox.start()
+        return delivery_ids
+    
+    def flush(self):
+        """Queue every partly filled batch now"""
+        self.batcher.flush()
+    
+    def close(self):
+        """Queue buffered batches, then stop delivering (pending deliveries stay in the outbox log)"""
+        self.batcher.close()
+        self.outbox.close()
+    
+    def _enqueue(self, webhook: Dict[str, Any], event: str, body: str,
+                 headers: Optional[Dict[str, str]] = None) -> str:
+        """Sign a body for a webhook and queue it in the outbox"""
+        headers = dict({
+            "Content-Type": "application/json",
+            "User-Agent": WEBHOOK_USER_AGENT,
+            "X-Webhook-Event": event
+        }, **(headers or {}))
+        
+        # Add signature if secret exists
+        if webhook.get("secret"):
+            signature = self._generate_signature(body, webhook["secret"])
+            headers["X-Webhook-Signature"] = f"sha256={signature}"
+        
+        return self.outbox.enqueue(webhook["url"], body, headers, event=event, webhook_id=webhook["id"])
+    
+    def _send_batch(self, webhook: Dict[str, Any], payloads: List[Dict[str, Any]]) -> str:
+        """Batcher callback: queue buffered events as one JSON array"""
+        delivery_id = self._enqueue(webhook, "batch", json.dumps(payloads),
+                                    {"X-Webhook-Batch-Size": str(len(payloads))})
+        self.outbox.start()
+        return delivery_id
+    
+    def _record_delivery(self, delivery: Dict[str, Any], outcome: str):
+        """Outbox callback: track each webhook's last delivery and failures"""
+        if outcome != "retry":
+            self.registry.record_delivery(delivery.get("webhook_id"), outcome == "delivered")
     
     def list_webhooks(self) -> List[Dict[str, Any]]:
         """List all webhooks"""
-        return self.webhooks
+        return self.registry.list()
     
     def get_webhook(self, webhook_id: str) -> Optional[Dict[str, Any]]:
         """Get webhook by ID"""
-        for webhook in self.webhooks:
-            if webhook["id"] == webhook_id:
-                return webhook
-        return None
+        return self.registry.get(webhook_id)
 
 # Global webhook manager instance
 webhook_manager = WebhookManager()
@@ -0,0 +1,480 @@
+"""
+Webhook Outbox
+Durable queue of webhook deliveries drained by async workers
+"""
+
+import asyncio
+import glob
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable
+from urllib.parse import urlsplit
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    import requests
+    HTTPX_AVAILABLE = False
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines: one process per outbox file
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_OUTBOX_FILE = os.getenv("WEBHOOK_OUTBOX_FILE", "webhook_outbox.ndjson")
+WEBHOOK_OUTBOX_FSYNC = os.getenv("WEBHOOK_OUTBOX_FSYNC", "false").lower() == "true"
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "16"))
+WEBHOOK_ENDPOINT_CONCURRENCY = int(os.getenv("WEBHOOK_ENDPOINT_CONCURRENCY", "4"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+WEBHOOK_TIMEOUT_SECONDS = 5.0
+WEBHOOK_BACKOFF_BASE = 1.0    # seconds before the first retry
+WEBHOOK_BACKOFF_MAX = 300.0
+
+COMPACT_EVERY = 1000  # settled deliveries between log rewrites
+
+# Client errors worth retrying; any other 4xx goes straight to the dead letters
+RETRYABLE_STATUS = (408, 425, 429)
+
+# on_result(delivery, outcome) with outcome "delivered", "retry" or "dead"
+ResultCallback = Callable[[Dict[str, Any], str], None]
+
+
+def backoff_delay(attempts: int, base: float = WEBHOOK_BACKOFF_BASE, cap: float = WEBHOOK_BACKOFF_MAX) -> float:
+    """Seconds before retry number ``attempts``: doubling from ``base``, jittered down by up to half"""
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return random.uniform(delay / 2, delay)
+
+
+def _endpoint(url: str) -> str:
+    """Concurrency limits apply per scheme://host:port"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+class WebhookOutbox:
+    """
+    Durable, asynchronously drained webhook deliveries
+    
+    ``enqueue`` appends one JSON line to the outbox file and hands the
+    delivery to an event loop running in a background thread, so the
+    caller never waits on a subscriber. The loop keeps one queue per
+    endpoint (scheme, host and port) drained by at most
+    ``endpoint_concurrency`` coroutines, with ``workers`` requests in
+    flight overall on one pooled ``httpx.AsyncClient``.
+    
+    Failed attempts (connection errors, timeouts, 5xx, 408/425/429) are
+    retried with jittered exponential backoff; after ``max_attempts``, or
+    on any other 4xx, a delivery moves to the dead letters, from which
+    ``replay`` sends it again. Every state change is logged too, so
+    deliveries still pending at shutdown or after a crash are picked up
+    by the next ``start()``: delivery is at least once, and receivers can
+    drop repeats by the ``X-Webhook-Delivery`` header. The log is
+    rewritten with only pending and dead deliveries every
+    ``COMPACT_EVERY`` settled ones.
+    
+    Each process logs to its own file next to ``path``
+    (``webhook_outbox.<id>.ndjson``), created with its first write and
+    locked while the outbox is open, so no two processes send the same
+    delivery or rewrite a file another is appending to. On first use an
+    outbox takes over the files of processes that closed or died (and a
+    plain ``path`` file from before), including their dead letters;
+    constructing one touches nothing on disk.
+    """
+    
+    def __init__(self, path: str = WEBHOOK_OUTBOX_FILE, workers: int = WEBHOOK_WORKERS,
+                 endpoint_concurrency: int = WEBHOOK_ENDPOINT_CONCURRENCY,
+                 max_attempts: int = WEBHOOK_MAX_ATTEMPTS, timeout: float = WEBHOOK_TIMEOUT_SECONDS,
+                 backoff_base: float = WEBHOOK_BACKOFF_BASE, backoff_max: float = WEBHOOK_BACKOFF_MAX,
+                 fsync: bool = WEBHOOK_OUTBOX_FSYNC, on_result: Optional[ResultCallback] = None):
+        self.path = path
+        self.workers = workers
+        self.endpoint_concurrency = endpoint_concurrency
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.fsync = fsync
+        self.on_result = on_result
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._fd: Optional[int] = None
+        self._opened = False
+        self._segment: Optional[str] = None  # this process's log file, once written
+        self._owner_lock = None              # held on it while open
+        self._deliveries: Dict[str, Dict[str, Any]] = {}  # pending and dead, by id
+        self._pending = 0
+        self._settled = 0
+        self._stats = {"enqueued": 0, "delivered": 0, "retried": 0, "dead_lettered": 0, "replayed": 0}
+        
+        # Event loop state, owned by the loop thread
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._queues: Dict[str, deque] = defaultdict(deque)
+        self._drainers: Dict[str, int] = defaultdict(int)
+        self._tasks = set()
+        self._timers = set()
+    
+    # Log
+    
+    @staticmethod
+    def _try_lock(path: str):
+        """Exclusive lock on a log file's ``.lock`` companion, or None if a live outbox holds it"""
+        lock_file = open(path + ".lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+        return lock_file
+    
+    def _own_segment(self):
+        """Pick and lock this process's log file (caller holds the lock)"""
+        if self._segment is not None:
+            return
+        if fcntl is None:
+            self._segment = self.path
+            return
+        base, ext = os.path.splitext(self.path)
+        while self._owner_lock is None:
+            segment = f"{base}.{os.urandom(4).hex()}{ext}"
+            self._owner_lock = self._try_lock(segment)
+        self._segment = segment
+    
+    def _claim_orphans(self) -> List[tuple]:
+        """Lock every log no live outbox owns"""
+        if fcntl is None:
+            return [(self.path, None)] if os.path.exists(self.path) else []
+        base, ext = os.path.splitext(self.path)
+        pattern = glob.escape(base) + ".*" + ext
+        paths = set(glob.glob(pattern)) | {lock[:-len(".lock")] for lock in glob.glob(pattern + ".lock")}
+        if os.path.exists(self.path):
+            paths.add(self.path)
+        orphans = []
+        for path in sorted(paths - {self._segment}):
+            lock_file = self._try_lock(path)
+            if lock_file is None:
+                continue
+            if os.path.exists(path):
+                orphans.append((path, lock_file))
+            else:  # an outbox that never logged anything, or one taken over just now
+                os.remove(path + ".lock")
+                lock_file.close()
+        return orphans
+    
+    def _open(self):
+        """On first use, take over pending and dead deliveries from orphaned logs (caller holds the lock)"""
+        if self._opened:
+            return
+        self._opened = True
+        orphans = self._claim_orphans()
+        for path, _ in orphans:
+            self._read_log(path)
+        self._pending = sum(1 for d in self._deliveries.values() if d["status"] == "pending")
+        if not orphans:
+            return
+        self._compact()
+        for path, lock_file in orphans:
+            if lock_file is not None:
+                os.remove(path)
+                os.remove(path + ".lock")
+                lock_file.close()
+        if self._deliveries:
+            logger.info(f"Outbox {self._segment}: {self._pending} pending and "
+                        f"{len(self._deliveries) - self._pending} dead deliveries")
+    
+    def _read_log(self, path: str):
+        """Apply one log file to the deliveries"""
+        with open(path, "rb") as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping unreadable line {number} of {path}")
+                    continue
+                op = record.pop("op", None)
+                if op == "enqueue":
+                    self._deliveries[record["id"]] = record
+                    continue
+                delivery = self._deliveries.get(record.get("id"))
+                if delivery is None:
+                    continue
+                if op == "delivered":
+                    del self._deliveries[record["id"]]
+                elif op in ("retry", "dead", "replay"):
+                    delivery.update(record)
+    
+    def _append(self, record: Dict[str, Any]):
+        """Write one log line (caller holds the lock)"""
+        if self._fd is None:
+            self._own_segment()
+            self._fd = os.open(self._segment, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        os.write(self._fd, (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8"))
+        if self.fsync:
+            os.fsync(self._fd)
+    
+    def _compact(self):
+        """Rewrite this process's log with only live deliveries (caller holds the lock)"""
+        self._own_segment()
+        tmp_path = self._segment + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for delivery in self._deliveries.values():
+                f.write(json.dumps(dict(delivery, op="enqueue"), separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._segment)
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._settled = 0
+    
+    # Producer side
+    
+    def enqueue(self, url: str, body: str, headers: Optional[Dict[str, str]] = None,
+                event: Optional[str] = None, webhook_id: Optional[str] = None) -> str:
+        """
+        Durably queue one POST of ``body`` to ``url``
+        
+        The body is sent byte for byte, so a signature computed over it
+        stays valid. Returns the delivery id.
+        """
+        delivery = {
+            "id": f"dlv_{os.urandom(8).hex()}",
+            "webhook_id": webhook_id,
+            "url": url,
+            "event": event,
+            "body": body,
+            "headers": dict(headers or {}),
+            "created_at": datetime.now().isoformat(),
+            "status": "pending",
+            "attempts": 0,
+            "next_at": 0.0,
+            "last_error": None
+        }
+        with self._lock:
+            self._open()
+            self._append(dict(delivery, op="enqueue"))
+            self._deliveries[delivery["id"]] = delivery
+            self._pending += 1
+            self._stats["enqueued"] += 1
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._dispatch, delivery["id"])
+        return delivery["id"]
+    
+    def start(self):
+        """Start the delivery loop (idempotent) and dispatch everything pending"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._open()
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run_loop, args=(ready,), name="webhook-outbox", daemon=True)
+            self._thread.start()
+            ready.wait()
+            for delivery in self._deliveries.values():
+                if delivery["status"] == "pending":
+                    self._loop.call_soon_threadsafe(self._schedule, delivery["id"], delivery["next_at"])
+    
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait until no delivery is pending (dead letters do not count); False on timeout"""
+        with self._changed:
+            return self._changed.wait_for(lambda: self._pending == 0, timeout)
+    
+    def close(self, timeout: float = 5.0):
+        """Stop the loop and give up the log; unfinished deliveries stay in it for the next outbox"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+        if loop is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout)
+            except Exception as e:
+                logger.warning(f"Outbox shutdown incomplete: {e}")
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+        with self._lock:
+            self._loop = self._thread = None
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            if self._owner_lock is not None:
+                if not self._deliveries and os.path.exists(self._segment):
+                    os.remove(self._segment)
+                if not os.path.exists(self._segment):
+                    os.remove(self._segment + ".lock")
+                self._owner_lock.close()
+                self._owner_lock = None
+                self._segment = None
+    
+    # Dead letters
+    
+    def dead_letters(self) -> List[Dict[str, Any]]:
+        """Deliveries that gave up, oldest first"""
+        with self._lock:
+            self._open()
+            return [dict(d) for d in self._deliveries.values() if d["status"] == "dead"]
+    
+    def replay(self, delivery_id: Optional[str] = None) -> int:
+        """Queue dead deliveries again with a fresh attempt budget (all of them without an id)"""
+        with self._lock:
+            self._open()
+            if delivery_id is None:
+                ids = [d["id"] for d in self._deliveries.values() if d["status"] == "dead"]
+            else:
+                delivery = self._deliveries.get(delivery_id)
+                ids = [delivery_id] if delivery is not None and delivery["status"] == "dead" else []
+            for replayed in ids:
+                update = {"id": replayed, "status": "pending", "attempts": 0, "next_at": 0.0, "last_error": None}
+                self._append(dict(update, op="replay"))
+                self._deliveries[replayed].update(update)
+                self._pending += 1
+                self._stats["replayed"] += 1
+                if self._loop is not None:
+                    self._loop.call_soon_threadsafe(self._dispatch, replayed)
+        return len(ids)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._open()
+            return dict(
+                self._stats,
+                pending=self._pending,
+                dead=len(self._deliveries) - self._pending,
+                running=self._loop is not None,
+                transport="httpx" if HTTPX_AVAILABLE else "requests"
+            )
+    
+    # Delivery loop
+    
+    def _run_loop(self, ready: threading.Event):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._slots = asyncio.Semaphore(self.workers)
+        if HTTPX_AVAILABLE:
+            # First callback on the loop, ahead of any dispatch, without making start() wait on TLS setup
+            loop.call_soon(self._open_client)
+        self._loop = loop
+        ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+    
+    def _open_client(self):
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.workers, max_keepalive_connections=self.workers)
+        )
+    
+    async def _shutdown(self):
+        for timer in self._timers:
+            timer.cancel()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+    
+    def _schedule(self, delivery_id: str, at: float):
+        delay = at - time.time()
+        if delay <= 0:
+            self._dispatch(delivery_id)
+            return
+        timer = self._loop.call_later(delay, lambda: (self._timers.discard(timer), self._dispatch(delivery_id)))
+        self._timers.add(timer)
+    
+    def _dispatch(self, delivery_id: str):
+        delivery = self._deliveries.get(delivery_id)
+        if delivery is None or delivery["status"] != "pending":
+            return
+        endpoint = _endpoint(delivery["url"])
+        self._queues[endpoint].append(delivery_id)
+        if self._drainers[endpoint] < self.endpoint_concurrency:
+            self._drainers[endpoint] += 1
+            task = self._loop.create_task(self._drain(endpoint))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _drain(self, endpoint: str):
+        queue = self._queues[endpoint]
+        try:
+            while queue:
+                delivery_id = queue.popleft()
+                async with self._slots:
+                    await self._attempt(delivery_id)
+        finally:
+            self._drainers[endpoint] -= 1
+    
+    async def _post(self, delivery: Dict[str, Any]) -> int:
+        headers = dict(delivery["headers"], **{"X-Webhook-Delivery": delivery["id"]})
+        headers.setdefault("Content-Type", "application/json")
+        body = delivery["body"].encode("utf-8")
+        if self._client is not None:
+            response = await self._client.post(delivery["url"], content=body, headers=headers)
+        else:
+            response = await asyncio.to_thread(requests.post, delivery["url"], data=body,
+                                               headers=headers, timeout=self.timeout)
+        return response.status_code
+    
+    async def _attempt(self, delivery_id: str):
+        delivery = self._deliveries.get(delivery_id)
+        if delivery is None or delivery["status"] != "pending":
+            return
+        try:
+            status = await self._post(delivery)
+            error = None if 200 <= status < 300 else f"HTTP {status}"
+            retryable = status >= 500 or status in RETRYABLE_STATUS
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            retryable = True
+        
+        attempts = delivery["attempts"] + 1
+        with self._changed:
+            if error is None:
+                outcome = "delivered"
+                self._append({"op": "delivered", "id": delivery_id})
+                del self._deliveries[delivery_id]
+            elif retryable and attempts < self.max_attempts:
+                outcome = "retry"
+                next_at = time.time() + backoff_delay(attempts, self.backoff_base, self.backoff_max)
+                update = {"id": delivery_id, "attempts": attempts, "next_at": next_at, "last_error": error}
+                self._append(dict(update, op="retry"))
+                delivery.update(update)
+            else:
+                outcome = "dead"
+                update = {"id": delivery_id, "status": "dead", "attempts": attempts, "last_error": error}
+                self._append(dict(update, op="dead"))
+                delivery.update(update)
+            
+            self._stats[{"delivered": "delivered", "retry": "retried", "dead": "dead_lettered"}[outcome]] += 1
+            if outcome != "retry":
+                self._pending -= 1
+                self._settled += 1
+                if self._settled >= COMPACT_EVERY:
+                    self._compact()
+                self._changed.notify_all()
+        
+        if outcome == "retry":
+            self._schedule(delivery_id, delivery["next_at"])
+        elif outcome == "dead":
+            logger.warning(f"Webhook delivery {delivery_id} to {delivery['url']} dead-lettered "
+                           f"after {attempts} attempts: {error}")
+        if self.on_result is not None:
+            try:
+                self.on_result(delivery, outcome)
+            except Exception as e:
+                logger.error(f"Webhook result callback failed: {e}")
@@ -0,0 +1,256 @@
+"""
+Webhook Registry
+Indexed webhook subscriptions shared by the webhook managers
+"""
+
+import atexit
+import fnmatch
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import weakref
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+
+from api.webhook_batcher import batch_settings
+
+logger = logging.getLogger(__name__)
+
+WEBHOOKS_FILE = os.getenv("WEBHOOKS_FILE", "webhooks.json")
+
+# Delivery bookkeeping (last_triggered, failure_count) is saved at most this often
+WEBHOOK_SAVE_SECONDS = float(os.getenv("WEBHOOK_SAVE_SECONDS", "5"))
+
+# Dead-lettered deliveries in a row before a webhook is deactivated
+MAX_WEBHOOK_FAILURES = 5
+
+_WILDCARD = re.compile(r"[*?\[]")
+
+_open_registries: "weakref.WeakSet[WebhookRegistry]" = weakref.WeakSet()
+
+
+def is_pattern(event: str) -> bool:
+    """Whether a subscribed event is a wildcard pattern such as ``decision.*``"""
+    return bool(_WILDCARD.search(event))
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile(pattern: str) -> re.Pattern:
+    return re.compile(fnmatch.translate(pattern))
+
+
+class WebhookRegistry:
+    """
+    Webhook subscriptions with an event index
+    
+    A subscription is ``{"id", "url", "events", "secret", "active", "batch", ...}``.
+    Active subscriptions are indexed by exact event name; wildcard events
+    (fnmatch syntax: ``decision.*``, ``*``) are compiled once on
+    subscribe. The subscribers of an event are worked out on its first
+    dispatch and cached until the subscriptions next change, so a dispatch
+    costs a dict lookup plus one step per matching subscriber, however
+    many subscriptions exist.
+    
+    ``webhooks.json`` is read in either of the formats the managers used
+    to write (a list of subscriptions, or lists keyed by event) and saved
+    as a list by writing a temporary file and renaming it over the old one.
+    Subscription changes are saved at once; delivery bookkeeping is saved
+    within ``WEBHOOK_SAVE_SECONDS``, once for all deliveries meanwhile.
+    """
+    
+    def __init__(self, path: str = WEBHOOKS_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._subscriptions: Dict[str, Dict[str, Any]] = {}   # insertion order = subscription order
+        self._exact: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._patterns: List[Tuple[re.Pattern, Dict[str, Any]]] = []
+        self._matches: Dict[str, Tuple[Dict[str, Any], ...]] = {}
+        self._save_timer: Optional[threading.Timer] = None
+        self._load()
+        _open_registries.add(self)
+    
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read {self.path}: {e}")
+            return
+        
+        if isinstance(data, dict):
+            # {event: [subscription, ...]}, one event per subscription
+            for event, subscriptions in data.items():
+                for subscription in subscriptions:
+                    existing = self._subscriptions.get(subscription.get("id"))
+                    if existing is not None:
+                        existing["events"].append(event)
+                    else:
+                        self._add(dict(subscription, events=[event]))
+        else:
+            for subscription in data:
+                self._add(dict(subscription, events=list(subscription.get("events", []))))
+        self._reindex()
+    
+    def _add(self, subscription: Dict[str, Any]):
+        subscription.setdefault("active", True)
+        subscription.setdefault("secret", None)
+        subscription.setdefault("last_triggered", None)
+        subscription.setdefault("failure_count", 0)
+        subscription.setdefault("batch", None)
+        self._subscriptions[subscription["id"]] = subscription
+    
+    def _reindex(self):
+        """Rebuild the event index from the active subscriptions (caller holds the lock)"""
+        self._exact = {}
+        self._patterns = []
+        for subscription in self._subscriptions.values():
+            if not subscription.get("active", True):
+                continue
+            for event in subscription["events"]:
+                if is_pattern(event):
+                    self._patterns.append((_compile(event), subscription))
+                else:
+                    self._exact.setdefault(event, {})[subscription["id"]] = subscription
+        self._matches = {}
+    
+    def save(self):
+        """Write all subscriptions atomically"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            subscriptions = list(self._subscriptions.values())
+            tmp_path = self.path + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(subscriptions, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.error(f"Error saving webhooks: {e}")
+    
+    def _save_later(self):
+        """Save within WEBHOOK_SAVE_SECONDS (caller holds the lock)"""
+        if WEBHOOK_SAVE_SECONDS <= 0:
+            self.save()
+        elif self._save_timer is None:
+            self._save_timer = threading.Timer(WEBHOOK_SAVE_SECONDS, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+    
+    def flush(self):
+        """Save now if delivery bookkeeping is waiting to be saved"""
+        with self._lock:
+            if self._save_timer is not None:
+                self.save()
+    
+    def subscribe(self, url: str, events: Iterable[str], secret: Optional[str] = None,
+                  batch: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Add a subscription to one or more events (or patterns); returns its ID
+        
+        ``batch`` ({"max_items", "max_wait_ms", "coalesce"}) opts into
+        batched delivery (see WebhookBatcher).
+        """
+        subscription = {
+            "id": f"wh_{datetime.now().strftime('%Y%m%d%H%M%S')}_{os.urandom(3).hex()}",
+            "url": url,
+            "events": list(events),
+            "secret": secret,
+            "active": True,
+            "created_at": datetime.now().isoformat(),
+            "last_triggered": None,
+            "failure_count": 0,
+            "batch": batch_settings(batch)
+        }
+        with self._lock:
+            self._add(subscription)
+            self._reindex()
+            self.save()
+        return subscription["id"]
+    
+    def set_active(self, subscription_id: str, active: bool) -> bool:
+        """Activate or deactivate a subscription; False if there is no such ID"""
+        with self._lock:
+            subscription = self._subscriptions.get(subscription_id)
+            if subscription is None:
+                return False
+            subscription["active"] = active
+            self._reindex()
+            self.save()
+            return True
+    
+    def unsubscribe(self, subscription_id: str) -> bool:
+        """Deactivate a subscription (kept for its history)"""
+        return self.set_active(subscription_id, False)
+    
+    def get(self, subscription_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        return self._subscriptions.get(subscription_id)
+    
+    def list(self) -> List[Dict[str, Any]]:
+        """All subscriptions, active or not, oldest first"""
+        with self._lock:
+            return list(self._subscriptions.values())
+    
+    def by_event(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Subscriptions grouped by subscribed event (or pattern)"""
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        with self._lock:
+            for subscription in self._subscriptions.values():
+                for event in subscription["events"]:
+                    grouped.setdefault(event, []).append(subscription)
+        return grouped
+    
+    def matching(self, event: str) -> Tuple[Dict[str, Any], ...]:
+        """Active subscriptions an event is delivered to, oldest first"""
+        matches = self._matches.get(event)
+        if matches is not None:
+            return matches
+        with self._lock:
+            found = dict(self._exact.get(event, {}))
+            for pattern, subscription in self._patterns:
+                if pattern.match(event):
+                    found[subscription["id"]] = subscription
+            order = {subscription_id: i for i, subscription_id in enumerate(self._subscriptions)}
+            matches = tuple(sorted(found.values(), key=lambda s: order[s["id"]]))
+            self._matches[event] = matches
+            return matches
+    
+    def record_delivery(self, subscription_id: Optional[str], delivered: bool):
+        """Track a finished delivery; repeated dead letters deactivate the subscription"""
+        with self._lock:
+            subscription = self._subscriptions.get(subscription_id)
+            if subscription is None:
+                return
+            if delivered:
+                subscription["last_triggered"] = datetime.now().isoformat()
+                subscription["failure_count"] = 0
+                self._save_later()
+                return
+            subscription["failure_count"] = subscription.get("failure_count", 0) + 1
+            if subscription["failure_count"] >= MAX_WEBHOOK_FAILURES and subscription["active"]:
+                logger.warning(f"Webhook {subscription_id} deactivated after "
+                               f"{subscription['failure_count']} failed deliveries")
+                self.set_active(subscription_id, False)
+            else:
+                self._save_later()
+
+
+@atexit.register
+def _flush_all():
+    """Save delivery bookkeeping still waiting for its timer"""
+    for registry in list(_open_registries):
+        try:
+            registry.flush()
+        except Exception as e:
+            logger.error(f"Error saving webhooks to {registry.path}: {e}")
+
+
+# Global registry, shared by both webhook managers
+webhook_registry = WebhookRegistry()
@@ -0,0 +1,255 @@
+"""
+Autonomy Counters
+Durable progression counters shared by every worker, written in batches
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+AUTONOMY_COMMIT_SECONDS = float(os.getenv("AUTONOMY_COMMIT_SECONDS", "1.0"))
+MAX_PENDING_UPDATES = 1000          # commit early once this many updates are waiting
+COMPACT_BYTES = 1024 * 1024         # fold the log into one line per day past this size
+
+_open_counters: "weakref.WeakSet[SharedCounters]" = weakref.WeakSet()
+
+
+def counters_path(state_file: str) -> str:
+    """Counter log kept next to a state file (``x.json`` -> ``x.counters.ndjson``)"""
+    base, _ = os.path.splitext(state_file)
+    return base + ".counters.ndjson"
+
+
+class SharedCounters:
+    """
+    Named counters kept as an append-only log of deltas
+    
+    ``add`` only touches memory. Updates made within
+    ``commit_interval`` seconds are summed and appended as a single line
+    (a group commit), by a timer or as soon as ``MAX_PENDING_UPDATES``
+    are waiting. Every worker appends to the same file and reads the
+    lines the others appended, so the totals are the sum over all
+    workers and survive restarts. Each line is stamped with its commit
+    time, so ``totals_as_of`` can sum the lines up to a point in time.
+    Past ``COMPACT_BYTES`` the log is folded into one line per day under
+    an exclusive lock; appends hold a shared lock so none land in the
+    file being replaced.
+    """
+    
+    def __init__(self, path: str, commit_interval: float = AUTONOMY_COMMIT_SECONDS,
+                 baseline: Optional[Dict[str, float]] = None):
+        self.path = path
+        self.commit_interval = commit_interval
+        self._lock = threading.RLock()
+        self._pending: Counter = Counter()
+        self._pending_updates = 0
+        self._pending_at: Optional[float] = None  # epoch of the newest pending update
+        self._timer: Optional[threading.Timer] = None
+        self._committed: Counter = Counter()  # totals read from the log
+        self._offset = 0
+        self._inode: Optional[int] = None
+        self._refreshed = 0.0
+        self.stats = {"updates": 0, "commits": 0, "compactions": 0}
+        if baseline:
+            self._seed(baseline)
+        self.refresh(force=True)
+        _open_counters.add(self)
+    
+    def _seed(self, baseline: Dict[str, float]):
+        """Start a new log from existing totals (only the first worker to create it does)"""
+        counts = {name: value for name, value in baseline.items() if value}
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"ts": time.time(), "delta": counts}) + "\n")
+    
+    def _flock(self, mode: int):
+        if not FCNTL_AVAILABLE:
+            return None
+        lock_file = open(self.path + ".lock", "a")
+        fcntl.flock(lock_file, mode)
+        return lock_file
+    
+    def add(self, name: str, amount: float = 1):
+        """Add to a counter; written with the next group commit"""
+        with self._lock:
+            self._pending[name] += amount
+            self._pending_updates += 1
+            self._pending_at = time.time()
+            self.stats["updates"] += 1
+            if self._pending_updates >= MAX_PENDING_UPDATES:
+                self.commit()
+            elif self._timer is None and self.commit_interval > 0:
+                self._timer = threading.Timer(self.commit_interval, self.commit)
+                self._timer.daemon = True
+                self._timer.start()
+            elif self.commit_interval <= 0:
+                self.commit()
+    
+    def commit(self):
+        """Append pending updates as one line"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return
+            line = json.dumps({"ts": time.time(), "delta": dict(self._pending)}) + "\n"
+            lock_file = self._flock(fcntl.LOCK_SH) if FCNTL_AVAILABLE else None
+            try:
+                # One write on an O_APPEND descriptor, so lines from several
+                # workers never interleave
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, line.encode("utf-8"))
+                finally:
+                    os.close(fd)
+            except OSError as e:
+                logger.error(f"Error committing counters to {self.path}: {e}")
+                return
+            finally:
+                if lock_file is not None:
+                    lock_file.close()
+            self._pending.clear()
+            self._pending_updates = 0
+            self._pending_at = None
+            self.stats["commits"] += 1
+            self.refresh(force=True)
+            if self._offset > COMPACT_BYTES:
+                self.compact()
+    
+    def refresh(self, force: bool = False):
+        """Read lines appended since the last read (by any worker)"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._refreshed < self.commit_interval:
+                return
+            self._refreshed = now
+            try:
+                f = open(self.path, "rb")
+            except FileNotFoundError:
+                return
+            with f:
+                inode = os.fstat(f.fileno()).st_ino
+                if inode != self._inode:
+                    # New or compacted file: read it from the start
+                    self._committed.clear()
+                    self._offset = 0
+                    self._inode = inode
+                f.seek(self._offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # another worker is mid-write; read it next time
+                    try:
+                        self._committed.update(json.loads(line)["delta"])
+                    except (ValueError, KeyError, TypeError):
+                        logger.warning(f"Skipping malformed counter line at byte {self._offset} of {self.path}")
+                    self._offset += len(line)
+    
+    def _entries(self) -> Iterator[Tuple[float, Dict[str, float]]]:
+        """(commit epoch, delta) for every complete line of the log"""
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                    yield float(entry["ts"]), entry["delta"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+    
+    def compact(self):
+        """Fold the log into one line per day, stamped with the day's last commit"""
+        if not FCNTL_AVAILABLE:
+            return
+        with self._lock:
+            lock_file = self._flock(fcntl.LOCK_EX)
+            try:
+                days: Dict[int, Tuple[float, Counter]] = {}
+                for ts, delta in self._entries():  # everything appended so far, under the lock
+                    day = int(ts // 86400)
+                    last, counts = days.get(day, (ts, Counter()))
+                    counts.update(delta)
+                    days[day] = (max(last, ts), counts)
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    for day in sorted(days):
+                        ts, counts = days[day]
+                        f.write(json.dumps({"ts": ts, "delta": dict(counts)}) + "\n")
+                os.replace(tmp_path, self.path)
+                self._inode = None
+                self.stats["compactions"] += 1
+            finally:
+                lock_file.close()
+            self.refresh(force=True)
+    
+    def totals(self) -> Dict[str, float]:
+        """Committed totals from every worker plus this worker's pending updates"""
+        with self._lock:
+            self.refresh()
+            totals = Counter(self._committed)
+            totals.update(self._pending)
+            return dict(totals)
+    
+    def get(self, name: str) -> float:
+        return self.totals().get(name, 0)
+    
+    def totals_as_of(self, ts: float) -> Dict[str, float]:
+        """
+        Committed totals from every worker as of epoch ``ts``
+        
+        Lines committed at or before ``ts``; after a compaction, a day's
+        commits count from the last of them.
+        """
+        totals: Counter = Counter()
+        with self._lock:
+            for committed, delta in self._entries():
+                if committed <= ts:
+                    totals.update(delta)
+        return dict(totals)
+    
+    @contextmanager
+    def locked(self):
+        """Hold off this process's other adds and commits, e.g. while acting on the totals"""
+        with self._lock:
+            yield self
+    
+    def pending_since(self) -> Optional[float]:
+        """Epoch of the newest update still waiting for its commit (None if nothing is pending)"""
+        with self._lock:
+            return self._pending_at
+    
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, pending=self._pending_updates, log_bytes=self._offset)
+
+
+@atexit.register
+def _commit_all():
+    """Write whatever is still waiting for its group commit"""
+    for counters in list(_open_counters):
+        try:
+            counters.commit()
+        except Exception as e:
+            logger.error(f"Error committing counters to {counters.path}: {e}")
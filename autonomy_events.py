@@ -0,0 +1,336 @@
+"""
+Autonomy Events
+Append-only event log with periodic snapshots for autonomy state
+"""
+
+import json
+import logging
+import os
+import threading
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterator, Callable, Tuple
+
+from memory_retention import record_epoch
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines: one writer per log
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+AUTONOMY_SNAPSHOT_EVERY = int(os.getenv("AUTONOMY_SNAPSHOT_EVERY", "100"))
+
+# reducer(state, event) applies one event to the state in place
+Reducer = Callable[[Dict[str, Any], Dict[str, Any]], None]
+
+
+def event_log_paths(state_file: str) -> Tuple[str, str]:
+    """Event and snapshot files kept next to a state file (``x.json`` -> ``x.events.ndjson``, ``x.snapshots.ndjson``)"""
+    base, _ = os.path.splitext(state_file)
+    return base + ".events.ndjson", base + ".snapshots.ndjson"
+
+
+def parse_as_of(value: Any) -> float:
+    """ISO timestamp, datetime or epoch seconds -> epoch seconds"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value!r} (expected ISO 8601)")
+
+
+def _last_line(path: str, chunk_size: int = 65536) -> Optional[Tuple[int, bytes]]:
+    """(offset, bytes) of the last complete line of a file, read from the end"""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        position = f.seek(0, os.SEEK_END)
+        buffer = b""
+        while position > 0:
+            step = min(chunk_size, position)
+            position -= step
+            f.seek(position)
+            buffer = f.read(step) + buffer
+            complete = buffer[:buffer.rfind(b"\n") + 1]  # a torn tail does not count
+            if not complete:
+                continue
+            start = complete.rfind(b"\n", 0, len(complete) - 1)
+            if start >= 0:
+                return position + start + 1, complete[start + 1:-1]
+            if position == 0:
+                return 0, complete[:-1]
+    return None
+
+
+class AutonomyEventLog:
+    """
+    Autonomy state as an append-only event log
+    
+    Each change is one JSON line appended to ``<name>.events.ndjson`` and
+    applied to the in-memory state by a reducer. Every ``snapshot_every``
+    events the state is appended to ``<name>.snapshots.ndjson`` along with
+    the sequence number and byte offset it covers, and the state file is
+    rewritten as a readable copy of it. Startup reads the last snapshot
+    and replays only the events after it; "state as of T" starts from the
+    last snapshot taken before T.
+    
+    Several writers (worker processes, or a tenant engine and its
+    reloaded replacement) can share one log: appends and snapshots take
+    an exclusive lock on ``<name>.events.ndjson.lock`` and first apply
+    whatever the others appended, so sequence numbers and snapshot
+    offsets always match the file. ``refresh`` picks up their events
+    without writing.
+    
+    A state file without an event log (the old format) is taken as the
+    initial state; neither log file exists until the first event, which
+    is preceded by snapshot 0.
+    """
+    
+    def __init__(self, state_file: str, reducer: Reducer, initial_state: Callable[[], Dict[str, Any]],
+                 snapshot_every: int = AUTONOMY_SNAPSHOT_EVERY):
+        self.state_file = state_file
+        self.events_path, self.snapshots_path = event_log_paths(state_file)
+        self.reducer = reducer
+        self.snapshot_every = max(1, snapshot_every)
+        self._lock = threading.RLock()
+        self.seq = 0
+        self._last_ts: Optional[str] = None
+        self._loaded_at = datetime.now().isoformat()
+        self._offset = 0  # end of the last complete event line read
+        self._torn = False  # the log ends in a line a crashed writer left unfinished
+        self._snapshot_seq: Optional[int] = None  # None: no snapshot on disk yet
+        # (epoch, seq, snapshot line offset, event offset), built on first history query
+        self._snapshot_index: Optional[List[Tuple[float, int, int, int]]] = None
+        self.state = self._load(initial_state)
+    
+    def _load(self, initial_state: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        last = _last_line(self.snapshots_path)
+        if last is None:
+            # Old format (or nothing logged yet): the state file is the
+            # starting point for every event in the log
+            self.state = initial_state()
+        else:
+            snapshot = json.loads(last[1])
+            self.seq = self._snapshot_seq = snapshot["seq"]
+            self._last_ts = snapshot["ts"]
+            self._offset = snapshot["offset"]
+            self.state = snapshot["state"]
+        replayed = self._catch_up()
+        if replayed:
+            logger.info(f"Replayed {replayed} autonomy events from {self.events_path}")
+        return self.state
+    
+    def _catch_up(self, exclusive: bool = False) -> int:
+        """
+        Apply events logged after ``_offset`` by any writer (caller holds ``_lock``)
+        
+        An incomplete last line is left for the next read, as its writer
+        may still be appending it; only under the exclusive file lock
+        (``exclusive``) is it known to be left by a crashed writer, and
+        then it is skipped and closed off by the next append. Nothing is
+        ever truncated.
+        """
+        try:
+            f = open(self.events_path, "rb")
+        except FileNotFoundError:
+            return 0
+        applied = 0
+        with f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    if exclusive:
+                        logger.warning(f"Skipping torn event at byte {self._offset} of {self.events_path}")
+                        self._offset += len(line)
+                        self._torn = True
+                    break
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping unreadable event at byte {self._offset} of {self.events_path}")
+                    self._offset += len(line)
+                    continue
+                self.reducer(self.state, event)
+                self.seq = event["seq"]
+                self._last_ts = event["ts"]
+                self._offset += len(line)
+                applied += 1
+        return applied
+    
+    def _flock(self):
+        """Exclusive lock on the log, for appends and snapshots (None without fcntl)"""
+        if fcntl is None:
+            return None
+        lock_file = open(self.events_path + ".lock", "a")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+    
+    def _write_snapshot(self, ts: str):
+        """Append the current state as a snapshot (caller holds both locks, caught up)"""
+        record = {"seq": self.seq, "ts": ts, "offset": self._offset, "state": self.state}
+        line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        position = os.path.getsize(self.snapshots_path) if os.path.exists(self.snapshots_path) else 0
+        with open(self.snapshots_path, "ab") as f:
+            f.write(line)
+        if self._snapshot_index is not None:
+            self._snapshot_index.append((record_epoch(ts), self.seq, position, self._offset))
+        self._snapshot_seq = self.seq
+        
+        tmp_path = self.state_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2, ensure_ascii=False, default=str)
+        os.replace(tmp_path, self.state_file)
+    
+    def refresh(self) -> int:
+        """Apply events other writers logged since the last read; returns how many"""
+        with self._lock:
+            return self._catch_up()
+    
+    def append(self, event_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Record one event, after any logged by other writers, and apply it to the state"""
+        with self._lock:
+            lock_file = self._flock()
+            try:
+                self._catch_up(exclusive=True)
+                if self._snapshot_seq is None and not os.path.exists(self.snapshots_path):
+                    self._write_snapshot(self._last_ts or self._loaded_at)
+                
+                event = {"seq": self.seq + 1, "ts": datetime.now().isoformat(), "type": event_type, "data": data}
+                line = (json.dumps(event, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+                if self._torn:
+                    line = b"\n" + line
+                    self._torn = False
+                # One write on an O_APPEND descriptor, so a reader never sees
+                # half an event followed by more data
+                fd = os.open(self.events_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, line)
+                finally:
+                    os.close(fd)
+                self.seq = event["seq"]
+                self._last_ts = event["ts"]
+                self._offset += len(line)
+                self.reducer(self.state, event)
+                
+                if self.seq - (self._snapshot_seq or 0) >= self.snapshot_every:
+                    self._write_snapshot(self._last_ts)
+            finally:
+                if lock_file is not None:
+                    lock_file.close()
+            return event
+    
+    def snapshot(self):
+        """Snapshot the current state, including other writers' events, now"""
+        with self._lock:
+            lock_file = self._flock()
+            try:
+                self._catch_up(exclusive=True)
+                self._write_snapshot(self._last_ts or datetime.now().isoformat())
+            finally:
+                if lock_file is not None:
+                    lock_file.close()
+    
+    def _index(self) -> List[Tuple[float, int, int, int]]:
+        if self._snapshot_index is None:
+            index = []
+            if not os.path.exists(self.snapshots_path):
+                return index
+            with open(self.snapshots_path, "rb") as f:
+                position = 0
+                for line in f:
+                    if line.endswith(b"\n"):
+                        snapshot = json.loads(line)
+                        index.append((record_epoch(snapshot["ts"]), snapshot["seq"], position, snapshot["offset"]))
+                    position += len(line)
+            self._snapshot_index = index
+        return self._snapshot_index
+    
+    def _read_snapshot(self, position: int) -> Dict[str, Any]:
+        with open(self.snapshots_path, "rb") as f:
+            f.seek(position)
+            return json.loads(f.readline())
+    
+    def _read_events(self, start: int, end: int) -> Iterator[Dict[str, Any]]:
+        with open(self.events_path, "rb") as f:
+            f.seek(start)
+            while f.tell() < end:
+                try:
+                    event = json.loads(f.readline())
+                except ValueError:
+                    continue  # skipped as torn or unreadable when it was caught up
+                yield event
+    
+    def state_as_of(self, when: Any) -> Optional[Dict[str, Any]]:
+        """
+        State after the last event at or before ``when``
+        
+        Returns ``{"seq", "ts", "state"}``, or None if ``when`` precedes
+        the first snapshot.
+        """
+        target = parse_as_of(when)
+        with self._lock:
+            self._catch_up()
+            index = self._index()
+            i = bisect_right([entry[0] for entry in index], target) - 1
+            if i < 0:
+                return None
+            end = self._offset
+            snapshot = self._read_snapshot(index[i][2])
+        
+        state, seq, ts = snapshot["state"], snapshot["seq"], snapshot["ts"]
+        if os.path.exists(self.events_path):
+            for event in self._read_events(snapshot["offset"], end):
+                if record_epoch(event["ts"]) > target:
+                    break
+                self.reducer(state, event)
+                seq, ts = event["seq"], event["ts"]
+        return {"seq": seq, "ts": ts, "state": state}
+    
+    def iter_events(self, since: Any = None, until: Any = None, event_type: Optional[str] = None,
+                    after_seq: int = 0) -> Iterator[Dict[str, Any]]:
+        """
+        Events in order (``since`` inclusive, ``until`` exclusive)
+        
+        Reading starts at the nearest snapshot before the range instead of
+        the top of the log.
+        """
+        since_epoch = parse_as_of(since) if since is not None else None
+        until_epoch = parse_as_of(until) if until is not None else None
+        with self._lock:
+            self._catch_up()
+            end = self._offset
+            start = 0
+            for epoch, seq, _, offset in self._index():
+                # Skip past a snapshot when every event it covers is filtered out
+                if seq > after_seq and (since_epoch is None or epoch >= since_epoch):
+                    break
+                start = offset
+        if not os.path.exists(self.events_path):
+            return
+        
+        for event in self._read_events(start, end):
+            if event["seq"] <= after_seq:
+                continue
+            epoch = record_epoch(event["ts"])
+            if since_epoch is not None and epoch < since_epoch:
+                continue
+            if until_epoch is not None and epoch >= until_epoch:
+                break
+            if event_type and event["type"] != event_type:
+                continue
+            yield event
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "events": self.seq,
+            "events_since_snapshot": self.seq - (self._snapshot_seq or 0),
+            "snapshot_every": self.snapshot_every,
+            "log_bytes": self._offset
+        }
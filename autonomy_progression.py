@@ -5,10 +5,17 @@ Human maintains ownership with minimal operational input
 """
 
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+import copy
 import json
 from enum import Enum
 
+from autonomy_counters import SharedCounters, counters_path
+from autonomy_events import AutonomyEventLog, parse_as_of
+
+# Additive decision counts, kept in the shared counter log
+DECISION_COUNTERS = ("total_decisions", "ai_decisions", "human_decisions", "human_interventions", "successful_decisions")
+
 class AutonomyLevel(Enum):
     """Autonomy levels"""
     LEVEL_1_HUMAN_LED = "LEVEL_1_HUMAN_LED"  # Current: Human makes most decisions
@@ -18,14 +25,109 @@ class AutonomyLevel(Enum):
     LEVEL_5_FULL_AUTONOMY = "LEVEL_5_FULL_AUTONOMY"  # AI fully autonomous, human owns
     LEVEL_6_COMPLETE_AUTONOMY = "LEVEL_6_COMPLETE_AUTONOMY"  # AI runs everything, human interprets only
 
+
+def _record_decision_metrics(metrics: Dict[str, Any], decision: Dict[str, Any]):
+    """Fold one decision into the progression metrics (decision events logged before counters were shared)"""
+    metrics["total_decisions"] += 1
+    
+    if decision["ai_made"]:
+        metrics["ai_decisions"] += 1
+    else:
+        metrics["human_decisions"] += 1
+    
+    if not decision["ai_made"] and decision["human_approved"]:
+        metrics["human_interventions"] += 1
+    
+    # Update success rate
+    if metrics["total_decisions"] > 0:
+        successful = metrics.get("successful_decisions", 0)
+        if decision["success"]:
+            successful += 1
+        metrics["successful_decisions"] = successful
+        metrics["success_rate"] = (successful / metrics["total_decisions"]) * 100
+    
+    _calculate_autonomy_score(metrics)
+
+
+def _calculate_autonomy_score(metrics: Dict[str, Any]):
+    """Calculate current autonomy score"""
+    if metrics["total_decisions"] == 0:
+        metrics["autonomy_score"] = 0.0
+        return
+    
+    # Base score: percentage of AI decisions
+    ai_decision_ratio = (metrics["ai_decisions"] / metrics["total_decisions"]) * 100
+    
+    # Success bonus: higher success rate = higher autonomy score
+    success_bonus = (metrics["success_rate"] / 100) * 20
+    
+    # Intervention penalty: fewer interventions = higher score
+    if metrics["total_decisions"] > 0:
+        intervention_ratio = (metrics["human_interventions"] / metrics["total_decisions"]) * 100
+        intervention_penalty = min(intervention_ratio * 2, 30)
+    else:
+        intervention_penalty = 0
+    
+    metrics["autonomy_score"] = ai_decision_ratio + success_bonus - intervention_penalty
+    metrics["autonomy_score"] = max(0, min(100, metrics["autonomy_score"]))
+
+
+def _apply_counter_totals(metrics: Dict[str, Any], totals: Dict[str, Any]):
+    """Set the decision counts from shared counter totals and derive the rates"""
+    for name in DECISION_COUNTERS:
+        metrics[name] = int(totals.get(name, 0))
+    if metrics["total_decisions"] > 0:
+        metrics["success_rate"] = (metrics["successful_decisions"] / metrics["total_decisions"]) * 100
+    _calculate_autonomy_score(metrics)
+
+
+def apply_progression_event(progression: Dict[str, Any], event: Dict[str, Any]):
+    """
+    Apply one progression event (decision, counter totals, level upgrade or full state)
+    
+    ``decision`` and ``counters`` events are only in logs written before
+    decision counts moved to the shared counters. An upgrade from a
+    level the state has already left (another worker upgraded first) is
+    ignored.
+    """
+    kind, payload = event["type"], event["data"]
+    if kind == "state":
+        progression.clear()
+        progression.update(copy.deepcopy(payload))
+        return
+    
+    if kind == "decision":
+        _record_decision_metrics(progression["metrics"], payload)
+    elif kind == "counters":
+        _apply_counter_totals(progression.setdefault("metrics", {}), payload)
+    elif kind == "level_upgrade":
+        if payload.get("from_level", progression.get("current_level")) != progression.get("current_level"):
+            return
+        progression["current_level"] = payload["to_level"]
+        progression.setdefault("milestones", []).append(payload)
+    progression["last_updated"] = event["ts"]
+
+
 class AutonomyProgressionSystem:
     """Manages gradual transition to full AI autonomy"""
     
     def __init__(self, memory_file="autonomy_progression.json"):
         self.memory_file = memory_file
-        self.progression = self.load_progression()
+        # Level upgrades are appended to an event log (memory_file is
+        # rewritten at each snapshot); decision counts go to counters
+        # shared by every worker and committed in batches, whose log
+        # history queries also read
+        self.events = AutonomyEventLog(memory_file, apply_progression_event, self.load_progression)
+        self.progression = self.events.state
+        metrics = self.progression.get("metrics", {})
+        self.counters = SharedCounters(counters_path(memory_file),
+                                       baseline={name: metrics.get(name, 0) for name in DECISION_COUNTERS})
+        self._bind()
+    
+    def _bind(self):
+        """Point the level, metrics and milestones attributes at the progression state"""
         self.current_level = AutonomyLevel(self.progression.get("current_level", "LEVEL_1_HUMAN_LED"))
-        self.metrics = self.progression.get("metrics", {
+        self.metrics = self.progression.setdefault("metrics", {
             "total_decisions": 0,
             "ai_decisions": 0,
             "human_decisions": 0,
@@ -33,7 +135,12 @@ class AutonomyProgressionSystem:
             "human_interventions": 0,
             "autonomy_score": 0.0
         })
-        self.milestones = self.progression.get("milestones", [])
+        self.milestones = self.progression.setdefault("milestones", [])
+        self._sync_metrics()
+    
+    def _sync_metrics(self):
+        """Metrics from the shared decision counts"""
+        _apply_counter_totals(self.metrics, self.counters.totals())
     
     def load_progression(self) -> Dict[str, Any]:
         """Load progression state"""
@@ -57,66 +164,39 @@ class AutonomyProgressionSystem:
             }
     
     def save_progression(self):
-        """Save progression state"""
+        """Save progression state edited in place (logged as a full-state event)"""
         self.progression["current_level"] = self.current_level.value
         self.progression["metrics"] = self.metrics
+        self.progression["milestones"] = self.milestones
         self.progression["last_updated"] = datetime.now().isoformat()
         
-        with open(self.memory_file, "w", encoding="utf-8") as f:
-            json.dump(self.progression, f, indent=2, ensure_ascii=False)
+        self.events.append("state", copy.deepcopy(self.progression))
+        self._bind()
     
     def record_decision(self, decision_type: str, ai_made: bool, human_approved: bool, success: bool):
         """Record a decision to track autonomy progression"""
-        self.metrics["total_decisions"] += 1
-        
-        if ai_made:
-            self.metrics["ai_decisions"] += 1
-        else:
-            self.metrics["human_decisions"] += 1
-        
-        if not ai_made and human_approved:
-            self.metrics["human_interventions"] += 1
-        
-        # Update success rate
-        if self.metrics["total_decisions"] > 0:
-            successful = self.metrics.get("successful_decisions", 0)
+        # Counted and checked under the counter lock, so concurrent
+        # decisions in this worker see the totals in turn and upgrade once
+        with self.counters.locked():
+            self.counters.add("total_decisions")
+            self.counters.add("ai_decisions" if ai_made else "human_decisions")
+            if not ai_made and human_approved:
+                self.counters.add("human_interventions")
             if success:
-                successful += 1
-            self.metrics["successful_decisions"] = successful
-            self.metrics["success_rate"] = (successful / self.metrics["total_decisions"]) * 100
-        
-        # Calculate autonomy score
-        self._calculate_autonomy_score()
-        
-        # Check if ready for next level
-        self._check_level_upgrade()
-        
-        self.save_progression()
+                self.counters.add("successful_decisions")
+            self._sync_metrics()
+            
+            # Check if ready for next level
+            self._check_level_upgrade()
     
     def _calculate_autonomy_score(self):
         """Calculate current autonomy score"""
-        if self.metrics["total_decisions"] == 0:
-            self.metrics["autonomy_score"] = 0.0
-            return
-        
-        # Base score: percentage of AI decisions
-        ai_decision_ratio = (self.metrics["ai_decisions"] / self.metrics["total_decisions"]) * 100
-        
-        # Success bonus: higher success rate = higher autonomy score
-        success_bonus = (self.metrics["success_rate"] / 100) * 20
-        
-        # Intervention penalty: fewer interventions = higher score
-        if self.metrics["total_decisions"] > 0:
-            intervention_ratio = (self.metrics["human_interventions"] / self.metrics["total_decisions"]) * 100
-            intervention_penalty = min(intervention_ratio * 2, 30)
-        else:
-            intervention_penalty = 0
-        
-        self.metrics["autonomy_score"] = ai_decision_ratio + success_bonus - intervention_penalty
-        self.metrics["autonomy_score"] = max(0, min(100, self.metrics["autonomy_score"]))
+        _calculate_autonomy_score(self.metrics)
     
     def _check_level_upgrade(self):
         """Check if ready to upgrade autonomy level"""
+        self.events.refresh()  # levels other workers reached
+        self.current_level = AutonomyLevel(self.progression.get("current_level", "LEVEL_1_HUMAN_LED"))
         current_score = self.metrics["autonomy_score"]
         success_rate = self.metrics["success_rate"]
         total_decisions = self.metrics["total_decisions"]
@@ -161,10 +241,7 @@ class AutonomyProgressionSystem:
             "total_decisions": self.metrics["total_decisions"]
         }
         
-        self.milestones.append(milestone)
-        self.progression["milestones"] = self.milestones
-        
-        self.save_progression()
+        self.events.append("level_upgrade", milestone)
         return milestone
     
     def get_autonomy_status(self) -> Dict[str, Any]:
@@ -181,6 +258,38 @@ class AutonomyProgressionSystem:
             "next_level_requirements": self._get_next_level_requirements()
         }
     
+    def get_status_as_of(self, when: Any) -> Optional[Dict[str, Any]]:
+        """
+        Level and metrics as they were at ``when`` (ISO timestamp), or None before the log began
+        
+        Decision counts are summed from the counter log up to the last
+        group commit before ``when``. This worker's pending counts are
+        committed first, and count as of ``when`` if they were all made by
+        then.
+        """
+        target = parse_as_of(when)
+        pending_at = self.counters.pending_since()
+        totals = self.counters.totals()
+        self.counters.commit()
+        result = self.events.state_as_of(target)
+        if result is None:
+            if self.events.seq:
+                return None
+            # Nothing logged yet: only the counts have changed since the state file
+            result = {"seq": 0, "ts": None, "state": copy.deepcopy(self.progression)}
+        state = result["state"]
+        metrics = state.setdefault("metrics", {})
+        if pending_at is None or pending_at > target:
+            totals = self.counters.totals_as_of(target)
+        _apply_counter_totals(metrics, totals)
+        return {
+            "current_level": state.get("current_level", AutonomyLevel.LEVEL_1_HUMAN_LED.value),
+            "metrics": metrics,
+            "milestones": state.get("milestones", []),
+            "seq": result["seq"],
+            "last_change": result["ts"]
+        }
+    
     def _get_next_level_requirements(self) -> Dict[str, Any]:
         """Get requirements for next level"""
         if self.current_level == AutonomyLevel.LEVEL_1_HUMAN_LED:
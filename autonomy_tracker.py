@@ -3,16 +3,77 @@ Autonomy Progression System
 Tracks AI autonomy level and gradually increases independence
 """
 
+import copy
 import json
+import logging
 from datetime import datetime
-from typing import Dict, Any, List
+from itertools import islice
+from typing import Dict, Any, List, Callable, Iterable, Optional, Tuple
+
+from autonomy_counters import SharedCounters, counters_path
+from autonomy_events import AutonomyEventLog
+
+logger = logging.getLogger(__name__)
+
+RISK_LEVELS = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+
+# Autonomy level (%) an AI task needs to auto-execute at each risk level;
+# CRITICAL never auto-executes
+AUTO_EXECUTE_THRESHOLDS = {"LOW": 30, "MEDIUM": 50, "HIGH": 85}
+
+PERFORMANCE_COUNTERS = ("successful_decisions", "failed_decisions", "successful_tweets", "successful_strategies")
+
+
+def _autonomy(ai_tasks: int, total_tasks: int, capabilities: int) -> float:
+    """Share of tasks the AI owns plus 2 points per proven capability, capped at 100"""
+    autonomy = (ai_tasks / total_tasks) * 100
+    
+    # Adjust based on proven capabilities
+    capability_bonus = capabilities * 2
+    autonomy = min(100, autonomy + capability_bonus)
+    
+    return round(autonomy, 1)
+
+
+def apply_tracker_event(data: Dict[str, Any], event: Dict[str, Any]):
+    """Apply one autonomy event to tracker data"""
+    kind, payload = event["type"], event["data"]
+    if kind == "state":
+        data.clear()
+        data.update(copy.deepcopy(payload))
+        return
+    
+    if kind == "capability":
+        data["proven_capabilities"].append(payload)
+    elif kind == "handoff":
+        data["human_tasks"].pop(payload["task"], None)
+        data["ai_tasks"][payload["task"]] = True
+        data["handoff_history"].append(payload)
+    elif kind == "milestone":
+        data["autonomy_milestones"].append(payload)
+    data["current_autonomy"] = _autonomy(len(data["ai_tasks"]), len(data["human_tasks"]) + len(data["ai_tasks"]),
+                                         len(data["proven_capabilities"]))
+
 
 class AutonomyTracker:
     """Track and manage AI autonomy progression"""
     
     def __init__(self, autonomy_file="autonomy_tracker.json"):
         self.autonomy_file = autonomy_file
-        self.data = self.load_data()
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        # Changes are appended to an event log; autonomy_file is rewritten
+        # at each snapshot and only read when there is no log yet
+        self.events = AutonomyEventLog(autonomy_file, apply_tracker_event, self.load_data)
+        self.data = self.events.state
+    
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]):
+        """Subscribe to autonomy changes; called with the tracker data after each change"""
+        self._listeners.append(listener)
+    
+    def remove_listener(self, listener: Callable[[Dict[str, Any]], None]):
+        """Unsubscribe a listener"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
     
     def load_data(self) -> Dict[str, Any]:
         """Load autonomy tracking data"""
@@ -52,22 +113,26 @@ class AutonomyTracker:
             }
     
     def save_data(self):
-        """Save autonomy data"""
-        with open(self.autonomy_file, "w", encoding="utf-8") as f:
-            json.dump(self.data, f, indent=2, ensure_ascii=False)
+        """Save autonomy data edited in place (logged as a full-state event)"""
+        self.events.append("state", copy.deepcopy(self.data))
+        self._notify()
+    
+    def refresh(self):
+        """Pick up changes other workers logged, telling listeners if there were any"""
+        if self.events.refresh():
+            self._notify()
+    
+    def _notify(self):
+        for listener in list(self._listeners):
+            try:
+                listener(self.data)
+            except Exception as e:
+                logger.error(f"Autonomy listener failed: {e}")
     
     def calculate_autonomy(self) -> float:
         """Calculate current autonomy percentage"""
         total_tasks = len(self.data["human_tasks"]) + len(self.data["ai_tasks"])
-        ai_tasks = len(self.data["ai_tasks"])
-        
-        autonomy = (ai_tasks / total_tasks) * 100
-        
-        # Adjust based on proven capabilities
-        capability_bonus = len(self.data["proven_capabilities"]) * 2
-        autonomy = min(100, autonomy + capability_bonus)
-        
-        return round(autonomy, 1)
+        return _autonomy(len(self.data["ai_tasks"]), total_tasks, len(self.data["proven_capabilities"]))
     
     def prove_capability(self, capability: str, evidence: Dict[str, Any] = None):
         """Record that AI has proven a capability"""
@@ -78,55 +143,45 @@ class AutonomyTracker:
             "human_verified": False
         }
         
+        self.refresh()
         if capability not in [p["capability"] for p in self.data["proven_capabilities"]]:
-            self.data["proven_capabilities"].append(proof)
-            self.data["current_autonomy"] = self.calculate_autonomy()
-            self.save_data()
+            self.events.append("capability", proof)
+            self._notify()
             
             # Auto-handoff if capability proven
             self.consider_handoff(capability)
     
     def handoff_task(self, task: str, reason: str, ai_ready: bool = True):
         """Hand off a task from human to AI"""
+        self.refresh()
         if task in self.data["human_tasks"]:
-            del self.data["human_tasks"][task]
-            self.data["ai_tasks"][task] = True
-            
+            ai_tasks = len(self.data["ai_tasks"]) + (task not in self.data["ai_tasks"])
             handoff = {
                 "task": task,
                 "timestamp": datetime.now().isoformat(),
                 "reason": reason,
                 "ai_ready": ai_ready,
                 "autonomy_before": self.data["current_autonomy"],
-                "autonomy_after": self.calculate_autonomy()
+                "autonomy_after": _autonomy(ai_tasks, len(self.data["human_tasks"]) - 1 + ai_tasks,
+                                            len(self.data["proven_capabilities"]))
             }
             
-            self.data["handoff_history"].append(handoff)
-            self.data["current_autonomy"] = self.calculate_autonomy()
+            self.events.append("handoff", handoff)
             
             # Record milestone if significant
+            milestone = None
             if self.data["current_autonomy"] >= 50 and len(self.data["autonomy_milestones"]) == 0:
-                self.data["autonomy_milestones"].append({
-                    "milestone": "50% Autonomy",
-                    "timestamp": datetime.now().isoformat()
-                })
+                milestone = "50% Autonomy"
             elif self.data["current_autonomy"] >= 75 and len(self.data["autonomy_milestones"]) < 2:
-                self.data["autonomy_milestones"].append({
-                    "milestone": "75% Autonomy",
-                    "timestamp": datetime.now().isoformat()
-                })
+                milestone = "75% Autonomy"
             elif self.data["current_autonomy"] >= 95 and len(self.data["autonomy_milestones"]) < 3:
-                self.data["autonomy_milestones"].append({
-                    "milestone": "95% Autonomy",
-                    "timestamp": datetime.now().isoformat()
-                })
+                milestone = "95% Autonomy"
             elif self.data["current_autonomy"] >= 100:
-                self.data["autonomy_milestones"].append({
-                    "milestone": "100% Autonomy - Full AI Operation",
-                    "timestamp": datetime.now().isoformat()
-                })
+                milestone = "100% Autonomy - Full AI Operation"
+            if milestone:
+                self.events.append("milestone", {"milestone": milestone, "timestamp": datetime.now().isoformat()})
             
-            self.save_data()
+            self._notify()
             return handoff
     
     def consider_handoff(self, capability: str):
@@ -150,16 +205,33 @@ class AutonomyTracker:
     
     def get_autonomy_status(self) -> Dict[str, Any]:
         """Get current autonomy status"""
+        self.refresh()
+        return self._status(self.data)
+    
+    @staticmethod
+    def _status(data: Dict[str, Any]) -> Dict[str, Any]:
         return {
-            "current_autonomy": self.data["current_autonomy"],
-            "target_autonomy": self.data["target_autonomy"],
-            "remaining_tasks": list(self.data["human_tasks"].keys()),
-            "ai_tasks": list(self.data["ai_tasks"].keys()),
-            "proven_capabilities": len(self.data["proven_capabilities"]),
-            "milestones": self.data["autonomy_milestones"],
-            "ownership": self.data["ownership"]
+            "current_autonomy": data["current_autonomy"],
+            "target_autonomy": data["target_autonomy"],
+            "remaining_tasks": list(data["human_tasks"].keys()),
+            "ai_tasks": list(data["ai_tasks"].keys()),
+            "proven_capabilities": len(data["proven_capabilities"]),
+            "milestones": data["autonomy_milestones"],
+            "ownership": data["ownership"]
         }
     
+    def get_status_as_of(self, when: Any) -> Optional[Dict[str, Any]]:
+        """Autonomy status as it was at ``when`` (ISO timestamp), or None before the log began"""
+        result = self.events.state_as_of(when)
+        if result is None:
+            return None
+        return dict(self._status(result["state"]), seq=result["seq"], last_change=result["ts"])
+    
+    def get_history(self, since: Any = None, until: Any = None, event_type: Optional[str] = None,
+                    after_seq: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Logged autonomy changes in order (handoff, capability, milestone, state)"""
+        return list(islice(self.events.iter_events(since, until, event_type, after_seq), limit))
+    
     def needs_human_input(self, task_type: str) -> bool:
         """Check if task needs human input"""
         return task_type in self.data["human_tasks"]
@@ -172,49 +244,77 @@ class AutonomyTracker:
 class GradualAutonomySystem:
     """System that gradually increases AI autonomy"""
     
-    def __init__(self):
-        self.tracker = AutonomyTracker()
-        self.ai_performance = {
-            "successful_decisions": 0,
-            "failed_decisions": 0,
-            "successful_tweets": 0,
-            "successful_strategies": 0
-        }
+    def __init__(self, autonomy_file: str = "autonomy_tracker.json"):
+        self.tracker = AutonomyTracker(autonomy_file)
+        # Shared by every worker and kept across restarts
+        self.counters = SharedCounters(counters_path(autonomy_file))
+        
+        # (task_type, risk_level) pairs the AI may auto-execute, rebuilt when
+        # the tracker saves (handoffs, proven capabilities, autonomy changes)
+        self._auto_execute: frozenset = frozenset()
+        self.matrix_version = 0
+        self._rebuild_matrix()
+        self.tracker.add_listener(self._on_tracker_change)
+    
+    def _rebuild_matrix(self):
+        """Compile the task x risk level auto-execute matrix from tracker state"""
+        autonomy = self.tracker.data["current_autonomy"]
+        levels = [level for level, minimum in AUTO_EXECUTE_THRESHOLDS.items() if autonomy >= minimum]
+        self._auto_execute = frozenset(
+            (task, level) for task in self.tracker.data["ai_tasks"] for level in levels
+        )
+        self.matrix_version += 1
+    
+    def _on_tracker_change(self, data: Dict[str, Any]):
+        self._rebuild_matrix()
+    
+    @property
+    def ai_performance(self) -> Dict[str, int]:
+        """Success counts summed over all workers"""
+        totals = self.counters.totals()
+        return {name: int(totals.get(name, 0)) for name in PERFORMANCE_COUNTERS}
     
     def record_success(self, task_type: str):
         """Record successful AI task completion"""
         if task_type == "decision":
-            self.ai_performance["successful_decisions"] += 1
+            self.counters.add("successful_decisions")
         elif task_type == "tweet":
-            self.ai_performance["successful_tweets"] += 1
+            self.counters.add("successful_tweets")
         elif task_type == "strategy":
-            self.ai_performance["successful_strategies"] += 1
+            self.counters.add("successful_strategies")
         
         # Auto-prove capability after threshold
-        if self.ai_performance["successful_decisions"] >= 10:
+        performance = self.ai_performance
+        if performance["successful_decisions"] >= 10:
             self.tracker.prove_capability("successful_low_risk_decisions")
         
-        if self.ai_performance["successful_tweets"] >= 5:
+        if performance["successful_tweets"] >= 5:
             self.tracker.prove_capability("successful_tweet_generation")
         
-        if self.ai_performance["successful_strategies"] >= 3:
+        if performance["successful_strategies"] >= 3:
             self.tracker.prove_capability("successful_strategy_evaluation")
     
     def should_auto_execute(self, task_type: str, risk_level: str = "LOW") -> bool:
-        """Determine if AI should auto-execute"""
-        # Check if task is in AI domain
-        if not self.tracker.can_ai_handle(task_type):
-            return False
-        
-        # Risk-based execution
-        if risk_level == "LOW" and self.tracker.data["current_autonomy"] >= 30:
-            return True
-        elif risk_level == "MEDIUM" and self.tracker.data["current_autonomy"] >= 50:
-            return True
-        elif risk_level == "HIGH" and self.tracker.data["current_autonomy"] >= 85:
-            return True
-        
-        return False
+        """Determine if AI should auto-execute (task must be AI-owned and autonomy high enough)"""
+        return (task_type, risk_level) in self._auto_execute
+    
+    def should_auto_execute_many(self, checks: Iterable[Tuple[str, str]]) -> List[bool]:
+        """Answer many (task_type, risk_level) checks against one matrix version"""
+        allowed = self._auto_execute
+        return [(task_type, risk_level) in allowed for task_type, risk_level in checks]
+    
+    def get_execution_matrix(self) -> Dict[str, Any]:
+        """Full task x risk level matrix for every known task"""
+        allowed = self._auto_execute
+        tasks = list(self.tracker.data["ai_tasks"]) + list(self.tracker.data["human_tasks"])
+        return {
+            "version": self.matrix_version,
+            "autonomy_level": self.tracker.data["current_autonomy"],
+            "risk_levels": list(RISK_LEVELS),
+            "matrix": {
+                task: {level: (task, level) in allowed for level in RISK_LEVELS} for task in tasks
+            }
+        }
     
     def get_autonomy_level(self) -> float:
         """Get current autonomy level as percentage"""
@@ -0,0 +1,343 @@
+"""
+Decision Similarity
+Hashed TF-IDF vectors with MinHash-LSH candidate retrieval over past decisions
+"""
+
+import hashlib
+import math
+import re
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from array import array
+from typing import Dict, Any, List, Optional, Iterable
+
+import numpy as np
+
+N_FEATURES = 2 ** 18
+NUM_PERM = 32
+BANDS = 8                 # 8 bands x 4 rows: pairs above ~0.6 Jaccard almost always collide
+BUCKET_SCAN = 64          # newest entries read from each LSH bucket
+EXACT_SCAN_ROWS = 32      # indexes this small are scored in full; larger ones only ever see candidates
+
+# Operands stay below 2**31, so a * x + b < 2**63 never wraps in uint64
+_MERSENNE = (1 << 31) - 1
+_rng = np.random.default_rng(20251030)  # fixed so band keys are stable across processes
+_PERM_A = _rng.integers(1, _MERSENNE, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _MERSENNE, NUM_PERM, dtype=np.uint64)
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("a an and for in of on or the to with".split())
+_ATTRIBUTE_SKIP = frozenset(("id", "timestamp", "description", "amount", "memory_insights", "data"))
+
+
+def decision_tokens(decision: Dict[str, Any]) -> List[str]:
+    """
+    Terms describing a decision
+    
+    Words of the description plus ``key:value`` attribute terms (category,
+    risk level, amount band and any other short string fields). Accepts a
+    memory decision record (``{"decision": {...}}``), an engine decision
+    or raw decision data; engine decisions are read from their request
+    ``data``, so stored decisions and queries yield terms from the same
+    fields rather than also picking up status and action fields.
+    """
+    if isinstance(decision.get("decision"), dict):
+        decision = decision["decision"]
+    if isinstance(decision.get("data"), dict):
+        decision = decision["data"]
+    
+    tokens = [
+        word for word in _WORD.findall(str(decision.get("description", "")).lower())
+        if len(word) > 1 and word not in _STOPWORDS
+    ]
+    amount = decision.get("amount")
+    if isinstance(amount, (int, float)):
+        tokens.append(f"amount:{int(math.log10(amount)) if amount >= 1 else 0}")
+    
+    for key, value in decision.items():
+        if key in _ATTRIBUTE_SKIP:
+            continue
+        value = getattr(value, "value", value)  # enums
+        if isinstance(value, str) and len(value) <= 40:
+            tokens.append(f"{key}:{value.lower()}")
+    return tokens
+
+
+def _feature(token: str) -> int:
+    return zlib.crc32(token.encode("utf-8")) % N_FEATURES
+
+
+def term_counts(decision: Dict[str, Any]) -> Dict[int, int]:
+    """Hashed feature -> term count for a decision"""
+    counts: Dict[int, int] = {}
+    for token in decision_tokens(decision):
+        feature = _feature(token)
+        counts[feature] = counts.get(feature, 0) + 1
+    return counts
+
+
+def minhash_signature(features: Iterable[int]) -> np.ndarray:
+    """MinHash signature of a feature set"""
+    values = np.fromiter(features, dtype=np.uint64) % np.uint64(_MERSENNE)
+    if not len(values):
+        return np.zeros(NUM_PERM, dtype=np.uint64)
+    hashed = (_PERM_A[:, None] * values[None, :] + _PERM_B[:, None]) % _MERSENNE
+    return hashed.min(axis=1)
+
+
+def band_keys(signature: np.ndarray) -> List[bytes]:
+    """One LSH bucket key per band"""
+    rows = NUM_PERM // BANDS
+    return [bytes([band]) + signature[band * rows:(band + 1) * rows].tobytes() for band in range(BANDS)]
+
+
+def sorted_lookup(keys: np.ndarray, values: np.ndarray, features: np.ndarray) -> np.ndarray:
+    """``values`` at each feature's position in sorted ``keys``, 0 where absent"""
+    if not len(keys):
+        return np.zeros(len(features), dtype=values.dtype)
+    at = np.minimum(np.searchsorted(keys, features), len(keys) - 1)
+    return np.where(keys[at] == features, values[at], 0).astype(values.dtype, copy=False)
+
+
+class SimilarityScorer(ABC):
+    """
+    Top-k cosine search over a CSR matrix of hashed term frequencies
+    
+    Subclasses supply the storage: the CSR arrays, document frequencies,
+    LSH candidates and a per-row summary.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+    
+    @abstractmethod
+    def _rows(self) -> int:
+        """Number of indexed decisions"""
+    
+    @abstractmethod
+    def _csr(self):
+        """(indptr int64, features int32, tf float32) arrays"""
+    
+    @abstractmethod
+    def _doc_frequency(self, features: np.ndarray) -> np.ndarray:
+        """Number of rows containing each feature"""
+    
+    @abstractmethod
+    def _candidates(self, signature: np.ndarray) -> np.ndarray:
+        """Rows sharing an LSH bucket with the signature"""
+    
+    @abstractmethod
+    def _match(self, row: int) -> Dict[str, Any]:
+        """Summary of one row for search results"""
+    
+    def _idf(self, features: np.ndarray) -> np.ndarray:
+        return np.log((1.0 + self._rows()) / (1.0 + self._doc_frequency(features))) + 1.0
+    
+    def _score(self, rows: np.ndarray, query_features: np.ndarray, query_weights: np.ndarray) -> np.ndarray:
+        """Cosine between the query (features sorted, weights normalized) and the given rows"""
+        indptr, features, tf = self._csr()
+        
+        starts, ends = indptr[rows], indptr[rows + 1]
+        lengths = ends - starts
+        nonempty = lengths > 0
+        scores = np.zeros(len(rows), dtype=np.float64)
+        if not nonempty.any():
+            return scores
+        starts, lengths = starts[nonempty], lengths[nonempty]
+        
+        # Flattened positions of every stored term of every candidate row
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        positions = np.arange(lengths.sum()) + offsets
+        row_features = features[positions]
+        weights = tf[positions] * self._idf(row_features)
+        
+        segment_starts = np.cumsum(lengths) - lengths
+        query = sorted_lookup(query_features, query_weights, row_features)
+        dots = np.add.reduceat(weights * query, segment_starts)
+        norms = np.sqrt(np.add.reduceat(weights * weights, segment_starts))
+        scores[nonempty] = dots / np.maximum(norms, 1e-12)
+        return scores
+    
+    def search(self, decision: Dict[str, Any], k: int = 5, min_score: float = 0.1,
+               exact: bool = False) -> List[Dict[str, Any]]:
+        """
+        Top-k most similar indexed decisions
+        
+        Args:
+            decision: Decision data or record to compare against
+            k: Number of results
+            min_score: Minimum cosine similarity
+            exact: Score every row instead of LSH candidates (O(n); for
+                evaluation, not the request path)
+        
+        Returns:
+            Matches, best first: id, score, success and a short summary
+        """
+        counts = term_counts(decision)
+        if not counts:
+            return []
+        signature = None if exact else minhash_signature(counts)
+        
+        with self._lock:
+            return self._search_locked(counts, signature, k, min_score)
+    
+    def _search_locked(self, counts: Dict[int, int], signature: Optional[np.ndarray],
+                       k: int, min_score: float) -> List[Dict[str, Any]]:
+        n = self._rows()
+        if not n:
+            return []
+        query_features = np.fromiter(counts, dtype=np.int64)
+        query_weights = (1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32))) * self._idf(query_features)
+        query_weights /= max(float(np.linalg.norm(query_weights)), 1e-12)
+        order = np.argsort(query_features)
+        query_features, query_weights = query_features[order], query_weights[order]
+        
+        if signature is None or n <= EXACT_SCAN_ROWS:
+            rows = np.arange(n, dtype=np.int64)
+        else:
+            rows = self._candidates(signature)
+            if not len(rows):
+                return []
+        
+        scores = self._score(rows, query_features, query_weights)
+        
+        if len(rows) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        
+        results = []
+        for i in top:
+            score = float(scores[i])
+            if score < min_score:
+                break
+            results.append(dict(self._match(int(rows[i])), score=round(score, 4)))
+        return results
+
+
+class DecisionSimilarityIndex(SimilarityScorer):
+    """
+    Incremental similarity index over decisions
+    
+    Each decision is a row of a CSR-style sparse matrix of hashed term
+    frequencies (features, tf, row pointers in growable arrays). IDF weights
+    are applied at query time from maintained document frequencies, so
+    adding a decision never rewrites earlier rows. MinHash signatures are
+    split into LSH bands whose buckets yield candidates without touching
+    every row; candidates are then scored by exact cosine similarity.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self._indptr = array("q", [0])
+        self._features = array("i")
+        self._tf = array("f")
+        self._df: Dict[int, int] = {}  # feature -> rows containing it, for features seen so far
+        self._buckets: Dict[bytes, List[int]] = {}
+        self._ids: List[str] = []
+        self._first_row: Dict[str, int] = {}
+        self._success = array("b")  # -1 unknown, 0 failed, 1 succeeded
+        self._summaries: List[Dict[str, Any]] = []
+    
+    def __len__(self) -> int:
+        return len(self._ids)
+    
+    # ---- building ----
+    
+    def add(self, decision_record: Dict[str, Any]) -> int:
+        """Index one decision record; returns its row"""
+        counts = term_counts(decision_record)
+        with self._lock:  # numpy views pin the arrays while scoring
+            return self._add_row(decision_record, counts)
+    
+    def _add_row(self, decision_record: Dict[str, Any], counts: Dict[int, int]) -> int:
+        row = len(self._ids)
+        for feature, count in counts.items():
+            self._features.append(feature)
+            self._tf.append(1.0 + math.log(count))
+            self._df[feature] = self._df.get(feature, 0) + 1
+        self._indptr.append(len(self._features))
+        
+        for key in band_keys(minhash_signature(counts)):
+            self._buckets.setdefault(key, []).append(row)
+        
+        decision = decision_record.get("decision", decision_record)
+        decision_id = decision_record.get("id", "")
+        self._ids.append(decision_id)
+        self._first_row.setdefault(decision_id, row)  # outcomes link to the first match
+        success = decision_record.get("success")
+        self._success.append(-1 if success is None else int(bool(success)))
+        self._summaries.append({
+            "timestamp": decision_record.get("timestamp"),
+            "category": getattr(decision.get("category"), "value", decision.get("category")),
+            "risk_level": getattr(decision.get("risk_level"), "value", decision.get("risk_level")),
+            "description": str(decision.get("description", ""))[:120]
+        })
+        return row
+    
+    def set_outcome(self, decision_id: str, success: bool):
+        """Record the outcome of an indexed decision"""
+        row = self._first_row.get(decision_id)
+        if row is not None:
+            self._success[row] = int(bool(success))
+    
+    def export_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Copy of the index as flat arrays (for memory snapshots)
+        
+        Document frequencies become parallel ``df_features``/``df`` arrays
+        sorted by feature; LSH buckets become parallel ``bucket_keys``/
+        ``bucket_rows`` arrays sorted by (key, row), with keys folded to
+        64-bit hashes.
+        """
+        with self._lock:
+            keys, rows = [], []
+            for key, bucket in self._buckets.items():
+                folded = bucket_key_hash(key)
+                keys.extend([folded] * len(bucket))
+                rows.extend(bucket)
+            bucket_keys = np.array(keys, dtype=np.uint64)
+            bucket_rows = np.array(rows, dtype=np.int32)
+            order = np.lexsort((bucket_rows, bucket_keys))
+            df_features = np.array(sorted(self._df), dtype=np.int32)
+            return {
+                "indptr": np.array(self._indptr, dtype=np.int64),
+                "features": np.array(self._features, dtype=np.int32),
+                "tf": np.array(self._tf, dtype=np.float32),
+                "df_features": df_features,
+                "df": np.array([self._df[f] for f in df_features.tolist()], dtype=np.float32),
+                "success": np.array(self._success, dtype=np.int8),
+                "bucket_keys": bucket_keys[order],
+                "bucket_rows": bucket_rows[order]
+            }
+    
+    # ---- storage for SimilarityScorer ----
+    
+    def _rows(self) -> int:
+        return len(self._ids)
+    
+    def _csr(self):
+        return (np.frombuffer(self._indptr, dtype=np.int64),
+                np.frombuffer(self._features, dtype=np.int32),
+                np.frombuffer(self._tf, dtype=np.float32))
+    
+    def _doc_frequency(self, features: np.ndarray) -> np.ndarray:
+        df = self._df
+        return np.fromiter((df.get(f, 0) for f in features.tolist()), dtype=np.float32, count=len(features))
+    
+    def _candidates(self, signature: np.ndarray) -> np.ndarray:
+        found = set()
+        for key in band_keys(signature):
+            found.update(self._buckets.get(key, [])[-BUCKET_SCAN:])
+        return np.fromiter(found, dtype=np.int64, count=len(found))
+    
+    def _match(self, row: int) -> Dict[str, Any]:
+        success = self._success[row]
+        return dict(self._summaries[row], id=self._ids[row], success=None if success < 0 else bool(success))
+
+
+def bucket_key_hash(key: bytes) -> int:
+    """Fold an LSH bucket key to 64 bits"""
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
@@ -4,13 +4,21 @@ AI-selected strategies for autonomous income generation
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 import json
+import threading
+
+from strategy_runner import StrategyRunner
 
 class IncomeStrategy(ABC):
     """Base class for income generation strategies"""
     
+    # How IncomeManager.execute_all runs it: "thread" for I/O-bound work,
+    # "process" for CPU-bound work; an ``async def execute`` runs on an event loop
+    execution_mode = "thread"
+    execution_timeout: Optional[float] = None  # seconds; None = the runner's default
+    
     def __init__(self, name: str, capital_allocation: float):
         self.name = name
         self.capital_allocation = capital_allocation
@@ -18,6 +26,26 @@ class IncomeStrategy(ABC):
         self.revenue = 0.0
         self.start_date = None
         self.performance_history = []
+        self.cancel_event = threading.Event()
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        # Sent to a worker process without the (unpicklable) cancel event
+        state = self.__dict__.copy()
+        state.pop("cancel_event", None)
+        return state
+    
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+        self.cancel_event = threading.Event()
+    
+    @property
+    def cancelled(self) -> bool:
+        """Whether the current run gave up on this strategy; long executions should check it"""
+        return self.cancel_event.is_set()
+    
+    def cancel(self):
+        """Ask a running execution to stop"""
+        self.cancel_event.set()
     
     @abstractmethod
     def execute(self) -> Dict[str, Any]:
@@ -413,9 +441,11 @@ class AffiliateMarketingStrategy(IncomeStrategy):
 class IncomeManager:
     """Manage all income generation strategies"""
     
-    def __init__(self):
+    def __init__(self, runner: Optional[StrategyRunner] = None):
         self.strategies: List[IncomeStrategy] = []
         self.total_capital = 0.0
+        self.runner = runner or StrategyRunner()
+        self.last_run: Optional[Dict[str, Any]] = None  # summary of the latest execute_all
     
     def allocate_capital(self, strategies_config: List[Dict[str, Any]]):
         """Allocate capital to strategies"""
@@ -447,17 +477,22 @@ class IncomeManager:
         for strategy in self.strategies:
             strategy.activate()
     
-    def execute_all(self) -> List[Dict[str, Any]]:
-        """Execute all active strategies"""
-        results = []
-        
-        for strategy in self.strategies:
-            if strategy.status == "ACTIVE":
-                result = strategy.execute()
-                result["strategy"] = strategy.name
-                results.append(result)
+    def execute_all(self, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Execute all active strategies concurrently
         
-        return results
+        Each result carries ``execution`` (mode, status, elapsed); a
+        strategy that fails or overruns ``timeout`` seconds is reported
+        instead of stopping the others. See strategy_runner.StrategyRunner.
+        """
+        active = [strategy for strategy in self.strategies if strategy.status == "ACTIVE"]
+        run = self.runner.run(active, timeout=timeout)
+        self.last_run = run["summary"]
+        return run["results"]
+    
+    def cancel(self):
+        """Stop waiting for the strategies of a running execute_all"""
+        self.runner.cancel()
     
     def get_total_revenue(self) -> float:
         """Get total revenue from all strategies"""
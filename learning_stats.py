@@ -0,0 +1,146 @@
+"""
+Learning Statistics
+Streaming per-(category, amount band) outcome statistics for risk assessment
+"""
+
+import math
+from typing import Dict, Any, List, Optional
+
+PRIOR_SUCCESSES = 1.0    # Beta(1, 1): uniform prior on the success probability
+PRIOR_FAILURES = 1.0
+MIN_OBSERVATIONS = 10    # outcomes in a cell before it may move a risk level
+CONFIDENT_SUCCESS = 0.8  # lower credible bound needed to lower risk one level
+CONFIDENT_FAILURE = 0.5  # upper credible bound below which risk is raised one level
+
+_SEPARATOR = "|"
+
+
+def amount_band(amount: Any) -> int:
+    """Order of magnitude of an amount (0 for anything below 10)"""
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        return 0
+    return int(math.log10(amount)) if amount >= 10 else 0
+
+
+def _cell_key(category: Any, amount: Any) -> str:
+    category = getattr(category, "value", category)
+    return f"{str(category or '').upper()}{_SEPARATOR}{amount_band(amount)}"
+
+
+def welford_update(stats: List[float], value: float):
+    """Add one value to a ``[count, mean, m2]`` accumulator in place"""
+    stats[0] += 1
+    delta = value - stats[1]
+    stats[1] += delta / stats[0]
+    stats[2] += delta * (value - stats[1])
+
+
+def welford_summary(stats: List[float]) -> Dict[str, float]:
+    """Count, mean and sample standard deviation of an accumulator"""
+    count, mean, m2 = stats
+    return {
+        "count": int(count),
+        "mean": round(mean, 4),
+        "std": round(math.sqrt(m2 / (count - 1)), 4) if count > 1 else 0.0
+    }
+
+
+class LearningStats:
+    """
+    Outcome statistics per (category, amount band)
+    
+    Each cell holds a Beta posterior over the success probability and a
+    Welford accumulator per numeric outcome metric. Updates and lookups
+    touch one cell, and the state is plain JSON so it can live in
+    ai_memory.json next to the success-pattern tables.
+    """
+    
+    VERSION = 1
+    
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        self.cells: Dict[str, Dict[str, Any]] = (state or {}).get("cells", {})
+    
+    @classmethod
+    def is_state(cls, state: Any) -> bool:
+        """Whether a stored ``statistics`` value was written by this class"""
+        return isinstance(state, dict) and state.get("version") == cls.VERSION
+    
+    @classmethod
+    def from_records(cls, decisions: List[Dict[str, Any]], outcomes: List[Dict[str, Any]]) -> "LearningStats":
+        """Replay stored outcomes against their decisions"""
+        stats = cls()
+        by_id = {}
+        for decision in decisions:
+            by_id.setdefault(decision.get("id"), decision)
+        previous: Dict[str, bool] = {}
+        for outcome in outcomes:
+            decision = by_id.get(outcome.get("decision_id"))
+            if decision is not None:
+                decision_id = decision.get("id")
+                stats.record_outcome(decision, outcome, previous.get(decision_id))
+                previous[decision_id] = bool(outcome.get("success"))
+        return stats
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable state"""
+        return {"version": self.VERSION, "cells": self.cells}
+    
+    def _cell(self, key: str) -> Dict[str, Any]:
+        cell = self.cells.get(key)
+        if cell is None:
+            cell = self.cells[key] = {"successes": 0, "failures": 0, "metrics": {}}
+        return cell
+    
+    def record_outcome(self, decision_record: Dict[str, Any], outcome: Dict[str, Any],
+                       previous_success: Optional[bool] = None):
+        """
+        Fold one outcome into its decision's cell
+        
+        A decision's earlier outcome (``previous_success``) is replaced in
+        the success counts; metrics keep every observation.
+        """
+        decision = decision_record.get("decision", decision_record)
+        cell = self._cell(_cell_key(decision.get("category"), decision.get("amount")))
+        if previous_success is not None:
+            cell["successes" if previous_success else "failures"] -= 1
+        cell["successes" if outcome.get("success") else "failures"] += 1
+        
+        for name, value in (outcome.get("metrics") or {}).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+                welford_update(cell["metrics"].setdefault(name, [0, 0.0, 0.0]), float(value))
+    
+    def get(self, category: Any, amount: Any) -> Dict[str, Any]:
+        """
+        Posterior summary for a decision's cell
+        
+        Returns:
+            observations, success_probability (posterior mean), a ~95%
+            credible interval (normal approximation), per-metric
+            mean/std/count and the suggested ``risk_adjustment`` in levels
+        """
+        key = _cell_key(category, amount)
+        cell = self.cells.get(key, {"successes": 0, "failures": 0, "metrics": {}})
+        alpha = PRIOR_SUCCESSES + cell["successes"]
+        beta = PRIOR_FAILURES + cell["failures"]
+        mean = alpha / (alpha + beta)
+        spread = 2 * math.sqrt(alpha * beta / ((alpha + beta) ** 2 * (alpha + beta + 1)))
+        lower, upper = max(0.0, mean - spread), min(1.0, mean + spread)
+        observations = cell["successes"] + cell["failures"]
+        
+        adjustment = 0
+        if observations >= MIN_OBSERVATIONS:
+            if lower >= CONFIDENT_SUCCESS:
+                adjustment = -1
+            elif upper < CONFIDENT_FAILURE:
+                adjustment = 1
+        
+        return {
+            "cell": key,
+            "observations": observations,
+            "success_probability": round(mean, 4),
+            "credible_interval": [round(lower, 4), round(upper, 4)],
+            "metrics": {name: welford_summary(stats) for name, stats in cell["metrics"].items()},
+            "risk_adjustment": adjustment
+        }
@@ -0,0 +1,168 @@
+"""
+Memory Journal
+Shared append-only log of new memory records, folded into ai_memory.json by the snapshot writer
+"""
+
+import json
+import logging
+import os
+from typing import Dict, Any, List, Callable, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines: one process per journal
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# apply(entries, seq) saves the entries somewhere durable; seq is the last one folded
+FoldCallback = Callable[[List[Dict[str, Any]], int], None]
+
+
+def journal_path(memory_file: str) -> str:
+    """Journal kept next to a memory file (``x.json`` -> ``x.journal.ndjson``)"""
+    return os.path.splitext(memory_file)[0] + ".journal.ndjson"
+
+
+def json_default(value: Any) -> Any:
+    return getattr(value, "value", str(value))  # enums as their values, as the memory file stores them
+
+
+class MemoryJournal:
+    """
+    Records made since the last fold, shared by worker processes
+    
+    Each new record is one JSON line ``{"seq", "kind", "record"}``
+    appended under an exclusive lock on ``<journal>.lock``, after reading
+    whatever other workers appended, so sequence numbers are unique and
+    in file order. ``fold`` hands every line to the snapshot writer and
+    replaces the journal with a new file holding only a ``fold`` marker
+    with the last folded seq; readers notice the new file and start over
+    from its beginning, skipping anything they have already seen.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.seq = 0            # last seq read or written
+        self.folded = 0         # seq of the last fold marker read
+        self._offset = 0        # end of the last complete line read
+        self._inode = None
+        self._torn = False      # the file ends in a line a crashed writer left unfinished
+    
+    def read(self, exclusive: bool = False) -> List[Dict[str, Any]]:
+        """
+        Entries appended since the last read, in seq order (callers serialize reads)
+        
+        An incomplete last line is left for the next read, as its writer
+        may still be appending it; only under the exclusive lock is it
+        known to be left by a crashed writer, and then it is skipped.
+        """
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            self._offset, self._inode = 0, None
+            return []
+        entries = []
+        with f:
+            stat = os.fstat(f.fileno())
+            if stat.st_ino != self._inode or stat.st_size < self._offset:
+                self._offset, self._inode, self._torn = 0, stat.st_ino, False  # folded since
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    if exclusive:
+                        logger.warning(f"Skipping torn entry at byte {self._offset} of {self.path}")
+                        self._offset += len(line)
+                        self._torn = True
+                    break
+                self._offset += len(line)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping unreadable entry before byte {self._offset} of {self.path}")
+                    continue
+                if entry.get("kind") == "fold":
+                    self.folded = max(self.folded, entry["seq"])
+                    self.seq = max(self.seq, entry["seq"])
+                elif entry["seq"] > self.seq:
+                    self.seq = entry["seq"]
+                    entries.append(entry)
+        return entries
+    
+    def _flock(self):
+        """Exclusive lock on the journal, for appends and folds (None without fcntl)"""
+        if fcntl is None:
+            return None
+        lock_file = open(self.path + ".lock", "a")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+    
+    def append(self, kind: str, record: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Log one record after whatever other writers logged
+        
+        Returns:
+            (the new entry, entries by others read first); the entry holds
+            ``record`` itself, not a copy
+        """
+        lock_file = self._flock()
+        try:
+            earlier = self.read(exclusive=True)
+            entry = {"seq": self.seq + 1, "kind": kind, "record": record}
+            line = (json.dumps(entry, ensure_ascii=False, default=json_default) + "\n").encode("utf-8")
+            if self._torn:
+                line = b"\n" + line
+                self._torn = False
+            # One write on an O_APPEND descriptor, so a reader never sees
+            # half an entry followed by more data
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+                self._inode = os.fstat(fd).st_ino
+            finally:
+                os.close(fd)
+            self.seq = entry["seq"]
+            self._offset += len(line)
+        finally:
+            if lock_file is not None:
+                lock_file.close()
+        return entry, earlier
+    
+    def fold(self, apply: FoldCallback) -> int:
+        """
+        Pass every logged entry to ``apply``, then start a fresh journal
+        
+        Runs under the exclusive lock, so nothing is appended between the
+        two; if ``apply`` raises, the journal is left as it was. This
+        journal's own read position is unaffected.
+        
+        Returns:
+            Number of entries folded
+        """
+        lock_file = self._flock()
+        try:
+            entries, seq = [], 0
+            try:
+                with open(self.path, "rb") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue  # torn or unreadable lines were never acknowledged
+                        seq = max(seq, entry["seq"])
+                        if entry.get("kind") != "fold":
+                            entries.append(entry)
+            except FileNotFoundError:
+                pass
+            apply(entries, seq)
+            if entries:
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(json.dumps({"seq": seq, "kind": "fold"}) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            return len(entries)
+        finally:
+            if lock_file is not None:
+                lock_file.close()
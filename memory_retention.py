@@ -0,0 +1,385 @@
+"""
+Memory Retention
+Hot/warm/cold tiers for AI memory records so ai_memory.json stays small
+"""
+
+import gzip
+import json
+import os
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+MEMORY_ARCHIVE_DIR = os.getenv("MEMORY_ARCHIVE_DIR", "memory_archive")
+
+# Per record type: days kept in ai_memory.json (hot), then days kept as
+# plain NDJSON segments (warm) before being compressed (cold). None keeps
+# records in that tier forever.
+DEFAULT_RETENTION_POLICIES = {
+    "events": {"hot_days": 30, "warm_days": 180},
+    "decisions": {"hot_days": 30, "warm_days": 365},
+    "outcomes": {"hot_days": 30, "warm_days": 365},
+    "learnings": {"hot_days": 365, "warm_days": None},
+}
+
+TIERS = ("warm", "cold")
+
+
+def record_epoch(timestamp: Optional[str]) -> float:
+    """ISO timestamp -> epoch seconds (0.0 when missing or malformed)"""
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _json_default(obj: Any) -> Any:
+    """Enums (RiskLevel, DecisionCategory) are stored by value, as save_memories does"""
+    return obj.value if hasattr(obj, "value") else str(obj)
+
+
+def _month_end(month: str) -> float:
+    """Epoch at the start of the month after ``YYYY-MM``"""
+    year, number = map(int, month.split("-"))
+    if number == 12:
+        return datetime(year + 1, 1, 1).timestamp()
+    return datetime(year, number + 1, 1).timestamp()
+
+
+class MemoryRetention:
+    """Move aged memory records out of the hot file into monthly segments"""
+    
+    def __init__(self, directory: str = MEMORY_ARCHIVE_DIR,
+                 policies: Optional[Dict[str, Dict[str, Optional[int]]]] = None):
+        self.directory = directory
+        self.policies = {kind: dict(policy) for kind, policy in DEFAULT_RETENTION_POLICIES.items()}
+        for kind, policy in (policies or {}).items():
+            self.policies.setdefault(kind, {"hot_days": None, "warm_days": None}).update(policy)
+        self.cold_extension = ".ndjson.zst" if ZSTD_AVAILABLE else ".ndjson.gz"
+        self.reload()
+    
+    # ---- layout ----
+    
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, "index.json")
+    
+    def _segment_path(self, tier: str, kind: str, month: str, extension: Optional[str] = None) -> str:
+        if extension is None:
+            extension = ".ndjson" if tier == "warm" else self.cold_extension
+        return os.path.join(self.directory, tier, kind, month + extension)
+    
+    def _load_index(self) -> Dict[str, Any]:
+        """
+        Segment index: tier -> kind -> month -> {count, first, last, file},
+        plus ``ids``: kind -> record ID -> month
+        
+        ``first``/``last`` are epoch bounds so range queries only open the
+        segments they overlap; ``ids`` lets lookups open only the month
+        holding the record.
+        """
+        try:
+            with open(self._index_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {tier: {} for tier in TIERS}
+    
+    def reload(self):
+        """Re-read the segment index (after another process archived records)"""
+        self._index = self._load_index()
+        if "ids" not in self._index:
+            self._index["ids"] = self._scan_ids()  # index written before IDs were kept; saved with the next change
+    
+    def _scan_ids(self) -> Dict[str, Dict[str, str]]:
+        """Record ID -> month for every archived record, read from the segments"""
+        ids: Dict[str, Dict[str, str]] = {}
+        segments = sorted((entry["first"], tier, kind, month) for tier in TIERS
+                          for kind, months in self._index.get(tier, {}).items()
+                          for month, entry in months.items())
+        for _, tier, kind, month in segments:  # oldest first, so a reused ID maps to its newest month
+            for record in self._segment_records(tier, kind, month):
+                if record.get("id") is not None:
+                    ids.setdefault(kind, {})[str(record["id"])] = month
+        return ids
+    
+    def _save_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._index, f, indent=2)
+        os.replace(tmp_path, self._index_path)
+    
+    # ---- segment io ----
+    
+    @staticmethod
+    def _compress(data: bytes, path: str) -> bytes:
+        if path.endswith(".zst"):
+            return zstandard.ZstdCompressor(level=10).compress(data)
+        return gzip.compress(data, compresslevel=9)
+    
+    @staticmethod
+    def _decompress(data: bytes, path: str) -> bytes:
+        if path.endswith(".zst"):
+            if not ZSTD_AVAILABLE:
+                raise RuntimeError(f"zstandard is required to read {path}")
+            return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+        return gzip.decompress(data)
+    
+    def _read_segment(self, tier: str, kind: str, month: str) -> bytes:
+        entry = self._index[tier][kind][month]
+        path = os.path.join(self.directory, entry["file"])
+        with open(path, "rb") as f:
+            data = f.read()
+        return data if tier == "warm" else self._decompress(data, path)
+    
+    @staticmethod
+    def _lines(data: bytes) -> List[str]:
+        """Complete lines of a segment (a crash mid-append can leave a partial last line)"""
+        lines = data.decode("utf-8").split("\n")
+        return [line for line in lines[:-1] if line]
+    
+    def _segment_records(self, tier: str, kind: str, month: str) -> Iterator[Dict[str, Any]]:
+        for line in self._lines(self._read_segment(tier, kind, month)):
+            yield json.loads(line)
+    
+    def _write_segment(self, tier: str, kind: str, month: str, data: bytes, bounds: Tuple[int, float, float]):
+        """Atomically (re)write a whole segment and record it in the index"""
+        path = self._segment_path(tier, kind, month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = data if tier == "warm" else self._compress(data, path)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        previous = self._index[tier].get(kind, {}).get(month)
+        if previous and os.path.join(self.directory, previous["file"]) != path:
+            os.remove(os.path.join(self.directory, previous["file"]))  # e.g. .gz rewritten as .zst
+        count, first, last = bounds
+        self._index[tier].setdefault(kind, {})[month] = {
+            "count": count,
+            "first": first,
+            "last": last,
+            "file": os.path.relpath(path, self.directory)
+        }
+    
+    # ---- tier movement ----
+    
+    def archive(self, memories: Dict[str, Any], now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Apply retention policies
+        
+        Records older than their hot window are removed from ``memories``
+        (in place) and appended to warm segments; warm months older than
+        the warm window are compressed into cold segments. Segments are
+        written before the caller saves the trimmed hot file, so a crash in
+        between can at worst duplicate records, never lose them.
+        
+        Returns:
+            Records moved out of the hot tier per kind
+        """
+        now_ts = (now or datetime.now()).timestamp()
+        moved = {}
+        
+        for kind, policy in self.policies.items():
+            records = memories.get(kind)
+            if not records or policy.get("hot_days") is None:
+                continue
+            cutoff = now_ts - policy["hot_days"] * 86400
+            keep, expired = [], {}
+            for record in records:
+                timestamp = record_epoch(record.get("timestamp"))
+                if timestamp < cutoff:
+                    month = datetime.fromtimestamp(timestamp).strftime("%Y-%m")
+                    expired.setdefault(month, []).append((timestamp, record))
+                else:
+                    keep.append(record)
+            if not expired:
+                continue
+            for month, items in expired.items():
+                self._append_warm(kind, month, items)
+            records[:] = keep
+            moved[kind] = sum(len(items) for items in expired.values())
+        
+        if self._demote_to_cold(now_ts) or moved:
+            self._save_index()
+        return moved
+    
+    def _append_warm(self, kind: str, month: str, items: List[Tuple[float, Dict[str, Any]]]):
+        """
+        Append records to a warm month segment
+        
+        Segments are appended to, not rewritten, so they are in time order
+        only within each append; readers sort what they read.
+        """
+        items = sorted(items, key=lambda item: item[0])
+        data = "".join(json.dumps(record, ensure_ascii=False, default=_json_default) + "\n"
+                       for _, record in items).encode("utf-8")
+        existing = self._index["warm"].get(kind, {}).get(month)
+        path = self._segment_path("warm", kind, month)
+        if existing:
+            path = os.path.join(self.directory, existing["file"])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "ab") as f:
+            if f.tell():
+                with open(path, "rb") as tail:
+                    tail.seek(-1, os.SEEK_END)
+                    if tail.read(1) != b"\n":
+                        data = b"\n" + data  # leave a torn line from a crashed append on its own
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        
+        first, last = items[0][0], items[-1][0]
+        count = len(items)
+        if existing:
+            count += existing["count"]
+            first, last = min(first, existing["first"]), max(last, existing["last"])
+        self._index["warm"].setdefault(kind, {})[month] = {
+            "count": count,
+            "first": first,
+            "last": last,
+            "file": os.path.relpath(path, self.directory)
+        }
+        ids = self._index["ids"].setdefault(kind, {})
+        for _, record in items:
+            if record.get("id") is not None:
+                ids[str(record["id"])] = month
+    
+    def _demote_to_cold(self, now_ts: float) -> int:
+        """Compress expired warm months; returns segments moved"""
+        demoted = 0
+        for kind, months in self._index["warm"].items():
+            warm_days = self.policies.get(kind, {}).get("warm_days")
+            if warm_days is None:
+                continue
+            cutoff = now_ts - (self.policies[kind].get("hot_days") or 0) * 86400 - warm_days * 86400
+            for month in sorted(months):
+                if _month_end(month) > cutoff:
+                    continue
+                entry = months[month]
+                lines = self._lines(self._read_segment("warm", kind, month))
+                bounds = (entry["count"], entry["first"], entry["last"])
+                cold = self._index["cold"].get(kind, {}).get(month)
+                if cold:
+                    lines = self._lines(self._read_segment("cold", kind, month)) + lines
+                    bounds = (cold["count"] + entry["count"], min(cold["first"], entry["first"]),
+                              max(cold["last"], entry["last"]))
+                data = "".join(line + "\n" for line in lines).encode("utf-8")
+                self._write_segment("cold", kind, month, data, bounds)
+                os.remove(os.path.join(self.directory, entry["file"]))
+                del months[month]
+                demoted += 1
+        return demoted
+    
+    # ---- queries ----
+    
+    def iter_records(
+        self,
+        kind: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        tiers: Tuple[str, ...] = TIERS
+    ) -> Iterator[Tuple[float, Dict[str, Any]]]:
+        """
+        Archived ``(epoch, record)`` pairs of one kind in time order
+        
+        Only segments overlapping ``[start, end)`` are opened.
+        """
+        segments = []
+        for tier in tiers:
+            for month, entry in self._index.get(tier, {}).get(kind, {}).items():
+                if start is not None and entry["last"] < start:
+                    continue
+                if end is not None and entry["first"] >= end:
+                    continue
+                segments.append((entry["first"], tier, month))
+        
+        for _, tier, month in sorted(segments):
+            items = []
+            for record in self._segment_records(tier, kind, month):
+                timestamp = record_epoch(record.get("timestamp"))
+                if start is not None and timestamp < start:
+                    continue
+                if end is not None and timestamp >= end:
+                    continue
+                items.append((timestamp, record))
+            items.sort(key=lambda item: item[0])
+            yield from items
+    
+    def _segments_newest_first(self, kind: str) -> List[Tuple[str, str]]:
+        segments = [(entry["last"], tier, month) for tier in TIERS
+                    for month, entry in self._index.get(tier, {}).get(kind, {}).items()]
+        return [(tier, month) for _, tier, month in sorted(segments, reverse=True)]
+    
+    def _locate(self, kind: str, record_id: str, key: str) -> Optional[Tuple[str, str, List[str], int]]:
+        """(tier, month, segment lines, line number) of an archived record"""
+        if key == "id":
+            month = self._index["ids"].get(kind, {}).get(str(record_id))
+            if month is None:
+                return None
+            segments = [(tier, month) for tier in TIERS if month in self._index.get(tier, {}).get(kind, {})]
+        else:
+            segments = self._segments_newest_first(kind)
+        needle = json.dumps(record_id, ensure_ascii=False).encode("utf-8")
+        for tier, month in segments:
+            data = self._read_segment(tier, kind, month)
+            if needle not in data:
+                continue
+            lines = self._lines(data)
+            for number, line in enumerate(lines):
+                if json.loads(line).get(key) == record_id:
+                    return tier, month, lines, number
+        return None
+    
+    def find(self, kind: str, record_id: str, key: str = "id") -> Optional[Dict[str, Any]]:
+        """
+        Archived record whose ``key`` field is ``record_id``, or None
+        
+        Lookups by ``id`` open only the month the index maps the ID to;
+        other keys search segments newest first, skipping any that do not
+        contain the value, so only the matching segment is parsed.
+        """
+        found = self._locate(kind, record_id, key)
+        if found is None:
+            return None
+        _, _, lines, number = found
+        return json.loads(lines[number])
+    
+    def update(self, kind: str, record_id: str, changes: Dict[str, Any], key: str = "id") -> bool:
+        """Merge ``changes`` into an archived record, rewriting its segment; False if not archived"""
+        found = self._locate(kind, record_id, key)
+        if found is None:
+            return False
+        tier, month, lines, number = found
+        record = json.loads(lines[number])
+        record.update(changes)
+        lines[number] = json.dumps(record, ensure_ascii=False, default=_json_default)
+        entry = self._index[tier][kind][month]
+        data = "".join(line + "\n" for line in lines).encode("utf-8")
+        self._write_segment(tier, kind, month, data, (entry["count"], entry["first"], entry["last"]))
+        self._save_index()
+        return True
+    
+    def count(self, kind: str) -> int:
+        """Archived records of one kind across tiers"""
+        return sum(entry["count"] for tier in TIERS
+                   for entry in self._index.get(tier, {}).get(kind, {}).values())
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Segment and record counts per tier"""
+        stats = {}
+        for tier in TIERS:
+            kinds = self._index.get(tier, {})
+            stats[tier] = {
+                kind: {"segments": len(months), "records": sum(e["count"] for e in months.values())}
+                for kind, months in kinds.items()
+            }
+        stats["cold_compression"] = "zstd" if ZSTD_AVAILABLE else "gzip"
+        return stats
@@ -0,0 +1,545 @@
+"""
+Memory Snapshot
+Read-only memory-mapped generations of the AI memory indexes, shared by worker processes
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple, Callable, Iterator
+
+import numpy as np
+
+from decision_similarity import (
+    DecisionSimilarityIndex, SimilarityScorer, BUCKET_SCAN, band_keys, bucket_key_hash, sorted_lookup
+)
+from memory_journal import MemoryJournal, json_default
+from memory_retention import MemoryRetention, record_epoch
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+MEMORY_SNAPSHOT_INTERVAL = float(os.getenv("MEMORY_SNAPSHOT_INTERVAL", "30"))
+SNAPSHOT_REFRESH_SECONDS = 1.0   # how often readers re-check the pointer file
+KEEP_GENERATIONS = 2             # older generation files are removed by the writer
+
+MAGIC = b"AIMS"
+FORMAT_VERSION = 4  # 4: sparse document frequencies; 3: hot records and aggregate states
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct("<4sHHI")  # magic, version, reserved, header length
+
+# Fixed-width decision records; strings live in the string table as
+# (offset, length) pairs, categories and risk levels in the label table
+DECISION_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("id_offset", "<u4"),
+    ("id_length", "<u4"),
+    ("description_offset", "<u4"),
+    ("description_length", "<u4"),
+    ("category", "<u2"),
+    ("risk_level", "<u2"),
+    ("success", "i1"),         # -1 unknown, 0 failed, 1 succeeded
+    ("reserved", "V11")
+])
+
+SUMMARY_KINDS = ("events", "decisions", "outcomes", "learnings")
+
+# fold(memory_file, memories, entries, retention) applies journal entries to the
+# loaded memory file and saves it
+FoldCallback = Callable[[str, Dict[str, Any], List[Dict[str, Any]], Optional[MemoryRetention]], None]
+
+
+def _label(value: Any) -> Optional[str]:
+    value = getattr(value, "value", value)
+    return None if value is None else str(value)
+
+
+class _StringTable:
+    """Append-only UTF-8 blob addressed by (offset, length)"""
+    
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._size = 0
+    
+    def add(self, text: str) -> Tuple[int, int]:
+        data = text.encode("utf-8")
+        offset = self._size
+        self._chunks.append(data)
+        self._size += len(data)
+        return offset, len(data)
+    
+    def to_array(self) -> np.ndarray:
+        return np.frombuffer(b"".join(self._chunks), dtype=np.uint8)
+
+
+def _id_key(record_id: Any) -> int:
+    return bucket_key_hash(str(record_id).encode("utf-8"))
+
+
+def _record_arrays(kind: str, records: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Hot records of one kind in time order, as JSON in one blob"""
+    timed = sorted(((record_epoch(r.get("timestamp")), i) for i, r in enumerate(records)))
+    blob = _StringTable()
+    offsets = np.zeros(len(timed) + 1, dtype=np.int64)
+    for row, (_, i) in enumerate(timed):
+        _, length = blob.add(json.dumps(records[i], ensure_ascii=False, default=json_default))
+        offsets[row + 1] = offsets[row] + length
+    arrays = {
+        f"{kind}_times": np.array([t for t, _ in timed], dtype=np.float64),
+        f"{kind}_offsets": offsets,
+        f"{kind}_records": blob.to_array()
+    }
+    if kind == "decisions":
+        keys = np.array([_id_key(records[i].get("id")) for _, i in timed], dtype=np.uint64)
+        order = np.argsort(keys, kind="stable")
+        arrays["decisions_id_keys"] = keys[order]
+        arrays["decisions_id_rows"] = order.astype(np.int64)
+    return arrays
+
+
+def build_snapshot(memories: Dict[str, Any], retention: Optional[MemoryRetention] = None,
+                   journal_seq: int = 0) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Sections of a snapshot for the given hot memories and archive
+    
+    ``journal_seq`` is the last journal entry folded into ``memories``.
+    
+    Returns:
+        (header metadata, named arrays)
+    """
+    decisions = []
+    if retention:
+        decisions.extend(retention.iter_records("decisions"))
+    decisions.extend((record_epoch(d.get("timestamp")), d) for d in memories.get("decisions", []))
+    decisions.sort(key=lambda item: item[0])  # similarity row i == table row i
+    
+    # An outcome may have been recorded after its decision was archived
+    outcomes = {o.get("decision_id"): o.get("success") for o in memories.get("outcomes", [])}
+    
+    strings = _StringTable()
+    labels: List[Optional[str]] = [None]
+    label_ids: Dict[Optional[str], int] = {None: 0}
+    table = np.zeros(len(decisions), dtype=DECISION_DTYPE)
+    index = DecisionSimilarityIndex()
+    
+    for row, (timestamp, record) in enumerate(decisions):
+        decision = record.get("decision", {})
+        success = record.get("success")
+        if success is None:
+            success = outcomes.get(record.get("id"))
+            if success is not None:
+                record = dict(record, success=success)
+        index.add(record)
+        
+        entry = table[row]
+        entry["timestamp"] = timestamp
+        entry["id_offset"], entry["id_length"] = strings.add(str(record.get("id", "")))
+        entry["description_offset"], entry["description_length"] = strings.add(
+            str(decision.get("description", ""))[:120])
+        for field in ("category", "risk_level"):
+            label = _label(decision.get(field))
+            if label not in label_ids:
+                label_ids[label] = len(labels)
+                labels.append(label)
+            entry[field] = label_ids[label]
+        entry["success"] = -1 if success is None else int(bool(success))
+    
+    arrays = {"strings": strings.to_array(), "decisions": table}
+    arrays.update({f"similarity_{name}": values for name, values in index.export_arrays().items()})
+    for kind in SUMMARY_KINDS:
+        arrays.update(_record_arrays(kind, memories.get(kind, [])))
+    
+    successful = table["success"] == 1
+    metadata = {
+        "labels": labels,
+        "watermark": float(table["timestamp"][-1]) if len(table) else 0.0,
+        "journal_seq": journal_seq,
+        "states": {name: memories.get(name) for name in ("patterns", "statistics")},
+        "aggregates": {
+            "decisions": len(table),
+            "successful_decisions": int(successful.sum()),
+            "archived": {kind: retention.count(kind) for kind in SUMMARY_KINDS} if retention else {},
+            "hot": {kind: len(memories.get(kind, [])) for kind in SUMMARY_KINDS}
+        }
+    }
+    return metadata, arrays
+
+
+def write_snapshot_file(path: str, generation: int, metadata: Dict[str, Any], arrays: Dict[str, np.ndarray]):
+    """
+    Write one generation file
+    
+    Layout: fixed preamble, JSON header (metadata plus a section directory
+    of name -> offset/dtype/shape), then each array padded to a 64-byte
+    boundary so readers can map them in place.
+    """
+    sections = {}
+    offset = 0
+    for name, values in arrays.items():
+        sections[name] = {
+            "offset": offset,
+            "dtype": values.dtype.descr if values.dtype.names else values.dtype.str,
+            "shape": list(values.shape)
+        }
+        offset += -(-values.nbytes // ALIGNMENT) * ALIGNMENT
+    
+    header = dict(metadata, generation=generation, created=time.time(), sections=sections)
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = -(-(_PREAMBLE.size + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+    
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, 0, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * (data_start - _PREAMBLE.size - len(header_bytes)))
+        for name, values in arrays.items():
+            data = np.ascontiguousarray(values).tobytes()
+            f.write(data)
+            f.write(b"\0" * (-len(data) % ALIGNMENT))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class MemorySnapshot(SimilarityScorer):
+    """
+    One mapped generation
+    
+    Every array is a zero-copy view into the read-only mapping, so all
+    processes that open the same generation share its pages. Hot records
+    are decoded one at a time as they are read.
+    """
+    
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, header_length = _PREAMBLE.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Not a memory snapshot (version {FORMAT_VERSION}): {path}")
+        header = json.loads(self._map[_PREAMBLE.size:_PREAMBLE.size + header_length])
+        data_start = -(-(_PREAMBLE.size + header_length) // ALIGNMENT) * ALIGNMENT
+        
+        self.generation: int = header["generation"]
+        self.created: float = header["created"]
+        self.watermark: float = header["watermark"]
+        self.journal_seq: int = header["journal_seq"]
+        self.aggregates: Dict[str, Any] = header["aggregates"]
+        self.states: Dict[str, Any] = header["states"]  # stored success tables and statistics
+        self.labels: List[Optional[str]] = header["labels"]
+        
+        self._arrays: Dict[str, np.ndarray] = {}
+        for name, section in header["sections"].items():
+            spec = section["dtype"]
+            dtype = np.dtype([tuple(field) for field in spec] if isinstance(spec, list) else spec)
+            count = int(np.prod(section["shape"]))
+            self._arrays[name] = np.frombuffer(self._map, dtype=dtype, count=count,
+                                               offset=data_start + section["offset"])
+        self.decisions = self._arrays["decisions"]
+        self._strings = self._arrays["strings"]
+    
+    def __len__(self) -> int:
+        return len(self.decisions)
+    
+    def _string(self, offset: int, length: int) -> str:
+        return self._strings[offset:offset + length].tobytes().decode("utf-8")
+    
+    def count_since(self, kind: str, since: float) -> int:
+        """Hot records of ``kind`` at or after epoch ``since``"""
+        times = self._arrays[f"{kind}_times"]
+        return int(len(times) - np.searchsorted(times, since, side="left"))
+    
+    def hot_count(self, kind: str) -> int:
+        return len(self._arrays[f"{kind}_times"])
+    
+    def record(self, kind: str, row: int) -> Dict[str, Any]:
+        """Decode hot record ``row`` of ``kind`` (rows are in time order)"""
+        offsets = self._arrays[f"{kind}_offsets"]
+        data = self._arrays[f"{kind}_records"][offsets[row]:offsets[row + 1]]
+        return json.loads(data.tobytes().decode("utf-8"))
+    
+    def records(self, kind: str, start: Optional[float] = None, end: Optional[float] = None
+                ) -> Iterator[Tuple[float, int, Dict[str, Any]]]:
+        """(epoch, row, record) for hot records of ``kind`` in [start, end), oldest first"""
+        times = self._arrays[f"{kind}_times"]
+        first = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+        stop = len(times) if end is None else int(np.searchsorted(times, end, side="left"))
+        for row in range(first, stop):
+            yield float(times[row]), row, self.record(kind, row)
+    
+    def find_decision(self, decision_id: str) -> Optional[Dict[str, Any]]:
+        """Hot decision record by ID"""
+        keys, rows = self._arrays["decisions_id_keys"], self._arrays["decisions_id_rows"]
+        key = np.uint64(_id_key(decision_id))
+        at = int(np.searchsorted(keys, key, side="left"))
+        while at < len(keys) and keys[at] == key:
+            record = self.record("decisions", int(rows[at]))
+            if record.get("id") == decision_id:
+                return record
+            at += 1
+        return None
+    
+    def decision(self, row: int) -> Dict[str, Any]:
+        """Decode one decision record"""
+        entry = self.decisions[row]
+        success = int(entry["success"])
+        return {
+            "id": self._string(int(entry["id_offset"]), int(entry["id_length"])),
+            "timestamp": datetime.fromtimestamp(float(entry["timestamp"])).isoformat(),
+            "category": self.labels[entry["category"]],
+            "risk_level": self.labels[entry["risk_level"]],
+            "description": self._string(int(entry["description_offset"]), int(entry["description_length"])),
+            "success": None if success < 0 else bool(success)
+        }
+    
+    # ---- storage for SimilarityScorer ----
+    
+    def _rows(self) -> int:
+        return len(self.decisions)
+    
+    def _csr(self):
+        return (self._arrays["similarity_indptr"], self._arrays["similarity_features"],
+                self._arrays["similarity_tf"])
+    
+    def _doc_frequency(self, features: np.ndarray) -> np.ndarray:
+        return sorted_lookup(self._arrays["similarity_df_features"], self._arrays["similarity_df"], features)
+    
+    def _candidates(self, signature: np.ndarray) -> np.ndarray:
+        keys, rows = self._arrays["similarity_bucket_keys"], self._arrays["similarity_bucket_rows"]
+        found = []
+        for key in band_keys(signature):
+            folded = np.uint64(bucket_key_hash(key))
+            start = np.searchsorted(keys, folded, side="left")
+            end = np.searchsorted(keys, folded, side="right")
+            found.append(rows[max(start, end - BUCKET_SCAN):end])
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found)).astype(np.int64)
+    
+    def _match(self, row: int) -> Dict[str, Any]:
+        return self.decision(row)
+
+
+def _read_memories(memory_file: str) -> Dict[str, Any]:
+    try:
+        with open(memory_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+class MemorySnapshots:
+    """
+    Generation files plus the ``CURRENT`` pointer in one directory
+    
+    One process (whichever holds ``writer.lock``) rebuilds generations;
+    every process maps the generation ``CURRENT`` names and switches when
+    the pointer changes.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._current: Optional[MemorySnapshot] = None
+        self._checked = 0.0
+        self._pointer_mtime = None
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock_file = None
+        self._sources = None
+    
+    @property
+    def _pointer_path(self) -> str:
+        return os.path.join(self.directory, "CURRENT")
+    
+    def _generation_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"gen-{generation:08d}.bin")
+    
+    # ---- readers ----
+    
+    def current(self, recheck: bool = False) -> Optional[MemorySnapshot]:
+        """Mapped current generation (None before the first one is written); ``recheck`` skips the refresh delay"""
+        now = time.monotonic()
+        if self._current is not None and not recheck and now - self._checked < SNAPSHOT_REFRESH_SECONDS:
+            return self._current
+        with self._lock:
+            self._checked = now
+            try:
+                stat = os.stat(self._pointer_path)
+            except FileNotFoundError:
+                return self._current
+            mtime = (stat.st_ino, stat.st_mtime_ns)  # replaced on every write, even within one clock tick
+            if mtime != self._pointer_mtime:
+                self._pointer_mtime = mtime
+                try:
+                    with open(self._pointer_path, "r") as f:
+                        name = f.read().strip()
+                    if self._current is None or os.path.basename(self._current.path) != name:
+                        # The old mapping is released once its last reader drops it
+                        self._current = MemorySnapshot(os.path.join(self.directory, name))
+                except (OSError, ValueError) as e:
+                    logger.error(f"Error opening memory snapshot: {e}")
+            return self._current
+    
+    # ---- writer ----
+    
+    def _latest_generation(self) -> int:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+        generations = [int(name[4:12]) for name in names if name.startswith("gen-") and name.endswith(".bin")]
+        return max(generations, default=0)
+    
+    def write(self, memories: Dict[str, Any], retention: Optional[MemoryRetention] = None,
+              journal_seq: int = 0) -> int:
+        """Write a new generation, point ``CURRENT`` at it and prune old ones"""
+        os.makedirs(self.directory, exist_ok=True)
+        metadata, arrays = build_snapshot(memories, retention, journal_seq)
+        generation = self._latest_generation() + 1
+        path = self._generation_path(generation)
+        write_snapshot_file(path, generation, metadata, arrays)
+        
+        tmp_path = self._pointer_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(os.path.basename(path))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._pointer_path)
+        
+        for old in range(generation - KEEP_GENERATIONS, 0, -1):
+            old_path = self._generation_path(old)
+            if not os.path.exists(old_path):
+                break
+            os.remove(old_path)  # processes still mapping it keep their pages
+        return generation
+    
+    def _acquire_writer_lock(self) -> bool:
+        if not FCNTL_AVAILABLE:
+            return True  # every process writes; the pointer swap keeps readers consistent
+        os.makedirs(self.directory, exist_ok=True)
+        lock_file = open(os.path.join(self.directory, "writer.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file  # held for the life of the process
+        return True
+    
+    def _source_state(self, memory_file: str, retention: Optional[MemoryRetention],
+                      journal: Optional[MemoryJournal] = None) -> Tuple:
+        paths = [memory_file] + ([os.path.join(retention.directory, "index.json")] if retention else [])
+        if journal is not None:
+            paths.append(journal.path)
+        state = []
+        for path in paths:
+            try:
+                state.append(os.stat(path).st_mtime_ns)
+            except FileNotFoundError:
+                state.append(None)
+        return tuple(state)
+    
+    def refresh_from_disk(self, memory_file: str, retention: Optional[MemoryRetention] = None,
+                          journal: Optional[MemoryJournal] = None, fold: Optional[FoldCallback] = None
+                          ) -> Optional[int]:
+        """
+        Rebuild from the memory file and archive if either changed since the last build
+        
+        With a ``journal``, its entries are first applied to the memory
+        file by ``fold``, all under the journal's lock, and the generation
+        records the last seq folded.
+        """
+        state = self._source_state(memory_file, retention, journal)
+        if state == self._sources and os.path.exists(self._pointer_path):
+            return None
+        if retention:
+            retention = MemoryRetention(retention.directory, retention.policies)  # re-read the index
+        if journal is None:
+            try:
+                memories = _read_memories(memory_file)
+            except json.JSONDecodeError:
+                return None  # caught mid-write; try again next round
+            generation = self.write(memories, retention)
+            self._sources = state
+            return generation
+        
+        written = []
+        
+        def apply(entries: List[Dict[str, Any]], seq: int):
+            memories = _read_memories(memory_file)
+            fold(memory_file, memories, entries, retention)
+            written.append(self.write(memories, retention, journal_seq=seq))
+        
+        folded = journal.fold(apply)
+        if folded:
+            logger.info(f"Folded {folded} memory journal entries into {memory_file}")
+        self._sources = self._source_state(memory_file, retention, journal)
+        return written[0]
+    
+    def start_writer(self, memory_file: str, retention: Optional[MemoryRetention] = None,
+                     interval: float = MEMORY_SNAPSHOT_INTERVAL, journal: Optional[MemoryJournal] = None,
+                     fold: Optional[FoldCallback] = None) -> bool:
+        """
+        Start the background writer if no other process runs one
+        
+        Returns:
+            Whether this process became the writer
+        """
+        if self._writer is not None:
+            return True
+        if not self._acquire_writer_lock():
+            return False
+        
+        def run():
+            while True:
+                try:
+                    generation = self.refresh_from_disk(memory_file, retention, journal, fold)
+                    if generation:
+                        logger.info(f"Wrote memory snapshot generation {generation}")
+                except Exception as e:
+                    logger.error(f"Error writing memory snapshot: {e}")
+                if self._stop.wait(interval):
+                    return
+        
+        self._writer = threading.Thread(target=run, name="memory-snapshot-writer", daemon=True)
+        self._writer.start()
+        return True
+    
+    def stop_writer(self):
+        """Stop the background writer (the lock is kept until exit or ``close``)"""
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+    
+    def close(self):
+        """Stop writing, hand the writer lock to another process and unmap the current generation"""
+        self.stop_writer()
+        with self._lock:
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+            self._current = None
+            self._pointer_mtime = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Current generation and whether this process writes"""
+        snapshot = self.current()
+        return {
+            "generation": snapshot.generation if snapshot is not None else None,
+            "created": datetime.fromtimestamp(snapshot.created).isoformat() if snapshot is not None else None,
+            "decisions": len(snapshot) if snapshot is not None else 0,
+            "writer": self._writer is not None
+        }
@@ -0,0 +1,178 @@
+"""
+Metric Series
+Fixed-size columnar time series of numeric metrics
+"""
+
+import math
+import threading
+import time
+from array import array
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable
+
+import numpy as np
+
+from memory_retention import record_epoch
+
+RESAMPLE_METHODS = ("last", "first", "mean", "min", "max", "sum")
+
+
+def _epoch(value: Any) -> Optional[float]:
+    """ISO timestamp, datetime or epoch seconds -> epoch seconds (None stays None)"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return record_epoch(value)
+
+
+class MetricSeries:
+    """
+    Ring buffer of metric samples, one ``array('d')`` column per metric
+    
+    A sample is an epoch timestamp plus one float per metric, 8 bytes
+    each. Columns are allocated at ``capacity`` up front and never
+    resized, so NumPy views of them stay valid; once full, each sample
+    overwrites the oldest. Timestamps are kept non-decreasing, which lets
+    every time-range query use a binary search.
+    """
+    
+    def __init__(self, names: Iterable[str], capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity must be at least one sample")
+        self.names = list(names)
+        self.capacity = capacity
+        self._timestamps = array("d", bytes(8 * capacity))
+        self._columns = {name: array("d", bytes(8 * capacity)) for name in self.names}
+        self._next = 0   # slot the next sample goes to
+        self._count = 0
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def append(self, values: Dict[str, float], timestamp: Any = None):
+        """Add one sample (metrics missing from ``values`` are stored as NaN)"""
+        ts = time.time() if timestamp is None else _epoch(timestamp)
+        with self._lock:
+            if self._count:
+                ts = max(ts, self._timestamps[(self._next - 1) % self.capacity])
+            slot = self._next
+            self._timestamps[slot] = ts
+            for name, column in self._columns.items():
+                value = values.get(name)
+                column[slot] = math.nan if value is None else float(value)
+            self._next = (slot + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+    
+    def _ordered(self, column: array) -> np.ndarray:
+        """Column in time order: a view until the buffer wraps, then a copy"""
+        values = np.frombuffer(column, dtype=np.float64)
+        if self._count < self.capacity:
+            return values[:self._count]
+        return np.concatenate([values[self._next:], values[:self._next]])
+    
+    def window(self, since: Any = None, until: Any = None,
+               names: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Samples with ``since <= timestamp < until`` as arrays
+        
+        Returns ``{"timestamp": ..., <metric>: ...}``. Before the buffer
+        wraps the arrays are read-only views of the live columns; treat
+        them as a snapshot only until the next append.
+        """
+        names = self.names if names is None else list(names)
+        unknown = set(names) - set(self.names)
+        if unknown:
+            raise ValueError(f"Unknown metrics: {sorted(unknown)}")
+        with self._lock:
+            timestamps = self._ordered(self._timestamps)
+            start = 0 if since is None else int(np.searchsorted(timestamps, _epoch(since), side="left"))
+            stop = len(timestamps) if until is None else int(np.searchsorted(timestamps, _epoch(until), side="left"))
+            selected = {"timestamp": timestamps[start:stop]}
+            for name in names:
+                selected[name] = self._ordered(self._columns[name])[start:stop]
+        for values in selected.values():
+            values.flags.writeable = False
+        return selected
+    
+    def latest(self) -> Optional[Dict[str, float]]:
+        """Most recent sample, or None if empty"""
+        with self._lock:
+            if not self._count:
+                return None
+            slot = (self._next - 1) % self.capacity
+            sample = {"timestamp": self._timestamps[slot]}
+            sample.update({name: column[slot] for name, column in self._columns.items()})
+            return sample
+    
+    def aggregate(self, name: str, since: Any = None, until: Any = None) -> Dict[str, Any]:
+        """Count, min, max, mean, first, last and change of one metric over a time range"""
+        values = self.window(since, until, names=[name])[name]
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return {"metric": name, "count": 0}
+        return {
+            "metric": name,
+            "count": int(len(values)),
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "mean": float(values.mean()),
+            "first": float(values[0]),
+            "last": float(values[-1]),
+            "change": float(values[-1] - values[0])
+        }
+    
+    def resample(self, interval: float, how: str = "last", since: Any = None, until: Any = None,
+                 names: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        One value per ``interval`` seconds (buckets aligned to the epoch)
+        
+        ``how`` is one of RESAMPLE_METHODS; buckets without samples are
+        left out. ``timestamp`` holds each bucket's start.
+        """
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        if how not in RESAMPLE_METHODS:
+            raise ValueError(f"how must be one of {', '.join(RESAMPLE_METHODS)}")
+        selected = self.window(since, until, names)
+        timestamps = selected.pop("timestamp")
+        if not len(timestamps):
+            return dict(selected, timestamp=timestamps)
+        buckets = np.floor(timestamps / interval)
+        starts = np.flatnonzero(np.concatenate([[True], buckets[1:] != buckets[:-1]]))
+        ends = np.append(starts[1:], len(timestamps)) - 1
+        
+        resampled = {"timestamp": buckets[starts] * interval}
+        for name, values in selected.items():
+            if how == "last":
+                resampled[name] = values[ends]
+            elif how == "first":
+                resampled[name] = values[starts]
+            elif how == "min":
+                resampled[name] = np.minimum.reduceat(values, starts)
+            elif how == "max":
+                resampled[name] = np.maximum.reduceat(values, starts)
+            else:
+                sums = np.add.reduceat(values, starts)
+                resampled[name] = sums / (ends - starts + 1) if how == "mean" else sums
+        return resampled
+    
+    def to_records(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Latest samples as ``{"timestamp": ISO, "metrics": {...}}`` dicts, oldest first"""
+        selected = self.window()
+        timestamps = selected.pop("timestamp")
+        start = 0 if limit is None else max(0, len(timestamps) - limit)
+        return [
+            {"timestamp": datetime.fromtimestamp(timestamps[i]).isoformat(),
+             "metrics": {name: float(values[i]) for name, values in selected.items()}}
+            for i in range(start, len(timestamps))
+        ]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "samples": self._count,
+            "capacity": self.capacity,
+            "metrics": len(self.names),
+            "bytes": 8 * self.capacity * (len(self.names) + 1)
+        }
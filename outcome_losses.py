@@ -0,0 +1,187 @@
+"""
+Outcome Losses
+Sorted per-category loss distributions for Value-at-Risk queries
+"""
+
+import math
+import threading
+from statistics import NormalDist
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+# Outcome metrics a loss is read from, in order of precedence: a positive
+# "loss", the negated profit, or the negated return times the decision amount
+LOSS_METRICS = ("loss",)
+PROFIT_METRICS = ("pnl", "profit", "net_profit")
+RETURN_METRICS = ("return", "roi")
+
+MAX_CACHED_SUMMARIES = 64  # per category
+
+
+def outcome_loss(metrics: Optional[Dict[str, Any]], amount: Any = None) -> Optional[float]:
+    """Loss of one outcome (negative for a gain), or None if its metrics do not say"""
+    def number(name):
+        value = (metrics or {}).get(name)
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+            return float(value)
+        return None
+    
+    for name in LOSS_METRICS:
+        if number(name) is not None:
+            return number(name)
+    for name in PROFIT_METRICS:
+        if number(name) is not None:
+            return -number(name)
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        return None
+    for name in RETURN_METRICS:
+        if number(name) is not None:
+            return -number(name) * amount
+    return None
+
+
+def _category(decision: Dict[str, Any]) -> str:
+    category = decision.get("category")
+    return str(getattr(category, "value", category) or "").upper()
+
+
+class _CategoryLosses:
+    """One category's losses, kept sorted with prefix sums"""
+    
+    def __init__(self):
+        self.by_decision: Dict[str, float] = {}
+        self.sorted = np.empty(0)
+        self.prefix = np.zeros(1)       # prefix[i] = sum of the i smallest losses
+        self.variance = 0.0             # sample variance of the merged losses
+        self.pending: List[float] = []  # new decisions not merged into sorted yet
+        self.stale = False              # a loss was replaced: rebuild from by_decision
+        self.version = 0
+        self.summaries: Dict[Tuple[float, Optional[float]], Dict[str, Any]] = {}
+    
+    def add(self, decision_id: str, loss: float):
+        previous = self.by_decision.get(decision_id)
+        self.by_decision[decision_id] = loss
+        if previous is None:
+            self.pending.append(loss)
+        elif previous != loss:
+            self.stale = True
+        self.version += 1
+        self.summaries.clear()
+    
+    def merge(self):
+        """Fold new losses into the sorted array (a full sort only after a replaced loss)"""
+        if self.stale:
+            self.sorted = np.sort(np.fromiter(self.by_decision.values(), dtype=np.float64))
+        elif self.pending:
+            new = np.sort(np.asarray(self.pending, dtype=np.float64))
+            self.sorted = np.insert(self.sorted, np.searchsorted(self.sorted, new), new)
+        else:
+            return
+        self.prefix = np.concatenate([[0.0], np.cumsum(self.sorted)])
+        self.variance = float(np.var(self.sorted, ddof=1)) if len(self.sorted) > 1 else 0.0
+        self.pending = []
+        self.stale = False
+
+
+class OutcomeLosses:
+    """
+    Loss distribution per decision category
+    
+    Each decision's loss comes from its latest outcome's metrics (see
+    ``outcome_loss``). A category's losses are held as one sorted array
+    with prefix sums: a VaR quantile is an index into it, expected
+    shortfall is a difference of two prefix sums, and the chance of
+    losing more than an amount is one binary search. New outcomes are
+    merged in on the next query; summaries are cached per category until
+    its next outcome.
+    """
+    
+    def __init__(self):
+        self._categories: Dict[str, _CategoryLosses] = {}
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_records(cls, decisions: List[Dict[str, Any]], outcomes: List[Dict[str, Any]]) -> "OutcomeLosses":
+        """Replay stored outcomes against their decisions"""
+        losses = cls()
+        by_id = {}
+        for decision in decisions:
+            by_id.setdefault(decision.get("id"), decision)
+        for outcome in outcomes:
+            decision = by_id.get(outcome.get("decision_id"))
+            if decision is not None:
+                losses.record_outcome(decision, outcome)
+        return losses
+    
+    def record_outcome(self, decision_record: Dict[str, Any], outcome: Dict[str, Any]):
+        """Add (or replace) the loss of one decision"""
+        decision = decision_record.get("decision", decision_record)
+        loss = outcome_loss(outcome.get("metrics"), decision.get("amount"))
+        if loss is None:
+            return
+        with self._lock:
+            category = self._categories.setdefault(_category(decision), _CategoryLosses())
+            category.add(decision_record.get("id") or outcome.get("decision_id"), loss)
+    
+    def value_at_risk(self, category: str, confidence: float = 0.95,
+                      amount: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Historical and parametric (normal) VaR and expected shortfall
+        
+        Returns None when the category has no losses recorded. With
+        ``amount``, also the share of outcomes that lost more than it.
+        The summary carries ``cache`` "HIT" or "MISS".
+        """
+        if not 0 < confidence < 1:
+            raise ValueError("confidence must be between 0 and 1")
+        key = (confidence, amount)
+        with self._lock:
+            entry = self._categories.get(category.upper())
+            if entry is None or not entry.by_decision:
+                return None
+            cached = entry.summaries.get(key)
+            if cached is not None:
+                return dict(cached, cache="HIT")
+            entry.merge()
+            summary = self._summary(entry, confidence, amount)
+            summary["category"] = category.upper()
+            if len(entry.summaries) >= MAX_CACHED_SUMMARIES:
+                entry.summaries.clear()
+            entry.summaries[key] = summary
+            return dict(summary, cache="MISS")
+    
+    @staticmethod
+    def _summary(entry: _CategoryLosses, confidence: float, amount: Optional[float]) -> Dict[str, Any]:
+        losses, prefix = entry.sorted, entry.prefix
+        count = len(losses)
+        # Smallest loss that at least ``confidence`` of outcomes do not exceed
+        index = min(count - 1, max(0, math.ceil(confidence * count) - 1))
+        var = float(losses[index])
+        tail = count - index
+        shortfall = (prefix[count] - prefix[index]) / tail
+        
+        mean = float(prefix[count]) / count
+        std = math.sqrt(entry.variance)
+        z = NormalDist().inv_cdf(confidence)
+        summary = {
+            "confidence": confidence,
+            "observations": count,
+            "version": entry.version,
+            "historical": {"var": round(var, 2), "expected_shortfall": round(float(shortfall), 2),
+                           "tail_observations": tail},
+            "parametric": {"var": round(mean + std * z, 2),
+                           "expected_shortfall": round(mean + std * NormalDist().pdf(z) / (1 - confidence), 2),
+                           "mean": round(mean, 2), "std": round(std, 2)},
+            "worst_loss": round(float(losses[-1]), 2)
+        }
+        if amount is not None:
+            exceeding = count - int(np.searchsorted(losses, amount, side="right"))
+            summary["exceedance"] = {"amount": amount, "probability": round(exceeding / count, 6)}
+        return summary
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {name: {"observations": len(entry.by_decision), "version": entry.version}
+                for name, entry in self._categories.items()}
@@ -0,0 +1,362 @@
+"""
+Policy Simulator
+Replay decision history under alternative risk thresholds and autonomy cut-offs
+"""
+
+import itertools
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+
+import numpy as np
+
+from autonomy_tracker import AUTO_EXECUTE_THRESHOLDS, RISK_LEVELS
+from risk_rules import CompiledRiskRules, RiskTable
+
+logger = logging.getLogger(__name__)
+
+SIMULATOR_PROCESSES = int(os.getenv("SIMULATOR_PROCESSES", "0"))  # 0 = one per core
+CHUNK_CELLS = 2_000_000          # policies x risk levels x groups evaluated per array operation
+PARALLEL_MIN_CELLS = 50_000_000  # below this a process pool costs more than it saves
+
+AUTO_ACTIONS = ("EXECUTE_IMMEDIATELY", "AI_EXECUTE_IMMEDIATELY")
+
+# Filled in each pool worker by _init_worker
+_WORKER_GROUPS: Optional[Tuple["DecisionGroups", List[str]]] = None
+
+
+class DecisionHistory:
+    """
+    Recorded decisions as columns
+    
+    One entry per decision: amount, category code, recorded risk level
+    (-1 if unknown), the autonomy level at the time (NaN if not
+    recorded), whether it was executed automatically (-1 if unknown) and
+    the reported outcome (1 success, 0 failure, -1 none yet).
+    """
+    
+    def __init__(self, amount: np.ndarray, category: np.ndarray, categories: List[str], risk: np.ndarray,
+                 autonomy: np.ndarray, auto_executed: np.ndarray, success: np.ndarray):
+        self.amount = amount
+        self.category = category
+        self.categories = categories
+        self.risk = risk
+        self.autonomy = autonomy
+        self.auto_executed = auto_executed
+        self.success = success
+    
+    def __len__(self) -> int:
+        return len(self.amount)
+    
+    @classmethod
+    def from_records(cls, decisions: Iterable[Dict[str, Any]],
+                     outcomes: Iterable[Dict[str, Any]] = ()) -> "DecisionHistory":
+        """Columns from AIMemory decision and outcome records (the latest outcome per decision wins)"""
+        results = {outcome.get("decision_id"): outcome.get("success") for outcome in outcomes}
+        codes: Dict[str, int] = {}
+        levels = {level: i for i, level in enumerate(RISK_LEVELS)}
+        amount, category, risk, autonomy, auto_executed, success = [], [], [], [], [], []
+        for record in decisions:
+            decision = record.get("decision") or {}
+            name = str(getattr(decision.get("category"), "value", decision.get("category")) or "OPERATIONAL").upper()
+            try:
+                amount.append(float(decision.get("amount") or 0))
+            except (TypeError, ValueError):
+                amount.append(0.0)
+            category.append(codes.setdefault(name, len(codes)))
+            risk.append(levels.get(getattr(decision.get("risk_level"), "value", decision.get("risk_level")), -1))
+            level = decision.get("autonomy_level")
+            autonomy.append(float(level) if isinstance(level, (int, float)) else math.nan)
+            if "action_required" in decision or "ai_can_decide" in decision:
+                auto_executed.append(int(bool(decision.get("ai_can_decide"))
+                                         or decision.get("action_required") in AUTO_ACTIONS))
+            else:
+                auto_executed.append(-1)
+            outcome = results.get(record.get("id"))
+            success.append(-1 if outcome is None else int(bool(outcome)))
+        return cls(
+            amount=np.asarray(amount, dtype=np.float64),
+            category=np.asarray(category, dtype=np.int32),
+            categories=list(codes),
+            risk=np.asarray(risk, dtype=np.int8),
+            autonomy=np.asarray(autonomy, dtype=np.float64),
+            auto_executed=np.asarray(auto_executed, dtype=np.int8),
+            success=np.asarray(success, dtype=np.int8)
+        )
+    
+    @classmethod
+    def from_memory(cls, memory: Any, include_archive: bool = True) -> "DecisionHistory":
+        """Columns from an AIMemory, including archived records when it has retention tiers"""
+        decisions = memory.records("decisions")
+        outcomes = memory.records("outcomes")
+        if include_archive and getattr(memory, "retention", None):
+            decisions = [record for _, record in memory.retention.iter_records("decisions")] + decisions
+            outcomes = [record for _, record in memory.retention.iter_records("outcomes")] + outcomes
+        return cls.from_records(decisions, outcomes)
+
+
+def current_policy(ai_tasks: Optional[Iterable[str]] = None, table: Optional[RiskTable] = None) -> Dict[str, Any]:
+    """A risk-rules scope and the GradualAutonomySystem cut-offs as a policy (built-in rules by default)"""
+    table = table or CompiledRiskRules({}).table()
+    return {
+        "boundaries": list(table.boundaries),
+        "autonomy_cutoffs": dict(AUTO_EXECUTE_THRESHOLDS),
+        "auto_execute": {level: bool(table.thresholds[level].get("auto_execute")) for level in RISK_LEVELS},
+        "autonomy_level": None,
+        "ai_tasks": sorted(ai_tasks) if ai_tasks is not None else None
+    }
+
+
+def engine_policy(engine: Any) -> Dict[str, Any]:
+    """The policy an AIDecisionEngine applies now (its tenant's default rules scope and AI tasks)"""
+    table = engine.rules.current().table(None, engine.tenant_id)
+    return current_policy(engine.autonomy.tracker.data["ai_tasks"], table)
+
+
+def policy_grid(base: Dict[str, Any], **axes: Iterable[Any]) -> List[Dict[str, Any]]:
+    """
+    Every combination of the given values
+    
+    Axis names are policy keys, or ``<key>.<level>`` for one entry of
+    ``autonomy_cutoffs``/``auto_execute``, or ``boundary.<i>`` for one
+    risk boundary, e.g. ``policy_grid(base, **{"boundary.0": [500, 1000],
+    "autonomy_cutoffs.MEDIUM": [40, 50, 60]})``.
+    """
+    names = list(axes)
+    policies = []
+    for values in itertools.product(*(list(axes[name]) for name in names)):
+        policy = {key: (dict(value) if isinstance(value, dict) else list(value) if isinstance(value, list) else value)
+                  for key, value in base.items()}
+        for name, value in zip(names, values):
+            key, _, item = name.partition(".")
+            if key == "boundary":
+                policy["boundaries"][int(item)] = value
+            elif item:
+                policy[key][item] = value
+            else:
+                policy[key] = value
+        policies.append(policy)
+    return policies
+
+
+class _PolicyArrays:
+    """A batch of policies as arrays, one row per policy"""
+    
+    def __init__(self, policies: List[Dict[str, Any]], categories: List[str]):
+        count = len(policies)
+        self.boundaries = np.empty((count, len(RISK_LEVELS) - 1), dtype=np.float64)
+        self.cutoffs = np.full((count, len(RISK_LEVELS)), np.inf)
+        self.auto = np.zeros((count, len(RISK_LEVELS)), dtype=bool)
+        self.autonomy = np.full(count, np.nan)
+        self.ai_task = np.ones((count, max(len(categories), 1)), dtype=bool)
+        for row, policy in enumerate(policies):
+            boundaries = [float(b) for b in policy["boundaries"]]
+            if len(boundaries) != len(RISK_LEVELS) - 1 or boundaries != sorted(boundaries):
+                raise ValueError(f"boundaries must be {len(RISK_LEVELS) - 1} ascending amounts, got {policy['boundaries']}")
+            self.boundaries[row] = boundaries
+            for i, level in enumerate(RISK_LEVELS):
+                cutoff = policy.get("autonomy_cutoffs", {}).get(level)
+                if cutoff is not None:
+                    self.cutoffs[row, i] = cutoff
+                self.auto[row, i] = bool(policy.get("auto_execute", {}).get(level))
+            if policy.get("autonomy_level") is not None:
+                self.autonomy[row] = policy["autonomy_level"]
+            if policy.get("ai_tasks") is not None:
+                tasks = {task.upper() for task in policy["ai_tasks"]}
+                self.ai_task[row] = [name in tasks for name in categories] or [False]
+
+
+class _SortedAmounts:
+    """
+    Amounts of several groups of decisions, for counting per boundary
+    
+    Amounts are replaced by their rank among all distinct amounts and
+    stored as one sorted ``group * (ranks + 1) + rank`` key, so counting
+    each group's decisions at or below each boundary is one
+    ``searchsorted`` for every group and policy at once.
+    """
+    
+    def __init__(self, group: np.ndarray, rank: np.ndarray, ranks: int, groups: int):
+        self._stride = ranks + 1
+        self.keys = np.sort(group * self._stride + rank)
+        self.sizes = np.bincount(group, minlength=groups)
+        self.starts = np.concatenate([[0], np.cumsum(self.sizes)[:-1]]).astype(np.int64)
+    
+    def segment_counts(self, ranks: np.ndarray) -> np.ndarray:
+        """Decisions per (policy, risk level, group), given distinct amounts at or below each boundary"""
+        count, groups = len(ranks), len(self.sizes)
+        # A grid reuses a handful of boundary values: look each up once
+        distinct, inverse = np.unique(ranks, return_inverse=True)
+        queries = np.arange(groups)[None, :] * self._stride + distinct[:, None]
+        table = np.searchsorted(self.keys, queries, side="left") - self.starts[None, :]
+        at_or_below = table[inverse.reshape(ranks.shape)]
+        cumulative = np.concatenate([
+            np.zeros((count, 1, groups), dtype=np.int64),
+            at_or_below,
+            np.broadcast_to(self.sizes, (count, 1, groups))
+        ], axis=1)
+        return np.diff(cumulative, axis=1)
+
+
+class DecisionGroups:
+    """
+    History folded into groups for evaluation
+    
+    Whether a decision is AI-decided or executed under a policy depends
+    only on its risk level, category and recorded autonomy level; the
+    counts reported also need its recorded execution and whether its
+    outcome failed. Decisions alike in those are one group, and within a
+    group only the amount matters, through which side of each boundary
+    it falls. Recorded risk levels are counted separately. A policy then
+    costs O(groups) rather than O(decisions); autonomy levels are
+    rounded to 0.1 when recorded, which keeps groups few.
+    """
+    
+    def __init__(self, history: DecisionHistory):
+        self.decisions = len(history)
+        amounts, rank = np.unique(history.amount, return_inverse=True)
+        self.amounts = amounts
+        rank = rank.reshape(-1).astype(np.int64)
+        
+        autonomy = np.where(np.isnan(history.autonomy), -np.inf, history.autonomy)
+        autonomy_values, autonomy_code = np.unique(autonomy, return_inverse=True)
+        key = history.category.astype(np.int64)
+        key = key * len(autonomy_values) + autonomy_code.reshape(-1)
+        key = key * 3 + (history.auto_executed.astype(np.int64) + 1)
+        key = key * 2 + (history.success == 0)
+        keys, group = np.unique(key, return_inverse=True)
+        
+        self.failed = (keys % 2).astype(bool)
+        keys //= 2
+        self.auto_executed = keys % 3 - 1
+        keys //= 3
+        self.autonomy = autonomy_values[keys % len(autonomy_values)]
+        self.category = keys // len(autonomy_values)
+        self._groups = _SortedAmounts(group.reshape(-1), rank, len(amounts), len(self.category))
+        
+        # Recorded risk levels -1 (unknown) .. 3
+        self._risk = _SortedAmounts(history.risk.astype(np.int64) + 1, rank, len(amounts), len(RISK_LEVELS) + 1)
+    
+    def __len__(self) -> int:
+        return len(self.category)
+    
+    def segment_counts(self, boundaries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decisions per (policy, risk level, group) and per (policy, risk
+        level, recorded risk + 1) for a (policies, 3) array of boundaries
+        """
+        ranks = np.searchsorted(self.amounts, boundaries, side="right")
+        return self._groups.segment_counts(ranks), self._risk.segment_counts(ranks)
+
+
+def _evaluate(groups: DecisionGroups, arrays: _PolicyArrays, start: int, stop: int) -> Dict[str, np.ndarray]:
+    """Counts for policies[start:stop]"""
+    segments, by_recorded_risk = groups.segment_counts(arrays.boundaries[start:stop])
+    
+    override = arrays.autonomy[start:stop, None]
+    autonomy = np.where(np.isnan(override), groups.autonomy[None, :], override)[:, None, :]
+    ai_task = arrays.ai_task[start:stop][:, groups.category][:, None, :]
+    ai_allowed = ai_task & (autonomy >= arrays.cutoffs[start:stop, :, None])
+    executed = ai_allowed | arrays.auto[start:stop, :, None]
+    
+    recorded = (groups.auto_executed >= 0)[None, None, :]
+    execution_changed = recorded & (executed != (groups.auto_executed == 1)[None, None, :])
+    # A decision keeps its risk level when the new level equals the recorded one
+    kept = np.trace(by_recorded_risk[:, :, 1:], axis1=1, axis2=2)
+    return {
+        "auto_executed": (segments * executed).sum(axis=(1, 2)),
+        "ai_decided": (segments * ai_allowed).sum(axis=(1, 2)),
+        "risk_changed": by_recorded_risk[:, :, 1:].sum(axis=(1, 2)) - kept,
+        "execution_changed": (segments * execution_changed).sum(axis=(1, 2)),
+        "auto_executed_failures": (segments * (executed & groups.failed[None, None, :])).sum(axis=(1, 2)),
+        "by_risk": segments.sum(axis=2)
+    }
+
+
+def _evaluate_chunked(groups: DecisionGroups, categories: List[str],
+                      policies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    arrays = _PolicyArrays(policies, categories)
+    rows = max(1, CHUNK_CELLS // (len(RISK_LEVELS) * max(len(groups), 1)))
+    reports = []
+    for start in range(0, len(policies), rows):
+        stop = min(start + rows, len(policies))
+        counts = _evaluate(groups, arrays, start, stop)
+        for offset, policy in enumerate(policies[start:stop]):
+            auto_executed = int(counts["auto_executed"][offset])
+            reports.append({
+                "policy": policy,
+                "decisions": groups.decisions,
+                "auto_executed": auto_executed,
+                "needs_approval": groups.decisions - auto_executed,
+                "ai_decided": int(counts["ai_decided"][offset]),
+                "risk_changed": int(counts["risk_changed"][offset]),
+                "execution_changed": int(counts["execution_changed"][offset]),
+                "auto_executed_failures": int(counts["auto_executed_failures"][offset]),
+                "by_risk": {level: int(n) for level, n in zip(RISK_LEVELS, counts["by_risk"][offset])}
+            })
+    return reports
+
+
+def _init_worker(groups: DecisionGroups, categories: List[str]):
+    global _WORKER_GROUPS
+    _WORKER_GROUPS = (groups, categories)
+
+
+def _worker_evaluate(policies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return _evaluate_chunked(*_WORKER_GROUPS, policies)
+
+
+class PolicySimulator:
+    """
+    What-if replay of decision history
+    
+    A policy is a dict with ``boundaries`` (three ascending amounts
+    splitting LOW/MEDIUM/HIGH/CRITICAL), ``autonomy_cutoffs`` (autonomy %
+    an AI task needs per risk level), ``auto_execute`` (per-level flag of
+    the risk rules), and optionally ``autonomy_level`` (replaces the
+    recorded level) and ``ai_tasks`` (categories the AI owns; all if
+    None). Each decision is re-classified and re-routed the way
+    ``evaluate_decision``/``execute_decision`` would have done it; the
+    learned risk adjustment is not replayed, and decisions recorded
+    without an autonomy level are never AI-decided unless the policy
+    sets ``autonomy_level``.
+    """
+    
+    def __init__(self, history: DecisionHistory, processes: int = SIMULATOR_PROCESSES):
+        self.history = history
+        self.groups = DecisionGroups(history)
+        self.processes = processes or os.cpu_count() or 1
+    
+    def simulate(self, policy: Dict[str, Any]) -> Dict[str, Any]:
+        """Replay every decision under one policy"""
+        return _evaluate_chunked(self.groups, self.history.categories, [policy])[0]
+    
+    def simulate_many(self, policies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Replay under each policy; large batches are split across a process pool"""
+        cells = len(policies) * len(RISK_LEVELS) * max(len(self.groups), 1)
+        if self.processes <= 1 or cells < PARALLEL_MIN_CELLS:
+            return _evaluate_chunked(self.groups, self.history.categories, policies)
+        
+        batch = math.ceil(len(policies) / (self.processes * 4))
+        batches = [policies[i:i + batch] for i in range(0, len(policies), batch)]
+        logger.info(f"Simulating {len(policies)} policies over {len(self.history)} decisions "
+                    f"({len(self.groups)} groups) in {len(batches)} batches on {self.processes} processes")
+        with ProcessPoolExecutor(max_workers=self.processes, initializer=_init_worker,
+                                 initargs=(self.groups, self.history.categories)) as pool:
+            return [report for reports in pool.map(_worker_evaluate, batches) for report in reports]
+    
+    def grid_search(self, policies: List[Dict[str, Any]], max_failures: Optional[int] = None,
+                    top: int = 10) -> List[Dict[str, Any]]:
+        """
+        Policies that auto-execute the most decisions
+        
+        ``max_failures`` drops policies that would have auto-executed
+        more decisions with a failed outcome than that.
+        """
+        reports = self.simulate_many(policies)
+        if max_failures is not None:
+            reports = [report for report in reports if report["auto_executed_failures"] <= max_failures]
+        reports.sort(key=lambda report: (-report["auto_executed"], report["auto_executed_failures"]))
+        return reports[:top]
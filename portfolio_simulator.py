@@ -0,0 +1,254 @@
+"""
+Portfolio Simulator
+Monte Carlo expected value, VaR/CVaR and allocation search over income strategies
+"""
+
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PORTFOLIO_PROCESSES = int(os.getenv("PORTFOLIO_PROCESSES", "0"))  # 0 = one per core
+CHUNK_PATHS = 250_000            # paths sampled per array operation
+CHUNK_CELLS = 2_000_000          # paths x allocations valued per array operation
+PARALLEL_MIN_PATHS = 2_000_000   # below this a process pool costs more than it saves
+DEFAULT_CORRELATION = 0.2        # between any two strategies' returns
+
+# Per-period (monthly) parameters for the qualitative strategy attributes.
+# roi_potential is the expected return before shocks, risk sets the
+# volatility and the chance of a shock losing part of the capital, and
+# scalability caps how much of the capital one strategy can put to use.
+ROI_MEAN = {"very_high": 0.06, "high": 0.04, "medium": 0.02, "low": 0.01}
+RISK_VOLATILITY = {"low": 0.04, "medium": 0.10, "high": 0.25}
+RISK_SHOCK = {"low": (0.01, 0.30), "medium": (0.02, 0.40), "high": (0.04, 0.60)}  # (probability, loss)
+SCALABILITY_MAX_WEIGHT = {"low": 0.15, "medium": 0.25, "high": 0.40, "very_high": 0.50}
+
+
+def strategy_parameters(attributes: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Return distribution of one strategy
+    
+    Numeric ``mean_return``, ``volatility``, ``shock_probability``,
+    ``shock_loss`` and ``max_weight`` in the attributes take precedence
+    over the ones implied by ``roi_potential``, ``risk`` and
+    ``scalability``.
+    """
+    shock_probability, shock_loss = RISK_SHOCK.get(attributes.get("risk", "medium"), RISK_SHOCK["medium"])
+    parameters = {
+        "mean_return": ROI_MEAN.get(attributes.get("roi_potential", "medium"), ROI_MEAN["medium"]),
+        "volatility": RISK_VOLATILITY.get(attributes.get("risk", "medium"), RISK_VOLATILITY["medium"]),
+        "shock_probability": shock_probability,
+        "shock_loss": shock_loss,
+        "max_weight": SCALABILITY_MAX_WEIGHT.get(attributes.get("scalability", "medium"),
+                                                 SCALABILITY_MAX_WEIGHT["medium"])
+    }
+    for name in parameters:
+        if isinstance(attributes.get(name), (int, float)):
+            parameters[name] = float(attributes[name])
+    return parameters
+
+
+class _Model:
+    """Strategy parameters as arrays, in strategy order"""
+    
+    def __init__(self, parameters: List[Dict[str, float]], correlation: Any, horizon: int):
+        count = len(parameters)
+        volatility = np.array([p["volatility"] for p in parameters])
+        mean = np.array([p["mean_return"] for p in parameters])
+        # Log-normal steps whose expected growth is 1 + mean_return
+        self.drift = horizon * (np.log1p(mean) - volatility ** 2 / 2)
+        self.scale = math.sqrt(horizon) * volatility
+        self.shock_probability = np.array([p["shock_probability"] for p in parameters])
+        self.shock_log = np.log1p(-np.minimum([p["shock_loss"] for p in parameters], 1 - 1e-12))
+        self.max_weight = np.array([p["max_weight"] for p in parameters])
+        self.horizon = horizon
+        
+        if np.isscalar(correlation):
+            matrix = np.full((count, count), float(correlation))
+            np.fill_diagonal(matrix, 1.0)
+        else:
+            matrix = np.asarray(correlation, dtype=np.float64)
+        try:
+            self.cholesky = np.linalg.cholesky(matrix)
+        except np.linalg.LinAlgError:
+            raise ValueError("correlation must be a valid (positive definite) correlation matrix")
+    
+    def sample(self, seed: np.random.SeedSequence, paths: int) -> np.ndarray:
+        """
+        Growth of each strategy over the horizon, (paths, strategies)
+        
+        Steps are independent over time, so the sum of the horizon's
+        log-returns is drawn directly: one correlated normal per strategy
+        and a binomial count of shocks, instead of one draw per step.
+        """
+        rng = np.random.default_rng(seed)
+        normal = rng.standard_normal((paths, len(self.drift))) @ self.cholesky.T
+        shocks = rng.binomial(self.horizon, self.shock_probability, size=normal.shape)
+        return np.exp(self.drift + self.scale * normal + shocks * self.shock_log)
+
+
+def _value_chunk(model: _Model, seed: np.random.SeedSequence, paths: int,
+                 weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Portfolio growth per (path, allocation) and the summed growth per strategy for one chunk"""
+    growth = model.sample(seed, paths)
+    cash = 1.0 - weights.sum(axis=1)
+    return growth @ weights.T + cash, growth.sum(axis=0)
+
+
+def _value_job(job: Tuple[_Model, np.random.SeedSequence, int, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    return _value_chunk(*job)
+
+
+def _tail_metrics(values: np.ndarray, confidence: float) -> Dict[str, np.ndarray]:
+    """Per-column mean, quantile and tail mean of a (paths, allocations) growth array"""
+    tail = max(1, int(math.floor(len(values) * (1 - confidence))))
+    smallest = np.partition(values, tail - 1, axis=0)[:tail]
+    return {"mean": values.mean(axis=0), "quantile": smallest.max(axis=0), "tail_mean": smallest.mean(axis=0)}
+
+
+class PortfolioSimulator:
+    """
+    Monte Carlo simulation of capital split across income strategies
+    
+    Each strategy's return per period is log-normal around its expected
+    return, correlated with the others, and can be hit by a shock that
+    loses a fixed part of the capital. Capital not allocated is held as
+    cash. Paths are sampled in chunks of ``CHUNK_PATHS``; chunk ``i``
+    always draws from child ``i`` of the run's seed, so a seed gives the
+    same result whether the chunks run in this process or across a
+    process pool, which is used for runs of ``PARALLEL_MIN_PATHS`` paths
+    or more. VaR and CVaR are losses against the initial capital at the
+    given confidence (negative means even the tail ends with a gain).
+    """
+    
+    def __init__(self, strategies: Dict[str, Dict[str, Any]], horizon: int = 12,
+                 correlation: Any = DEFAULT_CORRELATION, processes: int = PORTFOLIO_PROCESSES):
+        if horizon < 1:
+            raise ValueError("horizon must be at least one period")
+        self.names = list(strategies)
+        self.parameters = {name: strategy_parameters(attributes) for name, attributes in strategies.items()}
+        self.model = _Model([self.parameters[name] for name in self.names], correlation, horizon)
+        self.horizon = horizon
+        self.processes = processes or os.cpu_count() or 1
+    
+    def _weights(self, allocation: Dict[str, float]) -> np.ndarray:
+        unknown = set(allocation) - set(self.names)
+        if unknown:
+            raise ValueError(f"Unknown strategies: {sorted(unknown)}")
+        weights = np.array([float(allocation.get(name, 0.0)) for name in self.names])
+        if (weights < 0).any() or weights.sum() > 1 + 1e-9:
+            raise ValueError("allocation weights must be non-negative and sum to at most 1")
+        return weights
+    
+    def _value(self, weights: np.ndarray, paths: int, seed: np.random.SeedSequence) -> Tuple[np.ndarray, np.ndarray]:
+        """Growth per (path, allocation) over ``paths`` paths, and mean growth per strategy"""
+        sizes = [min(CHUNK_PATHS, paths - start) for start in range(0, paths, CHUNK_PATHS)]
+        jobs = [(self.model, child, size, weights) for child, size in zip(seed.spawn(len(sizes)), sizes)]
+        if self.processes > 1 and paths >= PARALLEL_MIN_PATHS:
+            logger.info(f"Simulating {paths} paths in {len(jobs)} chunks on {self.processes} processes")
+            with ProcessPoolExecutor(max_workers=self.processes) as pool:
+                results = list(pool.map(_value_job, jobs))
+        else:
+            results = [_value_job(job) for job in jobs]
+        values = np.concatenate([values for values, _ in results])
+        return values, sum(growth for _, growth in results) / paths
+    
+    def _report(self, weights: np.ndarray, capital: float, values: np.ndarray, mean_growth: np.ndarray,
+                confidence: float, paths: int, entropy: int) -> Dict[str, Any]:
+        metrics = _tail_metrics(values[:, None], confidence)
+        expected = capital * float(metrics["mean"][0])
+        low, median, high = np.percentile(values, [5, 50, 95])
+        return {
+            "capital": capital,
+            "horizon": self.horizon,
+            "paths": paths,
+            "seed": entropy,
+            "confidence": confidence,
+            "allocation": {name: round(float(w), 6) for name, w in zip(self.names, weights) if w > 0},
+            "amounts": {name: round(capital * float(w), 2) for name, w in zip(self.names, weights) if w > 0},
+            "cash": round(capital * (1 - float(weights.sum())), 2),
+            "expected_value": round(expected, 2),
+            "expected_return": round(float(metrics["mean"][0]) - 1, 6),
+            "std": round(capital * float(values.std()), 2),
+            "var": round(capital * (1 - float(metrics["quantile"][0])), 2),
+            "cvar": round(capital * (1 - float(metrics["tail_mean"][0])), 2),
+            "probability_of_loss": round(float((values < 1).mean()), 6),
+            "percentiles": {"5": round(capital * low, 2), "50": round(capital * median, 2),
+                            "95": round(capital * high, 2)},
+            "strategy_expected_return": {name: round(float(g) - 1, 6) for name, g in zip(self.names, mean_growth)}
+        }
+    
+    def simulate(self, allocation: Dict[str, float], capital: float, paths: int = 100_000,
+                 confidence: float = 0.95, seed: Optional[int] = None) -> Dict[str, Any]:
+        """Distribution of the capital at the horizon for an allocation (strategy -> fraction of capital)"""
+        weights = self._weights(allocation)
+        seed_sequence = np.random.SeedSequence(seed)
+        values, mean_growth = self._value(weights[None, :], paths, seed_sequence)
+        return self._report(weights, capital, values[:, 0], mean_growth, confidence, paths, seed_sequence.entropy)
+    
+    def candidate_allocations(self, count: int, seed: np.random.SeedSequence) -> np.ndarray:
+        """
+        Allocations to search, (count, strategies)
+        
+        All cash, equal weights and random splits of the capital between
+        the strategies and cash, each capped at the strategy's
+        ``max_weight`` with the excess kept as cash.
+        """
+        rng = np.random.default_rng(seed)
+        strategies = len(self.names)
+        random_splits = rng.dirichlet(np.ones(strategies + 1), size=max(count - 2, 0))[:, :strategies]
+        candidates = np.vstack([np.zeros(strategies), np.full(strategies, 1.0 / strategies), random_splits])
+        return np.minimum(candidates, self.model.max_weight)[:count]
+    
+    def optimize(self, capital: float, paths: int = 100_000, confidence: float = 0.95,
+                 max_cvar: Optional[float] = None, risk_aversion: float = 1.0, candidates: int = 500,
+                 search_paths: int = 50_000, baseline: Optional[Dict[str, float]] = None,
+                 seed: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Allocation with the best expected value for its tail risk
+        
+        Candidate allocations (plus ``baseline`` if given) are scored on
+        ``search_paths`` shared paths: with ``max_cvar`` (a fraction of
+        the capital) the highest expected value whose CVaR stays within
+        it wins, falling back to the lowest CVaR if none does; otherwise
+        the highest expected value minus ``risk_aversion`` x CVaR. The
+        winner is then simulated on ``paths`` fresh paths.
+        """
+        seed_sequence = np.random.SeedSequence(seed)
+        candidate_seed, search_seed, final_seed = seed_sequence.spawn(3)
+        weights = self.candidate_allocations(candidates, candidate_seed)
+        if baseline is not None:
+            weights = np.vstack([self._weights(baseline), weights])
+        
+        growth = self.model.sample(search_seed, search_paths)
+        mean, tail_mean = np.empty(len(weights)), np.empty(len(weights))
+        step = max(1, CHUNK_CELLS // search_paths)
+        for start in range(0, len(weights), step):
+            batch = weights[start:start + step]
+            metrics = _tail_metrics(growth @ batch.T + (1.0 - batch.sum(axis=1)), confidence)
+            mean[start:start + step] = metrics["mean"]
+            tail_mean[start:start + step] = metrics["tail_mean"]
+        cvar = 1 - tail_mean
+        
+        if max_cvar is not None:
+            feasible = cvar <= max_cvar
+            best = int(np.argmax(np.where(feasible, mean, -np.inf))) if feasible.any() else int(np.argmin(cvar))
+        else:
+            best = int(np.argmax(mean - risk_aversion * cvar))
+        
+        values, mean_growth = self._value(weights[best][None, :], paths, final_seed)
+        report = self._report(weights[best], capital, values[:, 0], mean_growth, confidence, paths,
+                              seed_sequence.entropy)
+        report["search"] = {
+            "candidates": len(weights),
+            "paths": search_paths,
+            "max_cvar": max_cvar,
+            "risk_aversion": risk_aversion if max_cvar is None else None,
+            "within_max_cvar": bool(max_cvar is None or cvar[best] <= max_cvar)
+        }
+        return report
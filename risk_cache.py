@@ -0,0 +1,105 @@
+"""
+Risk Assessment Cache
+Versioned LRU memo of risk assessments keyed on normalized decision inputs
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from learning_stats import amount_band
+
+RISK_CACHE_SIZE = int(os.getenv("RISK_CACHE_SIZE", "1024"))
+
+_SPACE = re.compile(r"\s+")
+
+
+def _label(value: Any) -> str:
+    return str(getattr(value, "value", value) or "").upper()
+
+
+def risk_cache_key(decision_data: Dict[str, Any], base_risk: Any) -> Tuple[str, int, str, str]:
+    """
+    Normalized inputs of a risk assessment
+    
+    Amounts only matter through their base risk level and learning band,
+    and the description not at all, so ``(category, band, base risk,
+    risk level)`` identifies a risk level and its aggregate insights; the
+    last is the caller's own ``risk_level``, which selects the success
+    table the aggregates report.
+    """
+    return (
+        _label(decision_data.get("category")),
+        amount_band(decision_data.get("amount", 0)),
+        getattr(base_risk, "value", base_risk),
+        _label(decision_data.get("risk_level"))
+    )
+
+
+def insight_cache_key(decision_data: Dict[str, Any], base_risk: Any) -> Tuple[str, int, str, str, str]:
+    """Risk key plus the normalized description, which related-memory lookups depend on"""
+    description = _SPACE.sub(" ", str(decision_data.get("description", ""))).strip().lower()
+    return risk_cache_key(decision_data, base_risk) + (description,)
+
+
+class RiskAssessmentCache:
+    """
+    LRU of assessment results for one model version
+    
+    Entries are only valid for the version they were computed under.
+    Versions only grow: a lookup with a newer version drops everything
+    cached so far, while one with an older version (a request that
+    started before the change) misses and leaves the cache alone.
+    """
+    
+    def __init__(self, capacity: int = RISK_CACHE_SIZE):
+        self.capacity = capacity
+        self._entries: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+    
+    def _check_version(self, version: int) -> bool:
+        """Move to a newer version; whether ``version`` is the current one"""
+        if self._version is None or version > self._version:
+            if self._entries:
+                self.stats["invalidations"] += 1
+            self._entries.clear()
+            self._version = version
+        return version == self._version
+    
+    def get(self, key: Tuple, version: int) -> Optional[Any]:
+        """Cached result for ``key`` under ``version``, or None"""
+        with self._lock:
+            value = self._entries.get(key) if self._check_version(version) else None
+            if value is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+    
+    def put(self, key: Tuple, version: int, value: Any):
+        """Store a result computed under ``version`` (dropped if a newer one is current)"""
+        with self._lock:
+            if not self._check_version(version):
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters and hit rate"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return dict(
+                self.stats,
+                size=len(self._entries),
+                capacity=self.capacity,
+                model_version=self._version,
+                hit_rate=round(self.stats["hits"] / lookups * 100, 2) if lookups else 0.0
+            )
@@ -0,0 +1,211 @@
+"""
+Risk Rules
+Amount boundaries and action tables per category and tenant, compiled from a rules file
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    import yaml
+    YAML_AVAILABLE = True
+except ImportError:
+    YAML_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+RISK_RULES_FILE = os.getenv("RISK_RULES_FILE", "risk_rules.json")
+RELOAD_CHECK_SECONDS = 1.0
+
+RISK_LEVELS = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+DEFAULT_SCOPE = "*"
+
+# The built-in rules: amounts up to 1000 are LOW, up to 10000 MEDIUM, up to
+# 50000 HIGH, anything above CRITICAL
+DEFAULT_RULES = {
+    "default": {
+        "boundaries": [1000, 10000, 50000],
+        "thresholds": {
+            "LOW": {"max_amount": 1000, "auto_execute": True},
+            "MEDIUM": {"max_amount": 10000, "auto_execute": True, "log_required": True},
+            "HIGH": {"max_amount": 50000, "auto_execute": False, "human_approval": True},
+            "CRITICAL": {"max_amount": None, "auto_execute": False, "human_review": True}
+        }
+    },
+    "categories": {},
+    "tenants": {}
+}
+
+
+def _action(thresholds: Dict[str, Any], ai_allowed: bool) -> str:
+    """Required action for one risk level's flags"""
+    if ai_allowed:
+        return "AI_EXECUTE_IMMEDIATELY" if thresholds.get("auto_execute") else "AI_PROPOSE_HUMAN_REVIEW"
+    if thresholds.get("auto_execute"):
+        return "EXECUTE_IMMEDIATELY"
+    elif thresholds.get("human_approval"):
+        return "WAIT_HUMAN_APPROVAL"
+    elif thresholds.get("human_review"):
+        return "WAIT_HUMAN_REVIEW"
+    return "LOG_ONLY"
+
+
+class RiskTable:
+    """Compiled rules for one (tenant, category) scope"""
+    
+    __slots__ = ("boundaries", "thresholds", "actions")
+    
+    def __init__(self, scope: Dict[str, Any]):
+        boundaries = [float(b) for b in scope["boundaries"]]
+        if len(boundaries) != len(RISK_LEVELS) - 1 or boundaries != sorted(boundaries):
+            raise ValueError(f"boundaries must be {len(RISK_LEVELS) - 1} ascending amounts, got {scope['boundaries']}")
+        self.boundaries = boundaries
+        self.thresholds = {level: dict(scope["thresholds"].get(level, {})) for level in RISK_LEVELS}
+        # actions[2 * level index + ai_allowed]
+        self.actions = tuple(
+            _action(self.thresholds[level], allowed) for level in RISK_LEVELS for allowed in (False, True)
+        )
+    
+    def level_index(self, amount: float) -> int:
+        """Index into RISK_LEVELS (an amount equal to a boundary stays in the lower level)"""
+        return bisect_left(self.boundaries, amount)
+    
+    def action(self, level_index: int, ai_allowed: bool) -> str:
+        return self.actions[2 * level_index + bool(ai_allowed)]
+
+
+def _overlay(base: Dict[str, Any], override: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Scope inheritance: boundaries replace, thresholds merge per level"""
+    if not override:
+        return base
+    merged = {"boundaries": override.get("boundaries", base["boundaries"]),
+              "thresholds": {level: dict(flags) for level, flags in base["thresholds"].items()}}
+    for level, flags in override.get("thresholds", {}).items():
+        if level not in RISK_LEVELS:
+            raise ValueError(f"Unknown risk level in thresholds: {level}")
+        merged["thresholds"].setdefault(level, {}).update(flags)
+    return merged
+
+
+class CompiledRiskRules:
+    """
+    Every scope of a rules document, resolved ahead of time
+    
+    A scope inherits from the global default, then the global category,
+    then the tenant default, then the tenant category. Global categories
+    and each tenant's own scopes are compiled up front; a global category
+    seen through a tenant's default is compiled on first use and kept.
+    A lookup is then at most two dict gets and a bisect over three
+    boundaries, however many categories and tenants the file defines.
+    """
+    
+    def __init__(self, rules: Dict[str, Any], version: int = 0):
+        self.version = version
+        self._default = _overlay(DEFAULT_RULES["default"], rules.get("default"))
+        self._categories = {name.upper(): scope for name, scope in rules.get("categories", {}).items()}
+        self._tenant_defaults: Dict[str, Optional[Dict[str, Any]]] = {}
+        
+        self._global: Dict[str, RiskTable] = {DEFAULT_SCOPE: RiskTable(self._default)}
+        for name, scope in self._categories.items():
+            self._global[name] = RiskTable(_overlay(self._default, scope))
+        
+        self._tenants: Dict[str, Dict[str, RiskTable]] = {}
+        for tenant_id, tenant in rules.get("tenants", {}).items():
+            tenant_default = tenant.get("default")
+            self._tenant_defaults[tenant_id] = tenant_default
+            tables = {DEFAULT_SCOPE: RiskTable(_overlay(self._default, tenant_default))}
+            for name, scope in tenant.get("categories", {}).items():
+                tables[name.upper()] = RiskTable(_overlay(self._inherited(name.upper(), tenant_default), scope))
+            self._tenants[tenant_id] = tables
+    
+    def _inherited(self, category: str, tenant_default: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return _overlay(_overlay(self._default, self._categories.get(category)), tenant_default)
+    
+    def table(self, category: Optional[str] = None, tenant_id: Optional[str] = None) -> RiskTable:
+        """Rules for a category (upper-case name) of a tenant"""
+        tables = self._tenants.get(tenant_id) if tenant_id else None
+        if tables is None:
+            return self._global.get(category) or self._global[DEFAULT_SCOPE]
+        table = tables.get(category)
+        if table is None:
+            if category not in self._categories:
+                return tables[DEFAULT_SCOPE]
+            table = tables[category] = RiskTable(self._inherited(category, self._tenant_defaults[tenant_id]))
+        return table
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "categories": len(self._categories),
+            "tenants": len(self._tenants),
+            "tables": len(self._global) + sum(len(tables) for tables in self._tenants.values())
+        }
+
+
+class RiskRules:
+    """
+    Rules file with hot reload
+    
+    ``current()`` re-checks the file's mtime at most once a second. A
+    changed file is compiled off to the side and swapped in with a single
+    reference assignment, so evaluations never see a half-built table; a
+    file that fails to parse or validate leaves the previous rules active.
+    A missing file means the built-in rules.
+    """
+    
+    def __init__(self, path: str = RISK_RULES_FILE):
+        self.path = path
+        self._mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._compiled = CompiledRiskRules({}, version=0)
+        self.reload()
+    
+    @property
+    def version(self) -> int:
+        return self._compiled.version
+    
+    def _read(self) -> Dict[str, Any]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            if self.path.endswith((".yaml", ".yml")):
+                if not YAML_AVAILABLE:
+                    raise RuntimeError(f"PyYAML is required to read {self.path}")
+                return yaml.safe_load(f) or {}
+            return json.load(f)
+    
+    def reload(self) -> bool:
+        """Recompile if the file changed; returns whether new rules were installed"""
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime == self._mtime:
+                return False
+            try:
+                rules = self._read() if mtime is not None else {}
+                compiled = CompiledRiskRules(rules, version=self._compiled.version + 1)
+            except Exception as e:
+                logger.error(f"Keeping previous risk rules; {self.path} is invalid: {e}")
+                self._mtime = mtime  # do not retry until the file changes again
+                return False
+            self._mtime = mtime
+            self._compiled = compiled
+            logger.info(f"Loaded risk rules version {compiled.version} from {self.path}")
+            return True
+    
+    def current(self) -> CompiledRiskRules:
+        """Active compiled rules, reloading first if the file changed"""
+        if time.monotonic() - self._checked >= RELOAD_CHECK_SECONDS:
+            self.reload()
+        return self._compiled
+
+
+# Global instance
+risk_rules = RiskRules()
@@ -0,0 +1,63 @@
+"""
+Risk Rules Benchmark
+Time compiled risk-rule evaluation as the number of categories and tenants grows
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from risk_rules import CompiledRiskRules
+
+EVALUATIONS = 200000
+
+
+def build_rules(categories: int, tenants: int, tenant_categories: int = 5) -> dict:
+    """Synthetic rules with the given number of scopes"""
+    rng = random.Random(categories * 7919 + tenants)
+    
+    def scope():
+        low = rng.randint(100, 2000)
+        return {"boundaries": [low, low * 10, low * 50]}
+    
+    return {
+        "categories": {f"CAT{i}": scope() for i in range(categories)},
+        "tenants": {
+            f"{i:016x}": {"default": scope(), "categories": {f"CAT{j}": scope() for j in range(tenant_categories)}}
+            for i in range(tenants)
+        }
+    }
+
+
+def benchmark(categories: int, tenants: int) -> float:
+    """Nanoseconds per (table lookup + level + action) evaluation"""
+    compiled = CompiledRiskRules(build_rules(categories, tenants))
+    rng = random.Random(1)
+    queries = [
+        (f"CAT{rng.randrange(max(categories, 1))}", f"{rng.randrange(max(tenants, 1)):016x}" if tenants else None,
+         rng.uniform(0, 100000), rng.random() < 0.5)
+        for _ in range(EVALUATIONS)
+    ]
+    
+    for category, tenant_id, _, _ in queries:  # compile lazily inherited scopes first
+        compiled.table(category, tenant_id)
+    
+    start = time.perf_counter()
+    for category, tenant_id, amount, allowed in queries:
+        table = compiled.table(category, tenant_id)
+        table.action(table.level_index(amount), allowed)
+    return (time.perf_counter() - start) / EVALUATIONS * 1e9
+
+
+def main():
+    """Print the cost per evaluation for growing rule sets"""
+    print(f"{'categories':>10} {'tenants':>8} {'tables':>8} {'ns/eval':>8}")
+    for categories, tenants in ((1, 0), (10, 0), (100, 10), (1000, 100), (1000, 2000)):
+        stats = CompiledRiskRules(build_rules(categories, tenants)).get_stats()
+        print(f"{categories:>10} {tenants:>8} {stats['tables']:>8} {benchmark(categories, tenants):>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Policy Simulation
+Grid-search risk boundaries and autonomy cut-offs against the recorded decision history
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_memory_system import AIMemory
+from policy_simulator import DecisionHistory, PolicySimulator, current_policy, policy_grid
+
+GRID = {
+    "boundary.0": [250, 500, 1000, 2000, 5000],
+    "boundary.1": [5000, 10000, 20000],
+    "boundary.2": [25000, 50000, 100000],
+    "autonomy_cutoffs.LOW": [20, 30, 40],
+    "autonomy_cutoffs.MEDIUM": [40, 50, 60],
+    "autonomy_cutoffs.HIGH": [75, 85, 95],
+}
+
+
+def load_ai_tasks(autonomy_file: str):
+    """AI-owned tasks from the autonomy state file (all categories if it is missing)"""
+    try:
+        with open(autonomy_file, "r", encoding="utf-8") as f:
+            return list(json.load(f).get("ai_tasks", {}))
+    except FileNotFoundError:
+        return None
+
+
+def main():
+    """Print the current policy's replay and the best policies of the grid"""
+    parser = argparse.ArgumentParser(description="What-if replay of decision history")
+    parser.add_argument("--memory", default="ai_memory.json", help="AI memory file")
+    parser.add_argument("--autonomy", default="autonomy_tracker.json", help="Autonomy state file")
+    parser.add_argument("--max-failures", type=int, default=None,
+                        help="Drop policies that would have auto-executed more failed decisions")
+    parser.add_argument("--top", type=int, default=10, help="Policies to show")
+    parser.add_argument("--processes", type=int, default=0, help="Worker processes (0 = one per core)")
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    history = DecisionHistory.from_memory(AIMemory(args.memory))
+    simulator = PolicySimulator(history, processes=args.processes)
+    print(f"Loaded {len(history)} decisions ({len(simulator.groups)} groups) in {time.perf_counter() - start:.2f}s")
+    
+    base = current_policy(load_ai_tasks(args.autonomy))
+    current = simulator.simulate(base)
+    print(f"Current policy: {current['auto_executed']} auto-executed, {current['needs_approval']} need approval")
+    
+    policies = policy_grid(base, **GRID)
+    start = time.perf_counter()
+    best = simulator.grid_search(policies, max_failures=args.max_failures, top=args.top)
+    print(f"Evaluated {len(policies)} policies in {time.perf_counter() - start:.2f}s\n")
+    
+    print(f"{'boundaries':>26} {'cut-offs':>12} {'auto':>7} {'approval':>8} {'risk chg':>8} {'exec chg':>8} {'failed':>6}")
+    for report in best:
+        policy = report["policy"]
+        boundaries = "/".join(f"{b:g}" for b in policy["boundaries"])
+        cutoffs = "/".join(str(policy["autonomy_cutoffs"][level]) for level in ("LOW", "MEDIUM", "HIGH"))
+        print(f"{boundaries:>26} {cutoffs:>12} {report['auto_executed']:>7} {report['needs_approval']:>8} "
+              f"{report['risk_changed']:>8} {report['execution_changed']:>8} {report['auto_executed_failures']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Strategy Runner
+Concurrent execution of income strategies with per-strategy timeouts
+"""
+
+import asyncio
+import inspect
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STRATEGY_TIMEOUT_SECONDS = float(os.getenv("STRATEGY_TIMEOUT_SECONDS", "30"))
+MAX_STRATEGY_THREADS = 32
+
+EXECUTION_MODES = ("thread", "process", "async")
+
+
+def execution_mode(strategy: Any) -> str:
+    """How a strategy runs: "async" for an ``async def execute``, else its ``execution_mode``"""
+    if inspect.iscoroutinefunction(strategy.execute):
+        return "async"
+    mode = getattr(strategy, "execution_mode", "thread")
+    if mode not in ("thread", "process"):
+        raise ValueError(f"Unknown execution mode for {strategy.name}: {mode}")
+    return mode
+
+
+def _execute_in_process(strategy: Any):
+    """Pool worker: run one strategy and send back its result and updated state"""
+    result = strategy.execute()
+    return result, strategy.__getstate__()
+
+
+class _Task:
+    """One strategy's run"""
+    
+    __slots__ = ("strategy", "mode", "deadline", "handle", "status", "result", "error", "elapsed")
+    
+    def __init__(self, strategy: Any, mode: str, deadline: float):
+        self.strategy = strategy
+        self.mode = mode
+        self.deadline = deadline
+        self.handle = None  # Future, AsyncResult or (loop, asyncio task)
+        self.status: Optional[str] = None
+        self.result = None
+        self.error: Optional[str] = None
+        self.elapsed = 0.0
+
+
+class StrategyRunner:
+    """
+    Runs strategies concurrently and gathers their results
+    
+    I/O-bound strategies (``execution_mode = "thread"``, the default) share
+    a thread pool, CPU-bound ones (``"process"``) a process pool, and
+    strategies with an ``async def execute`` one event loop, so a cycle
+    takes about as long as its slowest strategy. Each strategy has until
+    its ``execution_timeout`` (or the runner's ``timeout``) from the start
+    of the run. A strategy that overruns, or every unfinished one after
+    ``cancel()``, is reported as TIMEOUT or CANCELLED and abandoned:
+    coroutines are cancelled, worker processes terminated, and threads
+    asked to stop through ``strategy.cancel()`` (they can check
+    ``strategy.cancelled``); a thread that ignores it finishes in the
+    background and its result is dropped. Process strategies run on a
+    copy, whose updated state is copied back when they complete.
+    """
+    
+    def __init__(self, timeout: float = STRATEGY_TIMEOUT_SECONDS, max_threads: int = MAX_STRATEGY_THREADS,
+                 max_processes: Optional[int] = None):
+        self.timeout = timeout
+        self.max_threads = max_threads
+        self.max_processes = max_processes or os.cpu_count() or 1
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._cancelled = threading.Event()
+    
+    def cancel(self):
+        """Stop waiting for the strategies of the current run"""
+        self._cancelled.set()
+        self._wake.set()
+    
+    def run(self, strategies: List[Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Execute every strategy and wait for all of them (or their deadlines)
+        
+        Returns ``{"results", "summary"}``: one result per strategy in the
+        given order, each with ``strategy`` and ``execution`` (mode, status,
+        elapsed seconds) added, and counts per status for the run.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        self._cancelled.clear()
+        self._wake.clear()
+        started = time.monotonic()
+        tasks = []
+        for strategy in strategies:
+            strategy.cancel_event.clear()
+            limit = getattr(strategy, "execution_timeout", None)
+            tasks.append(_Task(strategy, execution_mode(strategy), started + (timeout if limit is None else limit)))
+        
+        with ExitStack() as stack:
+            self._start(tasks, started, stack)
+            self._collect(tasks, started)
+        
+        results = [self._result(task) for task in tasks]
+        statuses = [task.status for task in tasks]
+        slowest = max(tasks, key=lambda task: task.elapsed, default=None)
+        summary = {
+            "strategies": len(tasks),
+            "completed": statuses.count("COMPLETED"),
+            "errors": statuses.count("ERROR"),
+            "timed_out": statuses.count("TIMEOUT"),
+            "cancelled": statuses.count("CANCELLED"),
+            "duration": round(time.monotonic() - started, 4),
+            "slowest": {"strategy": slowest.strategy.name, "elapsed": round(slowest.elapsed, 4)} if slowest else None
+        }
+        if summary["completed"] < len(tasks):
+            logger.warning(f"Strategy run finished with {len(tasks) - summary['completed']} of {len(tasks)} "
+                           f"strategies not completed")
+        return {"results": results, "summary": summary}
+    
+    def _start(self, tasks: List[_Task], started: float, stack: ExitStack):
+        process_tasks = [task for task in tasks if task.mode == "process"]
+        thread_tasks = [task for task in tasks if task.mode == "thread"]
+        async_tasks = [task for task in tasks if task.mode == "async"]
+        
+        if process_tasks:
+            # Leaving the stack terminates the pool, stopping any overrunning worker
+            pool = stack.enter_context(multiprocessing.Pool(min(self.max_processes, len(process_tasks))))
+            for task in process_tasks:
+                task.handle = pool.apply_async(
+                    _execute_in_process, (task.strategy,),
+                    callback=lambda output, task=task: self._finish_process(task, output, started),
+                    error_callback=lambda error, task=task: self._finish(task, started, "ERROR", error=error)
+                )
+        
+        if thread_tasks:
+            executor = ThreadPoolExecutor(max_workers=min(self.max_threads, len(thread_tasks)),
+                                          thread_name_prefix="strategy")
+            stack.callback(executor.shutdown, wait=False, cancel_futures=True)
+            for task in thread_tasks:
+                task.handle = executor.submit(task.strategy.execute)
+                task.handle.add_done_callback(lambda future, task=task: self._finish_future(task, future, started))
+        
+        if async_tasks:
+            ready = threading.Event()
+            # Own thread, so a run started from inside an event loop works too
+            threading.Thread(target=asyncio.run, args=(self._run_async(async_tasks, started, ready),),
+                             name="strategy-loop", daemon=True).start()
+            ready.wait()
+    
+    async def _run_async(self, tasks: List[_Task], started: float, ready: threading.Event):
+        async def run_one(task: _Task):
+            try:
+                result = await task.strategy.execute()
+            except asyncio.CancelledError:
+                self._finish(task, started, "CANCELLED")
+            except Exception as e:
+                self._finish(task, started, "ERROR", error=e)
+            else:
+                self._finish(task, started, "COMPLETED", result)
+        
+        loop = asyncio.get_running_loop()
+        coroutines = []
+        for task in tasks:
+            coroutine = asyncio.ensure_future(run_one(task))
+            task.handle = (loop, coroutine)
+            coroutines.append(coroutine)
+        ready.set()
+        await asyncio.gather(*coroutines, return_exceptions=True)
+    
+    def _finish(self, task: _Task, started: float, status: str, result: Any = None, error: Any = None,
+                state: Optional[Dict[str, Any]] = None) -> bool:
+        """Record a task's outcome; the first one recorded wins"""
+        with self._lock:
+            if task.status is not None:
+                return False
+            if state is not None:
+                task.strategy.__dict__.update(state)
+            task.status = status
+            task.result = result
+            task.error = None if error is None else f"{type(error).__name__}: {error}"
+            task.elapsed = time.monotonic() - started
+        if status == "ERROR":
+            logger.error(f"Strategy {task.strategy.name} failed: {task.error}")
+        self._wake.set()
+        return True
+    
+    def _finish_future(self, task: _Task, future: Future, started: float):
+        if future.cancelled():
+            self._finish(task, started, "CANCELLED")
+        elif future.exception() is not None:
+            self._finish(task, started, "ERROR", error=future.exception())
+        else:
+            self._finish(task, started, "COMPLETED", future.result())
+    
+    def _finish_process(self, task: _Task, output: Any, started: float):
+        result, state = output
+        self._finish(task, started, "COMPLETED", result, state=state)
+    
+    def _abandon(self, task: _Task, started: float, status: str):
+        """Give up on an unfinished task and ask it to stop"""
+        if not self._finish(task, started, status):
+            return
+        logger.warning(f"Strategy {task.strategy.name} {status.lower()} after {task.elapsed:.1f}s")
+        task.strategy.cancel()
+        if task.mode == "thread":
+            task.handle.cancel()
+        elif task.mode == "async":
+            loop, coroutine = task.handle
+            loop.call_soon_threadsafe(coroutine.cancel)
+        # Process workers are terminated when the run's pool is closed
+    
+    def _collect(self, tasks: List[_Task], started: float):
+        while True:
+            with self._lock:
+                pending = [task for task in tasks if task.status is None]
+            if not pending:
+                return
+            if self._cancelled.is_set():
+                for task in pending:
+                    self._abandon(task, started, "CANCELLED")
+                continue
+            now = time.monotonic()
+            expired = [task for task in pending if task.deadline <= now]
+            for task in expired:
+                self._abandon(task, started, "TIMEOUT")
+            if not expired:
+                self._wake.wait(min(task.deadline for task in pending) - now)
+                self._wake.clear()
+    
+    @staticmethod
+    def _result(task: _Task) -> Dict[str, Any]:
+        result = dict(task.result) if isinstance(task.result, dict) else {}
+        if task.result is not None and not isinstance(task.result, dict):
+            result["result"] = task.result
+        result["strategy"] = task.strategy.name
+        result["execution"] = {"mode": task.mode, "status": task.status, "elapsed": round(task.elapsed, 4)}
+        if task.error:
+            result["execution"]["error"] = task.error
+        return result
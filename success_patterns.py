@@ -0,0 +1,171 @@
+"""
+Success Patterns
+Maintained success/failure tables over decision outcomes
+"""
+
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable
+
+from memory_retention import record_epoch
+
+MAX_EXEMPLARS = 20       # recent successful decisions kept as examples
+REPORTED_STRATEGIES = 10
+REPORTED_DAYS = 30
+
+_SEPARATOR = "|"
+
+
+def _value(value: Any) -> str:
+    value = getattr(value, "value", value)
+    return "" if value is None else str(value)
+
+
+def _type_key(decision: Dict[str, Any]) -> str:
+    return _value(decision.get("category")) + _SEPARATOR + _value(decision.get("risk_level"))
+
+
+def _rate(counts: List[int]) -> Optional[float]:
+    total = counts[0] + counts[1]
+    return round(counts[0] / total * 100, 2) if total else None
+
+
+class SuccessPatterns:
+    """
+    Success and failure counts per (category, risk level), per strategy and
+    per day, plus a capped sample of recent successful decisions
+    
+    Tables are plain ``[successes, failures]`` lists keyed by strings, so
+    ``to_dict()`` can be stored as-is in the ``patterns`` slot of
+    ai_memory.json and survives records moving to the archive.
+    """
+    
+    VERSION = 1
+    
+    def __init__(self, state: Optional[Dict[str, Any]] = None, max_exemplars: int = MAX_EXEMPLARS):
+        state = state or {}
+        self.by_type: Dict[str, List[int]] = state.get("by_type", {})
+        self.by_strategy: Dict[str, List[int]] = state.get("by_strategy", {})
+        self.by_day: Dict[str, List[int]] = state.get("by_day", {})
+        self.exemplars = deque(state.get("exemplars", []), maxlen=max_exemplars)
+    
+    @classmethod
+    def is_state(cls, state: Any) -> bool:
+        """Whether a stored ``patterns`` value was written by this class"""
+        return isinstance(state, dict) and state.get("version") == cls.VERSION
+    
+    @classmethod
+    def from_records(cls, decisions: Iterable[Dict[str, Any]], outcomes: Iterable[Dict[str, Any]],
+                     max_exemplars: int = MAX_EXEMPLARS) -> "SuccessPatterns":
+        """
+        Build the tables from stored records (decisions in time order)
+        
+        Decisions carry their latest outcome; outcomes add the strategy and
+        day tables.
+        """
+        patterns = cls(max_exemplars=max_exemplars)
+        for decision in decisions:
+            if decision.get("success") is not None:
+                patterns._count_decision(decision, decision["success"], 1)
+        for outcome in outcomes:
+            patterns._count_outcome(outcome)
+        return patterns
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable state"""
+        return {
+            "version": self.VERSION,
+            "by_type": self.by_type,
+            "by_strategy": self.by_strategy,
+            "by_day": self.by_day,
+            "exemplars": list(self.exemplars)
+        }
+    
+    # ---- maintenance ----
+    
+    def _count_decision(self, decision_record: Dict[str, Any], success: bool, delta: int):
+        counts = self.by_type.setdefault(_type_key(decision_record.get("decision", {})), [0, 0])
+        counts[0 if success else 1] += delta
+        if success and delta > 0:
+            decision = decision_record.get("decision", {})
+            self.exemplars.append({
+                "id": decision_record.get("id"),
+                "type": _value(decision.get("category")) or None,
+                "risk_level": _value(decision.get("risk_level")) or None,
+                "outcome": decision_record.get("outcome")
+            })
+    
+    def _count_outcome(self, outcome: Dict[str, Any]):
+        slot = 0 if outcome.get("success") else 1
+        timestamp = record_epoch(outcome.get("timestamp"))
+        if timestamp:
+            day = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d")
+            self.by_day.setdefault(day, [0, 0])[slot] += 1
+        strategy = (outcome.get("metrics") or {}).get("strategy")
+        if strategy is not None:
+            self.by_strategy.setdefault(str(strategy), [0, 0])[slot] += 1
+    
+    def record_outcome(self, outcome: Dict[str, Any], decision_record: Optional[Dict[str, Any]] = None,
+                       previous_success: Optional[bool] = None):
+        """
+        Count one outcome in O(1)
+        
+        Args:
+            outcome: The outcome record
+            decision_record: The decision it resolves, if still in memory
+            previous_success: The decision's earlier outcome, which is uncounted
+        """
+        self._count_outcome(outcome)
+        if decision_record is None:
+            return
+        if previous_success is not None:
+            self._count_decision(decision_record, previous_success, -1)
+            if previous_success:
+                decision_id = decision_record.get("id")
+                self.exemplars = deque((e for e in self.exemplars if e["id"] != decision_id),
+                                       maxlen=self.exemplars.maxlen)
+        self._count_decision(decision_record, bool(outcome.get("success")), 1)
+    
+    # ---- queries ----
+    
+    def get_patterns(self, category: Any = None, risk_level: Any = None) -> Dict[str, Any]:
+        """
+        Bounded summary of the tables
+        
+        ``successful_decisions`` holds the exemplars (newest last) and
+        ``successful_strategies`` the most successful strategies. When a
+        category is given, ``match`` holds its counts (for one risk level,
+        or summed over all of them).
+        """
+        strategies = sorted(self.by_strategy.items(), key=lambda item: -item[1][0])[:REPORTED_STRATEGIES]
+        days = sorted(self.by_day)[-REPORTED_DAYS:]
+        patterns = {
+            "successful_decisions": list(self.exemplars),
+            "successful_strategies": [name for name, counts in strategies if counts[0]],
+            "by_type": [
+                {
+                    "category": key.split(_SEPARATOR)[0] or None,
+                    "risk_level": key.split(_SEPARATOR)[1] or None,
+                    "successes": counts[0],
+                    "failures": counts[1],
+                    "success_rate": _rate(counts)
+                }
+                for key, counts in sorted(self.by_type.items())
+            ],
+            "by_strategy": {
+                name: {"successes": counts[0], "failures": counts[1], "success_rate": _rate(counts)}
+                for name, counts in strategies
+            },
+            "by_day": {day: {"successes": self.by_day[day][0], "failures": self.by_day[day][1]} for day in days},
+            "optimal_timing": [],
+            "preferred_approaches": []
+        }
+        if category is not None:
+            if risk_level is not None:
+                counts = self.by_type.get(_value(category) + _SEPARATOR + _value(risk_level), [0, 0])
+            else:
+                prefix = _value(category) + _SEPARATOR
+                matching = [c for key, c in self.by_type.items() if key.startswith(prefix)]
+                counts = [sum(c[0] for c in matching), sum(c[1] for c in matching)]
+            patterns["match"] = {"successes": counts[0], "failures": counts[1], "success_rate": _rate(counts)}
+        return patterns
@@ -0,0 +1,118 @@
+"""
+Analytics Export Tests
+Unit tests for the streaming exporter and GET /analytics/export/{dataset}
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.analytics_store import ColumnarAnalyticsStore
+
+START = datetime(2025, 11, 1, 12, 0, 0)
+
+@pytest.fixture
+def export(tmp_path, monkeypatch):
+    """Export module reading ten requests over three days from a temporary store"""
+    # The key and marketing managers create their JSON files on import
+    monkeypatch.chdir(tmp_path)
+    from api import analytics_export
+    store = ColumnarAnalyticsStore(str(tmp_path / "store"))
+    for n in range(10):
+        store.append(START + timedelta(days=n // 4), f"/endpoint/{n}", "GET", "dev_key_12...",
+                     200 if n % 5 else 500, float(n))
+    store.flush()
+    monkeypatch.setattr(analytics_export, "analytics_store", store)
+    monkeypatch.setattr(analytics_export, "EXPORT_CHUNK_ROWS", 3)
+    return analytics_export
+
+@pytest.fixture
+def client(export):
+    from api.analytics_routes import router, verify_admin_key
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[verify_admin_key] = lambda: {"tier": "dev"}
+    return TestClient(app)
+
+def ndjson(chunks):
+    return [json.loads(line) for line in "".join(chunks).splitlines()]
+
+class TestStreamExport:
+    """Exporter tests"""
+    
+    def test_cursor_pages_through_requests(self, export):
+        """Test paging with limit and row cursors returns every row once"""
+        rows, cursor = [], None
+        while True:
+            page = ndjson(export.stream_export("requests", cursor=cursor, limit=4))
+            if not page:
+                break
+            assert len(page) <= 4
+            rows.extend(page)
+            cursor = str(page[-1]["row"] + 1)
+        assert [row["row"] for row in rows] == list(range(10))
+        assert rows[3]["endpoint"] == "/endpoint/3"
+    
+    def test_time_range_filters_requests(self, export):
+        """Test start is inclusive and end exclusive"""
+        rows = ndjson(export.stream_export("requests",
+                                           start=(START + timedelta(days=1)).isoformat(),
+                                           end=(START + timedelta(days=2)).isoformat()))
+        assert [row["row"] for row in rows] == [4, 5, 6, 7]
+    
+    def test_daily_rollups_resume_after_date(self, export):
+        """Test daily totals and the date cursor"""
+        days = ndjson(export.stream_export("daily"))
+        assert [day["total_requests"] for day in days] == [4, 4, 2]
+        assert days[0]["failed_requests"] == 1
+        resumed = ndjson(export.stream_export("daily", cursor=days[0]["date"], limit=1))
+        assert resumed == days[1:2]
+    
+    def test_csv_header_and_rows(self, export):
+        """Test CSV output has the dataset's columns"""
+        lines = "".join(export.stream_export("requests", "csv", limit=2)).splitlines()
+        assert lines[0] == "row,timestamp,endpoint,method,api_key_prefix,status_code,response_time_ms"
+        assert len(lines) == 3
+    
+    @pytest.mark.parametrize("kwargs", [
+        {"dataset": "nope"},
+        {"dataset": "requests", "export_format": "xml"},
+        {"dataset": "requests", "start": "yesterday"},
+        {"dataset": "requests", "cursor": "abc"}
+    ])
+    def test_bad_parameters_raise(self, export, kwargs):
+        """Test malformed parameters fail before anything is streamed"""
+        with pytest.raises(ValueError):
+            export.stream_export(**kwargs)
+
+class TestExportEndpoint:
+    """GET /analytics/export/{dataset} tests"""
+    
+    def test_streams_ndjson_page(self, client):
+        """Test the endpoint passes cursor and limit through"""
+        response = client.get("/analytics/export/requests", params={"cursor": 2, "limit": 3})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        assert [row["row"] for row in ndjson([response.text])] == [2, 3, 4]
+    
+    def test_csv_attachment(self, client):
+        """Test CSV exports are served as a named attachment"""
+        response = client.get("/analytics/export/daily", params={"format": "csv"})
+        assert response.status_code == 200
+        assert 'filename="daily.csv"' in response.headers["content-disposition"]
+        assert len(response.text.splitlines()) == 4
+    
+    def test_bad_iso_time_is_400(self, client):
+        """Test an unparseable start time is rejected"""
+        response = client.get("/analytics/export/requests", params={"start": "2025-13-45"})
+        assert response.status_code == 400
+    
+    def test_unknown_dataset_is_400(self, client):
+        """Test an unknown dataset is rejected"""
+        assert client.get("/analytics/export/nope").status_code == 400
@@ -0,0 +1,123 @@
+"""
+Analytics Store Tests
+Unit tests for the columnar request-event store
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.analytics import APIAnalytics
+from api.analytics_store import ColumnarAnalyticsStore
+
+@pytest.fixture
+def store(tmp_path):
+    """Store with a handful of requests"""
+    store = ColumnarAnalyticsStore(str(tmp_path / "store"))
+    now = datetime(2025, 11, 5, 12, 0, 0)
+    store.append(now, "/decisions/evaluate", "POST", "dev_key_12...", 200, 10.0)
+    store.append(now, "/decisions/evaluate", "POST", "dev_key_12...", 200, 30.0)
+    store.append(now - timedelta(days=1), "/risk/assess", "POST", "pro_key_45...", 500, 50.0)
+    store.append(now - timedelta(days=10), "/risk/assess", "POST", "dev_key_12...", 200, None)
+    return store
+
+class TestColumnarAnalyticsStore:
+    """Columnar store tests"""
+    
+    def test_rows_persist_across_instances(self, store):
+        """Test flushed rows are visible to a new reader"""
+        store.flush()
+        reopened = ColumnarAnalyticsStore(store.directory)
+        assert len(reopened) == 4
+        assert reopened.query().rows(limit=1)[0]["endpoint"] == "/decisions/evaluate"
+    
+    def test_group_by_endpoint(self, store):
+        """Test grouped counts, errors and latency"""
+        groups = store.query().group_by("endpoint")
+        assert groups["/decisions/evaluate"]["count"] == 2
+        assert groups["/decisions/evaluate"]["avg_response_time_ms"] == pytest.approx(20.0)
+        assert groups["/risk/assess"]["errors"] == 1
+        assert groups["/risk/assess"]["error_rate"] == pytest.approx(50.0)
+    
+    def test_group_by_distinct(self, store):
+        """Test distinct counts per group"""
+        users = store.query().group_by("api_key", distinct="endpoint")
+        assert users["dev_key_12..."]["distinct_endpoint"] == 2
+        assert users["pro_key_45..."]["distinct_endpoint"] == 1
+    
+    def test_time_filter_and_buckets(self, store):
+        """Test time range filtering and daily buckets"""
+        recent = store.query().where(start=datetime(2025, 11, 1))
+        assert recent.count() == 3
+        assert recent.time_buckets("day") == {
+            "2025-11-04": {"requests": 1, "errors": 1},
+            "2025-11-05": {"requests": 2, "errors": 0}
+        }
+    
+    def test_percentiles_skip_untimed_rows(self, store):
+        """Test percentiles ignore requests without a response time"""
+        assert store.query().percentiles((50,)) == {"p50": pytest.approx(30.0)}
+        by_endpoint = store.query().percentiles((100,), by="endpoint")
+        assert by_endpoint["/risk/assess"]["p100"] == pytest.approx(50.0)
+    
+    def test_unknown_filter_value_matches_nothing(self, store):
+        """Test filtering on a value that was never recorded"""
+        assert store.query().where(endpoint="/nope").count() == 0
+    
+    def test_directory_created_on_first_write(self, tmp_path):
+        """Test opening a store leaves no directory until rows are written"""
+        store = ColumnarAnalyticsStore(str(tmp_path / "lazy"))
+        assert len(store) == 0
+        assert not os.path.exists(store.directory)
+        store.append(datetime.now(), "/health", "GET", "anonymous", 200)
+        store.flush()
+        assert len(store) == 1
+
+class TestAPIAnalyticsCounters:
+    """Batched endpoint/key/day counters in api_analytics.json"""
+    
+    def test_counters_merge_in_batches(self, tmp_path):
+        """Test requests touch the file only on flush and instances add up"""
+        path = str(tmp_path / "api_analytics.json")
+        first = APIAnalytics(path, save_interval=3600)
+        second = APIAnalytics(path, save_interval=3600)
+        before = os.path.getmtime(path)
+        
+        first.record_request("/risk/assess", "POST", "dev_key_123", 200, 10.0)
+        first.record_request("/risk/assess", "POST", "dev_key_123", 500, 30.0)
+        second.record_request("/risk/assess", "POST", "pro_key_456", 200, 20.0)
+        with open(path) as f:
+            assert json.load(f)["endpoints"] == {}
+        assert os.path.getmtime(path) == before
+        
+        first.flush()
+        second.flush()
+        with open(path) as f:
+            data = json.load(f)
+        stats = data["endpoints"]["POST /risk/assess"]
+        assert (stats["count"], stats["success_count"], stats["error_count"]) == (3, 2, 1)
+        assert stats["avg_response_time"] == pytest.approx(20.0)
+        assert data["keys"]["dev_key_12..."]["count"] == 2
+        assert sum(day["total_requests"] for day in data["daily_stats"].values()) == 3
+    
+    def test_requests_record_while_flush_writes(self, tmp_path):
+        """Test the file is merged and written without holding up request recording"""
+        import threading
+        analytics = APIAnalytics(str(tmp_path / "api_analytics.json"), save_interval=3600)
+        analytics.record_request("/risk/assess", "POST", "dev_key_123", 200, 10.0)
+        merge = analytics._merge
+        
+        def merge_during_request(data, pending):
+            analytics.record_request("/risk/assess", "POST", "dev_key_123", 200, 10.0)  # blocks if flush holds the lock
+            merge(data, pending)
+        analytics._merge = merge_during_request
+        flushing = threading.Thread(target=analytics.flush, daemon=True)
+        flushing.start()
+        flushing.join(timeout=5)
+        
+        assert not flushing.is_alive()
+        assert analytics._pending["endpoints"]["POST /risk/assess"]["count"] == 1
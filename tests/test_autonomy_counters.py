@@ -0,0 +1,113 @@
+"""
+Autonomy Counters Tests
+Unit tests for shared, group-committed progression counters
+"""
+
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from autonomy_counters import SharedCounters
+from autonomy_progression import AutonomyProgressionSystem
+from autonomy_tracker import GradualAutonomySystem
+
+def _lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "progress.counters.ndjson")
+
+class TestAutonomyCounters:
+    """Shared counter tests"""
+    
+    def test_updates_in_a_window_are_one_write(self, path):
+        """Test many updates are folded into one appended line by the commit timer"""
+        counters = SharedCounters(path, commit_interval=0.05)
+        for _ in range(500):
+            counters.add("decisions")
+        assert not os.path.exists(path)
+        assert counters.get("decisions") == 500  # pending updates still count
+        
+        time.sleep(0.3)
+        
+        assert [line["delta"] for line in _lines(path)] == [{"decisions": 500}]
+        assert counters.get_stats()["commits"] == 1
+    
+    def test_workers_merge(self, path):
+        """Test totals include what other writers of the same log committed"""
+        a, b = SharedCounters(path, commit_interval=60), SharedCounters(path, commit_interval=60)
+        for _ in range(3):
+            a.add("decisions")
+        b.add("decisions", 2)
+        b.add("tweets")
+        a.commit()
+        b.commit()
+        a.refresh(force=True)
+        
+        assert a.totals() == b.totals() == {"decisions": 5, "tweets": 1}
+        assert SharedCounters(path).totals() == {"decisions": 5, "tweets": 1}
+    
+    def test_compaction_keeps_totals(self, path, monkeypatch):
+        """Test a compacted log holds one line and other readers re-read it"""
+        monkeypatch.setattr("autonomy_counters.COMPACT_BYTES", 200)
+        a, b = SharedCounters(path, commit_interval=60), SharedCounters(path, commit_interval=60)
+        for i in range(10):
+            b.add("decisions")
+            b.commit()
+        a.refresh(force=True)
+        
+        assert b.get_stats()["compactions"] >= 1
+        assert len(_lines(path)) < 10
+        assert a.totals() == b.totals() == {"decisions": 10}
+    
+    def test_compaction_keeps_daily_history(self, path):
+        """Test totals as of a past time survive compaction at day resolution"""
+        day = 86400
+        with open(path, "w") as f:
+            for ts, n in ((10 * day + 5, 1), (10 * day + 50, 2), (11 * day + 5, 4)):
+                f.write(json.dumps({"ts": ts, "delta": {"decisions": n}}) + "\n")
+        counters = SharedCounters(path, commit_interval=60)
+        
+        counters.compact()
+        
+        assert [line["ts"] for line in _lines(path)] == [10 * day + 50, 11 * day + 5]
+        assert counters.totals_as_of(10 * day + 60) == {"decisions": 3}
+        assert counters.totals_as_of(12 * day) == counters.totals() == {"decisions": 7}
+    
+    def test_performance_survives_restart(self, tmp_path):
+        """Test success counts toward capability thresholds are kept across instances"""
+        autonomy_file = str(tmp_path / "autonomy_tracker.json")
+        first = GradualAutonomySystem(autonomy_file)
+        for _ in range(6):
+            first.record_success("decision")
+        first.counters.commit()
+        
+        second = GradualAutonomySystem(autonomy_file)
+        for _ in range(4):
+            second.record_success("decision")
+        
+        assert second.ai_performance["successful_decisions"] == 10
+        assert "successful_low_risk_decisions" in [p["capability"] for p in second.tracker.data["proven_capabilities"]]
+    
+    def test_progression_seeds_from_existing_metrics(self, tmp_path):
+        """Test counts in an existing progression file carry over once"""
+        path = str(tmp_path / "autonomy_progression.json")
+        with open(path, "w") as f:
+            json.dump({"current_level": "LEVEL_1_HUMAN_LED", "milestones": [], "metrics": {
+                "total_decisions": 10, "ai_decisions": 8, "human_decisions": 2, "human_interventions": 1,
+                "successful_decisions": 9, "success_rate": 90.0, "autonomy_score": 0.0}}, f)
+        
+        progression = AutonomyProgressionSystem(path)
+        progression.record_decision("operational", ai_made=True, human_approved=False, success=True)
+        progression.counters.commit()
+        again = AutonomyProgressionSystem(path)
+        
+        assert again.metrics["total_decisions"] == 11
+        assert again.metrics["ai_decisions"] == 9
+        assert again.metrics["success_rate"] == pytest.approx(1000 / 11)
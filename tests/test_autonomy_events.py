@@ -0,0 +1,169 @@
+"""
+Autonomy Events Tests
+Unit tests for the event-sourced autonomy tracker and progression system
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from autonomy_events import event_log_paths
+from autonomy_progression import AutonomyLevel, AutonomyProgressionSystem
+from autonomy_tracker import AutonomyTracker
+
+def _now():
+    time.sleep(0.002)
+    stamp = datetime.now().isoformat()
+    time.sleep(0.002)
+    return stamp
+
+@pytest.fixture
+def autonomy_file(tmp_path):
+    return str(tmp_path / "autonomy_tracker.json")
+
+class TestAutonomyEvents:
+    """Event log tests"""
+    
+    def test_restart_replays_events_since_snapshot(self, autonomy_file):
+        """Test a reload rebuilds the same state from the last snapshot plus newer events"""
+        tracker = AutonomyTracker(autonomy_file)
+        tracker.events.snapshot_every = 3
+        for i in range(4):
+            tracker.prove_capability(f"capability_{i}")
+        tracker.handoff_task("tweet_approval", "proven")
+        
+        reloaded = AutonomyTracker(autonomy_file)
+        
+        assert reloaded.data == tracker.data
+        assert reloaded.events.seq == tracker.events.seq == 6  # 4 capabilities, handoff, milestone
+        assert reloaded.events.get_stats()["events_since_snapshot"] == 0
+        with open(autonomy_file) as f:
+            assert json.load(f) == tracker.data  # state file mirrors the latest snapshot
+    
+    def test_migrates_existing_state_file(self, autonomy_file):
+        """Test an old-format state file becomes the log's starting point"""
+        legacy = AutonomyTracker(autonomy_file).load_data()
+        legacy["current_autonomy"] = 61.5
+        legacy["proven_capabilities"] = [{"capability": "legacy", "timestamp": "2025-01-01T00:00:00"}]
+        with open(autonomy_file, "w") as f:
+            json.dump(legacy, f)
+        for path in event_log_paths(autonomy_file):
+            if os.path.exists(path):
+                os.remove(path)
+        
+        tracker = AutonomyTracker(autonomy_file)
+        tracker.prove_capability("new")
+        
+        assert [p["capability"] for p in AutonomyTracker(autonomy_file).data["proven_capabilities"]] == ["legacy", "new"]
+    
+    def test_state_as_of(self, autonomy_file):
+        """Test the status at a past time ignores later events"""
+        tracker = AutonomyTracker(autonomy_file)
+        tracker.events.snapshot_every = 2
+        before = _now()
+        tracker.prove_capability("first")
+        middle = _now()
+        tracker.handoff_task("decision_review", "proven")
+        tracker.prove_capability("second")
+        
+        then = tracker.get_status_as_of(middle)
+        
+        assert tracker.get_status_as_of("2000-01-01T00:00:00") is None
+        assert tracker.get_status_as_of(before)["proven_capabilities"] == 0
+        assert then["proven_capabilities"] == 1
+        assert "decision_review" in then["remaining_tasks"]
+        assert tracker.get_status_as_of(datetime.now().isoformat())["current_autonomy"] == tracker.data["current_autonomy"]
+        assert [e["type"] for e in tracker.get_history(since=middle)] == ["handoff", "milestone", "capability"]
+        assert [e["seq"] for e in tracker.get_history(after_seq=2, limit=1)] == [3]
+    
+    def test_torn_event_is_dropped(self, autonomy_file):
+        """Test a partially written last event does not break loading"""
+        tracker = AutonomyTracker(autonomy_file)
+        tracker.prove_capability("kept")
+        events_path, _ = event_log_paths(autonomy_file)
+        with open(events_path, "a") as f:
+            f.write('{"seq": 2, "ts": "2030-01-01T00:0')
+        
+        reloaded = AutonomyTracker(autonomy_file)
+        reloaded.prove_capability("after")
+        
+        assert [p["capability"] for p in AutonomyTracker(autonomy_file).data["proven_capabilities"]] == ["kept", "after"]
+    
+    def test_two_writers_share_one_log(self, autonomy_file):
+        """Test writers on one log never reuse a seq and snapshots cover the other's events"""
+        a, b = AutonomyTracker(autonomy_file), AutonomyTracker(autonomy_file)
+        a.prove_capability("cap_a")
+        b.prove_capability("cap_b")
+        a.prove_capability("cap_c")
+        a.events.snapshot()
+        
+        reloaded = AutonomyTracker(autonomy_file)
+        
+        assert [p["capability"] for p in reloaded.data["proven_capabilities"]] == ["cap_a", "cap_b", "cap_c"]
+        assert [e["seq"] for e in reloaded.get_history()] == [1, 2, 3]
+        b.refresh()
+        assert b.data == a.data == reloaded.data
+    
+    def test_no_files_until_first_event(self, tmp_path):
+        """Test loading a tracker writes nothing"""
+        tracker = AutonomyTracker(str(tmp_path / "autonomy_tracker.json"))
+        assert tracker.get_autonomy_status()["proven_capabilities"] == 0
+        assert os.listdir(tmp_path) == []
+        tracker.prove_capability("first")
+        assert sorted(os.listdir(tmp_path)) == ["autonomy_tracker.events.ndjson", "autonomy_tracker.events.ndjson.lock",
+                                                "autonomy_tracker.json", "autonomy_tracker.snapshots.ndjson"]
+    
+    def test_progression_replays_decisions_and_upgrades(self, tmp_path):
+        """Test progression metrics and level upgrades survive a restart"""
+        path = str(tmp_path / "autonomy_progression.json")
+        progression = AutonomyProgressionSystem(path)
+        for i in range(25):
+            progression.record_decision("operational", ai_made=True, human_approved=False, success=True)
+        progression.counters.commit()  # as at exit
+        
+        reloaded = AutonomyProgressionSystem(path)
+        
+        assert progression.current_level == AutonomyLevel.LEVEL_2_AI_ASSISTED
+        assert reloaded.current_level == progression.current_level
+        assert reloaded.metrics == progression.metrics
+        assert reloaded.metrics["total_decisions"] == 25
+        assert len(reloaded.milestones) == 1
+    
+    def test_progression_as_of_includes_counter_commits(self, tmp_path):
+        """Test decision counts reach history queries through counter commits"""
+        progression = AutonomyProgressionSystem(str(tmp_path / "autonomy_progression.json"))
+        for i in range(4):
+            progression.record_decision("operational", ai_made=True, human_approved=False, success=True)
+        progression.counters.commit()
+        middle = datetime.now().isoformat()
+        time.sleep(0.01)
+        for i in range(6):
+            progression.record_decision("operational", ai_made=False, human_approved=True, success=False)
+        
+        now = progression.get_status_as_of(time.time())["metrics"]
+        
+        assert now["total_decisions"] == progression.metrics["total_decisions"] == 10
+        assert now["human_interventions"] == 6
+        assert now["success_rate"] == progression.metrics["success_rate"] == 40.0
+        assert progression.get_status_as_of(middle)["metrics"]["total_decisions"] == 4
+        assert not os.path.exists(event_log_paths(str(tmp_path / "autonomy_progression.json"))[0])
+    
+    def test_workers_upgrade_once(self, tmp_path):
+        """Test a worker that has not seen another's upgrade neither repeats nor undoes it"""
+        path = str(tmp_path / "autonomy_progression.json")
+        first, second = AutonomyProgressionSystem(path), AutonomyProgressionSystem(path)
+        for i in range(20):
+            first.record_decision("operational", ai_made=True, human_approved=False, success=True)
+        assert first.current_level == AutonomyLevel.LEVEL_2_AI_ASSISTED
+        
+        second.upgrade_level(AutonomyLevel.LEVEL_2_AI_ASSISTED)  # decided from stale state
+        second.record_decision("operational", ai_made=True, human_approved=False, success=True)
+        first.events.refresh()
+        
+        assert second.current_level == AutonomyLevel.LEVEL_2_AI_ASSISTED
+        assert len(first.progression["milestones"]) == len(second.progression["milestones"]) == 1
@@ -0,0 +1,64 @@
+"""
+Autonomy Matrix Tests
+Unit tests for the compiled task x risk level auto-execute matrix
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from autonomy_tracker import AUTO_EXECUTE_THRESHOLDS, RISK_LEVELS, GradualAutonomySystem
+
+def _reference(system, task_type, risk_level):
+    """The rule the matrix compiles: AI-owned task and enough autonomy"""
+    minimum = AUTO_EXECUTE_THRESHOLDS.get(risk_level)
+    return (system.tracker.can_ai_handle(task_type) and minimum is not None
+            and system.tracker.data["current_autonomy"] >= minimum)
+
+@pytest.fixture
+def system(tmp_path):
+    return GradualAutonomySystem(str(tmp_path / "autonomy_tracker.json"))
+
+class TestAutonomyMatrix:
+    """Execution matrix tests"""
+    
+    def test_matches_rule_for_every_pair(self, system):
+        """Test every known task and risk level agrees with the direct rule"""
+        tasks = list(system.tracker.data["ai_tasks"]) + list(system.tracker.data["human_tasks"]) + ["unknown"]
+        
+        for task in tasks:
+            for level in RISK_LEVELS + ("low",):
+                assert system.should_auto_execute(task, level) == _reference(system, task, level)
+    
+    def test_handoff_rebuilds(self, system):
+        """Test a handoff and the autonomy change it causes reach the matrix"""
+        version = system.matrix_version
+        assert system.should_auto_execute("tweet_approval", "LOW") is False
+        
+        system.tracker.handoff_task("tweet_approval", "proven")
+        
+        assert system.matrix_version > version
+        assert system.should_auto_execute("tweet_approval", "LOW") is True
+        assert system.should_auto_execute("tweet_approval", "MEDIUM") == _reference(system, "tweet_approval", "MEDIUM")
+    
+    def test_proven_capability_raises_levels(self, system):
+        """Test autonomy gained from capabilities unlocks higher risk levels"""
+        for i in range(18):
+            system.tracker.prove_capability(f"capability_{i}")
+        
+        assert system.tracker.data["current_autonomy"] >= 85
+        assert system.should_auto_execute("learning", "HIGH") is True
+        assert system.should_auto_execute("learning", "CRITICAL") is False
+    
+    def test_bulk_and_full_matrix(self, system):
+        """Test bulk answers and the exported matrix agree with single checks"""
+        system.tracker.prove_capability("capability")  # 25% on a fresh tracker; recalculated to 52%
+        checks = [("learning", "LOW"), ("learning", "HIGH"), ("decision_review", "LOW")]
+        matrix = system.get_execution_matrix()
+        
+        assert system.should_auto_execute_many(checks) == [system.should_auto_execute(*c) for c in checks]
+        assert matrix["version"] == system.matrix_version
+        assert matrix["matrix"]["learning"]["LOW"] is True
+        assert matrix["matrix"]["decision_review"] == {level: False for level in RISK_LEVELS}
@@ -0,0 +1,90 @@
+"""
+Dashboard View Tests
+Unit tests for the incrementally maintained dashboard metrics
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_memory_system import AIMemory
+from autonomy_tracker import AutonomyTracker
+from analytics.dashboard_data import DashboardData, DashboardView
+
+@pytest.fixture
+def memory(tmp_path):
+    """Memory with one event and two decisions, one already successful"""
+    memory_file = tmp_path / "ai_memory.json"
+    memory_file.write_text(json.dumps({
+        "events": [{"id": "EVT_1", "timestamp": "2099-01-01T00:00:00", "type": "LAUNCH", "description": "launch", "data": {}}],
+        "decisions": [
+            {"id": "DEC_1", "timestamp": "2099-01-01T00:00:00", "decision": {}, "outcome": "ok", "success": True},
+            {"id": "DEC_2", "timestamp": "2099-01-01T00:00:00", "decision": {}, "outcome": None}
+        ],
+        "outcomes": [],
+        "learnings": [],
+        "preferences": {},
+        "patterns": {}
+    }))
+    return AIMemory(str(memory_file))
+
+@pytest.fixture
+def tracker(tmp_path):
+    """Autonomy tracker backed by a temp file"""
+    return AutonomyTracker(str(tmp_path / "autonomy_tracker.json"))
+
+class TestDashboardView:
+    """Dashboard view tests"""
+    
+    def test_initial_counts_match_memory(self, memory, tracker):
+        """Test the view starts from the persisted memory"""
+        metrics = DashboardView(memory, tracker).get_system_metrics()
+        
+        assert metrics["total_events"] == 1
+        assert metrics["total_decisions"] == 2
+        assert metrics["success_rate"] == 50.0
+        assert metrics["ai_autonomy"] == tracker.data["current_autonomy"]
+    
+    def test_counters_follow_memory_changes(self, memory, tracker):
+        """Test new records and outcomes update the counters without a reload"""
+        view = DashboardView(memory, tracker)
+        
+        memory.record_event("SOCIAL_MEDIA", "tweet posted")
+        memory.record_decision({"id": "DEC_3"})
+        memory.record_outcome("DEC_2", "done", True)
+        memory.record_outcome("DEC_1", "reverted", False)
+        
+        metrics = view.get_system_metrics()
+        assert metrics["total_events"] == 2
+        assert metrics["total_decisions"] == 3
+        assert metrics["success_rate"] == pytest.approx(33.3)
+        assert view.get_recent_activity()[-1]["description"] == "tweet posted"
+    
+    def test_autonomy_follows_tracker(self, memory, tracker):
+        """Test autonomy changes are pushed into the view"""
+        view = DashboardView(memory, tracker)
+        
+        tracker.handoff_task("tweet_approval", "proven")
+        
+        assert view.get_system_metrics()["ai_autonomy"] == tracker.data["current_autonomy"]
+    
+    def test_recent_activity_is_bounded(self, memory, tracker):
+        """Test the recent-activity ring keeps only the newest events"""
+        view = DashboardView(memory, tracker, recent_size=3)
+        
+        for i in range(5):
+            memory.record_event("TEST", f"event {i}")
+        
+        assert [e["description"] for e in view.get_recent_activity()] == ["event 2", "event 3", "event 4"]
+    
+    def test_dashboard_json_uses_view(self, memory, tracker):
+        """Test DashboardData serves the live view"""
+        dashboard = DashboardData(memory=memory, tracker=tracker)
+        memory.record_event("TEST", "after build")
+        
+        data = dashboard.generate_dashboard_json()
+        assert data["metrics"]["total_events"] == 2
+        assert data["recent_activity"][-1]["description"] == "after build"
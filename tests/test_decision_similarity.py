@@ -0,0 +1,117 @@
+"""
+Decision Similarity Tests
+Unit tests for the TF-IDF / MinHash-LSH decision index
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_memory_system import AIMemory
+from decision_similarity import DecisionSimilarityIndex, decision_tokens
+
+def _record(decision_id, category, description, amount=100, success=None):
+    record = {
+        "id": decision_id,
+        "timestamp": "2099-01-01T00:00:00",
+        "decision": {"category": category, "risk_level": "LOW", "description": description, "amount": amount}
+    }
+    if success is not None:
+        record["success"] = success
+    return record
+
+@pytest.fixture
+def index():
+    """Index with a few distinct decisions"""
+    index = DecisionSimilarityIndex()
+    index.add(_record("DEC_reddit", "MARKETING", "Reddit launch post for the API", success=True))
+    index.add(_record("DEC_hosting", "OPERATIONAL", "Upgrade server hosting plan", amount=5000))
+    index.add(_record("DEC_audit", "COMPLIANCE", "License audit with state regulator"))
+    return index
+
+class TestDecisionSimilarity:
+    """Similarity index tests"""
+    
+    def test_tokens_include_attributes(self):
+        """Test descriptions and attributes both become terms"""
+        tokens = decision_tokens({"category": "FINANCIAL", "description": "Buy the domain", "amount": 2500})
+        
+        assert "buy" in tokens and "domain" in tokens and "the" not in tokens
+        assert "category:financial" in tokens
+        assert "amount:3" in tokens
+    
+    def test_stored_decisions_use_request_fields(self):
+        """Test an engine decision yields the same terms as the request it came from"""
+        request = {"category": "FINANCIAL", "description": "Buy the domain", "amount": 2500, "vendor": "namecheap"}
+        stored = {"id": "DEC_1", "decision": dict(request, status="PENDING", action_required="Approve", data=request)}
+        
+        assert sorted(decision_tokens(stored)) == sorted(decision_tokens(request))
+    
+    def test_scorer_requires_storage(self):
+        """Test the scorer base class cannot be used without its storage methods"""
+        from decision_similarity import SimilarityScorer
+        
+        with pytest.raises(TypeError):
+            SimilarityScorer()
+    
+    def test_best_match_first(self, index):
+        """Test the closest decision ranks first with its outcome"""
+        results = index.search({"category": "MARKETING", "description": "reddit post about the launch"})
+        
+        assert results[0]["id"] == "DEC_reddit"
+        assert results[0]["success"] is True
+        assert 0 < results[0]["score"] <= 1
+        assert [r["score"] for r in results] == sorted((r["score"] for r in results), reverse=True)
+    
+    def test_exact_and_lsh_agree(self, index):
+        """Test candidate retrieval finds the same top hit as a full scan"""
+        query = {"category": "OPERATIONAL", "description": "hosting plan upgrade", "amount": 4000}
+        
+        assert index.search(query, k=1)[0]["id"] == index.search(query, k=1, exact=True)[0]["id"] == "DEC_hosting"
+    
+    def test_outcomes_update_matches(self, index):
+        """Test set_outcome is reflected in later searches"""
+        index.set_outcome("DEC_audit", False)
+        
+        results = index.search({"category": "COMPLIANCE", "description": "regulator audit"}, k=1)
+        assert results[0]["success"] is False
+    
+    def test_ai_memory_keeps_index_current(self, tmp_path):
+        """Test record_decision/record_outcome feed inform_decision"""
+        memory = AIMemory(str(tmp_path / "ai_memory.json"), retention=None)
+        memory.record_decision({"id": "DEC_1", "category": "MARKETING", "description": "Twitter ad campaign"})
+        memory.record_outcome("DEC_1", "good CTR", True)
+        
+        insights = memory.inform_decision({"category": "MARKETING", "description": "new twitter campaign"})
+        
+        assert insights["similar_decisions"] == 1
+        assert insights["similar"][0]["id"] == "DEC_1"
+        assert insights["similar"][0]["success"] is True
+        assert "similar successful decisions" in insights["recommendation"]
+    
+    def test_minhash_matches_exact_arithmetic(self):
+        """Test the uint64 MinHash equals the same hash in Python integers"""
+        from decision_similarity import minhash_signature, _PERM_A, _PERM_B, _MERSENNE
+        features = [0, 1, 12345, 2 ** 18 - 1]
+        expected = [min((int(a) * x + int(b)) % _MERSENNE for x in features) for a, b in zip(_PERM_A, _PERM_B)]
+        
+        assert minhash_signature(features).tolist() == expected
+    
+    def test_large_index_scores_only_candidates(self, monkeypatch):
+        """Test a large index never falls back to scoring every row"""
+        import decision_similarity
+        monkeypatch.setattr(decision_similarity, "EXACT_SCAN_ROWS", 2)
+        index = DecisionSimilarityIndex()
+        for n in range(50):
+            index.add(_record(f"DEC_{n}", "OPERATIONAL", f"unrelated chore number{n} word{n * 7}"))
+        index.add(_record("DEC_hosting", "OPERATIONAL", "Upgrade server hosting plan", amount=5000))
+        scored = []
+        score = index._score
+        monkeypatch.setattr(index, "_score", lambda rows, *query: scored.append(len(rows)) or score(rows, *query))
+        
+        results = index.search({"category": "OPERATIONAL", "description": "upgrade server hosting plan", "amount": 5000})
+        
+        assert results[0]["id"] == "DEC_hosting"
+        assert scored and scored[0] < len(index)
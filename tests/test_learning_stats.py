@@ -0,0 +1,72 @@
+"""
+Learning Statistics Tests
+Unit tests for streaming outcome statistics and learned risk adjustment
+"""
+
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_decision_engine import AIDecisionEngine, RiskLevel
+from learning_stats import LearningStats, amount_band
+
+def _decision(decision_id, category="MARKETING", amount=500):
+    return {"id": decision_id, "decision": {"category": category, "amount": amount}}
+
+class TestLearningStats:
+    """Outcome statistics tests"""
+    
+    def test_welford_matches_batch_statistics(self):
+        """Test running mean/std equal the batch values"""
+        stats = LearningStats()
+        values = [12.5, 3.0, 7.25, 40.0, 18.0]
+        for i, value in enumerate(values):
+            stats.record_outcome(_decision(f"DEC_{i}"), {"success": True, "metrics": {"revenue": value}})
+        
+        revenue = stats.get("MARKETING", 500)["metrics"]["revenue"]
+        
+        assert revenue["count"] == 5
+        assert revenue["mean"] == round(statistics.mean(values), 4)
+        assert revenue["std"] == round(statistics.stdev(values), 4)
+    
+    def test_posterior_and_bands(self):
+        """Test the Beta posterior is kept per category and amount band"""
+        stats = LearningStats()
+        for i in range(3):
+            stats.record_outcome(_decision(f"DEC_{i}"), {"success": True})
+        stats.record_outcome(_decision("DEC_big", amount=50000), {"success": False})
+        
+        small, big = stats.get("MARKETING", 700), stats.get("MARKETING", 60000)
+        
+        assert amount_band(700) == 2 and amount_band(5) == 0
+        assert small["observations"] == 3 and small["success_probability"] == 0.8
+        assert big["observations"] == 1 and big["success_probability"] == round(1 / 3, 4)
+        assert small["risk_adjustment"] == big["risk_adjustment"] == 0
+    
+    def test_replaced_outcome_is_not_double_counted(self):
+        """Test a corrected outcome moves the success count"""
+        stats = LearningStats()
+        stats.record_outcome(_decision("DEC_1"), {"success": True})
+        stats.record_outcome(_decision("DEC_1"), {"success": False}, previous_success=True)
+        
+        cell = stats.get("MARKETING", 500)
+        
+        assert cell["observations"] == 1
+        assert cell["success_probability"] == round(1 / 3, 4)
+    
+    def test_learned_outcomes_move_risk(self, tmp_path):
+        """Test consistent outcomes lower or raise the assessed risk one level"""
+        engine = AIDecisionEngine(str(tmp_path / "ai_memory.json"), str(tmp_path / "autonomy.json"))
+        for i in range(20):
+            engine.memory.record_decision({"id": f"OK_{i}", "category": "MARKETING", "amount": 5000})
+            engine.memory.record_outcome(f"OK_{i}", "fine", True)
+            engine.memory.record_decision({"id": f"BAD_{i}", "category": "FINANCIAL", "amount": 500})
+            engine.memory.record_outcome(f"BAD_{i}", "lost money", False)
+        
+        def assess(data):
+            return engine._assess_risk(data, engine.memory.inform_decision(data))
+        
+        assert assess({"category": "MARKETING", "amount": 5000}) == RiskLevel.LOW
+        assert assess({"category": "FINANCIAL", "amount": 500}) == RiskLevel.MEDIUM
+        assert assess({"category": "MARKETING", "amount": 60000}) == RiskLevel.CRITICAL
@@ -0,0 +1,143 @@
+"""
+Live Metrics Tests
+Unit tests for the live metrics aggregator and its SSE stream
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.live_metrics import LiveMetricsAggregator
+
+def parse_events(chunks):
+    """SSE chunks -> [(event, data)], skipping comments"""
+    events = []
+    for chunk in chunks:
+        if chunk.startswith(":"):
+            continue
+        lines = dict(line.split(": ", 1) for line in chunk.strip().splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+async def read_stream(aggregator, count, during=None, tenant=None, autonomy_source=None):
+    """First ``count`` events of one client's stream, running ``during`` once subscribed"""
+    chunks = []
+    done = asyncio.Event()
+    
+    async def is_disconnected():
+        return done.is_set()
+    
+    async for chunk in aggregator.stream(is_disconnected, tenant, autonomy_source):
+        chunks.append(chunk)
+        if len(chunks) == 1 and during:
+            during()
+        if len(parse_events(chunks)) >= count:
+            done.set()
+    return parse_events(chunks)
+
+class TestLiveMetricsAggregator:
+    """Aggregator tests"""
+    
+    def test_window_covers_everything_since_last_delta(self):
+        """Test counts before anyone subscribes land in the next delta"""
+        metrics = LiveMetricsAggregator()
+        metrics.record_request(200, 10.0)
+        metrics.record_request(500, 30.0)
+        metrics.record_decision("LOW")
+        
+        delta = metrics._collect()[None]
+        assert (delta["requests"], delta["errors"], delta["decisions"]) == (2, 1, 1)
+        assert delta["error_rate"] == 50.0
+        assert delta["latency_ms"]["p99"] == 30.0
+        assert delta["decisions_by_risk"] == {"LOW": 1}
+        assert delta["interval_seconds"] >= 0
+        
+        empty = metrics._collect()[None]
+        assert (empty["requests"], empty["decisions"]) == (0, 0)
+    
+    def test_totals_are_absolute(self):
+        """Test totals count every event, collected or not"""
+        metrics = LiveMetricsAggregator()
+        for status in (200, 200, 404):
+            metrics.record_request(status)
+        assert metrics._collect()[None]["totals"]["requests"] == 3
+        metrics.record_decision()
+        totals = metrics.totals()
+        assert (totals["requests"], totals["errors"], totals["decisions"]) == (3, 1, 1)
+        assert metrics._collect()[None]["totals"]["decisions"] == 1
+    
+    def test_decisions_scoped_to_tenant(self):
+        """Test a tenant's delta and totals count only its own decisions"""
+        metrics = LiveMetricsAggregator()
+        metrics.record_request(200)
+        metrics.record_decision("LOW", tenant="a")
+        metrics.record_decision("HIGH", tenant="b")
+        metrics.record_decision("HIGH", tenant="b")
+        
+        deltas = metrics._collect([None, "a", "b", "c"])
+        assert deltas[None]["decisions"] == 3
+        assert deltas["a"]["decisions_by_risk"] == {"LOW": 1}
+        assert (deltas["b"]["decisions"], deltas["b"]["totals"]["decisions"]) == (2, 2)
+        assert (deltas["c"]["decisions"], deltas["c"]["totals"]["decisions"]) == (0, 0)
+        assert deltas["a"]["requests"] == 1
+        assert metrics.totals("b")["decisions"] == 2
+
+class TestLiveMetricsStream:
+    """SSE generator tests"""
+    
+    def test_snapshot_then_metrics(self):
+        """Test a client gets current totals, then deltas with absolute totals"""
+        metrics = LiveMetricsAggregator(tick_seconds=0.01)
+        metrics.record_request(200, 5.0)
+        
+        events = asyncio.run(read_stream(metrics, 3, during=lambda: metrics.record_decision("HIGH")))
+        assert events[0][0] == "snapshot"
+        assert events[0][1]["totals"]["requests"] == 1
+        assert events[0][1]["subscribers"] == 1
+        
+        deltas = [data for event, data in events[1:] if event == "metrics"]
+        assert sum(delta["requests"] for delta in deltas) == 1
+        assert sum(delta["decisions"] for delta in deltas) == 1
+        assert deltas[-1]["totals"]["decisions"] == 1
+        assert metrics.subscriber_count() == 0
+    
+    def test_autonomy_event(self):
+        """Test the snapshot carries the level and later changes get their own event"""
+        metrics = LiveMetricsAggregator(tick_seconds=0.01)
+        level = [42.0]
+        metrics.set_autonomy_source(lambda: level[0])
+        events = asyncio.run(read_stream(metrics, 4, during=lambda: level.__setitem__(0, 50.0)))
+        assert events[0][1]["autonomy"] == 42.0
+        assert ("autonomy", {"previous": 42.0, "current": 50.0}) in events
+        assert sum(1 for event, _ in events if event == "autonomy") == 1
+    
+    def test_tenant_stream(self):
+        """Test a tenant subscriber gets its own decisions and autonomy source"""
+        metrics = LiveMetricsAggregator(tick_seconds=0.01)
+        metrics.set_autonomy_source(lambda: 99.0)
+        metrics.record_decision(tenant="other")
+        
+        events = asyncio.run(read_stream(metrics, 3, during=lambda: metrics.record_decision("LOW", tenant="mine"),
+                                         tenant="mine", autonomy_source=lambda: 7.0))
+        assert events[0][1]["autonomy"] == 7.0
+        assert events[0][1]["totals"]["decisions"] == 0
+        deltas = [data for event, data in events if event == "metrics"]
+        assert sum(delta["decisions"] for delta in deltas) == 1
+        assert deltas[-1]["totals"]["decisions"] == 1
+    
+    def test_slow_client_drops_oldest(self):
+        """Test a full queue loses its oldest event and counts the drop"""
+        metrics = LiveMetricsAggregator(queue_size=2)
+        
+        async def run():
+            queue = metrics.subscribe()
+            metrics._task.cancel()
+            for n in range(3):
+                metrics._publish(queue, "metrics", {"n": n})
+            return [queue.get_nowait()[1]["n"] for _ in range(queue.qsize())], metrics._subscribers[queue]
+        
+        received, stats = asyncio.run(run())
+        assert received == [1, 2]
+        assert stats["dropped"] == 1
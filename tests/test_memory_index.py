@@ -0,0 +1,85 @@
+"""
+Memory Index Tests
+Unit tests for the time-indexed AIMemory queries
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_memory_system import AIMemory
+
+@pytest.fixture
+def memory(tmp_path):
+    """Memory whose persisted events are out of time order"""
+    now = datetime.now()
+    memory_file = tmp_path / "ai_memory.json"
+    memory_file.write_text(json.dumps({
+        "events": [
+            {"id": "EVT_new", "timestamp": (now - timedelta(hours=1)).isoformat(), "type": "A", "description": "new"},
+            {"id": "EVT_old", "timestamp": (now - timedelta(days=3)).isoformat(), "type": "B", "description": "old"},
+            {"id": "EVT_mid", "timestamp": (now - timedelta(hours=5)).isoformat(), "type": "C", "description": "mid"}
+        ],
+        "decisions": [
+            {"id": "DEC_1", "timestamp": (now - timedelta(hours=2)).isoformat(), "decision": {}, "success": True}
+        ],
+        "outcomes": [],
+        "learnings": [],
+        "preferences": {},
+        "patterns": {}
+    }))
+    return AIMemory(str(memory_file))
+
+class TestMemoryIndex:
+    """Time index tests"""
+    
+    def test_recent_activity_is_newest_first(self, memory):
+        """Test the 24h window skips old events and sorts newest first"""
+        memory.record_event("D", "just now")
+        
+        recent = memory.get_recent_activity(24)
+        assert [e["description"] for e in recent] == ["just now", "new", "mid"]
+    
+    def test_summary_counters(self, memory):
+        """Test summary counts follow records and outcomes"""
+        memory.record_decision({"id": "DEC_2"})
+        memory.record_outcome("DEC_2", "done", True)
+        memory.record_outcome("DEC_1", "undone", False)
+        
+        summary = memory.get_memory_summary()
+        assert summary["total_decisions"] == 2
+        assert summary["total_outcomes"] == 2
+        assert summary["successful_decisions"] == 1
+        assert summary["recent_activity"] == 2
+    
+    def test_activity_pages_merge_kinds(self, memory):
+        """Test cursor pagination walks every record once in time order"""
+        memory.record_learning("insight", "test")
+        
+        seen = []
+        cursor = None
+        while True:
+            page = memory.get_activity(cursor=cursor, limit=2)
+            seen.extend((item["kind"], item["timestamp"]) for item in page["items"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        
+        assert len(seen) == 5
+        assert [timestamp for _, timestamp in seen] == sorted(timestamp for _, timestamp in seen)
+        assert [kind for kind, _ in seen] == ["events", "events", "decisions", "events", "learnings"]
+    
+    def test_activity_filters(self, memory):
+        """Test since and kind filters"""
+        since = datetime.now() - timedelta(hours=3)
+        
+        page = memory.get_activity(since=since, kinds=["events"])
+        assert [item["record"]["id"] for item in page["items"]] == ["EVT_new"]
+        assert page["next_cursor"] is None
+        
+        with pytest.raises(ValueError):
+            memory.get_activity(kinds=["tweets"])
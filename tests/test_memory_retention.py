@@ -0,0 +1,188 @@
+"""
+Memory Retention Tests
+Unit tests for hot/warm/cold memory tiers
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_memory_system import AIMemory
+from memory_retention import MemoryRetention
+
+NOW = datetime.now()
+
+def _event(event_id, when):
+    return {"id": event_id, "timestamp": when.isoformat(), "type": "TEST", "description": event_id, "data": {}}
+
+@pytest.fixture
+def memory_file(tmp_path):
+    """Hot file holding events from the last year"""
+    path = tmp_path / "ai_memory.json"
+    path.write_text(json.dumps({
+        "events": [
+            _event("ancient", NOW - timedelta(days=300)),
+            _event("old", NOW - timedelta(days=60)),
+            _event("fresh", NOW - timedelta(days=2))
+        ],
+        "decisions": [],
+        "outcomes": [],
+        "learnings": [],
+        "preferences": {},
+        "patterns": {}
+    }))
+    return path
+
+@pytest.fixture
+def retention(tmp_path):
+    """Events stay hot for 30 days and warm for 90"""
+    return MemoryRetention(str(tmp_path / "archive"), {"events": {"hot_days": 30, "warm_days": 90}})
+
+class TestMemoryRetention:
+    """Retention tier tests"""
+    
+    def test_archive_splits_tiers(self, memory_file, retention):
+        """Test aged records leave the hot list and land in warm or cold"""
+        memories = json.loads(memory_file.read_text())
+        
+        moved = retention.archive(memories, now=NOW)
+        
+        assert moved == {"events": 2}
+        assert [e["id"] for e in memories["events"]] == ["fresh"]
+        stats = retention.get_stats()
+        assert sum(s["records"] for s in stats["warm"].values()) == 1
+        assert sum(s["records"] for s in stats["cold"].values()) == 1
+    
+    def test_queries_span_tiers(self, memory_file, retention):
+        """Test archived records can be read back in time order"""
+        memories = json.loads(memory_file.read_text())
+        retention.archive(memories, now=NOW)
+        
+        assert [r["id"] for _, r in retention.iter_records("events")] == ["ancient", "old"]
+        start = (NOW - timedelta(days=100)).timestamp()
+        assert [r["id"] for _, r in retention.iter_records("events", start=start)] == ["old"]
+        assert [r["id"] for _, r in retention.iter_records("events", tiers=("cold",))] == ["ancient"]
+    
+    def test_index_survives_reopen(self, memory_file, retention, tmp_path):
+        """Test a new instance sees the segments written by another"""
+        memories = json.loads(memory_file.read_text())
+        retention.archive(memories, now=NOW)
+        
+        reopened = MemoryRetention(str(tmp_path / "archive"))
+        assert reopened.count("events") == 2
+    
+    def test_ai_memory_compacts_hot_file(self, memory_file, retention):
+        """Test AIMemory trims the hot file on load and pages across tiers"""
+        memory = AIMemory(str(memory_file), retention=retention)
+        
+        assert json.loads(memory_file.read_text())["events"] == [memory.memories["events"][0]]
+        assert memory.get_memory_summary()["archived"]["events"] == 2
+        
+        hot_only = memory.get_activity(kinds=["events"])
+        assert [i["record"]["id"] for i in hot_only["items"]] == ["fresh"]
+        
+        page = memory.get_activity(kinds=["events"], limit=2, include_archive=True)
+        assert [i["record"]["id"] for i in page["items"]] == ["ancient", "old"]
+        page = memory.get_activity(kinds=["events"], cursor=page["next_cursor"], include_archive=True)
+        assert [i["record"]["id"] for i in page["items"]] == ["fresh"]
+    
+    def test_retention_is_opt_in(self, memory_file):
+        """Test the hot file is left alone unless retention is enabled"""
+        before = memory_file.read_text()
+        memory = AIMemory(str(memory_file))
+        
+        assert memory.retention is None
+        assert memory_file.read_text() == before
+        assert not (memory_file.parent / "memory_archive").exists()
+    
+    def test_outcome_for_archived_decision(self, tmp_path):
+        """Test outcomes reach decisions that already left the hot file"""
+        path = tmp_path / "ai_memory.json"
+        path.write_text(json.dumps({
+            "events": [], "outcomes": [], "learnings": [], "preferences": {}, "patterns": {},
+            "decisions": [
+                {"id": "DEC_OLD", "timestamp": (NOW - timedelta(days=60)).isoformat(),
+                 "decision": {"category": "financial"}, "outcome": None},
+                {"id": "DEC_NEW", "timestamp": NOW.isoformat(), "decision": {"category": "financial"}, "outcome": None}
+            ]
+        }))
+        retention = MemoryRetention(str(tmp_path / "archive"), {"decisions": {"hot_days": 30, "warm_days": 365}})
+        memory = AIMemory(str(path), retention=retention)
+        assert [d["id"] for d in memory.memories["decisions"]] == ["DEC_NEW"]
+        assert memory.get_memory_summary()["total_decisions"] == 2
+        
+        memory.record_outcome("DEC_OLD", "worked", True)
+        
+        assert retention.find("decisions", "DEC_OLD")["success"] is True
+        assert memory.get_decision("DEC_OLD")["outcome"] == "worked"
+        assert memory.get_memory_summary()["successful_decisions"] == 1
+        by_type = memory.get_successful_patterns()["by_type"]
+        assert [(row["category"], row["successes"]) for row in by_type] == [("financial", 1)]
+        
+        reopened = AIMemory(str(path), retention=MemoryRetention(str(tmp_path / "archive")))
+        assert reopened.get_memory_summary()["successful_decisions"] == 1
+    
+    def test_find_and_update_archived_records(self, memory_file, retention):
+        """Test archived records can be looked up and changed in warm and cold tiers"""
+        memories = json.loads(memory_file.read_text())
+        retention.archive(memories, now=NOW)
+        
+        assert retention.find("events", "ancient")["description"] == "ancient"
+        assert retention.find("events", "fresh") is None
+        assert retention.update("events", "ancient", {"description": "changed"})
+        assert not retention.update("events", "missing", {"description": "changed"})
+        
+        reopened = MemoryRetention(str(retention.directory))
+        assert reopened.find("events", "ancient")["description"] == "changed"
+        assert [r["id"] for _, r in reopened.iter_records("events")] == ["ancient", "old"]
+    
+    def test_find_opens_only_the_indexed_segment(self, memory_file, retention, monkeypatch):
+        """Test lookups by ID read the one month holding the record, and misses read nothing"""
+        memories = json.loads(memory_file.read_text())
+        retention.archive(memories, now=NOW)
+        reopened = MemoryRetention(str(retention.directory))
+        opened = []
+        read_segment = reopened._read_segment
+        monkeypatch.setattr(reopened, "_read_segment",
+                            lambda tier, kind, month: opened.append(tier) or read_segment(tier, kind, month))
+        
+        assert reopened.find("events", "old")["id"] == "old"
+        assert opened == ["warm"]
+        assert reopened.find("events", "missing") is None
+        assert opened == ["warm"]
+    
+    def test_warm_segments_are_appended(self, tmp_path):
+        """Test a second archive run appends to the month instead of rewriting it"""
+        retention = MemoryRetention(str(tmp_path / "archive"), {"events": {"hot_days": 30, "warm_days": None}})
+        when = NOW - timedelta(days=60)
+        retention.archive({"events": [_event("first", when)]}, now=NOW)
+        path = os.path.join(retention.directory, retention._index["warm"]["events"][when.strftime("%Y-%m")]["file"])
+        inode = os.stat(path).st_ino
+        
+        retention.archive({"events": [_event("second", when - timedelta(hours=1))]}, now=NOW)
+        
+        assert os.stat(path).st_ino == inode
+        assert [r["id"] for _, r in retention.iter_records("events")] == ["second", "first"]
+        assert retention.count("events") == 2
+        assert MemoryRetention(str(retention.directory)).find("events", "second")["id"] == "second"
+    
+    def test_cursor_survives_archiving(self, tmp_path):
+        """Test a cursor taken before records were archived resumes at the same record"""
+        same = NOW - timedelta(days=2)
+        path = tmp_path / "ai_memory.json"
+        path.write_text(json.dumps({
+            "events": [_event("ancient", NOW - timedelta(days=60)), _event("a", same), _event("b", same)],
+            "decisions": [], "outcomes": [], "learnings": [], "preferences": {}, "patterns": {}
+        }))
+        page = AIMemory(str(path)).get_activity(kinds=["events"], limit=2)
+        assert [i["record"]["id"] for i in page["items"]] == ["ancient", "a"]
+        
+        compacted = AIMemory(str(path), retention=MemoryRetention(str(tmp_path / "archive")))
+        assert [e["id"] for e in compacted.memories["events"]] == ["a", "b"]
+        
+        resumed = compacted.get_activity(kinds=["events"], cursor=page["next_cursor"], include_archive=True)
+        assert [i["record"]["id"] for i in resumed["items"]] == ["b"]
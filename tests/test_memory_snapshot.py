@@ -0,0 +1,165 @@
+"""
+Memory Snapshot Tests
+Unit tests for memory-mapped AI memory generations
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_memory_system import AIMemory
+from decision_similarity import DecisionSimilarityIndex
+from memory_snapshot import MemorySnapshots
+
+def _decision(decision_id, category, description, success=None):
+    record = {
+        "id": decision_id,
+        "timestamp": datetime.now().isoformat(),
+        "decision": {"category": category, "risk_level": "LOW", "description": description}
+    }
+    if success is not None:
+        record["success"] = success
+    return record
+
+@pytest.fixture
+def memories():
+    """Hot memories with a few decisions and events"""
+    return {
+        "events": [{"id": "EVT_1", "timestamp": datetime.now().isoformat(), "type": "LAUNCH"}],
+        "decisions": [
+            _decision("DEC_reddit", "MARKETING", "Reddit launch post for the API", success=True),
+            _decision("DEC_hosting", "OPERATIONAL", "Upgrade server hosting plan"),
+            _decision("DEC_audit", "COMPLIANCE", "License audit with state regulator", success=False)
+        ],
+        "outcomes": [],
+        "learnings": []
+    }
+
+class TestMemorySnapshot:
+    """Snapshot format and generation tests"""
+    
+    def test_round_trip(self, tmp_path, memories):
+        """Test records, counts and aggregates survive the binary format"""
+        snapshots = MemorySnapshots(str(tmp_path / "snap"))
+        assert snapshots.current() is None
+        
+        generation = snapshots.write(memories)
+        snapshot = snapshots.current()
+        
+        assert snapshot.generation == generation == 1
+        assert len(snapshot) == 3
+        assert snapshot.decision(2)["id"] == "DEC_audit"
+        assert snapshot.decision(2)["category"] == "COMPLIANCE"
+        assert snapshot.decision(2)["success"] is False
+        assert snapshot.count_since("events", 0) == 1
+        assert snapshot.aggregates["successful_decisions"] == 1
+    
+    def test_search_matches_in_process_index(self, tmp_path, memories):
+        """Test the mapped index ranks exactly like the in-process one"""
+        snapshots = MemorySnapshots(str(tmp_path / "snap"))
+        snapshots.write(memories)
+        index = DecisionSimilarityIndex()
+        for record in memories["decisions"]:
+            index.add(record)
+        query = {"category": "MARKETING", "description": "reddit post about the launch"}
+        
+        mapped = snapshots.current().search(query)
+        local = index.search(query)
+        
+        assert [(m["id"], m["score"], m["success"]) for m in mapped] == \
+               [(m["id"], m["score"], m["success"]) for m in local]
+    
+    def test_pointer_switches_generation(self, tmp_path, memories, monkeypatch):
+        """Test readers follow CURRENT and old generations are pruned"""
+        monkeypatch.setattr("memory_snapshot.SNAPSHOT_REFRESH_SECONDS", 0.0)
+        snapshots = MemorySnapshots(str(tmp_path / "snap"))
+        for _ in range(3):
+            snapshots.write(memories)
+        memories["decisions"].append(_decision("DEC_new", "FINANCIAL", "Buy the domain"))
+        snapshots.write(memories)
+        
+        reader = MemorySnapshots(str(tmp_path / "snap"))
+        
+        assert reader.current().generation == 4
+        assert len(reader.current()) == 4
+        assert sorted(os.listdir(tmp_path / "snap")) == ["CURRENT", "gen-00000003.bin", "gen-00000004.bin"]
+    
+    def test_ai_memory_merges_newer_decisions(self, tmp_path):
+        """Test decisions and outcomes after the snapshot are still found"""
+        memory_file = str(tmp_path / "ai_memory.json")
+        snapshots = MemorySnapshots(str(tmp_path / "snap"))
+        memory = AIMemory(memory_file, retention=None, snapshots=snapshots)
+        memory.record_decision({"id": "DEC_1", "category": "MARKETING", "description": "Twitter ad campaign"})
+        assert memory.write_snapshot() == 2  # generation 1 was written at startup
+        
+        memory.record_outcome("DEC_1", "good CTR", True)
+        memory.record_decision({"id": "DEC_2", "category": "MARKETING", "description": "Twitter ad campaign v2"})
+        results = memory.find_similar_decisions({"category": "MARKETING", "description": "twitter campaign"})
+        
+        assert sorted(r["id"] for r in results) == ["DEC_1", "DEC_2"]
+        assert next(r for r in results if r["id"] == "DEC_1")["success"] is True
+        assert memory.get_memory_summary()["snapshot"]["generation"] == 2
+    
+    def test_workers_share_records_through_the_journal(self, tmp_path):
+        """Test records reach other workers without rewriting the memory file, and fold into it once"""
+        memory_file = str(tmp_path / "ai_memory.json")
+        first = AIMemory(memory_file, retention=None, snapshots=MemorySnapshots(str(tmp_path / "snap")))
+        second = AIMemory(memory_file, retention=None, snapshots=MemorySnapshots(str(tmp_path / "snap")))
+        saved = os.stat(memory_file).st_mtime_ns
+        
+        first.record_decision({"id": "DEC_1", "category": "MARKETING", "description": "Twitter ad campaign"})
+        second.record_outcome("DEC_1", "good CTR", True)
+        
+        assert os.stat(memory_file).st_mtime_ns == saved
+        assert first.get_decision("DEC_1")["success"] is True
+        assert first.get_memory_summary()["successful_decisions"] == 1
+        
+        first.write_snapshot()
+        with open(memory_file) as f:
+            stored = json.load(f)
+        assert [(d["id"], d["success"]) for d in stored["decisions"]] == [("DEC_1", True)]
+        assert len(stored["outcomes"]) == 1
+        for memory in (first, second):
+            summary = memory.get_memory_summary()
+            assert (summary["total_decisions"], summary["total_outcomes"], summary["successful_decisions"]) == (1, 1, 1)
+            assert [r["id"] for r in memory.find_similar_decisions({"description": "twitter campaign"})] == ["DEC_1"]
+    
+    def test_workers_never_load_the_memory_file(self, tmp_path, monkeypatch):
+        """Test a worker serves aggregates and lookups from the generation alone"""
+        memory_file = str(tmp_path / "ai_memory.json")
+        writer = AIMemory(memory_file, retention=None, snapshots=MemorySnapshots(str(tmp_path / "snap")))
+        writer.record_decision({"id": "DEC_1", "category": "MARKETING", "risk_level": "LOW",
+                                "description": "Twitter ad campaign"})
+        writer.record_outcome("DEC_1", "good CTR", True)
+        writer.record_event("LAUNCH", "Public launch")
+        writer.write_snapshot()
+        
+        def no_load(self):
+            raise AssertionError("memory file loaded")
+        monkeypatch.setattr(AIMemory, "load_memories", no_load)
+        worker = AIMemory(memory_file, retention=None, snapshots=MemorySnapshots(str(tmp_path / "snap")))
+        
+        match = worker.get_successful_patterns("MARKETING", "LOW")["match"]
+        assert (match["successes"], match["failures"]) == (1, 0)
+        assert worker.get_decision("DEC_1")["decision"]["description"] == "Twitter ad campaign"
+        assert [e["type"] for e in worker.get_recent_activity(1)] == ["LAUNCH"]
+        assert worker.count_since("outcomes", 0) == 1
+    
+    def test_close_hands_over_the_writer(self, tmp_path, monkeypatch):
+        """Test closing a memory stops its writer so another can take over"""
+        import ai_memory_system
+        monkeypatch.setattr(ai_memory_system, "MEMORY_SNAPSHOT_ENABLED", True)
+        memory = AIMemory(str(tmp_path / "ai_memory.json"), retention=None)
+        other = MemorySnapshots(str(tmp_path / "memory_snapshot"))
+        assert memory.snapshots.get_stats()["writer"]
+        assert not other.start_writer(str(tmp_path / "ai_memory.json"), interval=60)
+        
+        memory.close()
+        
+        assert not memory.snapshots.get_stats()["writer"]
+        assert other.start_writer(str(tmp_path / "ai_memory.json"), interval=60)
+        other.close()
@@ -0,0 +1,76 @@
+"""
+Metric Series Tests
+Unit tests for the columnar metric history
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_decision_engine import PerformanceTracker
+from metric_series import MetricSeries
+
+class TestMetricSeries:
+    """Ring-buffer metric history tests"""
+    
+    def test_ring_buffer_keeps_latest_samples_in_order(self):
+        """Test a full buffer drops the oldest samples and timestamps stay ordered"""
+        series = MetricSeries(["a", "b"], capacity=5)
+        for i in range(8):
+            series.append({"a": i, "b": 10 * i}, timestamp=100.0 + i)
+        series.append({"a": 8}, timestamp=50.0)
+        
+        window = series.window()
+        assert len(series) == 5
+        assert window["a"].tolist() == [4, 5, 6, 7, 8]
+        assert window["timestamp"].tolist() == [104, 105, 106, 107, 107]
+        assert np.isnan(window["b"][-1])
+        assert series.latest()["a"] == 8
+    
+    def test_window_is_a_read_only_view(self):
+        """Test windows before wrap-around share the column buffer"""
+        series = MetricSeries(["a"], capacity=100)
+        for i in range(10):
+            series.append({"a": i}, timestamp=float(i))
+        
+        window = series.window(since=3, until=7)
+        assert window["a"].tolist() == [3, 4, 5, 6]
+        assert not window["a"].flags.owndata
+        with pytest.raises(ValueError):
+            window["a"][0] = 1
+        with pytest.raises(ValueError):
+            series.window(names=["missing"])
+    
+    def test_resample_and_aggregate(self):
+        """Test per-bucket reductions and windowed statistics"""
+        series = MetricSeries(["a"], capacity=100)
+        for i in range(10):
+            series.append({"a": i}, timestamp=60.0 + 15 * i)
+        
+        last = series.resample(60)
+        assert last["timestamp"].tolist() == [60, 120, 180]
+        assert last["a"].tolist() == [3, 7, 9]
+        assert series.resample(60, how="mean")["a"].tolist() == [1.5, 5.5, 8.5]
+        assert series.resample(60, how="max", since=120)["a"].tolist() == [7, 9]
+        
+        stats = series.aggregate("a", since=90, until=180)
+        assert stats["count"] == 6
+        assert (stats["min"], stats["max"], stats["mean"], stats["change"]) == (2, 7, 4.5, 5)
+        assert series.aggregate("a", since=1000) == {"metric": "a", "count": 0}
+    
+    def test_performance_tracker_history(self):
+        """Test the tracker records bounded history in the old record format"""
+        tracker = PerformanceTracker(history_samples=3)
+        for value in (10.0, 20.0, 30.0, 40.0):
+            tracker.update_metric("revenue", value)
+        tracker.update_metric("unknown", 1.0)
+        
+        history = tracker.history
+        assert [record["metrics"]["revenue"] for record in history] == [20.0, 30.0, 40.0]
+        assert history[-1]["metrics"]["compliance_score"] == 100.0
+        assert tracker.get_history()["revenue"].tolist() == [20.0, 30.0, 40.0]
+        assert tracker.summarize()["revenue"]["change"] == 20.0
+        assert tracker.series.get_stats()["bytes"] == 3 * 9 * 8
@@ -0,0 +1,116 @@
+"""
+Outcome Losses Tests
+Unit tests for per-category Value-at-Risk from decision outcomes
+"""
+
+import json
+import math
+import os
+import random
+import statistics
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_memory_system import AIMemory
+from memory_retention import MemoryRetention
+from outcome_losses import OutcomeLosses, outcome_loss
+
+def _decision(decision_id, category="FINANCIAL", amount=1000):
+    return {"id": decision_id, "decision": {"category": category, "amount": amount}}
+
+class TestOutcomeLosses:
+    """Outcome loss distribution tests"""
+    
+    def test_loss_metrics_precedence(self):
+        """Test losses come from loss, then negated profit, then return times amount"""
+        assert outcome_loss({"loss": 50, "pnl": 10}) == 50
+        assert outcome_loss({"pnl": 25.5}) == -25.5
+        assert outcome_loss({"roi": -0.1}, amount=2000) == pytest.approx(200)
+        assert outcome_loss({"roi": 0.1}) is None
+        assert outcome_loss({"revenue": 10, "pnl": True}) is None
+    
+    def test_matches_sorted_reference(self):
+        """Test historical and parametric figures against a plain sort"""
+        rng = random.Random(3)
+        values = [rng.gauss(100, 400) for _ in range(5000)]
+        losses = OutcomeLosses()
+        for i, value in enumerate(values):
+            losses.record_outcome(_decision(f"DEC_{i}"), {"metrics": {"loss": value}})
+        
+        summary = losses.value_at_risk("financial", 0.99, amount=500)
+        ordered = sorted(values)
+        index = math.ceil(0.99 * len(values)) - 1
+        mean, std = statistics.mean(values), statistics.stdev(values)
+        
+        assert summary["observations"] == 5000
+        assert summary["historical"]["var"] == round(ordered[index], 2)
+        assert summary["historical"]["expected_shortfall"] == pytest.approx(statistics.mean(ordered[index:]), abs=0.01)
+        assert summary["parametric"]["var"] == pytest.approx(mean + 2.3263 * std, abs=0.5)
+        assert summary["exceedance"]["probability"] == pytest.approx(sum(v > 500 for v in values) / 5000)
+    
+    def test_std_is_stable_for_large_losses(self):
+        """Test the spread is exact when losses are large relative to their spread"""
+        losses = OutcomeLosses()
+        for i, value in enumerate((1e9 + 1, 1e9 + 2, 1e9 + 3)):
+            losses.record_outcome(_decision(f"DEC_{i}"), {"metrics": {"loss": value}})
+        
+        assert losses.value_at_risk("financial", 0.95)["parametric"]["std"] == 1.0
+    
+    def test_cache_invalidated_by_new_and_replaced_outcomes(self):
+        """Test summaries are cached until the category's next outcome"""
+        losses = OutcomeLosses()
+        for i in range(100):
+            losses.record_outcome(_decision(f"DEC_{i}"), {"metrics": {"loss": float(i)}})
+        losses.record_outcome(_decision("DEC_M", category="MARKETING"), {"metrics": {"loss": 1.0}})
+        
+        first = losses.value_at_risk("FINANCIAL", 0.95)
+        assert first["cache"] == "MISS"
+        assert losses.value_at_risk("FINANCIAL", 0.95)["cache"] == "HIT"
+        losses.record_outcome(_decision("DEC_M2", category="MARKETING"), {"metrics": {"loss": 5.0}})
+        assert losses.value_at_risk("FINANCIAL", 0.95)["cache"] == "HIT"
+        
+        losses.record_outcome(_decision("DEC_100"), {"metrics": {"loss": 1000.0}})
+        assert losses.value_at_risk("FINANCIAL", 0.95)["historical"]["expected_shortfall"] > first["historical"]["expected_shortfall"]
+        
+        losses.record_outcome(_decision("DEC_100"), {"metrics": {"loss": 0.0}})
+        summary = losses.value_at_risk("FINANCIAL", 0.95)
+        assert summary["cache"] == "MISS"
+        assert summary["observations"] == 101
+        assert summary["worst_loss"] == 99.0
+        assert losses.value_at_risk("COMPLIANCE", 0.95) is None
+    
+    def test_memory_keeps_losses_current(self, tmp_path):
+        """Test AIMemory builds losses from stored outcomes and adds new ones"""
+        memory = AIMemory(str(tmp_path / "ai_memory.json"))
+        for i, pnl in enumerate([-100, 50, -300]):
+            memory.record_decision({"id": f"DEC_{i}", "category": "FINANCIAL", "amount": 1000})
+            memory.record_outcome(f"DEC_{i}", "closed", pnl > 0, {"pnl": pnl})
+        
+        reloaded = AIMemory(str(tmp_path / "ai_memory.json"))
+        assert reloaded.losses.value_at_risk("FINANCIAL", 0.5)["observations"] == 3
+        
+        reloaded.record_decision({"id": "DEC_3", "category": "FINANCIAL", "amount": 1000})
+        reloaded.record_outcome("DEC_3", "closed", False, {"pnl": -900})
+        summary = reloaded.losses.value_at_risk("FINANCIAL", 0.5)
+        
+        assert summary["observations"] == 4
+        assert summary["worst_loss"] == 900
+    
+    def test_outcome_for_archived_decision(self, tmp_path):
+        """Test an outcome for a decision already in the archive still counts as a loss"""
+        path = tmp_path / "ai_memory.json"
+        path.write_text(json.dumps({
+            "events": [], "outcomes": [], "learnings": [], "preferences": {}, "patterns": {},
+            "decisions": [{"id": "DEC_OLD", "timestamp": (datetime.now() - timedelta(days=60)).isoformat(),
+                           "decision": {"category": "FINANCIAL", "amount": 1000}, "outcome": None}]
+        }))
+        retention = MemoryRetention(str(tmp_path / "archive"), {"decisions": {"hot_days": 30, "warm_days": 365}})
+        memory = AIMemory(str(path), retention=retention)
+        assert memory.losses.value_at_risk("FINANCIAL") is None
+        
+        memory.record_outcome("DEC_OLD", "closed", False, {"pnl": -250})
+        
+        assert memory.losses.value_at_risk("FINANCIAL")["worst_loss"] == 250
@@ -0,0 +1,115 @@
+"""
+Policy Simulator Tests
+Unit tests for what-if replay of decision history
+"""
+
+import math
+import os
+import random
+import sys
+from bisect import bisect_left
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from autonomy_tracker import RISK_LEVELS
+from policy_simulator import DecisionHistory, PolicySimulator, current_policy, policy_grid
+
+CATEGORIES = ["FINANCIAL", "MARKETING", "OPERATIONAL"]
+
+def _records(count, seed=7):
+    rng = random.Random(seed)
+    decisions, outcomes = [], []
+    for i in range(count):
+        amount = rng.choice([0, 500, 1000, 5000, 10000, 20000, 50000, 75000]) + rng.choice([0, 0.5])
+        level = bisect_left([1000, 10000, 50000], amount)
+        autonomy = rng.choice([None, 25.0, 45.5, 60.0, 90.0])
+        decision = {"amount": amount, "category": rng.choice(CATEGORIES), "risk_level": RISK_LEVELS[level]}
+        if autonomy is not None:
+            decision["autonomy_level"] = autonomy
+            decision["ai_can_decide"] = level < 2 and autonomy >= 50
+        decisions.append({"id": f"DEC_{i}", "decision": decision})
+        if rng.random() < 0.6:
+            outcomes.append({"decision_id": f"DEC_{i}", "success": rng.random() < 0.8})
+    return decisions, outcomes
+
+def _reference(decisions, outcomes, policy):
+    """Decision-by-decision replay"""
+    results = {outcome["decision_id"]: outcome["success"] for outcome in outcomes}
+    report = {"auto_executed": 0, "ai_decided": 0, "risk_changed": 0, "auto_executed_failures": 0}
+    for record in decisions:
+        decision = record["decision"]
+        level = RISK_LEVELS[bisect_left(policy["boundaries"], decision["amount"])]
+        autonomy = policy.get("autonomy_level")
+        if autonomy is None:
+            autonomy = decision.get("autonomy_level", math.nan)
+        tasks = policy.get("ai_tasks")
+        ai_allowed = (tasks is None or decision["category"] in tasks) and autonomy >= policy["autonomy_cutoffs"].get(level, math.inf)
+        executed = ai_allowed or policy["auto_execute"][level]
+        report["ai_decided"] += ai_allowed
+        report["auto_executed"] += executed
+        report["risk_changed"] += level != decision["risk_level"]
+        report["auto_executed_failures"] += executed and results.get(record["id"]) is False
+    return report
+
+class TestPolicySimulator:
+    """Policy simulator tests"""
+    
+    def test_matches_decision_by_decision_replay(self):
+        """Test grouped evaluation counts what a per-decision replay counts"""
+        decisions, outcomes = _records(2000)
+        simulator = PolicySimulator(DecisionHistory.from_records(decisions, outcomes), processes=1)
+        policies = policy_grid(current_policy(ai_tasks=["FINANCIAL", "MARKETING"]),
+                               **{"boundary.0": [500, 1000, 1000.5], "boundary.1": [10000, 20000],
+                                  "autonomy_cutoffs.MEDIUM": [40, 60], "autonomy_level": [None, 55],
+                                  "auto_execute.HIGH": [False, True]})
+        
+        for report in simulator.simulate_many(policies):
+            expected = _reference(decisions, outcomes, report["policy"])
+            assert {key: report[key] for key in expected} == expected
+            assert sum(report["by_risk"].values()) == report["decisions"] == 2000
+    
+    def test_current_policy_reproduces_recorded_routing(self):
+        """Test replaying the built-in policy changes nothing"""
+        decisions, outcomes = _records(500)
+        simulator = PolicySimulator(DecisionHistory.from_records(decisions, outcomes), processes=1)
+        policy = current_policy()
+        policy["autonomy_cutoffs"] = {"LOW": 50, "MEDIUM": 50}
+        policy["auto_execute"] = {level: False for level in RISK_LEVELS}
+        
+        report = simulator.simulate(policy)
+        
+        assert report["risk_changed"] == 0
+        assert report["execution_changed"] == 0
+    
+    def test_grid_search_ranks_and_filters(self):
+        """Test results are ordered by auto-executions and respect max_failures"""
+        decisions, outcomes = _records(1000)
+        simulator = PolicySimulator(DecisionHistory.from_records(decisions, outcomes), processes=1)
+        policies = policy_grid(current_policy(), **{"boundary.0": [100, 1000, 5000],
+                                                    "autonomy_cutoffs.HIGH": [50, 85, 101]})
+        reports = simulator.simulate_many(policies)
+        limit = sorted(report["auto_executed_failures"] for report in reports)[len(reports) // 2]
+        
+        best = simulator.grid_search(policies, max_failures=limit, top=3)
+        
+        assert len(best) == 3
+        assert all(report["auto_executed_failures"] <= limit for report in best)
+        assert [report["auto_executed"] for report in best] == sorted((report["auto_executed"] for report in best), reverse=True)
+        assert best[0]["auto_executed"] == max(r["auto_executed"] for r in reports if r["auto_executed_failures"] <= limit)
+    
+    def test_process_pool_gives_same_results(self, monkeypatch):
+        """Test batches split across processes match the in-process evaluation"""
+        decisions, outcomes = _records(300)
+        simulator = PolicySimulator(DecisionHistory.from_records(decisions, outcomes), processes=2)
+        policies = policy_grid(current_policy(), **{"boundary.0": [500, 1000], "autonomy_cutoffs.LOW": [20, 30, 40]})
+        expected = simulator.simulate_many(policies)
+        
+        monkeypatch.setattr("policy_simulator.PARALLEL_MIN_CELLS", 0)
+        assert simulator.simulate_many(policies) == expected
+    
+    def test_rejects_unsorted_boundaries(self):
+        """Test a policy with boundaries out of order is an error"""
+        simulator = PolicySimulator(DecisionHistory.from_records(*_records(10)), processes=1)
+        with pytest.raises(ValueError):
+            simulator.simulate(dict(current_policy(), boundaries=[10000, 1000, 50000]))
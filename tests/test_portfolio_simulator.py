@@ -0,0 +1,77 @@
+"""
+Portfolio Simulator Tests
+Unit tests for the Monte Carlo income strategy simulation
+"""
+
+import math
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_decision_engine import IncomeStrategyEvaluator
+from portfolio_simulator import PortfolioSimulator
+
+STRATEGIES = {
+    "STEADY": {"mean_return": 0.01, "volatility": 0.0, "shock_probability": 0.0, "shock_loss": 0.0, "max_weight": 1.0},
+    "RISKY": {"roi_potential": "high", "risk": "high", "scalability": "medium"},
+    "SAFE": {"roi_potential": "medium", "risk": "low", "scalability": "high"}
+}
+
+class TestPortfolioSimulator:
+    """Portfolio simulator tests"""
+    
+    def test_deterministic_strategy_grows_at_its_rate(self):
+        """Test a strategy without volatility or shocks compounds exactly"""
+        simulator = PortfolioSimulator(STRATEGIES, horizon=12, processes=1)
+        report = simulator.simulate({"STEADY": 0.5}, 1000, paths=1000, seed=1)
+        
+        expected = 500 * 1.01 ** 12 + 500
+        assert report["expected_value"] == pytest.approx(expected, abs=0.01)
+        assert report["var"] == pytest.approx(1000 - expected, abs=0.01)
+        assert report["probability_of_loss"] == 0
+        assert report["cash"] == 500
+    
+    def test_var_and_cvar_match_sorted_losses(self):
+        """Test the tail metrics against a full sort of the simulated values"""
+        simulator = PortfolioSimulator(STRATEGIES, horizon=6, processes=1)
+        report = simulator.simulate({"RISKY": 0.6, "SAFE": 0.4}, 1.0, paths=20000, confidence=0.9, seed=3)
+        
+        growth = simulator.model.sample(np.random.SeedSequence(3).spawn(1)[0], 20000)
+        values = np.sort(growth @ np.array([0.0, 0.6, 0.4]))
+        tail = int(math.floor(20000 * 0.1))
+        assert report["var"] == pytest.approx(1 - values[tail - 1], abs=0.01)
+        assert report["cvar"] == pytest.approx(1 - values[:tail].mean(), abs=0.01)
+        assert report["cvar"] >= report["var"]
+    
+    def test_seed_reproducible_across_processes(self, monkeypatch):
+        """Test chunks give the same result in-process and in a process pool"""
+        monkeypatch.setattr("portfolio_simulator.CHUNK_PATHS", 1000)
+        allocation = {"RISKY": 0.3, "SAFE": 0.3}
+        expected = PortfolioSimulator(STRATEGIES, processes=1).simulate(allocation, 100.0, paths=5000, seed=7)
+        
+        monkeypatch.setattr("portfolio_simulator.PARALLEL_MIN_PATHS", 0)
+        assert PortfolioSimulator(STRATEGIES, processes=2).simulate(allocation, 100.0, paths=5000, seed=7) == expected
+        assert PortfolioSimulator(STRATEGIES, processes=1).simulate(allocation, 100.0, paths=5000, seed=8) != expected
+    
+    def test_optimize_respects_limits(self):
+        """Test the optimized allocation stays within max_weight and max_cvar"""
+        simulator = PortfolioSimulator(STRATEGIES, processes=1)
+        report = simulator.optimize(1.0, paths=20000, max_cvar=0.0, candidates=200, search_paths=20000, seed=5)
+        
+        assert report["search"]["within_max_cvar"]
+        assert report["allocation"].get("RISKY", 0) <= 0.25 + 1e-9
+        assert report["allocation"].get("SAFE", 0) <= 0.40 + 1e-9
+        assert report["cvar"] <= 0.01
+    
+    def test_evaluator_compares_score_based_and_optimized(self):
+        """Test IncomeStrategyEvaluator reports both allocations"""
+        evaluator = IncomeStrategyEvaluator()
+        result = evaluator.simulate_portfolio(10000.0, paths=20000, seed=11)
+        
+        assert sum(evaluator.score_allocation().values()) == pytest.approx(1.0)
+        assert set(result["score_based"]["allocation"]) == set(IncomeStrategyEvaluator.STRATEGIES)
+        assert result["optimized"]["search"]["candidates"] == 501
+        assert result == evaluator.simulate_portfolio(10000.0, paths=20000, seed=11)
@@ -0,0 +1,114 @@
+"""
+Risk Cache Tests
+Unit tests for memoized, versioned risk assessments
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_decision_engine import AIDecisionEngine, RiskLevel
+from risk_cache import RiskAssessmentCache, insight_cache_key, risk_cache_key
+
+@pytest.fixture
+def engine(tmp_path):
+    """Engine with its own memory and autonomy files"""
+    return AIDecisionEngine(str(tmp_path / "ai_memory.json"), str(tmp_path / "autonomy.json"))
+
+class TestRiskCache:
+    """Risk assessment cache tests"""
+    
+    def test_key_normalization(self):
+        """Test equivalent inputs share a key and threshold crossings do not"""
+        a = risk_cache_key({"category": "marketing", "amount": 200, "description": " Reddit  ads"}, RiskLevel.LOW)
+        b = risk_cache_key({"category": "MARKETING", "amount": 300, "description": "reddit ads"}, RiskLevel.LOW)
+        c = risk_cache_key({"category": "MARKETING", "amount": 3000, "description": "reddit ads"}, RiskLevel.MEDIUM)
+        d = risk_cache_key({"category": "MARKETING", "amount": 200, "description": "twitter ads"}, RiskLevel.LOW)
+        
+        assert a == b == d
+        assert a != c
+        assert risk_cache_key({"category": "MARKETING", "amount": 200, "risk_level": "high"}, RiskLevel.LOW) \
+            == risk_cache_key({"category": "MARKETING", "amount": 200, "risk_level": "HIGH"}, RiskLevel.LOW) != a
+        assert insight_cache_key({"category": "marketing", "amount": 200, "description": " Reddit  ads"}, RiskLevel.LOW) \
+            != insight_cache_key({"category": "MARKETING", "amount": 200, "description": "twitter ads"}, RiskLevel.LOW)
+    
+    def test_repeated_assessment_hits(self, engine):
+        """Test identical inputs come back from the cache"""
+        data = {"category": "MARKETING", "amount": 500, "description": "Reddit ads"}
+        
+        first = engine.assess_decision(data)
+        second = engine.assess_decision(dict(data, amount=600))
+        
+        assert (first["cache"], second["cache"]) == ("MISS", "HIT")
+        assert (first["insights_cache"], second["insights_cache"]) == ("MISS", "HIT")
+        assert second["risk_level"] == first["risk_level"] == RiskLevel.LOW
+        assert engine.risk_cache.get_stats()["hit_rate"] == 50.0
+    
+    def test_insights_are_copies(self, engine):
+        """Test changing returned insights leaves the cached ones alone"""
+        data = {"category": "MARKETING", "amount": 500, "description": "Reddit ads"}
+        first = engine.assess_decision(data)
+        first["memory_insights"]["learned"]["risk_adjustment"] = 99
+        first["memory_insights"]["similar"].append({"id": "bogus"})
+        
+        second = engine.assess_decision(data)
+        
+        assert second["insights_cache"] == "HIT"
+        assert second["memory_insights"]["learned"].get("risk_adjustment") != 99
+        assert {"id": "bogus"} not in second["memory_insights"]["similar"]
+    
+    def test_repeated_evaluations_hit(self, engine):
+        """Test the decision each evaluation records keeps both caches, and an outcome refreshes insights"""
+        data = {"category": "MARKETING", "amount": 500, "description": "Reddit ads"}
+        engine.evaluate_decision(data)
+        
+        assessment = engine.assess_decision(dict(data, description="reddit ads"))
+        assert (assessment["cache"], assessment["insights_cache"]) == ("HIT", "HIT")
+        
+        decision_id = engine.memory.records("decisions")[-1]["id"]
+        engine.memory.record_outcome(decision_id, "fine", True)
+        assessment = engine.assess_decision(data)
+        
+        assert (assessment["cache"], assessment["insights_cache"]) == ("MISS", "MISS")
+        assert assessment["memory_insights"]["similar_decisions"] == 1
+    
+    def test_outcomes_invalidate(self, engine):
+        """Test recording an outcome bumps the model version"""
+        data = {"category": "MARKETING", "amount": 5000, "description": "Reddit ads"}
+        engine.assess_decision(data)
+        version = engine.model_version
+        
+        for i in range(20):
+            engine.memory.record_decision({"id": f"DEC_{i}", "category": "MARKETING", "amount": 5000})
+            engine.memory.record_outcome(f"DEC_{i}", "fine", True)
+        assessment = engine.assess_decision(data)
+        
+        assert engine.model_version > version
+        assert assessment["cache"] == "MISS"
+        assert assessment["risk_level"] == RiskLevel.LOW  # learned from the outcomes
+    
+    def test_lru_eviction(self):
+        """Test the cache is bounded and drops the least recently used entry"""
+        cache = RiskAssessmentCache(capacity=2)
+        cache.put("a", 1, "A")
+        cache.put("b", 1, "B")
+        cache.get("a", 1)
+        cache.put("c", 1, "C")
+        
+        assert cache.get("b", 1) is None
+        assert cache.get("a", 1) == "A"
+        assert cache.get("a", 2) is None  # newer version
+        assert cache.get_stats()["evictions"] == 1
+    
+    def test_older_version_misses_without_clearing(self):
+        """Test a lookup or store from before a version change leaves the newer entries alone"""
+        cache = RiskAssessmentCache()
+        cache.put("a", 2, "A2")
+        
+        assert cache.get("a", 1) is None
+        cache.put("a", 1, "A1")
+        
+        assert cache.get("a", 2) == "A2"
+        assert cache.get_stats()["invalidations"] == 0
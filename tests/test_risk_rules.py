@@ -0,0 +1,97 @@
+"""
+Risk Rules Tests
+Unit tests for compiled, hot-reloaded risk thresholds
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_decision_engine import AIDecisionEngine, RiskLevel
+from risk_rules import CompiledRiskRules, RiskRules
+
+RULES = {
+    "categories": {
+        "compliance": {
+            "boundaries": [100, 1000, 10000],
+            "thresholds": {"MEDIUM": {"auto_execute": False, "human_approval": True}}
+        }
+    },
+    "tenants": {
+        "tenant_a": {
+            "default": {"boundaries": [500, 5000, 25000]},
+            "categories": {"FINANCIAL": {"thresholds": {"LOW": {"auto_execute": False, "human_review": True}}}}
+        }
+    }
+}
+
+def _write(path, rules, generation=0):
+    with open(path, "w") as f:
+        json.dump(rules, f)
+    # Distinct mtimes even on coarse filesystem clocks
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9 * (1 + generation)))
+
+@pytest.fixture
+def rules_file(tmp_path):
+    path = str(tmp_path / "risk_rules.json")
+    _write(path, RULES)
+    return path
+
+class TestRiskRules:
+    """Risk rules tests"""
+    
+    def test_builtin_rules_match_previous_cutoffs(self):
+        """Test the defaults keep the 1000/10000/50000 boundaries and actions"""
+        table = CompiledRiskRules({}).table()
+        
+        assert [table.level_index(a) for a in (0, 1000, 1000.01, 10000, 50000, 50001)] == [0, 0, 1, 1, 2, 3]
+        assert table.action(0, False) == "EXECUTE_IMMEDIATELY"
+        assert table.action(2, False) == "WAIT_HUMAN_APPROVAL"
+        assert table.action(3, False) == "WAIT_HUMAN_REVIEW"
+        assert table.action(2, True) == "AI_PROPOSE_HUMAN_REVIEW"
+    
+    def test_category_and_tenant_scopes(self):
+        """Test scopes inherit default -> category -> tenant -> tenant category"""
+        compiled = CompiledRiskRules(RULES)
+        
+        assert compiled.table("COMPLIANCE").level_index(500) == 1
+        assert compiled.table("COMPLIANCE").action(1, False) == "WAIT_HUMAN_APPROVAL"
+        assert compiled.table("MARKETING").level_index(500) == 0
+        assert compiled.table("MARKETING", "tenant_a").level_index(600) == 1
+        assert compiled.table("COMPLIANCE", "tenant_a").level_index(600) == 1
+        assert compiled.table("COMPLIANCE", "tenant_a").action(1, False) == "WAIT_HUMAN_APPROVAL"
+        assert compiled.table("FINANCIAL", "tenant_a").action(0, False) == "WAIT_HUMAN_REVIEW"
+        assert compiled.table("FINANCIAL", "tenant_b").action(0, False) == "EXECUTE_IMMEDIATELY"
+    
+    def test_hot_reload_keeps_last_good_rules(self, rules_file, monkeypatch):
+        """Test changed files are picked up and invalid ones ignored"""
+        monkeypatch.setattr("risk_rules.RELOAD_CHECK_SECONDS", 0.0)
+        rules = RiskRules(rules_file)
+        assert rules.version == 1
+        
+        _write(rules_file, {"default": {"boundaries": [10, 20, 30]}}, generation=1)
+        assert rules.current().table().level_index(15) == 1
+        assert rules.version == 2
+        
+        _write(rules_file, {"default": {"boundaries": [30, 20]}}, generation=2)
+        assert rules.current().table().level_index(15) == 1
+        assert rules.version == 2
+    
+    def test_engine_uses_reloaded_rules(self, tmp_path, rules_file, monkeypatch):
+        """Test the engine assesses with the new rules and drops cached results"""
+        monkeypatch.setattr("risk_rules.RELOAD_CHECK_SECONDS", 0.0)
+        engine = AIDecisionEngine(str(tmp_path / "ai_memory.json"), str(tmp_path / "autonomy.json"),
+                                  tenant_id="tenant_a", rules=RiskRules(rules_file))
+        data = {"category": "MARKETING", "amount": 800, "description": "Ads"}
+        assert engine.assess_decision(data)["risk_level"] == RiskLevel.MEDIUM
+        
+        _write(rules_file, {"default": {"boundaries": [5000, 10000, 50000]}}, generation=1)
+        assessment = engine.assess_decision(data)
+        
+        assert assessment["cache"] == "MISS"
+        assert assessment["risk_level"] == RiskLevel.LOW
+        assert engine.thresholds_for("MARKETING")[RiskLevel.LOW]["auto_execute"] is True
@@ -0,0 +1,125 @@
+"""
+Strategy Runner Tests
+Unit tests for concurrent income strategy execution
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from income_strategies import IncomeManager, IncomeStrategy
+from strategy_runner import StrategyRunner
+
+class SleepStrategy(IncomeStrategy):
+    """I/O-bound stand-in that stops early when cancelled"""
+    
+    def __init__(self, name, delay):
+        super().__init__(name, 0.0)
+        self.delay = delay
+    
+    def execute(self):
+        if self.delay is None:
+            raise RuntimeError("no delay")
+        end = time.monotonic() + self.delay
+        while time.monotonic() < end and not self.cancelled:
+            time.sleep(0.01)
+        return {"action": "SLEPT"}
+    
+    def evaluate_opportunity(self):
+        return {}
+
+class CountingStrategy(IncomeStrategy):
+    """CPU-bound stand-in that keeps state between runs"""
+    
+    execution_mode = "process"
+    
+    def __init__(self, name, spin=False):
+        super().__init__(name, 0.0)
+        self.runs = 0
+        self.spin = spin
+    
+    def execute(self):
+        while self.spin:
+            pass
+        self.runs += 1
+        return {"action": "COUNTED", "runs": self.runs}
+    
+    def evaluate_opportunity(self):
+        return {}
+
+class AsyncStrategy(IncomeStrategy):
+    """Strategy with an async execute"""
+    
+    def __init__(self, name, delay):
+        super().__init__(name, 0.0)
+        self.delay = delay
+    
+    async def execute(self):
+        await asyncio.sleep(self.delay)
+        return {"action": "AWAITED"}
+    
+    def evaluate_opportunity(self):
+        return {}
+
+def _manager(strategies, timeout=5.0):
+    manager = IncomeManager(StrategyRunner(timeout=timeout))
+    manager.strategies = strategies
+    manager.activate_strategies()
+    return manager
+
+class TestStrategyRunner:
+    """Concurrent strategy execution tests"""
+    
+    def test_threads_take_as_long_as_the_slowest(self):
+        """Test I/O-bound strategies overlap and results keep their order"""
+        manager = _manager([SleepStrategy(f"S{i}", 0.3) for i in range(5)])
+        
+        start = time.monotonic()
+        results = manager.execute_all()
+        
+        assert time.monotonic() - start < 1.0
+        assert [r["strategy"] for r in results] == ["S0", "S1", "S2", "S3", "S4"]
+        assert all(r["action"] == "SLEPT" and r["execution"]["status"] == "COMPLETED" for r in results)
+        assert manager.last_run["completed"] == 5
+    
+    def test_timeouts_and_errors_are_aggregated(self):
+        """Test an overrunning strategy is cancelled and a failing one reported"""
+        slow, failing, quick = SleepStrategy("SLOW", 10), SleepStrategy("FAILING", None), SleepStrategy("QUICK", 0)
+        slow.execution_timeout = 0.2
+        manager = _manager([slow, failing, quick])
+        
+        results = manager.execute_all()
+        
+        assert [r["execution"]["status"] for r in results] == ["TIMEOUT", "ERROR", "COMPLETED"]
+        assert slow.cancelled
+        assert "RuntimeError" in results[1]["execution"]["error"]
+        assert manager.last_run["timed_out"] == 1 and manager.last_run["errors"] == 1
+        assert manager.last_run["duration"] < 1.0
+    
+    def test_process_strategies_copy_state_back_and_are_terminated(self):
+        """Test process-mode state survives the run and a spinning worker is stopped"""
+        counting, spinning = CountingStrategy("COUNTING"), CountingStrategy("SPINNING", spin=True)
+        spinning.execution_timeout = 0.5
+        manager = _manager([counting, spinning])
+        
+        manager.execute_all()
+        results = manager.execute_all()
+        
+        assert results[0]["runs"] == 2 and counting.runs == 2
+        assert results[1]["execution"]["status"] == "TIMEOUT"
+    
+    def test_async_strategies_and_cancel(self):
+        """Test async strategies run on the loop and cancel() stops a run"""
+        manager = _manager([AsyncStrategy("QUICK", 0.05), AsyncStrategy("SLOW", 10), SleepStrategy("SLEEPER", 10)])
+        threading.Timer(0.3, manager.cancel).start()
+        
+        start = time.monotonic()
+        results = manager.execute_all()
+        
+        assert time.monotonic() - start < 2.0
+        assert results[0]["action"] == "AWAITED"
+        assert [r["execution"]["status"] for r in results] == ["COMPLETED", "CANCELLED", "CANCELLED"]
+        assert results[0]["execution"]["mode"] == "async"
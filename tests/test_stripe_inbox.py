@@ -0,0 +1,175 @@
+"""
+Stripe Inbox Tests
+Unit tests for deduplicated, queued Stripe event processing
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.fake_stripe import FakeStripe
+from api.stripe_inbox import StripeEventInbox, apply_stripe_event
+
+class RecordingHandler:
+    """Handler that notes what it applied, optionally failing some events"""
+    
+    def __init__(self, fail=None, delay=0.0):
+        self.applied = []
+        self.fail = fail or {}  # event ID -> failures left
+        self.delay = delay
+        self.lock = threading.Lock()
+    
+    def __call__(self, event):
+        time.sleep(self.delay)
+        with self.lock:
+            if self.fail.get(event["id"], 0) > 0:
+                self.fail[event["id"]] -= 1
+                raise RuntimeError("handler down")
+            self.applied.append(event)
+
+@pytest.fixture
+def inbox_path(tmp_path):
+    return str(tmp_path / "stripe_inbox.db")
+
+class TestStripeInbox:
+    """Stripe event inbox tests"""
+    
+    def test_duplicates_dropped_and_order_kept_per_subscription(self, inbox_path):
+        """Test each event is applied once and a subscription's events in order"""
+        stream = FakeStripe(seed=1).stream([f"sub_{n}" for n in range(20)], duplicate_rate=0.3)
+        handler = RecordingHandler(delay=0.001)
+        inbox = StripeEventInbox(handler, inbox_path, workers=4, fsync=False)
+        inbox.start()
+        
+        accepted = [inbox.enqueue(event) for event in stream]
+        assert inbox.join(10)
+        inbox.close()
+        
+        unique = {event["id"] for event in stream}
+        assert accepted.count(True) == len(unique) == len(handler.applied)
+        assert inbox.get_stats()["duplicates"] == len(stream) - len(unique)
+        for subscription in {e["data"]["object"].get("subscription") or e["data"]["object"]["id"] for e in stream}:
+            created = [e["created"] for e in handler.applied
+                       if subscription in (e["data"]["object"].get("subscription"), e["data"]["object"]["id"])]
+            assert created == sorted(created)
+    
+    def test_failed_event_holds_back_its_subscription_only(self, inbox_path):
+        """Test retries keep order within a subscription and exhausted events are recorded"""
+        fake = FakeStripe(seed=2)
+        first, second = fake.subscription_events("sub_a", updates=1), fake.subscription_events("sub_b", updates=0)
+        blocked = fake.subscription_events("sub_c", updates=0)
+        handler = RecordingHandler(fail={first[0]["id"]: 2, blocked[0]["id"]: 99})
+        inbox = StripeEventInbox(handler, inbox_path, max_attempts=3, backoff_base=0.02, fsync=False)
+        inbox.start()
+        
+        for event in first + second + blocked:
+            inbox.enqueue(event)
+        assert inbox.join(5)
+        inbox.close()
+        
+        assert [e["id"] for e in handler.applied] == [second[0]["id"], first[0]["id"], first[1]["id"]]
+        assert inbox.status(first[0]["id"]) == "processed"
+        assert inbox.status(blocked[0]["id"]) == "failed"
+        assert "handler down" in inbox.failed()[0]["error"]
+        assert inbox.get_stats()["retried"] == 4
+    
+    def test_queued_events_and_seen_ids_survive_restart(self, inbox_path):
+        """Test a restart processes what was queued and still rejects redeliveries"""
+        events = FakeStripe(seed=3).stream(["sub_a", "sub_b"], duplicate_rate=0)
+        first = StripeEventInbox(RecordingHandler(), inbox_path)
+        for event in events:
+            assert first.enqueue(event)
+        first.close()
+        
+        handler = RecordingHandler()
+        second = StripeEventInbox(handler, inbox_path)
+        assert second.get_stats()["queued"] == len(events)
+        second.start()
+        assert second.join(5)
+        second.close()
+        assert sorted(e["id"] for e in handler.applied) == sorted(e["id"] for e in events)
+        
+        third = StripeEventInbox(RecordingHandler(), inbox_path)
+        assert third.get_stats()["queued"] == 0
+        assert not third.enqueue(events[0])
+        assert {third.status(e["id"]) for e in events} == {"processed"}
+        third.close()
+    
+    def test_nothing_on_disk_until_used(self, tmp_path):
+        """Test creating an inbox leaves the directory alone"""
+        inbox = StripeEventInbox(RecordingHandler(), str(tmp_path / "stripe_inbox.db"))
+        inbox.close()
+        assert os.listdir(tmp_path) == []
+    
+    def test_event_accepted_once_across_inboxes(self, inbox_path):
+        """Test an ID stored by one process is a duplicate for another"""
+        first, second = FakeStripe(seed=5).subscription_events("sub_a", updates=1)
+        a = StripeEventInbox(RecordingHandler(), inbox_path, fsync=False)
+        b = StripeEventInbox(RecordingHandler(), inbox_path, fsync=False)
+        
+        assert a.enqueue(first)
+        assert not b.enqueue(first)
+        assert b.enqueue(second)
+        assert not a.enqueue(second)
+        assert a.get_stats()["queued"] == b.get_stats()["queued"] == 2
+        a.close()
+        b.close()
+    
+    def test_inboxes_share_work_once_and_in_order(self, inbox_path):
+        """Test two live inboxes apply every event once, in order per subscription"""
+        stream = FakeStripe(seed=6).stream([f"sub_{n}" for n in range(10)], duplicate_rate=0.3)
+        handler = RecordingHandler(delay=0.001)
+        inboxes = [StripeEventInbox(handler, inbox_path, workers=2, fsync=False) for _ in range(2)]
+        for inbox in inboxes:
+            inbox.start()
+        
+        accepted = [inboxes[n % 2].enqueue(event) for n, event in enumerate(stream)]
+        assert all(inbox.join(10) for inbox in inboxes)
+        for inbox in inboxes:
+            inbox.close()
+        
+        unique = {event["id"] for event in stream}
+        assert accepted.count(True) == len(unique)
+        assert sorted(e["id"] for e in handler.applied) == sorted(unique)
+        for subscription in {e["data"]["object"].get("subscription") or e["data"]["object"]["id"] for e in stream}:
+            created = [e["created"] for e in handler.applied
+                       if subscription in (e["data"]["object"].get("subscription"), e["data"]["object"]["id"])]
+            assert created == sorted(created)
+    
+    def test_lapsed_claim_is_taken_over(self, inbox_path):
+        """Test an event claimed by a process that died is applied once its lease runs out"""
+        events = FakeStripe(seed=8).subscription_events("sub_a", updates=1)
+        crashed = StripeEventInbox(RecordingHandler(), inbox_path, fsync=False, lease_seconds=0.2)
+        for event in events:
+            crashed.enqueue(event)
+        assert crashed._claim()[1]["id"] == events[0]["id"]  # then never settled
+        
+        handler = RecordingHandler()
+        other = StripeEventInbox(handler, inbox_path, fsync=False)
+        assert other._claim() is None  # the held event blocks its subscription
+        other.start()
+        assert other.join(5)
+        other.close()
+        crashed.close()
+        assert [e["id"] for e in handler.applied] == [e["id"] for e in events]
+    
+    def test_cancellation_downgrades_api_key(self, tmp_path, monkeypatch):
+        """Test the handler applies subscription events to stored state"""
+        monkeypatch.chdir(tmp_path)
+        from api.api_key_manager import api_key_manager
+        from api.stripe_service import stripe_service
+        api_key = api_key_manager.generate_api_key(tier="pro", prefix="pro_sub")
+        stripe_service.link_subscription_to_api_key(api_key, "sub_x", "a@example.com", "pro")
+        
+        fake = FakeStripe(seed=4)
+        for event in fake.subscription_events("sub_x", updates=1, cancel=True):
+            apply_stripe_event(event)
+        
+        assert stripe_service._load_subscriptions()["sub_x"]["status"] == "cancelled"
+        assert api_key_manager.get_key_info(api_key)["tier"] == "free"
+        signature = fake.sign(b"{}", timestamp=1700000000)
+        assert signature.startswith("t=1700000000,v1=") and len(signature.split("v1=")[1]) == 64
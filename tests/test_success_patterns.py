@@ -0,0 +1,74 @@
+"""
+Success Pattern Tests
+Unit tests for the maintained success/failure tables
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_memory_system import AIMemory
+from success_patterns import SuccessPatterns
+
+class TestSuccessPatterns:
+    """Success pattern aggregate tests"""
+    
+    def test_outcomes_update_tables(self, tmp_path):
+        """Test record_outcome counts per type, strategy and day"""
+        memory = AIMemory(str(tmp_path / "ai_memory.json"), retention=None)
+        memory.record_decision({"id": "DEC_1", "category": "MARKETING", "risk_level": "LOW", "description": "Ads"})
+        memory.record_decision({"id": "DEC_2", "category": "MARKETING", "risk_level": "LOW", "description": "Post"})
+        memory.record_outcome("DEC_1", "good CTR", True, {"strategy": "reddit"})
+        memory.record_outcome("DEC_2", "no clicks", False, {"strategy": "reddit"})
+        
+        patterns = memory.get_successful_patterns("MARKETING")
+        
+        assert patterns["by_type"] == [{"category": "MARKETING", "risk_level": "LOW", "successes": 1,
+                                        "failures": 1, "success_rate": 50.0}]
+        assert patterns["by_strategy"]["reddit"] == {"successes": 1, "failures": 1, "success_rate": 50.0}
+        assert sum(day["successes"] + day["failures"] for day in patterns["by_day"].values()) == 2
+        assert patterns["match"]["successes"] == 1
+        assert patterns["successful_decisions"] == [
+            {"id": "DEC_1", "type": "MARKETING", "risk_level": "LOW", "outcome": "good CTR"}
+        ]
+    
+    def test_changed_outcome_moves_counts(self, tmp_path):
+        """Test a second outcome for a decision replaces the first"""
+        memory = AIMemory(str(tmp_path / "ai_memory.json"), retention=None)
+        memory.record_decision({"id": "DEC_1", "category": "FINANCIAL", "risk_level": "HIGH", "description": "Buy"})
+        memory.record_outcome("DEC_1", "looked fine", True)
+        memory.record_outcome("DEC_1", "chargeback", False)
+        
+        patterns = memory.get_successful_patterns("FINANCIAL", "HIGH")
+        
+        assert patterns["match"] == {"successes": 0, "failures": 1, "success_rate": 0.0}
+        assert patterns["successful_decisions"] == []
+    
+    def test_exemplars_are_capped(self):
+        """Test only the newest successful decisions are kept as examples"""
+        decisions = [
+            {"id": f"DEC_{i}", "decision": {"category": "OPERATIONAL", "risk_level": "LOW"}, "success": True}
+            for i in range(50)
+        ]
+        
+        patterns = SuccessPatterns.from_records(decisions, [], max_exemplars=5)
+        
+        assert [e["id"] for e in patterns.exemplars] == [f"DEC_{i}" for i in range(45, 50)]
+        assert patterns.by_type["OPERATIONAL|LOW"] == [50, 0]
+    
+    def test_tables_persist_with_memory(self, tmp_path):
+        """Test the tables are saved in ai_memory.json and reloaded as-is"""
+        memory_file = str(tmp_path / "ai_memory.json")
+        memory = AIMemory(memory_file, retention=None)
+        memory.record_decision({"id": "DEC_1", "category": "MARKETING", "risk_level": "LOW", "description": "Ads"})
+        memory.record_outcome("DEC_1", "good CTR", True)
+        with open(memory_file) as f:
+            stored = json.load(f)
+        stored["decisions"] = []  # e.g. moved to the archive
+        with open(memory_file, "w") as f:
+            json.dump(stored, f)
+        
+        reloaded = AIMemory(memory_file, retention=None)
+        
+        assert reloaded.get_successful_patterns("MARKETING")["match"]["successes"] == 1
@@ -0,0 +1,130 @@
+"""
+Tenant Registry Tests
+Unit tests for per-tenant engine partitioning
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.tenant_registry import TenantRegistry, tenant_id_for, shard_for
+
+@pytest.fixture
+def registry(tmp_path):
+    """Registry that keeps two tenants hot"""
+    return TenantRegistry(str(tmp_path / "tenants"), capacity=2)
+
+class TestTenantRegistry:
+    """Tenant registry tests"""
+    
+    def test_tenant_ids(self):
+        """Test ids are stable, opaque and shared per account"""
+        assert tenant_id_for("key_a") == tenant_id_for("key_a") != tenant_id_for("key_b")
+        assert "key_a" not in tenant_id_for("key_a")
+        assert tenant_id_for("key_a", {"account_id": "acct"}) == tenant_id_for("key_b", {"account_id": "acct"})
+        assert 0 <= shard_for(tenant_id_for("key_a"), 4) < 4
+    
+    def test_tenants_are_isolated(self, registry):
+        """Test one tenant's decisions never reach another's memory"""
+        alice = registry.get("alice")
+        bob = registry.get("bob")
+        
+        alice.evaluate_decision({"category": "MARKETING", "description": "reddit post", "amount": 10})
+        
+        assert len(alice.memory.memories["decisions"]) == 1
+        assert len(bob.memory.memories["decisions"]) == 0
+        assert os.path.exists(os.path.join(registry.tenant_dir("alice"), "ai_memory.json"))
+    
+    def test_lru_eviction_round_trips(self, registry):
+        """Test evicted tenants are flushed and reload with their state"""
+        alice = registry.get("alice")
+        decision = alice.evaluate_decision({"category": "OPERATIONAL", "description": "hosting", "amount": 10})
+        alice.log_decision(decision)
+        registry.get("bob")
+        registry.get("carol")  # evicts alice
+        
+        assert registry.get_stats()["evictions"] == 1
+        with open(os.path.join(registry.tenant_dir("alice"), "decision_log.json")) as f:
+            assert json.load(f)[0]["id"] == decision["id"]
+        
+        reloaded = registry.get("alice")
+        assert reloaded is not alice
+        assert reloaded.get_decisions()[0]["id"] == decision["id"]
+        assert len(reloaded.memory.memories["decisions"]) == 1
+    
+    def test_hot_tenants_are_reused(self, registry):
+        """Test a hot tenant is served from memory"""
+        assert registry.get("alice") is registry.get("alice")
+        assert registry.get_stats()["loads"] == 1
+    
+    def test_slow_load_blocks_only_its_tenant(self, registry, monkeypatch):
+        """Test a tenant still loading holds up neither hot tenants nor other loads"""
+        alice = registry.get("alice")
+        release = threading.Event()
+        load = registry._load
+        
+        def slow_load(tenant_id):
+            if tenant_id == "slow":
+                release.wait(5)
+            return load(tenant_id)
+        
+        monkeypatch.setattr(registry, "_load", slow_load)
+        waiters = [threading.Thread(target=registry.get, args=("slow",)) for _ in range(3)]
+        for thread in waiters:
+            thread.start()
+        time.sleep(0.05)
+        
+        started = time.monotonic()
+        assert registry.get("alice") is alice
+        registry.get("bob")
+        assert time.monotonic() - started < 1.0
+        
+        release.set()
+        for thread in waiters:
+            thread.join(5)
+        assert registry.get_stats()["loads"] == 3  # alice, bob, slow once
+        assert registry._tenant_locks == {}
+    
+    def test_eviction_closes_engine(self, registry, monkeypatch):
+        """Test an evicted tenant's snapshot writer is stopped"""
+        import ai_memory_system
+        monkeypatch.setattr(ai_memory_system, "MEMORY_SNAPSHOT_ENABLED", True)
+        alice = registry.get("alice")
+        assert alice.memory.snapshots.get_stats()["writer"]
+        registry.get("bob")
+        registry.get("carol")  # evicts alice
+        
+        assert not alice.memory.snapshots.get_stats()["writer"]
+        assert registry.get("carol").memory.snapshots.get_stats()["writer"]
+    
+    def test_engine_in_use_closed_on_release(self, registry, monkeypatch):
+        """Test an engine evicted mid-request keeps running until released"""
+        import ai_memory_system
+        monkeypatch.setattr(ai_memory_system, "MEMORY_SNAPSHOT_ENABLED", True)
+        alice = registry.acquire("alice")
+        registry.get("bob")
+        registry.get("carol")  # evicts alice while in use
+        
+        assert registry.get_stats()["retiring"] == 1
+        assert alice.memory.snapshots.get_stats()["writer"]
+        registry.release("alice")
+        assert not alice.memory.snapshots.get_stats()["writer"]
+        assert registry.get_stats()["retiring"] == registry.get_stats()["in_use"] == 0
+        assert registry._tenant_locks == {}
+    
+    def test_evicted_engine_in_use_is_handed_back(self, registry):
+        """Test a tenant requested while its evicted engine is in use gets that engine, not a second writer"""
+        alice = registry.acquire("alice")
+        registry.get("bob")
+        registry.get("carol")  # evicts alice while in use
+        
+        assert registry.acquire("alice") is alice
+        assert registry.get_stats()["loads"] == 3
+        registry.release("alice")
+        registry.release("alice")
+        assert registry.get("alice") is alice  # hot again, never closed
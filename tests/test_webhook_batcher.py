@@ -0,0 +1,119 @@
+"""
+Webhook Batcher Tests
+Unit tests for batched and coalesced webhook delivery
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.webhook_batcher import batch_settings
+from api.webhook_manager import WebhookManager
+from api.webhook_registry import WebhookRegistry
+
+class RecordingOutbox:
+    """Outbox stand-in that keeps queued deliveries"""
+    
+    def __init__(self):
+        self.on_result = None
+        self.deliveries = []
+    
+    def enqueue(self, url, body, headers=None, event=None, webhook_id=None):
+        self.deliveries.append({"url": url, "body": body, "headers": headers, "event": event})
+        return f"dlv_{len(self.deliveries)}"
+    
+    def start(self):
+        pass
+
+@pytest.fixture(autouse=True)
+def in_tmp_dir(tmp_path, monkeypatch):
+    """Keep files from default paths out of the working tree"""
+    monkeypatch.chdir(tmp_path)
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = WebhookManager(RecordingOutbox(), WebhookRegistry(str(tmp_path / "webhooks.json")))
+    yield manager
+    manager.batcher.close()
+
+class TestWebhookBatcher:
+    """Webhook batching tests"""
+    
+    def test_full_batches_are_sent_as_signed_arrays(self, manager):
+        """Test events go out max_items at a time, and flush sends the remainder"""
+        manager.subscribe("http://batched", ["decision.evaluated"], secret="k",
+                          batch={"max_items": 10, "max_wait_ms": 60000})
+        
+        queued = [manager.trigger("decision.evaluated", {"n": n}) for n in range(25)]
+        assert sum(len(ids) for ids in queued) == 2
+        assert manager.batcher.get_stats()["buffered"] == 5
+        manager.flush()
+        
+        deliveries = manager.outbox.deliveries
+        batches = [json.loads(d["body"]) for d in deliveries]
+        assert [len(batch) for batch in batches] == [10, 10, 5]
+        assert [payload["data"]["n"] for batch in batches for payload in batch] == list(range(25))
+        signature = hmac.new(b"k", deliveries[0]["body"].encode(), hashlib.sha256).hexdigest()
+        assert deliveries[0]["headers"]["X-Webhook-Signature"] == f"sha256={signature}"
+        assert deliveries[0]["headers"]["X-Webhook-Batch-Size"] == "10"
+        assert deliveries[0]["event"] == "batch"
+    
+    def test_exit_queues_buffered_batches(self, manager):
+        """Test the exit hook hands partly filled batches to the outbox"""
+        from api import webhook_batcher
+        manager.subscribe("http://batched", ["risk.assessed"], batch={"max_items": 100, "max_wait_ms": 60000})
+        manager.trigger("risk.assessed", {"n": 1})
+        assert manager.outbox.deliveries == []
+        
+        webhook_batcher._flush_all()
+        
+        assert len(json.loads(manager.outbox.deliveries[0]["body"])) == 1
+        assert manager.batcher.get_stats()["buffered"] == 0
+    
+    def test_partial_batch_sent_after_max_wait(self, manager):
+        """Test a batch that does not fill up goes out after max_wait_ms"""
+        manager.subscribe("http://batched", ["risk.assessed"], batch={"max_items": 100, "max_wait_ms": 50})
+        for n in range(3):
+            manager.trigger("risk.assessed", {"n": n})
+        assert manager.outbox.deliveries == []
+        
+        deadline = time.monotonic() + 2
+        while not manager.outbox.deliveries and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(json.loads(manager.outbox.deliveries[0]["body"])) == 3
+    
+    def test_coalesces_superseded_state_events(self, manager):
+        """Test only the latest autonomy change per category stays in the batch"""
+        manager.subscribe("http://batched", ["*"], batch={"max_items": 100, "max_wait_ms": 60000, "coalesce": True})
+        for level in ("LOW", "MEDIUM", "HIGH"):
+            manager.trigger("autonomy.changed", {"category": "FINANCIAL", "level": level})
+            manager.trigger("decision.evaluated", {"level": level})
+        manager.trigger("autonomy.changed", {"category": "MARKETING", "level": "LOW"})
+        manager.flush()
+        
+        batch = json.loads(manager.outbox.deliveries[0]["body"])
+        assert [(p["event"], p["data"]["level"]) for p in batch] == [
+            ("decision.evaluated", "LOW"), ("decision.evaluated", "MEDIUM"),
+            ("autonomy.changed", "HIGH"), ("decision.evaluated", "HIGH"), ("autonomy.changed", "LOW")
+        ]
+        assert manager.batcher.get_stats()["coalesced"] == 2
+    
+    def test_unbatched_subscribers_are_unaffected(self, manager):
+        """Test per-event delivery stays the default alongside batched subscriptions"""
+        manager.subscribe("http://single", ["autonomy.changed"])
+        manager.subscribe("http://batched", ["autonomy.changed"], batch={"max_items": 2})
+        
+        manager.trigger("autonomy.changed", {"category": "FINANCIAL"})
+        manager.trigger("autonomy.changed", {"category": "FINANCIAL"})
+        
+        assert [d["url"] for d in manager.outbox.deliveries] == ["http://single", "http://single", "http://batched"]
+        assert json.loads(manager.outbox.deliveries[0]["body"])["event"] == "autonomy.changed"
+        assert batch_settings(None) is None
+        with pytest.raises(ValueError):
+            batch_settings({"max_items": 0})
@@ -0,0 +1,202 @@
+"""
+Webhook Outbox Tests
+Unit tests for durable asynchronous webhook delivery
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.webhook_manager import WebhookManager
+from api.webhook_outbox import WebhookOutbox
+from api.webhook_registry import WebhookRegistry
+
+class StubReceiver(ThreadingHTTPServer):
+    """Local webhook receiver answering with queued status codes"""
+    
+    daemon_threads = True
+    
+    def __init__(self):
+        self.requests = []
+        self.statuses = []  # popped per request, 200 once empty
+        self.delay = 0.0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(handler):
+                body = handler.rfile.read(int(handler.headers["Content-Length"]))
+                with self.lock:
+                    self.active += 1
+                    self.max_active = max(self.max_active, self.active)
+                    status = self.statuses.pop(0) if self.statuses else 200
+                time.sleep(self.delay)
+                with self.lock:
+                    self.active -= 1
+                    self.requests.append((dict(handler.headers), body))
+                handler.send_response(status)
+                handler.send_header("Content-Length", "0")
+                handler.end_headers()
+            
+            def log_message(handler, *args):
+                pass
+        
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server_address[1]}/hook"
+
+@pytest.fixture(autouse=True)
+def in_tmp_dir(tmp_path, monkeypatch):
+    """Keep files from default paths out of the working tree"""
+    monkeypatch.chdir(tmp_path)
+
+@pytest.fixture
+def receiver():
+    server = StubReceiver()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def outbox_path(tmp_path):
+    return str(tmp_path / "webhook_outbox.ndjson")
+
+class TestWebhookOutbox:
+    """Outbox delivery tests"""
+    
+    def test_trigger_queues_and_delivers_signed_payload(self, receiver, outbox_path, tmp_path):
+        """Test trigger returns before delivery and the receiver gets the signed body"""
+        receiver.delay = 0.3
+        manager = WebhookManager(WebhookOutbox(outbox_path), WebhookRegistry(str(tmp_path / "webhooks.json")))
+        webhook_id = manager.subscribe(receiver.url, ["decision.evaluated"], secret="s3cret")
+        
+        start = time.monotonic()
+        delivery_ids = manager.trigger("decision.evaluated", {"decision_id": "dec_1"})
+        assert time.monotonic() - start < 0.1
+        assert manager.trigger("risk.assessed", {}) == []
+        
+        assert manager.outbox.join(5)
+        headers, body = receiver.requests[0]
+        expected = hmac.new(b"s3cret", body, hashlib.sha256).hexdigest()
+        assert headers["X-Webhook-Signature"] == f"sha256={expected}"
+        assert headers["X-Webhook-Delivery"] == delivery_ids[0]
+        assert json.loads(body)["data"] == {"decision_id": "dec_1"}
+        assert manager.get_webhook(webhook_id)["last_triggered"] is not None
+        manager.outbox.close()
+    
+    def test_retries_with_backoff_then_dead_letters_and_replays(self, receiver, outbox_path):
+        """Test 5xx is retried, exhausted deliveries are dead-lettered and replay resends them"""
+        outbox = WebhookOutbox(outbox_path, max_attempts=3, backoff_base=0.05)
+        receiver.statuses = [500, 503, 200, 500, 500, 500, 404]
+        outbox.start()
+        
+        outbox.enqueue(receiver.url, '{"n": 1}')
+        assert outbox.join(5)
+        assert len(receiver.requests) == 3
+        outbox.enqueue(receiver.url, '{"n": 2}')
+        assert outbox.join(5)
+        outbox.enqueue(receiver.url, '{"n": 3}')
+        assert outbox.join(5)
+        
+        dead = outbox.dead_letters()
+        assert [d["attempts"] for d in dead] == [3, 1]
+        assert dead[1]["last_error"] == "HTTP 404"
+        assert outbox.replay() == 2
+        assert outbox.join(5)
+        assert outbox.dead_letters() == []
+        stats = outbox.get_stats()
+        assert (stats["delivered"], stats["retried"], stats["dead_lettered"], stats["replayed"]) == (3, 4, 2, 2)
+        outbox.close()
+    
+    def test_pending_deliveries_survive_restart(self, receiver, outbox_path):
+        """Test deliveries queued before a restart are sent by the next outbox"""
+        first = WebhookOutbox(outbox_path)
+        for n in range(3):
+            first.enqueue(receiver.url, json.dumps({"n": n}))
+        first.close()
+        
+        second = WebhookOutbox(outbox_path)
+        assert second.get_stats()["pending"] == 3
+        second.start()
+        assert second.join(5)
+        assert sorted(json.loads(body)["n"] for _, body in receiver.requests) == [0, 1, 2]
+        second.close()
+        
+        third = WebhookOutbox(outbox_path)
+        assert third.get_stats()["pending"] == 0
+        third.close()
+        assert os.listdir(os.path.dirname(outbox_path)) == []
+    
+    def test_processes_keep_separate_logs(self, receiver, outbox_path):
+        """Test live outboxes on one path never pick up each other's deliveries"""
+        first = WebhookOutbox(outbox_path)
+        first.enqueue(receiver.url, '{"n": 1}')
+        second = WebhookOutbox(outbox_path)
+        second.enqueue(receiver.url, '{"n": 2}')
+        assert (first.get_stats()["pending"], second.get_stats()["pending"]) == (1, 1)
+        
+        second.start()
+        assert second.join(5)
+        assert [json.loads(body)["n"] for _, body in receiver.requests] == [2]
+        first.enqueue(receiver.url, '{"n": 3}')  # after second compacted nothing of first's
+        first.close()
+        second.close()
+        
+        third = WebhookOutbox(outbox_path)
+        assert third.get_stats()["pending"] == 2
+        third.start()
+        assert third.join(5)
+        assert sorted(json.loads(body)["n"] for _, body in receiver.requests) == [1, 2, 3]
+        third.close()
+    
+    def test_no_files_until_first_delivery(self, receiver, outbox_path):
+        """Test an outbox creates its log and lock only when something is queued"""
+        outbox = WebhookOutbox(outbox_path)
+        manager = WebhookManager()
+        assert os.listdir(os.path.dirname(outbox_path)) == []
+        
+        outbox.enqueue(receiver.url, "{}")
+        assert len(os.listdir(os.path.dirname(outbox_path))) == 2
+        outbox.start()
+        assert outbox.join(5)
+        outbox.close()
+        manager.close()
+        assert os.listdir(os.path.dirname(outbox_path)) == []
+    
+    def test_adopts_legacy_log(self, outbox_path):
+        """Test a single shared log from before per-process files is taken over"""
+        with open(outbox_path, "w") as f:
+            f.write(json.dumps({"op": "enqueue", "id": "dlv_old", "url": "http://127.0.0.1:9/hook", "body": "{}",
+                                "headers": {}, "status": "dead", "attempts": 8, "next_at": 0.0,
+                                "last_error": "HTTP 500"}) + "\n")
+        
+        outbox = WebhookOutbox(outbox_path)
+        
+        assert [d["id"] for d in outbox.dead_letters()] == ["dlv_old"]
+        assert not os.path.exists(outbox_path)
+        outbox.close()
+        assert [d["id"] for d in WebhookOutbox(outbox_path).dead_letters()] == ["dlv_old"]
+    
+    def test_endpoint_concurrency_limit(self, receiver, outbox_path):
+        """Test one endpoint never sees more than its limit of requests at once"""
+        receiver.delay = 0.1
+        outbox = WebhookOutbox(outbox_path, endpoint_concurrency=2)
+        outbox.start()
+        
+        start = time.monotonic()
+        for n in range(6):
+            outbox.enqueue(receiver.url, json.dumps({"n": n}))
+        assert outbox.join(5)
+        
+        assert receiver.max_active == 2
+        assert time.monotonic() - start >= 0.3
+        outbox.close()
@@ -0,0 +1,129 @@
+"""
+Webhook Registry Tests
+Unit tests for indexed webhook subscriptions
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.webhook_manager import WebhookManager
+from api.webhook_outbox import WebhookOutbox
+from api.webhook_registry import WebhookRegistry, MAX_WEBHOOK_FAILURES
+from api.webhooks import WebhookEvent, WebhookManager as EventWebhookManager
+
+@pytest.fixture(autouse=True)
+def in_tmp_dir(tmp_path, monkeypatch):
+    """Keep files from default paths out of the working tree"""
+    monkeypatch.chdir(tmp_path)
+
+@pytest.fixture
+def webhooks_file(tmp_path):
+    return str(tmp_path / "webhooks.json")
+
+class TestWebhookRegistry:
+    """Webhook subscription registry tests"""
+    
+    def test_reads_both_legacy_formats(self, webhooks_file):
+        """Test list and event-keyed files load, and are saved back as a list"""
+        with open(webhooks_file, "w") as f:
+            json.dump({
+                "decision.evaluated": [{"id": "wh_1", "url": "http://a", "secret": None, "active": True}],
+                "risk.assessed": [{"id": "wh_1", "url": "http://a", "secret": None, "active": True},
+                                  {"id": "wh_2", "url": "http://b", "secret": "s", "active": False}]
+            }, f)
+        registry = WebhookRegistry(webhooks_file)
+        
+        assert registry.get("wh_1")["events"] == ["decision.evaluated", "risk.assessed"]
+        assert [s["id"] for s in registry.matching("risk.assessed")] == ["wh_1"]
+        
+        registry.subscribe("http://c", ["autonomy.changed"])
+        with open(webhooks_file) as f:
+            saved = json.load(f)
+        assert [s["id"] for s in saved][:2] == ["wh_1", "wh_2"] and len(saved) == 3
+        assert not os.path.exists(webhooks_file + ".tmp")
+        assert [s["url"] for s in WebhookRegistry(webhooks_file).list()] == ["http://a", "http://b", "http://c"]
+    
+    def test_exact_and_wildcard_matching(self, webhooks_file):
+        """Test matches combine exact and pattern subscriptions in subscription order"""
+        registry = WebhookRegistry(webhooks_file)
+        everything = registry.subscribe("http://all", ["*"])
+        decisions = registry.subscribe("http://decisions", ["decision.*"])
+        exact = registry.subscribe("http://exact", ["decision.evaluated", "risk.assessed"])
+        
+        assert [s["id"] for s in registry.matching("decision.evaluated")] == [everything, decisions, exact]
+        assert [s["id"] for s in registry.matching("risk.assessed")] == [everything, exact]
+        assert [s["id"] for s in registry.matching("key.generated")] == [everything]
+        
+        registry.unsubscribe(everything)
+        assert [s["id"] for s in registry.matching("decision.evaluated")] == [decisions, exact]
+        assert registry.matching("key.generated") == ()
+        assert len(registry.list()) == 3
+    
+    def test_both_managers_share_subscriptions(self, webhooks_file, tmp_path):
+        """Test the event-keyed manager delegates to the same registry and outbox"""
+        dispatcher = WebhookManager(WebhookOutbox(str(tmp_path / "outbox.ndjson")), WebhookRegistry(webhooks_file))
+        manager = EventWebhookManager(dispatcher)
+        
+        subscription_id = manager.subscribe(WebhookEvent.KEY_GENERATED, "http://127.0.0.1:9/hook")
+        dispatcher.subscribe("http://127.0.0.1:9/other", ["key.*"])
+        
+        assert [s["id"] for s in manager.list_webhooks(WebhookEvent.KEY_GENERATED)["key.generated"]] == [subscription_id]
+        assert set(manager.list_webhooks()) == {"key.generated", "key.*"}
+        assert dispatcher.get_webhook(subscription_id)["events"] == ["key.generated"]
+        
+        dispatcher.outbox.start = lambda: None  # queue only
+        assert len(asyncio.run(manager.send_webhook(WebhookEvent.KEY_GENERATED, {"key": "k"}))) == 2
+        assert manager.unsubscribe(subscription_id)
+        assert len(dispatcher.trigger("key.generated", {})) == 1
+    
+    def test_deliveries_carry_user_agent(self, webhooks_file, tmp_path):
+        """Test queued deliveries identify the sender"""
+        from api.webhook_manager import WEBHOOK_USER_AGENT
+        dispatcher = WebhookManager(WebhookOutbox(str(tmp_path / "outbox.ndjson")), WebhookRegistry(webhooks_file))
+        dispatcher.subscribe("http://127.0.0.1:9/hook", ["key.generated"])
+        queued = []
+        dispatcher.outbox.enqueue = lambda url, body, headers, **kwargs: queued.append(headers) or "d1"
+        dispatcher.outbox.start = lambda: None
+        
+        dispatcher.trigger("key.generated", {})
+        
+        assert queued[0]["User-Agent"] == WEBHOOK_USER_AGENT
+    
+    def test_repeated_dead_letters_deactivate(self, webhooks_file):
+        """Test a subscription is dropped from dispatch after repeated failed deliveries"""
+        registry = WebhookRegistry(webhooks_file)
+        subscription_id = registry.subscribe("http://a", ["risk.assessed"])
+        
+        registry.record_delivery(subscription_id, False)
+        registry.record_delivery(subscription_id, True)
+        assert registry.get(subscription_id)["failure_count"] == 0
+        for _ in range(MAX_WEBHOOK_FAILURES):
+            registry.record_delivery(subscription_id, False)
+        
+        assert registry.matching("risk.assessed") == ()
+        assert WebhookRegistry(webhooks_file).get(subscription_id)["active"] is False
+    
+    def test_delivery_bookkeeping_is_saved_in_batches(self, webhooks_file, monkeypatch):
+        """Test many deliveries lead to one save, made by the timer or at exit"""
+        monkeypatch.setattr("api.webhook_registry.WEBHOOK_SAVE_SECONDS", 60)
+        registry = WebhookRegistry(webhooks_file)
+        subscription_id = registry.subscribe("http://a", ["risk.assessed"])
+        saves = []
+        save = registry.save
+        monkeypatch.setattr(registry, "save", lambda: saves.append(1) or save())
+        
+        for _ in range(50):
+            registry.record_delivery(subscription_id, True)
+        registry.record_delivery(subscription_id, False)
+        assert saves == []
+        
+        registry.flush()
+        
+        assert saves == [1]
+        saved = WebhookRegistry(webhooks_file).get(subscription_id)
+        assert saved["last_triggered"] is not None and saved["failure_count"] == 1